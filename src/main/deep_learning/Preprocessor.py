@@ -78,15 +78,19 @@ class Preprocessor:
 
         self.run_parallel(self.preprocess_pair, nifti_paths)
         # create pickle with infos
-        pickle.dump(
-            {
-                "patch_size": self.patch_size,
-                "spacings": self.target_spacing,
-                "n_class": 2, # len(self.metadata["labels"])
-                "in_channels": 1 + int(self.args.ohe), # len(self.metadata["modality"]) + int(self.args.ohe)
-            },
-            open(os.path.join(self.results, "config.pkl"), "wb"),
-        )
+        pickle.dump(self.config(), open(os.path.join(self.results, "config.pkl"), "wb"))
+
+    def config(self):
+        """
+        Retrieve the infos needed to build the network for the preprocessed data.
+        :return: config dictionary (saved as config.pkl)
+        """
+        return {
+            "patch_size": self.patch_size,
+            "spacings": self.target_spacing,
+            "n_class": 2, # len(self.metadata["labels"])
+            "in_channels": 1 + int(self.args.ohe), # len(self.metadata["modality"]) + int(self.args.ohe)
+        }
 
     def preprocess_pair(self, img):
         """
@@ -96,7 +100,18 @@ class Preprocessor:
         fname = os.path.basename(img)
         print(fname)
         image, label, image_spacings = self.load_img(img)
+        image, label, image_metadata = self.preprocess_image(image, label, fname)
 
+        self.save(image, label, fname, image_metadata)
+
+    def preprocess_image(self, image, label=None, fname=None):
+        """
+        Crop the foreground, normalize and (with ohe) add the foreground channel.
+        :param image: image in (C, D, H, W) layout
+        :param label: label, if any
+        :param fname: file name, used to save the cropped label
+        :return: preprocessed image, label, image metadata
+        """
         # Crop foreground and store original shapes
         orig_shape = image.shape[1:]
         bbox = transforms.utils.generate_spatial_bounding_box(image)
@@ -121,7 +136,17 @@ class Preprocessor:
             mask = np.expand_dims(mask, 0)
             image = np.concatenate([image, mask])
 
-        self.save(image, label, fname, image_metadata)
+        return image, label, image_metadata
+
+    def prepare_image(self, scan):
+        """
+        In-memory equivalent of prepare_nifti followed by load_img.
+        :param scan: NIfTI image
+        :return: image as float32 numpy array in (C, D, H, W) layout
+        """
+        image = np.stack([self.get_data(nifti=scan)], axis=-1).astype(np.float32)
+
+        return np.transpose(image, (3, 2, 1, 0))
 
     def prepare_nifti(self, image):
         """
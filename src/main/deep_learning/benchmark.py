@@ -0,0 +1,64 @@
+"""
+Measure the nnU-Net inference time per case, e.g. to compare CPU settings.
+
+Runs `InferenceModel` (the network used by ``inference_server.py``) on the
+cases of a preprocessed folder and reports the seconds per case, without the
+one-time cost of loading the checkpoint and building the network. On the CPU:
+
+    python benchmark.py --gpus 0 --threads 8 --amp --data <preprocess/val_3d/test> \\
+        --depth 6 --filters 64 96 128 192 256 384 512 --min_fmap 2 --tta --skip_empty_patches \\
+        --ckpt_path checkpoints/fold3/epoch=146-dice=88.05.ckpt
+"""
+import json
+import statistics
+import time
+
+import numpy as np
+import torch
+
+from data_loading.data_module import load_data
+from inference_server import InferenceModel
+from utils.args import get_main_parser
+
+
+parser = get_main_parser()
+parser.add_argument("--repeats", type=int, default=1, help="Timed predictions of every case")
+parser.add_argument("--warmup_cases", type=int, default=1, help="Untimed predictions before measuring")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if not args.ckpt_path:
+        parser.error("--ckpt_path is required")
+
+    start = time.perf_counter()
+    model = InferenceModel(args)
+    model.prepare(args.data)
+    load_seconds = time.perf_counter() - start
+
+    cases = list(zip(load_data(args.data, "*_x.npy"), load_data(args.data, "*_meta.npy")))
+    print(f"Device: {model.device}, threads: {torch.get_num_threads()}, "
+          f"autocast: {model.autocast_dtype}, channels_last_3d: {model.nnunet.channels_last}, tta: {args.tta}")
+    print(f"Model loaded in {load_seconds:.2f} s, {len(cases)} cases")
+
+    for image_file, meta_file in cases[:args.warmup_cases]:
+        model.predict(np.load(image_file), np.load(meta_file))
+
+    times = []
+    for image_file, meta_file in cases:
+        image, meta = np.load(image_file), np.load(meta_file)
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            model.predict(image, meta)
+            times.append(time.perf_counter() - start)
+        print(f"{image_file}: {times[-1]:.2f} s")
+
+    print(f"Seconds per case: mean {statistics.mean(times):.2f}, median {statistics.median(times):.2f}, "
+          f"min {min(times):.2f}, max {max(times):.2f}")
+    print(json.dumps({
+        "device": str(model.device),
+        "threads": torch.get_num_threads(),
+        "autocast": str(model.autocast_dtype),
+        "tta": args.tta,
+        "load_seconds": round(load_seconds, 3),
+        "seconds_per_case": round(statistics.mean(times), 3),
+    }))
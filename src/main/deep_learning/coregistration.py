@@ -4,6 +4,7 @@ from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 from pathlib import Path
 
 from utils.coreg import align, transform
+from utils.registration_store import RegistrationStore
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
@@ -28,6 +29,10 @@ parser.add_argument(
     "--atlas", type=str, required=True,
     help="T1 atlas"
 )
+parser.add_argument(
+    "--registrations", type=str, default=None,
+    help="Registration store shared with postprocess.py (registrations are not stored if omitted)"
+)
 parser.add_argument(
     "--clobber",
     action="store_true",          # diventa un flag
@@ -47,12 +52,21 @@ if __name__ == "__main__":
     prefix = str(output_dir / f"{input_basename}_")
 
     # Esegue la registrazione
-    stx_space_mri, mri_space_stx, stx2mri_tfm, mri2stx_tfm = align(
-        fx=mri,
-        mv=stx,
-        transform_method='SyNAggro',
-        outprefix=f'{prefix}_stx2mri_SyN_'
-    )
+    if args.registrations:
+        # postprocess.py maps the prediction back to the FLAIR with the same registration
+        stx_space_mri, mri_space_stx, stx2mri_tfm, mri2stx_tfm = RegistrationStore(args.registrations).align(
+            fx=mri,
+            mv=stx,
+            transform_method='SyNAggro',
+            register=align
+        )
+    else:
+        stx_space_mri, mri_space_stx, stx2mri_tfm, mri2stx_tfm = align(
+            fx=mri,
+            mv=stx,
+            transform_method='SyNAggro',
+            outprefix=f'{prefix}_stx2mri_SyN_'
+        )
 
     # Applica la trasformazione al brain mask skull-stripped
     brain_in_atlas = transform(
@@ -6,8 +6,8 @@ import os
 from pytorch_lightning import LightningDataModule
 from sklearn.model_selection import KFold
 
-from utils.utils import get_config_file, get_task_code, print0
-from data_loading.dali_loader import fetch_dali_loader
+from utils.utils import get_config_file, get_task_code, print0, use_gpu
+from data_loading.numpy_loader import fetch_numpy_loader
 
 
 # inspired by the NVIDIA nnU-Net GitHub repository available at:
@@ -15,6 +15,7 @@ from data_loading.dali_loader import fetch_dali_loader
 
 # DataModule makes use of the NVIDIA Data Loading Library (DALI)
 # read more at: https://docs.nvidia.com/deeplearning/dali/user-guide/docs/
+# (prediction on the CPU reads the cases with NumPy instead, and DALI is only imported by the GPU loaders)
 
 
 class DataModule(LightningDataModule):
@@ -74,6 +75,7 @@ class DataModule(LightningDataModule):
         Fetch the train DALI data loader.
         :return: train DALI data loader
         """
+        from data_loading.dali_loader import fetch_dali_loader
         return fetch_dali_loader(self.train_images, self.train_labels, self.args.batch_size, "train", **self.kwargs)
 
     def val_dataloader(self):
@@ -81,13 +83,17 @@ class DataModule(LightningDataModule):
         Fetch the eval DALI data loader.
         :return: eval DALI data loader
         """
+        from data_loading.dali_loader import fetch_dali_loader
         return fetch_dali_loader(self.val_images, self.val_labels, 1, "eval", **self.kwargs)
 
     def test_dataloader(self):
         """
-        Fetch the test DALI data loader.
-        :return: test DALI data loader
+        Fetch the test DALI data loader, or the NumPy one when running on the CPU.
+        :return: test data loader
         """
+        if not use_gpu(self.args):
+            return fetch_numpy_loader(self.test_images, 1, **self.kwargs)
+        from data_loading.dali_loader import fetch_dali_loader
         return fetch_dali_loader(self.test_images, None, 1, "test", **self.kwargs)
 
 
@@ -171,6 +177,7 @@ class DataModulePostop(LightningDataModule):
         Fetch the train DALI data loader.
         :return: train DALI data loader
         """
+        from data_loading.dali_loader import fetch_dali_loader
         return fetch_dali_loader(self.train_images, self.train_labels, self.args.batch_size, "train", **self.kwargs)
 
     def val_dataloader(self):
@@ -178,13 +185,17 @@ class DataModulePostop(LightningDataModule):
         Fetch the eval DALI data loader.
         :return: eval DALI data loader
         """
+        from data_loading.dali_loader import fetch_dali_loader
         return fetch_dali_loader(self.val_images, self.val_labels, 1, "eval", **self.kwargs)
 
     def test_dataloader(self):
         """
-        Fetch the test DALI data loader.
-        :return: test DALI data loader
+        Fetch the test DALI data loader, or the NumPy one when running on the CPU.
+        :return: test data loader
         """
+        if not use_gpu(self.args):
+            return fetch_numpy_loader(self.test_images, 1, **self.kwargs)
+        from data_loading.dali_loader import fetch_dali_loader
         return fetch_dali_loader(self.test_images, None, 1, "test", **self.kwargs)
 
 
@@ -0,0 +1,54 @@
+import numpy as np
+import torch
+
+from torch.utils.data import DataLoader, Dataset
+
+
+# Prediction data loading without DALI, whose pipelines read to the GPU.
+# Batches have the same layout as the DALI test loader: {"image": (N, C, D, H, W), "meta": (N, 4, 3)}
+
+
+class NumpyTestDataset(Dataset):
+    def __init__(self, imgs, meta):
+        """
+        Initialize the dataset of preprocessed test cases.
+        :param imgs: list with image paths (*_x.npy)
+        :param meta: list with metadata paths (*_meta.npy)
+        """
+        assert len(imgs) == len(meta), f"Number of images ({len(imgs)}) not matching number of metadata ({len(meta)})"
+        self.imgs = imgs
+        self.meta = meta
+
+    def __len__(self):
+        return len(self.imgs)
+
+    def __getitem__(self, idx):
+        """
+        Load one case.
+        :param idx: case index
+        :return: dictionary with image and metadata tensors
+        """
+        return {
+            "image": torch.from_numpy(np.load(self.imgs[idx])),
+            "meta": torch.from_numpy(np.load(self.meta[idx])),
+        }
+
+
+def fetch_numpy_loader(imgs, batch_size, **kwargs):
+    """
+    Fetch the NumPy test data loader, used for prediction on the CPU.
+    :param imgs: images
+    :param batch_size: batch size
+    :param kwargs: kwargs (meta and num_workers are used)
+    :return: torch DataLoader
+    """
+    assert len(imgs) > 0, "Empty list of images!"
+    # worker processes only pay off when there are several cases to read ahead
+    num_workers = min(kwargs["num_workers"], len(imgs)) if len(imgs) > 1 else 0
+
+    return DataLoader(
+        NumpyTestDataset(imgs, kwargs["meta"]),
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+    )
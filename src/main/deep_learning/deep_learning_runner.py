@@ -11,7 +11,8 @@ from pytorch_lightning.loggers import TensorBoardLogger
 from data_loading.data_module import DataModule, DataModulePostop
 from nnunet.nn_unet import NNUnet
 from utils.args import get_main_args
-from utils.utils import make_empty_dir, set_cuda_devices, set_granularity, verify_ckpt_path
+from utils.utils import get_precision, make_empty_dir, set_cpu_threads, set_cuda_devices, set_granularity, use_gpu, \
+    verify_ckpt_path
 
 
 # inspired by the NVIDIA nnU-Net GitHub repository available at:
@@ -20,8 +21,13 @@ from utils.utils import make_empty_dir, set_cuda_devices, set_granularity, verif
 
 if __name__ == "__main__":
     args = get_main_args()
-    set_granularity()  # increase maximum fetch granularity of L2 to 128 bytes
-    set_cuda_devices(args)
+    gpu = use_gpu(args)
+    if gpu:
+        set_granularity()  # increase maximum fetch granularity of L2 to 128 bytes
+        set_cuda_devices(args)
+    else:
+        print("CUDA not available or not requested: running on the CPU")
+        set_cpu_threads(args)
     if args.seed is not None:
         seed_everything(args.seed)
         #DataModulePostop(args)
@@ -35,7 +41,7 @@ if __name__ == "__main__":
     if args.freeze >= 0:
         # load weights only
         print(f"Loading state dict from {ckpt_path} for transfer learning...")
-        checkpoint = torch.load(ckpt_path, weights_only=False)
+        checkpoint = torch.load(ckpt_path, map_location="cpu", weights_only=False)
         nnunet.load_state_dict(checkpoint['state_dict'], strict = False)
         max_freezing = 2 * args.depth + 1
         assert args.freeze <= max_freezing, "Not enough blocks to freeze!"
@@ -83,15 +89,16 @@ if __name__ == "__main__":
         benchmark=True,
         deterministic=False,   # sets whether PyTorch operations must use deterministic algorithms
         max_epochs=args.epochs,
-        precision=16 if args.amp else 32,
+        precision=get_precision(args),  # float16 on the GPU, bfloat16 on CPUs supporting it
         gradient_clip_val=args.gradient_clip_val,
         enable_checkpointing=args.save_ckpt,
         callbacks=callbacks,
         num_sanity_val_steps=0,  # sanity check runs 0 validation batches before starting the training routine
-        accelerator="gpu",
-        devices=args.gpus,
+        accelerator="gpu" if gpu else "cpu",
+        devices=args.gpus if gpu else 1,
         num_nodes=args.nodes,
-        strategy="ddp" if args.gpus > 1 else "auto",
+        strategy="ddp" if gpu and args.gpus > 1 else "auto",
+        inference_mode=True,  # no autograd tracking during prediction
     )
 
     print(f"Save preds {args.save_preds}")
@@ -112,6 +119,8 @@ if __name__ == "__main__":
             make_empty_dir(save_dir)
 
         nnunet.args = args
-        checkpoint = torch.load(ckpt_path, weights_only=False)
+        checkpoint = torch.load(ckpt_path, map_location="cpu", weights_only=False)
         nnunet.load_state_dict(checkpoint['state_dict'], strict = False)
+        if not gpu:
+            nnunet.to_channels_last()
         trainer.test(nnunet, dataloaders=data_module.test_dataloader())
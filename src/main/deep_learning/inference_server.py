@@ -0,0 +1,178 @@
+"""
+Long-lived nnU-Net worker: builds the network and loads the checkpoint once, then segments a queue of cases.
+
+Running ``deep_learning_runner.py`` for every file imports torch and
+pytorch_lightning, builds `NNUnet` and reads the whole checkpoint again each
+time, which costs tens of seconds before the first voxel is predicted. This
+worker pays that cost once and then reads jobs from its standard input, one
+JSON object per line:
+
+    {"id": "2", "input": "/tmp/case/preprocess/val_3d/test", "output": "/tmp/case/predictions"}
+
+where ``input`` is a folder written by ``preprocess.py`` (``*_x.npy``,
+``*_meta.npy`` and ``config.pkl``) and ``output`` the folder receiving one
+``.npy`` prediction per case, as saved by the runner in predict mode.
+
+Jobs of kind ``"segment"`` run every phase after the coregistration in this
+process, handing arrays from one phase to the next (see ``phase_runner.py``),
+and write the final segmentation to the workspace derivatives:
+
+    {"id": "3", "kind": "segment", "input": "/tmp/case/coregistration/brain_rsl.nii.gz",
+     "output": "/path/to/workspace", "mri": ".../sub-01_flair.nii.gz", "atlas": ".../T1.nii.gz",
+     "brats": ".../BraTS-GLI-01-001.nii", "registrations": "...", "debug_dir": null}
+
+It reports on its standard output, one event per line prefixed by `EVENT_PREFIX`:
+
+    @nnunet {"event": "ready"}
+    @nnunet {"event": "started", "id": "2"}
+    @nnunet {"event": "progress", "id": "3", "phase": "preprocess"}
+    @nnunet {"event": "done", "id": "2", "seconds": 3.1, "cases": 1}
+    @nnunet {"event": "error", "id": "2", "message": "..."}
+
+where ``progress`` events name the phase a segment job enters.
+
+`InferenceModel` can also be used in-process: `predict` returns the
+prediction of one case as an array.
+
+Jobs are processed in order; the worker exits when its standard input is closed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+torch.serialization.add_safe_globals([argparse.Namespace])
+
+from data_loading.data_module import load_data
+from nnunet.nn_unet import NNUnet
+from phase_runner import PhaseRunner
+from utils.args import get_main_parser
+from utils.utils import cpu_supports_bf16, get_config_file, set_cpu_threads, use_gpu
+
+EVENT_PREFIX = "@nnunet "
+"""Marks the event lines among the output of the worker."""
+
+CONFIG_KEYS = ("patch_size", "spacings", "in_channels", "n_class")
+"""Entries of the preprocessing config that shape the network."""
+
+
+def emit(event, **fields):
+    """Write one event line and flush it, so the client sees it immediately."""
+    sys.stdout.write(EVENT_PREFIX + json.dumps(dict(event=event, **fields)) + "\n")
+    sys.stdout.flush()
+
+
+class InferenceModel:
+    """nnU-Net network and checkpoint, loaded once; same predictions as ``deep_learning_runner.py`` in predict mode."""
+
+    def __init__(self, args):
+        self.args = argparse.Namespace(**{**vars(args), "exec_mode": "predict", "save_preds": True})
+        self.device = torch.device("cuda" if use_gpu(args) else "cpu")
+        if self.device.type == "cuda":
+            torch.backends.cudnn.benchmark = True
+            self.autocast_dtype = torch.float16 if args.amp else None
+        else:
+            set_cpu_threads(args)
+            self.autocast_dtype = torch.bfloat16 if args.amp and cpu_supports_bf16() else None
+        self.state_dict = torch.load(args.ckpt_path, map_location="cpu", weights_only=False)["state_dict"]
+        self.nnunet = None
+        self.config = None
+
+    def prepare(self, data_dir):
+        """Build the network for the config of a preprocessed folder; kept while the config does not change."""
+        args = argparse.Namespace(**{**vars(self.args), "data": data_dir})
+        return self.build(get_config_file(args))
+
+    def build(self, config):
+        """Build the network for a preprocessing config (see `Preprocessor.config`); kept while it does not change."""
+        key = repr([np.asarray(config[name]).tolist() for name in CONFIG_KEYS])
+        if key != self.config:
+            nnunet = NNUnet(self.args, config=config)
+            nnunet.load_state_dict(self.state_dict, strict=False)
+            if self.device.type == "cpu":
+                nnunet.to_channels_last()
+            self.nnunet = nnunet.to(self.device).eval()
+            self.config = key
+        return self.nnunet
+
+    def predict(self, image, meta):
+        """
+        Segment one preprocessed case (`prepare` must have been called).
+        :param image: preprocessed image, (C, D, H, W)
+        :param meta: case metadata saved by the preprocessing
+        :return: probabilities in the original shape of the case
+        """
+        tensor = torch.from_numpy(np.ascontiguousarray(image))[None].to(self.device)
+        amp = self.autocast_dtype is not None
+        with torch.inference_mode(), torch.autocast(device_type=self.device.type, dtype=self.autocast_dtype, enabled=amp):
+            prediction = self.nnunet._forward(tensor)
+        return self.nnunet.restore_prediction(prediction.squeeze(0).float().cpu().numpy(), meta)
+
+    def run(self, data_dir, output_dir):
+        """
+        Segment every case of a preprocessed folder, saving the predictions as the runner does.
+        :return: saved prediction files
+        """
+        self.prepare(data_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        saved = []
+        for image_file, meta_file in zip(load_data(data_dir, "*_x.npy"), load_data(data_dir, "*_meta.npy")):
+            prediction = self.predict(np.load(image_file), np.load(meta_file))
+            path = os.path.join(output_dir, os.path.basename(image_file).replace("_x", ""))
+            np.save(path, prediction, allow_pickle=False)
+            saved.append(path)
+        return saved
+
+
+def run_job(model, runner, job):
+    """
+    Run one job.
+    :return: number of saved cases
+    """
+    if job.get("kind") == "segment":
+        runner.segment(job["input"], job["mri"], job["output"], job["atlas"], job["brats"],
+                       registrations=job.get("registrations"), debug_dir=job.get("debug_dir"),
+                       progress=lambda phase: emit("progress", id=job["id"], phase=phase))
+        return 1
+    return len(model.run(job["input"], job["output"]))
+
+
+def serve(model, stream):
+    """Process the jobs read from a stream until it is closed."""
+    runner = PhaseRunner(model)
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            print(f"Ignoring malformed job: {line}", file=sys.stderr)
+            continue
+
+        emit("started", id=job["id"])
+        start = time.perf_counter()
+        try:
+            cases = run_job(model, runner, job)
+        except Exception as e:
+            emit("error", id=job["id"], message=f"{type(e).__name__}: {e}")
+        else:
+            emit("done", id=job["id"], seconds=round(time.perf_counter() - start, 3), cases=cases)
+
+
+parser = get_main_parser()
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if not args.ckpt_path:
+        parser.error("--ckpt_path is required")
+    try:
+        loaded = InferenceModel(args)
+    except Exception as e:
+        emit("failed", message=f"{type(e).__name__}: {e}")
+        sys.exit(1)
+    emit("ready")
+    serve(loaded, sys.stdin)
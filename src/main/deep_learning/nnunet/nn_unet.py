@@ -16,6 +16,7 @@ from data_loading.data_module import get_data_path, load_data
 from nnunet.loss import LossBraTS
 
 from nnunet.metrics import Dice, Hausdorff95
+from nnunet.sliding_window import foreground_sliding_window_inference
 from utils.logger import DLLogger
 
 from utils.utils import get_config_file, print0
@@ -42,14 +43,16 @@ def flip(data, axis):
 
 
 class NNUnet(pl.LightningModule):
-    def __init__(self, args):
+    def __init__(self, args, config=None):
         """
         Initialize the nnU-Net framework for the BraTS task.
         :param args: args
+        :param config: preprocessing config (read from config.pkl in the data directory if None)
         """
         super(NNUnet, self).__init__()
         self.save_hyperparameters()
         self.args = args
+        self.config = config
         self.build_nnunet()
         self.best_temp_dice, self.best_epoch, self.test_idx = (0,) * 3
         self.best_temp_hausdorff95 = 373.13
@@ -58,6 +61,8 @@ class NNUnet(pl.LightningModule):
         self.learning_rate = args.learning_rate
         self.loss = LossBraTS(self.args.focal, self.args.freeze >= 0)
         self.tta_flips = [[2], [3], [4], [2, 3], [2, 4], [3, 4], [2, 3, 4]]
+        self.channels_last = False
+        self.background_logits = {}
         self.dice = Dice(self.n_class, self.args.freeze >= 0)
         self.hausdorff95 = Hausdorff95(self.n_class, self.args.freeze >= 0)
         if self.args.exec_mode == "train":
@@ -77,6 +82,8 @@ class NNUnet(pl.LightningModule):
         :param image: input image
         :return: inference output
         """
+        # prediction of the empty patches, shared by the flips of the same case
+        self.background_logits = {}
         return self.tta_inference(image) if self.args.tta else self.sliding_window_inference(image)
 
     def compute_loss(self, prediction, target):
@@ -134,31 +141,40 @@ class NNUnet(pl.LightningModule):
         image = batch["image"]
         prediction = self._forward(image).squeeze(0).cpu().detach().numpy()
         if self.args.save_preds:
-            prediction = expit(prediction)
-            # resize to original shape
             meta = batch["meta"][0].cpu().detach().numpy()
-            min_d, max_d = meta[0, 0], meta[1, 0]
-            min_h, max_h = meta[0, 1], meta[1, 1]
-            min_w, max_w = meta[0, 2], meta[1, 2]
-            n_class, original_shape, cropped_shape = prediction.shape[0], meta[2], meta[3]
-            if not all(cropped_shape == prediction.shape[1:]):
-                resized_pred = np.zeros((n_class, *cropped_shape))
-                for i in range(n_class):
-                    resized_pred[i] = resize(
-                        prediction[i], cropped_shape, order=3, mode="edge", cval=0, clip=True, anti_aliasing=False
-                    )
-                prediction = resized_pred
-            final_pred = np.zeros((n_class, *original_shape))
-            final_pred[:, min_d:max_d, min_h:max_h, min_w:max_w] = prediction
-
-            self.save_mask(final_pred)
+            self.save_mask(self.restore_prediction(prediction, meta))
+
+    def restore_prediction(self, prediction, meta):
+        """
+        Turn the logits of a preprocessed case into probabilities in its original (uncropped) shape.
+        :param prediction: logits, (n_class, D, H, W)
+        :param meta: case metadata saved by the preprocessing (crop bounds, original and cropped shapes)
+        :return: restored prediction
+        """
+        prediction = expit(prediction)
+        # resize to original shape
+        min_d, max_d = meta[0, 0], meta[1, 0]
+        min_h, max_h = meta[0, 1], meta[1, 1]
+        min_w, max_w = meta[0, 2], meta[1, 2]
+        n_class, original_shape, cropped_shape = prediction.shape[0], meta[2], meta[3]
+        if not all(cropped_shape == prediction.shape[1:]):
+            resized_pred = np.zeros((n_class, *cropped_shape))
+            for i in range(n_class):
+                resized_pred[i] = resize(
+                    prediction[i], cropped_shape, order=3, mode="edge", cval=0, clip=True, anti_aliasing=False
+                )
+            prediction = resized_pred
+        final_pred = np.zeros((n_class, *original_shape))
+        final_pred[:, min_d:max_d, min_h:max_h, min_w:max_w] = prediction
+
+        return final_pred
 
     def get_unet_params(self):
         """
         Compute and return the required parameters in order to build nnU-Net.
         :return: in_channels, out_channels, kernels list, strides list
         """
-        config = get_config_file(self.args)
+        config = self.config if self.config is not None else get_config_file(self.args)
         patch_size, spacings = config["patch_size"], config["spacings"]
         strides, kernels, sizes = [], [], patch_size[:]
         while True:
@@ -223,18 +239,46 @@ class NNUnet(pl.LightningModule):
     def sliding_window_inference(self, image):
         """
         Call to monai.infers.sliding_window_inference for inference.
+        With skip_empty_patches, the patches without foreground are not run through the network.
         :param image: input image
         :return: sliding window inference output
         """
+        if self.args.skip_empty_patches:
+            return foreground_sliding_window_inference(
+                inputs=image,
+                roi_size=self.patch_size,
+                sw_batch_size=self.args.val_batch_size,
+                predictor=self.predict_patch,
+                overlap=self.args.overlap,
+                background=self.background_logits,
+            )
         return sliding_window_inference(
             inputs=image,
             roi_size=self.patch_size,
             sw_batch_size=self.args.val_batch_size,
-            predictor=self.model,
+            predictor=self.predict_patch,
             overlap=self.args.overlap,
             mode="gaussian",
         )
 
+    def predict_patch(self, patch):
+        """
+        Run the model on a batch of sliding window patches.
+        :param patch: patches
+        :return: logits
+        """
+        if self.channels_last:
+            patch = patch.contiguous(memory_format=torch.channels_last_3d)
+
+        return self.model(patch)
+
+    def to_channels_last(self):
+        """
+        Use the channels_last_3d memory format, faster for 3D convolutions on the CPU (oneDNN).
+        """
+        self.model = self.model.to(memory_format=torch.channels_last_3d)
+        self.channels_last = True
+
     def round(self, tensor):
         """
         Round tensor mean to two decimal digits float.
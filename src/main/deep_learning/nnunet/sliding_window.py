@@ -0,0 +1,149 @@
+import math
+
+import torch
+import torch.nn.functional as F
+
+
+# Sliding window inference that skips the patches without foreground.
+# The patch grid, padding and Gaussian blending follow monai.inferers.sliding_window_inference
+# (MONAI 0.9.1, as pinned in requirements.txt): https://github.com/Project-MONAI/MONAI
+#
+# Skull-stripped volumes are mostly background: every patch whose voxels are all zero gets the
+# prediction of an empty patch, computed once, instead of a forward pass of the network.
+# The input of such patches is identical, so is their prediction: the result does not change.
+
+
+def scan_starts(image_size, roi_size, overlap):
+    """
+    Compute the start of the patches along one axis.
+    :param image_size: (padded) image size
+    :param roi_size: patch size
+    :param overlap: amount of overlap between patches
+    :return: list of start indices
+    """
+    if roi_size == image_size:
+        return [0]
+    interval = max(int(roi_size * (1 - overlap)), 1)
+    # the last patch is shifted back to end at the image border
+    num = math.ceil(max(image_size - roi_size, 0) / interval) + 1
+    return sorted({min(i * interval, image_size - roi_size) for i in range(num)})
+
+
+def patch_slices(image_size, roi_size, overlap):
+    """
+    Compute the spatial slices of all the patches of an image.
+    :param image_size: (padded) spatial size
+    :param roi_size: patch size
+    :param overlap: amount of overlap between patches
+    :return: list of tuples of slices
+    """
+    slices = [()]
+    for size, roi in zip(image_size, roi_size):
+        slices = [s + (slice(start, start + roi),) for s in slices for start in scan_starts(size, roi, overlap)]
+    return slices
+
+
+def gaussian_importance_map(roi_size, sigma_scale=0.125, device=None):
+    """
+    Compute the blending weights of the patch voxels, as MONAI's "gaussian" mode does: a unit impulse at the
+    patch center smoothed by a Gaussian filter (erf approximation, truncated at 4 standard deviations).
+    :param roi_size: patch size
+    :param sigma_scale: standard deviation, as a fraction of the patch size
+    :param device: torch device
+    :return: importance map, with maximum 1
+    """
+    importance = torch.ones((), dtype=torch.float32, device=device)
+    for size in roi_size:
+        sigma = sigma_scale * size
+        tail = int(max(sigma * 4.0, 0.5) + 0.5)
+        x = torch.arange(size, dtype=torch.float32, device=device) - size // 2
+        t = 0.70710678 / sigma
+        kernel = (0.5 * (torch.erf(t * (x + 0.5)) - torch.erf(t * (x - 0.5)))).clamp(min=0)
+        importance = importance[..., None] * torch.where(x.abs() <= tail, kernel, torch.zeros_like(kernel))
+    importance = importance / importance.max()
+
+    return importance.clamp(min=max(importance[importance != 0].min().item(), 1e-3))
+
+
+def is_out_of_memory(error):
+    """
+    Check if an error is an allocation failure, on the GPU or on the CPU.
+    :param error: exception
+    :return: True if the batch did not fit in memory
+    """
+    return isinstance(error, torch.cuda.OutOfMemoryError) or "can't allocate memory" in str(error)
+
+
+def foreground_sliding_window_inference(inputs, roi_size, sw_batch_size, predictor, overlap=0.5, background=None):
+    """
+    Sliding window inference predicting only the patches containing foreground.
+    :param inputs: input image, (N, C, D, H, W)
+    :param roi_size: patch size
+    :param sw_batch_size: maximum number of patches per forward pass (halved when a batch does not fit in memory)
+    :param predictor: function predicting a batch of patches
+    :param overlap: amount of overlap between patches
+    :param background: dictionary keeping the prediction of an empty patch between calls with the same predictor
+    :return: blended prediction, (N, out channels, D, H, W) float32
+    """
+    roi_size = tuple(int(r) for r in roi_size)
+    image_size = tuple(inputs.shape[2:])
+
+    # pad the image up to the patch size, as MONAI does
+    pads = [max(roi - size, 0) for roi, size in zip(roi_size, image_size)]
+    if any(pads):
+        inputs = F.pad(inputs, [p for pad in reversed(pads) for p in (pad // 2, pad - pad // 2)])
+    padded_size = tuple(inputs.shape[2:])
+
+    importance = gaussian_importance_map(roi_size, device=inputs.device)
+    slices = patch_slices(padded_size, roi_size, overlap)
+    count = torch.zeros(padded_size, dtype=torch.float32, device=inputs.device)
+    for s in slices:
+        count[s] += importance
+
+    # an empty patch (all channels zero) has no foreground: the ohe mask channel is zero as well
+    windows = [(n, (slice(None),) + s) for n in range(inputs.shape[0]) for s in slices]
+    has_foreground = [bool(inputs[n][s].any()) for n, s in windows]
+    foreground = [window for window, keep in zip(windows, has_foreground) if keep]
+    empty = [window for window, keep in zip(windows, has_foreground) if not keep]
+
+    output = None
+
+    def add(n, s, logits):
+        nonlocal output
+        if output is None:
+            output = torch.zeros((inputs.shape[0], logits.shape[0]) + padded_size, dtype=torch.float32,
+                                 device=inputs.device)
+        output[n][s] += logits.float() * importance
+
+    if empty:
+        background = {} if background is None else background
+        key = (inputs.shape[1], roi_size, inputs.dtype, inputs.device)
+        if key not in background:
+            background[key] = predictor(inputs.new_zeros((1, inputs.shape[1]) + roi_size))[0].float()
+        for n, s in empty:
+            add(n, s, background[key])
+
+    # split the foreground patches in batches of (nearly) the same size
+    batch_size = max(1, min(sw_batch_size, len(foreground)))
+    batch_size = math.ceil(len(foreground) / max(1, math.ceil(len(foreground) / batch_size)))
+    i = 0
+    while i < len(foreground):
+        batch = foreground[i:i + batch_size]
+        try:
+            logits = predictor(torch.stack([inputs[n][s] for n, s in batch]))
+        except RuntimeError as e:
+            if batch_size == 1 or not is_out_of_memory(e):
+                raise
+            batch_size = math.ceil(batch_size / 2)
+            if inputs.device.type == "cuda":
+                torch.cuda.empty_cache()
+            continue
+        for (n, s), patch_logits in zip(batch, logits):
+            add(n, s, patch_logits)
+        i += len(batch)
+
+    output = output / count
+
+    # crop the padding
+    crop = tuple(slice(pad // 2, pad // 2 + size) for pad, size in zip(pads, image_size))
+    return output[(slice(None), slice(None)) + crop]
@@ -0,0 +1,101 @@
+"""
+In-memory chain of the phases that follow the coregistration: reorientation, preprocessing, prediction and postprocessing.
+
+Run as separate scripts (``reorientation.py``, ``preprocess.py``,
+``deep_learning_runner.py`` and ``postprocess.py``), every phase writes its
+result to disk and the next one loads it again: the reoriented NIfTI, the
+prepared 4D NIfTI, the ``*_x.npy`` and ``*_meta.npy`` pair and the ``.npy``
+prediction. `PhaseRunner` calls the same functions in one process and hands
+the NumPy arrays and their metadata from one phase to the next, so only the
+final segmentation is written (the intermediates too when a debug folder is
+given).
+
+It runs in the nnU-Net worker (``inference_server.py``), whose network stays
+loaded, for the jobs of kind ``"segment"``.
+"""
+import os
+import tempfile
+
+import ants
+import nibabel as nib
+import numpy as np
+
+from postprocess import prediction_to_nifti, seg_output_path
+from preprocess import parser as preprocess_parser
+from Preprocessor import Preprocessor
+from reorientation import as_saved, reorient
+from utils.coreg import align, transform_image
+from utils.registration_store import RegistrationStore
+
+STEPS = ("reorientation", "preprocess", "deep_learning", "postprocess")
+"""Phases run by `PhaseRunner.segment`, in order."""
+
+
+class PhaseRunner:
+    def __init__(self, model):
+        """
+        Initialize the phase runner.
+        :param model: loaded `InferenceModel`
+        """
+        self.model = model
+        # same options as preprocess.py run by the application
+        self.preprocessor = Preprocessor(preprocess_parser.parse_args(["--ohe", "--results", ""]))
+
+    def segment(self, brain_in_atlas, mri, workspace, atlas, brats, registrations=None, debug_dir=None,
+                progress=None):
+        """
+        Segment a coregistered brain and save the segmentation in the space of the original FLAIR.
+        :param brain_in_atlas: skull-stripped brain in the atlas space (output of coregistration.py)
+        :param mri: original FLAIR mri
+        :param workspace: workspace path
+        :param atlas: T1 atlas
+        :param brats: BraTS reference
+        :param registrations: registration store shared with coregistration.py (the atlas is registered again if None)
+        :param debug_dir: folder receiving the intermediate results, as the separate phases write them
+        :param progress: function called with the name of every step (see `STEPS`) as it starts
+        :return: path of the saved segmentation
+        """
+        progress = progress or (lambda step: None)
+        fname = os.path.basename(mri).replace(".nii.gz", "").replace(".nii", "")
+        if debug_dir:
+            os.makedirs(debug_dir, exist_ok=True)
+        brats_img = nib.load(brats)
+
+        progress("reorientation")
+        # stored in the data type of the BraTS header, as reorientation.py saves it for preprocess.py
+        reoriented = as_saved(reorient(nib.load(brain_in_atlas), brats_img))
+        if debug_dir:
+            nib.save(reoriented, os.path.join(debug_dir, f"{fname}_reoriented.nii.gz"))
+
+        progress("preprocess")
+        image, _, meta = self.preprocessor.preprocess_image(self.preprocessor.prepare_image(reoriented))
+        if debug_dir:
+            np.save(os.path.join(debug_dir, f"{fname}_x.npy"), image, allow_pickle=False)
+            np.save(os.path.join(debug_dir, f"{fname}_meta.npy"), meta, allow_pickle=False)
+
+        progress("deep_learning")
+        self.model.build(self.preprocessor.config())
+        prediction = self.model.predict(image, meta)
+        if debug_dir:
+            np.save(os.path.join(debug_dir, f"{fname}.npy"), prediction, allow_pickle=False)
+
+        progress("postprocess")
+        seg = prediction_to_nifti(prediction, brats_img)
+        if debug_dir:
+            nib.save(seg, os.path.join(debug_dir, f"{fname}-seg.nii.gz"))
+
+        prefix, seg_path = seg_output_path(workspace, mri)
+        os.makedirs(prefix, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="dl_postprocess_") as work_dir:
+            if registrations:
+                # same registration as coregistration.py (FLAIR fixed, atlas moving): reused from the store
+                _, _, mrib2mri_tfm, _ = RegistrationStore(registrations).align(
+                    fx=mri, mv=atlas, transform_method='SyNAggro', register=align)
+            else:
+                _, _, mrib2mri_tfm, _ = align(
+                    fx=mri, mv=atlas, transform_method='SyNAggro', outprefix=os.path.join(work_dir, ""))
+            ants.image_write(transform_image(mri, seg, mrib2mri_tfm, interpolator='nearestNeighbor'), str(seg_path))
+
+        print("Final saved file:", seg_path)
+
+        return str(seg_path)
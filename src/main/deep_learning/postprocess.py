@@ -11,6 +11,7 @@ from glob import glob
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
 
 from utils.coreg import align, transform
+from utils.registration_store import RegistrationStore
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
@@ -38,23 +39,31 @@ def back_to_original_labels(pred):
     return bin_pred
 
 
+def prediction_to_nifti(pred_npy, img):
+    """
+    Convert a prediction to a segmentation in the BraTS space.
+    :param pred_npy: prediction, as saved by the runner
+    :param img: BraTS reference NIfTI image
+    :return: segmentation NIfTI image (in memory)
+    """
+    pred_mean = np.mean(pred_npy, axis=0)
+
+    # convert back to original BraTS labels
+    p = back_to_original_labels(pred_mean)
+
+    return nib.Nifti1Image(p, img.affine, header=img.header)
+
+
 def prepare_predictions(preds, brats, output_dir):
     saved_files = []
     for pred in preds:
         fname = os.path.basename(pred).split(".")[0]
         pred_npy = np.load(pred)
-        pred_mean = np.mean(pred_npy, axis=0)
-
-        # convert back to original BraTS labels
-        p = back_to_original_labels(pred_mean)
 
         # save as NIfTI
         img = nib.load(brats)
         out_path = os.path.join(output_dir, f"{fname}-seg.nii.gz")
-        nib.save(
-            nib.Nifti1Image(p, img.affine, header=img.header),
-            out_path,
-        )
+        nib.save(prediction_to_nifti(pred_npy, img), out_path)
         saved_files.append(out_path)
 
     return saved_files
@@ -81,6 +90,28 @@ def extract_subject_id(filepath):
     else:
         return None
 
+
+def seg_output_path(workspace, mri):
+    """
+    Path of the final segmentation of a FLAIR in the workspace derivatives.
+    :param workspace: workspace path
+    :param mri: original FLAIR mri
+    :return: (output directory, segmentation path)
+    """
+    subject_id = extract_subject_id(mri)
+    if subject_id is None:
+        raise ValueError(f"Cannot extract subject ID from filename: {os.path.basename(mri)}")
+
+    prefix = f"{workspace}/derivatives/deep_learning_seg/{subject_id}/anat/"
+
+    mri_name = Path(mri).name
+    if mri_name.endswith('.nii.gz'):
+        seg_name = mri_name[:-7] + '_seg.nii.gz'
+    else:
+        seg_name = Path(mri).stem + '_seg' + Path(mri).suffix
+
+    return prefix, Path(prefix) / seg_name
+
 # === CLI ARGUMENTS ===
 parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
 parser.add_argument(
@@ -108,6 +139,10 @@ parser.add_argument(
     "--mri", type=str, required=True,
     help="Original FLAIR mri"
 )
+parser.add_argument(
+    "--registrations", type=str, default=None,
+    help="Registration store shared with coregistration.py (the atlas is registered again if omitted)"
+)
 
 if __name__ == "__main__":
     args = parser.parse_args()
@@ -132,10 +167,7 @@ if __name__ == "__main__":
     atlas_brats = args.atlas
 
     subject_id = extract_subject_id(mri)
-    if subject_id is None:
-        raise ValueError(f"Cannot extract subject ID from filename: {os.path.basename(mri)}")
-
-    prefix = f"{args.w}/derivatives/deep_learning_seg/{subject_id}/anat/"
+    prefix, seg_path = seg_output_path(args.w, mri)
     print(f"Final path: {prefix}")
     outprefix = f"{args.output}/{subject_id}_mrib2mri_Rigid_"
 
@@ -145,12 +177,21 @@ if __name__ == "__main__":
     # Crea la directory se non esiste
     os.makedirs(prefix, exist_ok=True)
 
-    mri_space_mrib, mrib_space_mri, mrib2mri_tfm, mri2mrib_tfm = align(
-        fx=mri,
-        mv=atlas_brats,
-        transform_method='SyNAggro',
-        outprefix=outprefix
-    )
+    if args.registrations:
+        # same registration as coregistration.py (FLAIR fixed, atlas moving): reused from the store
+        mri_space_mrib, mrib_space_mri, mrib2mri_tfm, mri2mrib_tfm = RegistrationStore(args.registrations).align(
+            fx=mri,
+            mv=atlas_brats,
+            transform_method='SyNAggro',
+            register=align
+        )
+    else:
+        mri_space_mrib, mrib_space_mri, mrib2mri_tfm, mri2mrib_tfm = align(
+            fx=mri,
+            mv=atlas_brats,
+            transform_method='SyNAggro',
+            outprefix=outprefix
+        )
 
     new_mri = transform(
         prefix=prefix,
@@ -162,14 +203,6 @@ if __name__ == "__main__":
 
     new_mri = Path(new_mri)
 
-    mri_name = Path(mri).name
-    if mri_name.endswith('.nii.gz'):
-        seg_name = mri_name[:-7] + '_seg.nii.gz'
-    else:
-        seg_name = Path(mri).stem + '_seg' + Path(mri).suffix
-
-    seg_path = Path(prefix) / seg_name
-
     if seg_path.exists():
         seg_path.unlink()
 
@@ -26,6 +26,44 @@ parser.add_argument(
     help="File BraTS di riferimento (default: BraTS-GLI-01-001.nii nel repo)"
 )
 
+
+def reorient(my_img, brats_img):
+    """
+    Bring the brain_in_atlas image to the orientation, affine and header of the BraTS reference.
+    :param my_img: brain_in_atlas NIfTI image
+    :param brats_img: BraTS reference NIfTI image
+    :return: reoriented NIfTI image (in memory)
+    """
+    # Ottieni affini e orientamenti
+    my_ornt = io_orientation(my_img.affine)
+    brats_ornt = io_orientation(brats_img.affine)
+
+    sys.stdout.write(f"Orientamento brain_in_atlas: {my_ornt}\n")
+    sys.stdout.write(f"Orientamento BraTS riferimento: {brats_ornt}\n")
+
+    # Se necessario, riorienta
+    if not (my_ornt == brats_ornt).all():
+        sys.stdout.write("Orientamenti diversi - eseguo riorientazione...\n")
+        transform = ornt_transform(my_ornt, brats_ornt)
+        reoriented_data = apply_orientation(my_img.get_fdata(), transform)
+    else:
+        reoriented_data = my_img.get_fdata()
+        sys.stdout.write("Orientamento già coerente con BraTS\n")
+
+    img_corrected = reoriented_data / 10.0
+    return nib.Nifti1Image(img_corrected, affine=brats_img.affine, header=brats_img.header)
+
+
+def as_saved(img):
+    """
+    Return an image as it is read back once saved: the voxels are stored in the data type of its header
+    (int16 for the BraTS reference, scaled when needed), so they are rounded as in the saved file.
+    :param img: NIfTI image
+    :return: NIfTI image
+    """
+    return nib.Nifti1Image.from_bytes(img.to_bytes())
+
+
 if __name__ == "__main__":
     args = parser.parse_args()
 
@@ -43,32 +81,10 @@ if __name__ == "__main__":
     my_img = nib.load(brain_in_atlas_file)
     brats_img = nib.load(brats_reference_path)
 
-    # Ottieni affini e orientamenti
-    my_affine = my_img.affine
     brats_affine = brats_img.affine
-
-    my_ornt = io_orientation(my_affine)
-    brats_ornt = io_orientation(brats_affine)
-
-    sys.stdout.write(f"Orientamento brain_in_atlas: {my_ornt}\n")
-    sys.stdout.write(f"Orientamento BraTS riferimento: {brats_ornt}\n")
-
-    # Se necessario, riorienta
-    if not (my_ornt == brats_ornt).all():
-        sys.stdout.write("Orientamenti diversi - eseguo riorientazione...\n")
-        transform = ornt_transform(my_ornt, brats_ornt)
-        reoriented_data = apply_orientation(my_img.get_fdata(), transform)
-    else:
-        reoriented_data = my_img.get_fdata()
-        sys.stdout.write("Orientamento già coerente con BraTS\n")
-
-
-    img_corrected = reoriented_data / 10.0
-    reoriented_img = nib.Nifti1Image(img_corrected, affine=brats_affine, header=brats_img.header)
+    reoriented_img = reorient(my_img, brats_img)
 
     # Crea output
-    # reoriented_img = nib.Nifti1Image(reoriented_data, affine=brats_affine)
-
     output_dir.mkdir(parents=True, exist_ok=True)
     output_filename = f"{basename}_reoriented.nii.gz"
     reoriented_output_path = output_dir / output_filename
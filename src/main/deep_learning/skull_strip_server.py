@@ -0,0 +1,155 @@
+"""
+Long-lived skull-stripping worker: loads SynthStrip or HD-BET once and processes a queue of files.
+
+Starting ``nipreps-synthstrip`` or ``hd-bet`` for every file imports torch and
+reads the model weights again each time, which costs several seconds before
+any computation. This worker pays that cost once and then reads jobs from its
+standard input, one JSON object per line:
+
+    {"id": "3", "input": "/path/in.nii.gz", "output": "/path/out.nii.gz"}
+
+and reports on its standard output, one event per line prefixed by
+`EVENT_PREFIX` (anything else printed by the libraries is plain log text):
+
+    @skullstrip {"event": "ready"}
+    @skullstrip {"event": "started", "id": "3"}
+    @skullstrip {"event": "done", "id": "3", "seconds": 4.2}
+    @skullstrip {"event": "error", "id": "3", "message": "..."}
+
+Jobs are processed in order; the worker exits when its standard input is closed.
+"""
+import json
+import os
+import sys
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+EVENT_PREFIX = "@skullstrip "
+"""Marks the event lines among the output of the worker."""
+
+
+def emit(event, **fields):
+    """Write one event line and flush it, so the client sees it immediately."""
+    sys.stdout.write(EVENT_PREFIX + json.dumps(dict(event=event, **fields)) + "\n")
+    sys.stdout.flush()
+
+
+class SynthStripModel:
+    """SynthStrip (nipreps) network, loaded once; same processing as ``nipreps-synthstrip``."""
+
+    def __init__(self, model_path, device, border=1):
+        import torch
+        from nipreps.synthstrip.model import StripModel
+
+        self.torch = torch
+        self.device = torch.device(device)
+        self.border = border
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cudnn.deterministic = True
+
+        self.model = StripModel()
+        self.model.to(self.device)
+        self.model.eval()
+        checkpoint = torch.load(model_path, map_location=self.device)
+        self.model.load_state_dict(checkpoint["model_state_dict"])
+
+    def strip(self, input_file, output_file):
+        import nibabel as nib
+        import numpy as np
+        import scipy.ndimage
+        from nipreps.synthstrip.cli import conform, resample_like
+
+        image = nib.load(input_file)
+        conformed = conform(image)
+        in_data = conformed.get_fdata(dtype="float32")
+        in_data -= in_data.min()
+        in_data = np.clip(in_data / np.percentile(in_data, 99), 0, 1)
+        input_tensor = self.torch.from_numpy(in_data[np.newaxis, np.newaxis]).to(self.device)
+        with self.torch.no_grad():
+            sdt = self.model(input_tensor).cpu().numpy().squeeze()
+
+        sdt_target = resample_like(nib.Nifti1Image(sdt, conformed.affine, None), image, output_dtype="int16", cval=100)
+        sdt_data = np.asanyarray(sdt_target.dataobj).astype("int16")
+
+        # Largest connected component of the brain, with its holes filled
+        components = scipy.ndimage.label(sdt_data.squeeze() < self.border)[0]
+        bincount = np.bincount(components.flatten())[1:]
+        mask = scipy.ndimage.binary_fill_holes(components == (np.argmax(bincount) + 1))
+
+        img_data = image.get_fdata()
+        img_data[mask == 0] = np.min([0, img_data.min()])
+        nib.Nifti1Image(img_data, image.affine, image.header).to_filename(output_file)
+
+
+class HdBetModel:
+    """HD-BET predictor, loaded once; same processing as ``hd-bet``."""
+
+    def __init__(self, device, tta=True):
+        import torch
+        from HD_BET.checkpoint_download import maybe_download_parameters
+        from HD_BET.hd_bet_prediction import get_hdbet_predictor
+
+        maybe_download_parameters()
+        self.predictor = get_hdbet_predictor(use_tta=tta, device=torch.device(device), verbose=False)
+
+    def strip(self, input_file, output_file):
+        from HD_BET.hd_bet_prediction import hdbet_predict
+
+        hdbet_predict(input_file, output_file, self.predictor, keep_brain_mask=False,
+                      compute_brain_extracted_image=True)
+
+
+def load_model(args):
+    """Load the network of the selected tool."""
+    if args.tool == "synthstrip":
+        model = SynthStripModel(args.model, args.device)
+    else:
+        model = HdBetModel(args.device, tta=not args.disable_tta)
+    if args.threads:
+        # Set after loading: HD-BET takes every core when it runs on the CPU
+        import torch
+        torch.set_num_threads(args.threads)
+    return model
+
+
+def serve(model, stream):
+    """Process the jobs read from a stream until it is closed."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            print(f"Ignoring malformed job: {line}", file=sys.stderr)
+            continue
+
+        emit("started", id=job["id"])
+        start = time.perf_counter()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(job["output"])), exist_ok=True)
+            model.strip(job["input"], job["output"])
+        except Exception as e:
+            emit("error", id=job["id"], message=f"{type(e).__name__}: {e}")
+        else:
+            emit("done", id=job["id"], seconds=round(time.perf_counter() - start, 3))
+
+
+parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+parser.add_argument("--tool", choices=["synthstrip", "hd-bet"], required=True, help="Skull-stripping network")
+parser.add_argument("--device", default="cpu", help="Torch device (cpu or cuda)")
+parser.add_argument("--model", default=None, help="SynthStrip model weights")
+parser.add_argument("--threads", type=int, default=0, help="CPU threads used by torch (0: default)")
+parser.add_argument("--disable_tta", action="store_true", help="Disable the test-time augmentation of HD-BET")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.tool == "synthstrip" and not args.model:
+        parser.error("--model is required for synthstrip")
+    try:
+        loaded = load_model(args)
+    except Exception as e:
+        emit("failed", message=f"{type(e).__name__}: {e}")
+        sys.exit(1)
+    emit("ready")
+    serve(loaded, sys.stdin)
@@ -57,10 +57,10 @@ def float_0_1(value):
     return fvalue
 
 
-def get_main_args():
+def get_main_parser():
     """
-    Function to retrieve all command line args.
-    :return: args
+    Function to build the parser of all command line args.
+    :return: parser
     """
     parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
     arg = parser.add_argument
@@ -72,7 +72,8 @@ def get_main_args():
     arg("--config", type=str, default=None, help="Config file with arguments")
     arg("--logname", type=str, default="logs.json", help="Name of dlloger output")
     arg("--task", type=str, choices=["train", "val"], default="train", help="Choose between train or val on BraTS")
-    arg("--gpus", type=non_negative_int, default=1, help="Number of gpus")
+    arg("--gpus", type=non_negative_int, default=1, help="Number of gpus (0: run on the CPU)")
+    arg("--threads", type=non_negative_int, default=0, help="CPU threads used by torch on the CPU (0: all cores)")
     arg("--nodes", type=non_negative_int, default=1, help="Number of nodes")
     arg("--learning_rate", type=float, default=0.0008, help="Learning rate")
     arg("--gradient_clip_val", type=float, default=0, help="Gradient clipping norm value")
@@ -106,10 +107,19 @@ def get_main_args():
     arg("--filters", nargs="+", help="[Optional] Set U-Net filters", default=None, type=int)
     arg("--oversampling", type=float_0_1, default=0.4, help="Probability of crop to have some region with positive label")
     arg("--overlap", type=float_0_1, default=0.5, help="Amount of overlap between scans during sliding window inference")
+    arg("--skip_empty_patches", action="store_true", help="Do not run the network on sliding window patches without foreground")
     arg("--scheduler", action="store_true", help="Enable cosine rate scheduler with warmup")
     arg("--freeze", type=geq_minus_one_int, default=-1, help="Number of levels to freeze during training")
 
-    args = parser.parse_args()
+    return parser
+
+
+def get_main_args():
+    """
+    Function to retrieve all command line args.
+    :return: args
+    """
+    args = get_main_parser().parse_args()
     if args.config is not None:
         config = json.load(open(args.config, "r"))
         args = vars(args)
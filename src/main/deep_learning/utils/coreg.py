@@ -30,6 +30,28 @@ def transform(prefix, fx, mv, tfm, interpolator='linear', qc_filename=None, clob
     return out_fn
 
 
+def transform_image(fx, mv_img, tfm, interpolator='linear'):
+    """
+    Same as transform, for a moving image held in memory: nothing is written.
+    :param fx: fixed image file
+    :param mv_img: moving NIfTI image (nibabel)
+    :param tfm: transformations
+    :param interpolator: ANTs interpolator
+    :return: resampled ANTs image
+    """
+    print('\tTransforming (in memory)')
+    print('\t\tFixed', fx)
+    print('\t\tTransformations:', tfm)
+    print()
+
+    return ants.apply_transforms(fixed=ants.image_read(fx),
+                                 moving=ants.nifti_to_ants(mv_img),
+                                 transformlist=tfm,
+                                 interpolator=interpolator,
+                                 verbose=True
+                                 )
+
+
 def align(fx, mv, transform_method='SyNAggro', init=[], outprefix='', qc_filename=None):
     warpedmovout = outprefix + 'fwd.nii.gz'
     warpedfixout = outprefix + 'inv.nii.gz'
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import nibabel as nib
+import numpy as np
+
+
+# Registration artifacts shared between the phases of the pipeline (and between runs).
+# coregistration.py and postprocess.py both register the atlas to the same FLAIR with SyNAggro:
+# the store computes it once and hands the same transforms to the second caller.
+
+MAX_BYTES = 2 * 1024 ** 3
+"""Size of the registrations kept in a store; the least recently used ones are removed first."""
+
+ENTRY_FILE = "entry.json"
+OUTPUT_NAMES = ("fwd.nii.gz", "inv.nii.gz", "Composite.h5", "InverseComposite.h5")
+"""Files written by `utils.coreg.align` after its output prefix, in the order it returns them."""
+
+
+def image_hash(path):
+    """
+    Hash the voxels, shape, data type and affine of an image, whatever its file name or compression.
+    :param path: NIfTI file
+    :return: hexadecimal digest
+    """
+    img = nib.load(path)
+    data = np.ascontiguousarray(np.asanyarray(img.dataobj))
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((data.shape, data.dtype.str)).encode())
+    digest.update(np.asarray(img.affine, dtype=np.float64).round(6).tobytes())
+    digest.update(data.tobytes())
+
+    return digest.hexdigest()
+
+
+class RegistrationStore:
+    def __init__(self, root, max_bytes=MAX_BYTES):
+        """
+        Initialize a store of registration artifacts, keyed by (fixed hash, moving hash, transform method).
+        :param root: store directory (created if missing)
+        :param max_bytes: size of the registrations kept (the most recent one is always kept)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def entry_dir(self, fixed_hash, moving_hash, transform_method):
+        return os.path.join(self.root, f"{fixed_hash}_{moving_hash}_{transform_method}")
+
+    def lookup(self, fixed_hash, moving_hash, transform_method):
+        """
+        Find the outputs of a registration, or of the opposite one (fixed and moving swapped), inverted.
+        :return: (warped moving, warped fixed, forward transform, inverse transform) or None
+        """
+        for entry, inverted in ((self.entry_dir(fixed_hash, moving_hash, transform_method), False),
+                                (self.entry_dir(moving_hash, fixed_hash, transform_method), True)):
+            if os.path.exists(os.path.join(entry, ENTRY_FILE)):
+                outputs = tuple(os.path.join(entry, name) for name in OUTPUT_NAMES)
+                if all(os.path.exists(fn) for fn in outputs):
+                    os.utime(os.path.join(entry, ENTRY_FILE))  # most recently used
+                    warpedmovout, warpedfixout, fwdtransforms, invtransforms = outputs
+                    if inverted:
+                        return warpedfixout, warpedmovout, invtransforms, fwdtransforms
+                    return outputs
+        return None
+
+    def align(self, fx, mv, transform_method, register):
+        """
+        Register mv to fx, reusing the stored artifacts of the same (or the opposite) registration.
+        :param fx: fixed image
+        :param mv: moving image
+        :param transform_method: ANTs transform type
+        :param register: function computing the registration, with the signature of `utils.coreg.align`
+        :return: (warped moving, warped fixed, forward transform, inverse transform), as `utils.coreg.align`
+        """
+        fixed_hash, moving_hash = image_hash(fx), image_hash(mv)
+        outputs = self.lookup(fixed_hash, moving_hash, transform_method)
+        if outputs is not None:
+            print(f"\tReusing stored registration\n\t\tFixed: {fx}\n\t\tMoving: {mv}\n\t\tTransform: {transform_method}")
+            return outputs
+
+        # register in a private folder, then publish it in one rename so other processes never see half an entry
+        entry = self.entry_dir(fixed_hash, moving_hash, transform_method)
+        work_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.root)
+        try:
+            register(fx=fx, mv=mv, transform_method=transform_method, outprefix=os.path.join(work_dir, ""))
+            with open(os.path.join(work_dir, ENTRY_FILE), "w") as f:
+                json.dump({"fixed": fx, "moving": mv, "transform_method": transform_method, "created": time.time()}, f)
+            try:
+                os.rename(work_dir, entry)
+            except OSError:
+                if os.path.exists(os.path.join(entry, ENTRY_FILE)):
+                    # another process stored the same registration meanwhile
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                else:
+                    # leftover of an interrupted removal
+                    shutil.rmtree(entry, ignore_errors=True)
+                    os.rename(work_dir, entry)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        self.prune()
+
+        return tuple(os.path.join(entry, name) for name in OUTPUT_NAMES)
+
+    def prune(self):
+        """
+        Remove the least recently used registrations once the store is larger than max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if os.path.exists(os.path.join(entry, ENTRY_FILE)):
+                size = sum(os.path.getsize(os.path.join(entry, fn)) for fn in os.listdir(entry))
+                entries.append((os.path.getmtime(os.path.join(entry, ENTRY_FILE)), entry, size))
+
+        total = 0
+        for i, (_, entry, size) in enumerate(sorted(entries, reverse=True)):
+            total += size
+            if i and total > self.max_bytes:
+                shutil.rmtree(entry, ignore_errors=True)
@@ -58,6 +58,45 @@ def set_cuda_devices(args):
     os.environ["CUDA_VISIBLE_DEVICES"] = os.environ.get("CUDA_VISIBLE_DEVICES", device_list)
 
 
+def use_gpu(args):
+    """
+    Check whether to run on the GPU.
+    :param args: main args
+    :return: True if gpus are requested and CUDA is available
+    """
+    return args.gpus > 0 and torch.cuda.is_available()
+
+
+def set_cpu_threads(args):
+    """
+    Set the torch intra-op threads for CPU execution.
+    :param args: main args
+    """
+    torch.set_num_threads(args.threads or os.cpu_count() or 1)
+
+
+def cpu_supports_bf16():
+    """
+    Check whether the CPU computes bfloat16 natively (AVX512-BF16 or AMX).
+    Elsewhere bfloat16 is emulated and slower than float32.
+    :return: True if bfloat16 autocast pays off on this CPU
+    """
+    checks = ("_is_amx_tile_supported", "_is_avx512_bf16_supported")
+    return any(getattr(torch.cpu, check, lambda: False)() for check in checks)
+
+
+def get_precision(args):
+    """
+    Retrieve the Trainer precision: float16 mixed precision on the GPU, bfloat16 on CPUs supporting it.
+    :param args: main args
+    :return: precision
+    """
+    if use_gpu(args):
+        return 16 if args.amp else 32
+
+    return "bf16-mixed" if args.amp and cpu_supports_bf16() else 32
+
+
 def verify_ckpt_path(args):
     """
     Verify the good definition of specified checkpoint paths.
@@ -0,0 +1,197 @@
+import os
+import threading
+from collections import OrderedDict
+
+import nibabel as nib
+import numpy as np
+import pydicom
+from pydicom.errors import InvalidDicomError
+
+from logger import get_logger
+
+log = get_logger()
+
+LPS_TO_RAS = np.diag([-1.0, -1.0, 1.0, 1.0])
+"""DICOM patient coordinates are LPS+, NIfTI world coordinates are RAS+."""
+
+
+class DicomSeries:
+    """
+    DICOM series folder read as a 3D volume, one slice at a time.
+
+    Only the headers are read when the series is opened: instances are sorted
+    by their position along the slice normal, and the affine is built from the
+    image position, orientation and pixel spacing. Pixel data is decoded on
+    demand with `read_slice`, and decoded slices are kept in a byte-budgeted
+    LRU cache.
+
+    Voxel indices are in the native order of the series: (column, row, instance).
+    `canonical_view` and `native_view` convert arrays between that order and
+    the closest canonical (RAS+) orientation used by the viewer.
+
+    Attributes:
+        folder (str): Folder of the series.
+        files (list[str]): Instance files sorted along the slice normal.
+        shape (tuple[int, int, int]): Native volume shape.
+        affine (np.ndarray): Native voxel-to-world (RAS+) affine.
+        ornt (np.ndarray): Orientation transform from native to canonical axes.
+        canonical_shape (tuple[int, int, int]): Shape of the canonical volume.
+        canonical_affine (np.ndarray): Affine of the canonical volume.
+    """
+
+    SLICE_CACHE_BYTES = 128 * 1024 ** 2
+
+    def __init__(self, folder, max_cache_bytes=SLICE_CACHE_BYTES):
+        """
+        Args:
+            folder (str): Folder holding the instances of the series. When it holds
+                several series, the one with the most instances is opened.
+            max_cache_bytes (int, optional): Memory budget of the slice cache in bytes.
+
+        Raises:
+            ValueError: If the folder holds no usable single-frame DICOM series.
+        """
+        self.folder = folder
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_bytes = 0
+        self._slices = OrderedDict()
+        self._lock = threading.Lock()
+
+        headers = self._read_headers(folder)
+        self.files = [path for _, path, _ in headers]
+        self._scaling = [(float(getattr(h, "RescaleSlope", 1) or 1), float(getattr(h, "RescaleIntercept", 0) or 0))
+                         for _, _, h in headers]
+
+        first = headers[0][2]
+        rows, columns = int(first.Rows), int(first.Columns)
+        self.shape = (columns, rows, len(headers))
+        self.affine = self._build_affine(headers)
+
+        self.ornt = nib.orientations.io_orientation(self.affine)
+        self.canonical_affine = self.affine @ nib.orientations.inv_ornt_aff(self.ornt, self.shape)
+        canonical_shape = [0, 0, 0]
+        for axis, (new_axis, _) in enumerate(self.ornt):
+            canonical_shape[int(new_axis)] = self.shape[axis]
+        self.canonical_shape = tuple(canonical_shape)
+        # Orientation transform going back from canonical to native axes
+        self._inverse_ornt = np.zeros_like(self.ornt)
+        for axis, (new_axis, flip) in enumerate(self.ornt):
+            self._inverse_ornt[int(new_axis)] = (axis, flip)
+
+    @staticmethod
+    def _read_headers(folder):
+        """Read the headers of the largest series of a folder, sorted along the slice normal."""
+        series = {}
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                header = pydicom.dcmread(path, stop_before_pixels=True)
+            except (InvalidDicomError, OSError):
+                continue
+            if "ImagePositionPatient" not in header or "ImageOrientationPatient" not in header:
+                continue  # Not an image instance (e.g. a report or a DICOMDIR)
+            series.setdefault(getattr(header, "SeriesInstanceUID", ""), []).append((path, header))
+
+        if not series:
+            raise ValueError(f"No DICOM image found in {folder}")
+        uid, instances = max(series.items(), key=lambda item: len(item[1]))
+        if len(series) > 1:
+            log.info(f"{folder} holds {len(series)} series, opening {uid} ({len(instances)} instances)")
+        if any(int(getattr(h, "NumberOfFrames", 1) or 1) > 1 for _, h in instances):
+            raise ValueError("Multi-frame DICOM files are not supported, import the series first")
+
+        orientation = np.array(instances[0][1].ImageOrientationPatient, dtype=np.float64)
+        normal = np.cross(orientation[:3], orientation[3:])
+        headers = sorted(((float(np.dot(normal, np.array(h.ImagePositionPatient, dtype=np.float64))), path, h)
+                          for path, h in instances), key=lambda item: item[0])
+
+        positions = np.array([position for position, _, _ in headers])
+        if len(positions) > 1 and np.any(np.diff(positions) < 1e-4):
+            raise ValueError("Several instances share a slice position (4D or multi-echo series), "
+                             "import the series first")
+        return headers
+
+    @staticmethod
+    def _build_affine(headers):
+        """Build the native voxel-to-world (RAS+) affine from the sorted headers."""
+        first = headers[0][2]
+        orientation = np.array(first.ImageOrientationPatient, dtype=np.float64)
+        row_spacing, column_spacing = (float(s) for s in first.PixelSpacing)
+        origin = np.array(first.ImagePositionPatient, dtype=np.float64)
+
+        if len(headers) > 1:
+            last = np.array(headers[-1][2].ImagePositionPatient, dtype=np.float64)
+            slice_step = (last - origin) / (len(headers) - 1)
+            gaps = np.diff([position for position, _, _ in headers])
+            if np.ptp(gaps) > 0.01 * np.mean(gaps):
+                log.warning("Slices are not evenly spaced, using their mean spacing")
+        else:
+            thickness = float(getattr(first, "SliceThickness", 1) or 1)
+            slice_step = np.cross(orientation[:3], orientation[3:]) * thickness
+
+        affine = np.eye(4)
+        affine[:3, 0] = orientation[:3] * column_spacing  # Along a row: column index
+        affine[:3, 1] = orientation[3:] * row_spacing  # Along a column: row index
+        affine[:3, 2] = slice_step
+        affine[:3, 3] = origin
+        return LPS_TO_RAS @ affine
+
+    def __len__(self):
+        """Return the number of slices."""
+        return len(self.files)
+
+    def read_slice(self, index):
+        """
+        Return one slice of the series, using the slice cache.
+
+        Args:
+            index (int): Native slice index (position in `files`).
+
+        Returns:
+            np.ndarray: Read-only float32 slice of shape (columns, rows), rescaled to
+            the stored units, equal to ``volume[:, :, index]`` of the native volume.
+        """
+        with self._lock:
+            cached = self._slices.get(index)
+            if cached is not None:
+                self._slices.move_to_end(index)
+                return cached
+
+        pixels = pydicom.dcmread(self.files[index]).pixel_array
+        slope, intercept = self._scaling[index]
+        values = (pixels.T.astype(np.float32) * np.float32(slope) + np.float32(intercept))
+        values.setflags(write=False)
+        with self._lock:
+            if index not in self._slices and values.nbytes <= self.max_cache_bytes:
+                self._slices[index] = values
+                self.cache_bytes += values.nbytes
+                while self.cache_bytes > self.max_cache_bytes:
+                    _, evicted = self._slices.popitem(last=False)
+                    self.cache_bytes -= evicted.nbytes
+        return values
+
+    def loading_order(self):
+        """Return the native slice indices from the middle of the series outwards."""
+        middle = len(self) // 2
+        return sorted(range(len(self)), key=lambda k: (abs(k - middle), k))
+
+    def canonical_view(self, native):
+        """Return a view of a native-order volume in canonical orientation."""
+        return nib.orientations.apply_orientation(native, self.ornt)
+
+    def native_view(self, canonical):
+        """Return a view of a canonical volume in native order, so writing to it fills `canonical`."""
+        return nib.orientations.apply_orientation(canonical, self._inverse_ornt)
+
+    @property
+    def canonical_slice_axis(self):
+        """Canonical axis running across the slices of the series."""
+        return int(self.ornt[2, 0])
+
+    def native_slice_index(self, canonical_index):
+        """Map a position along `canonical_slice_axis` to a native slice index."""
+        if self.ornt[2, 1] < 0:
+            return len(self) - 1 - int(canonical_index)
+        return int(canonical_index)
@@ -17,7 +17,10 @@ from PyQt6.QtWidgets import QApplication, QStyleFactory
 
 from controller import Controller
 from logger import setup_logger
-from utils import resource_path, get_shell_path
+from threads.inference_service import stop_shared_inference_service
+from threads.nifti_utils_threads import KernelWarmupThread
+from tool_environment import resolve_tool_environment, apply_tool_environment
+from utils import resource_path
 
 
 if __name__ == "__main__":
@@ -38,12 +41,22 @@ if __name__ == "__main__":
     log = setup_logger(console=True)
     log.info("Program started")
 
-    # Extend PATH environment variable to include shell utilities
-    os.environ["PATH"] = get_shell_path()
+    # Take PATH and the FSL/FreeSurfer variables from the user's shell (cached between runs)
+    apply_tool_environment(resolve_tool_environment())
 
     # Create and start the main application controller
     controller = Controller()
     controller.start()
 
+    # The nnU-Net worker stays loaded between segmentation runs, until the application quits
+    app.aboutToQuit.connect(stop_shared_inference_service)
+
+    # Compile the viewer's numba kernels in the background (Settings > Warm Up Viewer at Startup)
+    if controller.settings.value("kernel_warmup", True, type=bool):
+        warmup_thread = KernelWarmupThread()
+        # Quitting does not wait for the whole warm-up, only briefly for the kernel being compiled
+        app.aboutToQuit.connect(warmup_thread.stop)
+        warmup_thread.start()
+
     # Begin Qt event loop (blocking call)
     sys.exit(app.exec())
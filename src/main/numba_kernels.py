@@ -0,0 +1,280 @@
+"""
+Numba kernels used by the NIfTI viewer and its background threads.
+
+Kernels are declared with `jit_kernel`, which compiles them with on-disk
+caching and records them in `JIT_KERNELS` together with sample arguments.
+`warm_up_kernels()` uses these samples to compile every registered kernel
+ahead of its first interactive use; new kernels only need the decorator to
+get the same treatment.
+"""
+
+import contextlib
+import threading
+import time
+
+import numpy as np
+from numba import njit, prange
+
+from logger import get_logger
+
+log = get_logger()
+
+# Parallel numba kernels may be launched from the GUI thread and from background
+# renderers; the default workqueue threading layer does not support concurrent
+# launches, so they are serialized through this lock.
+numba_kernel_lock = threading.Lock()
+
+JIT_KERNELS = {}
+"""Registered kernels: name -> (dispatcher, callable returning warm-up argument tuples)."""
+
+
+def jit_kernel(warmup_args=None, **options):
+    """
+    Compile a function with numba and register it as a viewer kernel.
+
+    Compiled code is cached on disk (`cache=True`) so that later sessions load it
+    instead of recompiling. When the source file cannot be located (e.g. inside
+    a frozen bundle), the kernel is compiled without caching; warm-up still
+    moves that compilation off the first interactive use.
+
+    Args:
+        warmup_args (Callable[[], list[tuple]], optional): Returns sample argument
+            tuples with the same types as the real calls, one per signature to compile.
+        **options: Options forwarded to `numba.njit` (e.g. `parallel=True`).
+
+    Returns:
+        Callable: Decorator producing the numba dispatcher.
+    """
+    def decorator(func):
+        try:
+            kernel = njit(cache=True, **options)(func)
+        except RuntimeError as e:
+            log.debug(f"On-disk cache unavailable for {func.__name__}: {e}")
+            kernel = njit(**options)(func)
+        JIT_KERNELS[func.__name__] = (kernel, warmup_args)
+        return kernel
+
+    return decorator
+
+
+def warm_up_kernels(names=None, stop=None):
+    """
+    Compile registered kernels by calling them with their warm-up arguments.
+
+    Args:
+        names (Iterable[str], optional): Kernels to warm up (defaults to all).
+        stop (Callable[[], bool], optional): Checked before each compilation;
+            warm-up ends early once it returns True.
+
+    Returns:
+        dict[str, float]: Seconds spent on each fully warmed-up kernel.
+    """
+    timings = {}
+    for name, (kernel, warmup_args) in list(JIT_KERNELS.items()):
+        if warmup_args is None or (names is not None and name not in names):
+            continue
+        start = time.perf_counter()
+        lock = numba_kernel_lock if kernel.targetoptions.get("parallel") else contextlib.nullcontext()
+        for args in warmup_args():
+            if stop is not None and stop():
+                return timings
+            with lock:
+                kernel(*args)
+        timings[name] = time.perf_counter() - start
+        log.debug(f"Kernel {name} ready in {timings[name]:.2f}s")
+    return timings
+
+
+def _volumes():
+    """Sample float32 volumes laid out as loaded 3D files (C or Fortran order) and as frames of 4D files."""
+    volume = np.zeros((4, 4, 4), dtype=np.float32)
+    fortran_volume = np.asfortranarray(np.zeros((4, 4, 4), dtype=np.float32))
+    frame = np.zeros((4, 4, 4, 2), dtype=np.float32)[..., 0]
+    return volume, fortran_volume, frame
+
+
+def _region_grow_warmup_args():
+    voxel_sizes = np.ones(3)
+    return [(img, 1, 1, 1, 2, voxel_sizes, img[1, 1, 1], 0.1, 0, 4, 0, 4, 0, 4, 26)
+            for img in _volumes()]
+
+
+def _overlay_warmup_args():
+    rgba_image = np.zeros((4, 4, 4))
+    overlay_color = np.array([1.0, 0.0, 0.0])
+    args = []
+    # ROI slices are uint8 and thresholded overlays are boolean, both flipped views
+    for dtype in (np.uint8, np.bool_):
+        overlay_slice = np.flipud(np.zeros((4, 4), dtype=dtype).T)
+        args.append((rgba_image, overlay_slice, overlay_slice * 0.5, overlay_color))
+    return args
+
+
+@jit_kernel(parallel=True)
+def compute_mask_numba_mm(img, x0, y0, z0, radius_mm, voxel_sizes,
+                          seed_intensity, diff,
+                          x_min, x_max, y_min, y_max, z_min, z_max):
+    """
+    Compute a binary spherical mask around a seed point in millimeter space.
+
+    This function is compiled with Numba for high-performance execution and
+    performs voxel-wise checks to include all voxels within a given radius
+    (in mm) and within a specified intensity difference from a seed value.
+    The viewer grows automatic ROIs with `region_grow_numba_mm` instead, so this
+    kernel is not warmed up.
+
+    Args:
+        img (np.ndarray): Input 3D image array.
+        x0, y0, z0 (int): Coordinates of the seed voxel.
+        radius_mm (float): Radius of the spherical mask in millimeters.
+        voxel_sizes (tuple[float, float, float]): Physical voxel sizes along each axis.
+        seed_intensity (float): Intensity value at the seed voxel.
+        diff (float): Maximum allowed intensity difference from the seed.
+        x_min, x_max, y_min, y_max, z_min, z_max (int): Bounding box limits in voxel space.
+
+    Returns:
+        np.ndarray: Binary mask (uint8) with 1 where the voxel meets the criteria.
+    """
+    mask = np.zeros(img.shape, dtype=np.uint8)
+    r2 = radius_mm * radius_mm
+    vx, vy, vz = voxel_sizes  # voxel dimensions in mm
+
+    for x in prange(x_min, x_max):
+        for y in range(y_min, y_max):
+            for z in range(z_min, z_max):
+                dx_mm = (x - x0) * vx
+                dy_mm = (y - y0) * vy
+                dz_mm = (z - z0) * vz
+                if dx_mm * dx_mm + dy_mm * dy_mm + dz_mm * dz_mm <= r2:
+                    if abs(img[x, y, z] - seed_intensity) <= diff:
+                        mask[x, y, z] = 1
+    return mask
+
+
+@jit_kernel(warmup_args=_region_grow_warmup_args)
+def region_grow_numba_mm(img, x0, y0, z0, radius_mm, voxel_sizes,
+                         seed_intensity, diff,
+                         x_min, x_max, y_min, y_max, z_min, z_max,
+                         connectivity):
+    """
+    Grow a connected region from a seed voxel, bounded by a sphere in millimeter space.
+
+    Starting from the seed, neighbouring voxels (6, 18 or 26-connectivity) are
+    added while they lie within `radius_mm` of the seed and within `diff` of the
+    seed intensity. Only voxels connected to the seed are included, and the work
+    is proportional to the size of the grown region rather than to the volume.
+
+    Args:
+        img (np.ndarray): Input 3D image array.
+        x0, y0, z0 (int): Coordinates of the seed voxel.
+        radius_mm (float): Radius of the bounding sphere in millimeters.
+        voxel_sizes (tuple[float, float, float]): Physical voxel sizes along each axis.
+        seed_intensity (float): Intensity value at the seed voxel.
+        diff (float): Maximum allowed intensity difference from the seed.
+        x_min, x_max, y_min, y_max, z_min, z_max (int): Bounding box limits in voxel space.
+        connectivity (int): Neighbourhood used for growing (6, 18 or 26).
+
+    Returns:
+        tuple[np.ndarray, int, int, int]: Binary mask (uint8) cropped to the grown
+        region, and the (x, y, z) voxel offset of the crop in the full volume.
+    """
+    sx, sy, sz = x_max - x_min, y_max - y_min, z_max - z_min
+    lx0, ly0, lz0 = x0 - x_min, y0 - y_min, z0 - z_min
+    if sx <= 0 or sy <= 0 or sz <= 0 or not (0 <= lx0 < sx and 0 <= ly0 < sy and 0 <= lz0 < sz):
+        return np.zeros((0, 0, 0), dtype=np.uint8), x0, y0, z0
+
+    # Neighbour offsets for the requested connectivity
+    offsets = np.empty((26, 3), dtype=np.int64)
+    n_offsets = 0
+    for dx in range(-1, 2):
+        for dy in range(-1, 2):
+            for dz in range(-1, 2):
+                order = abs(dx) + abs(dy) + abs(dz)
+                if order == 0 or (connectivity == 6 and order > 1) or (connectivity == 18 and order > 2):
+                    continue
+                offsets[n_offsets, 0] = dx
+                offsets[n_offsets, 1] = dy
+                offsets[n_offsets, 2] = dz
+                n_offsets += 1
+
+    r2 = radius_mm * radius_mm
+    vx, vy, vz = voxel_sizes  # voxel dimensions in mm
+
+    # Bounding-box-sized buffer; voxels are marked when pushed so each is visited once
+    mask = np.zeros((sx, sy, sz), dtype=np.uint8)
+    stack = np.empty(min(sx * sy * sz, 4096), dtype=np.int64)
+    mask[lx0, ly0, lz0] = 1
+    stack[0] = (lx0 * sy + ly0) * sz + lz0
+    top = 1
+
+    lo_x, lo_y, lo_z = lx0, ly0, lz0
+    hi_x, hi_y, hi_z = lx0, ly0, lz0
+
+    while top > 0:
+        top -= 1
+        idx = stack[top]
+        lx = idx // (sy * sz)
+        ly = (idx // sz) % sy
+        lz = idx % sz
+
+        lo_x, hi_x = min(lo_x, lx), max(hi_x, lx)
+        lo_y, hi_y = min(lo_y, ly), max(hi_y, ly)
+        lo_z, hi_z = min(lo_z, lz), max(hi_z, lz)
+
+        for k in range(n_offsets):
+            nx = lx + offsets[k, 0]
+            ny = ly + offsets[k, 1]
+            nz = lz + offsets[k, 2]
+            if nx < 0 or nx >= sx or ny < 0 or ny >= sy or nz < 0 or nz >= sz:
+                continue
+            if mask[nx, ny, nz]:
+                continue
+
+            dx_mm = (nx - lx0) * vx
+            dy_mm = (ny - ly0) * vy
+            dz_mm = (nz - lz0) * vz
+            if dx_mm * dx_mm + dy_mm * dy_mm + dz_mm * dz_mm > r2:
+                continue
+            if abs(img[nx + x_min, ny + y_min, nz + z_min] - seed_intensity) > diff:
+                continue
+
+            mask[nx, ny, nz] = 1
+            if top == stack.shape[0]:
+                grown = np.empty(stack.shape[0] * 2, dtype=np.int64)
+                grown[:top] = stack[:top]
+                stack = grown
+            stack[top] = (nx * sy + ny) * sz + nz
+            top += 1
+
+    cropped = mask[lo_x:hi_x + 1, lo_y:hi_y + 1, lo_z:hi_z + 1].copy()
+    return cropped, lo_x + x_min, lo_y + y_min, lo_z + z_min
+
+
+@jit_kernel(warmup_args=_overlay_warmup_args, parallel=True)
+def apply_overlay_numba(rgba_image, overlay_mask, overlay_intensity, overlay_color):
+    """
+    Apply a semi-transparent overlay to an RGBA image.
+
+    This function adds colorized overlay regions based on the provided mask and
+    intensity map, applying blending only on RGB channels.
+
+    Args:
+        rgba_image (np.ndarray): Base image (H, W, 3) in float format (0–1 range).
+        overlay_mask (np.ndarray): Binary mask (H, W) specifying overlay pixels.
+        overlay_intensity (np.ndarray): Intensity weight map (H, W) for overlay blending.
+        overlay_color (tuple[float, float, float]): RGB overlay color (0–1 range).
+
+    Returns:
+        np.ndarray: Modified RGBA image with overlay applied.
+    """
+    h, w, c = rgba_image.shape
+    for y in prange(h):
+        for x in range(w):
+            if overlay_mask[y, x]:
+                for ch in range(3):
+                    # Apply color to RGB channels only
+                    if overlay_color[ch] != 0:
+                        rgba_image[y, x, ch] = min(1.0, rgba_image[y, x, ch] + overlay_intensity[y, x] * overlay_color[ch])
+                    else:
+                        rgba_image[y, x, ch] *= (1.0 - overlay_intensity[y, x])
+    return rgba_image
@@ -0,0 +1,191 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def voxel_mapping(source_affine, target_affine):
+    """
+    Return the 4x4 matrix mapping target voxel indices to source voxel indices.
+
+    Args:
+        source_affine (np.ndarray): Voxel-to-world affine of the volume being sampled.
+        target_affine (np.ndarray): Voxel-to-world affine of the grid it is sampled on.
+
+    Returns:
+        np.ndarray: ``inv(source_affine) @ target_affine``.
+    """
+    return np.linalg.inv(np.asarray(source_affine, dtype=np.float64)) @ np.asarray(target_affine, dtype=np.float64)
+
+
+def needs_resampling(source_shape, source_affine, target_shape, target_affine):
+    """Return whether a volume must be resampled to line up voxel by voxel with another grid."""
+    if tuple(source_shape[:3]) != tuple(target_shape[:3]):
+        return True
+    return not np.allclose(voxel_mapping(source_affine, target_affine), np.eye(4), atol=1e-4)
+
+
+class ResampledOverlay:
+    """
+    Overlay volume sampled lazily on the voxel grid of the base image.
+
+    Both affines are combined into a single voxel-to-voxel mapping, and the
+    overlay is sampled with nearest-neighbour interpolation (so label atlases
+    keep their values) one displayed slice at a time. Sampled slices are kept
+    in a byte-budgeted LRU cache, so the full base-space volume is only built
+    when a caller explicitly asks for it (ROI averages, saving).
+
+    The threshold interface mirrors `OverlayThresholdIndex`: `set_threshold`
+    moves the threshold and `mask` exposes the thresholded overlay, here as a
+    `ResampledOverlayMask` decoding its slices on demand.
+
+    Attributes:
+        shape (tuple[int, int, int]): Shape of the base image grid.
+        mask (ResampledOverlayMask): Voxels strictly above the current threshold.
+        threshold (float): Current threshold value.
+    """
+
+    SLICE_CACHE_BYTES = 64 * 1024 ** 2
+
+    def __init__(self, data, source_affine, target_affine, target_shape, max_cache_bytes=SLICE_CACHE_BYTES):
+        """
+        Args:
+            data (np.ndarray): 3D overlay volume in its own voxel space.
+            source_affine (np.ndarray): Voxel-to-world affine of the overlay.
+            target_affine (np.ndarray): Voxel-to-world affine of the base image.
+            target_shape (tuple[int]): Shape of the base image (only the first three axes are used).
+            max_cache_bytes (int, optional): Memory budget of the slice cache in bytes.
+        """
+        self.data = data
+        self.shape = tuple(int(n) for n in target_shape[:3])
+        self.vox2vox = voxel_mapping(source_affine, target_affine)
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_bytes = 0
+        self._slices = OrderedDict()
+        self._lock = threading.Lock()
+        self._sorted_values = None
+        self.threshold = np.inf
+        self.mask = ResampledOverlayMask(self, self.threshold)
+
+    def set_threshold(self, threshold):
+        """
+        Move the threshold and replace `mask` with the matching lazy mask.
+
+        Returns:
+            None: The voxels that changed state are not tracked, so callers must
+            treat every displayed plane as changed.
+        """
+        self.threshold = threshold
+        self.mask = ResampledOverlayMask(self, threshold)
+        return None
+
+    @property
+    def count(self):
+        """Number of overlay voxels (in the overlay's own grid) above the current threshold."""
+        if self._sorted_values is None:
+            self._sorted_values = np.sort(np.asarray(self.data).ravel())
+        return int(self._sorted_values.size - np.searchsorted(self._sorted_values, self.threshold, side='right'))
+
+    @property
+    def nbytes(self):
+        """Memory footprint of the cached slices and sorted intensities in bytes."""
+        sorted_bytes = self._sorted_values.nbytes if self._sorted_values is not None else 0
+        return self.cache_bytes + sorted_bytes
+
+    def plane(self, axis, index):
+        """
+        Return one base-space slice of the overlay intensities, using the slice cache.
+
+        Args:
+            axis (int): Axis orthogonal to the slice (0, 1 or 2).
+            index (int): Position of the slice along `axis`.
+
+        Returns:
+            np.ndarray: Resampled slice, laid out like ``volume.take(index, axis)``.
+            Base voxels falling outside the overlay are 0.
+        """
+        key = (axis, index)
+        with self._lock:
+            cached = self._slices.get(key)
+            if cached is not None:
+                self._slices.move_to_end(key)
+                return cached
+
+        values = self.sample_plane(axis, index)
+        values.setflags(write=False)
+        with self._lock:
+            if key not in self._slices and values.nbytes <= self.max_cache_bytes:
+                self._slices[key] = values
+                self.cache_bytes += values.nbytes
+                while self.cache_bytes > self.max_cache_bytes:
+                    _, evicted = self._slices.popitem(last=False)
+                    self.cache_bytes -= evicted.nbytes
+        return values
+
+    def sample_plane(self, axis, index):
+        """Resample one base-space slice without going through the cache."""
+        in_plane = [a for a in range(3) if a != axis]
+        rows = np.arange(self.shape[in_plane[0]])
+        cols = np.arange(self.shape[in_plane[1]])
+
+        # Source voxel coordinate = translation + fixed slice term + in-plane terms
+        origin = self.vox2vox[:3, 3] + self.vox2vox[:3, axis] * index
+        source = [np.rint(origin[d]
+                          + self.vox2vox[d, in_plane[0]] * rows[:, None]
+                          + self.vox2vox[d, in_plane[1]] * cols[None, :]).astype(np.int64)
+                  for d in range(3)]
+
+        inside = np.ones((len(rows), len(cols)), dtype=bool)
+        for d in range(3):
+            inside &= (source[d] >= 0) & (source[d] < self.data.shape[d])
+
+        out = np.zeros((len(rows), len(cols)), dtype=self.data.dtype)
+        out[inside] = self.data[source[0][inside], source[1][inside], source[2][inside]]
+        return out
+
+    def to_dense(self):
+        """Resample the whole overlay onto the base grid, slab by slab along the first axis."""
+        out = np.empty(self.shape, dtype=self.data.dtype)
+        for x in range(self.shape[0]):
+            out[x] = self.sample_plane(0, x)
+        return out
+
+    def clear(self):
+        """Drop every cached slice."""
+        with self._lock:
+            self._slices.clear()
+            self.cache_bytes = 0
+
+
+class ResampledOverlayMask:
+    """
+    Thresholded view of a `ResampledOverlay` at a fixed threshold.
+
+    Behaves like a 3D boolean mask on the base grid for the viewer: slices are
+    decoded on demand with `plane`, single voxels can be read with
+    ``mask[x, y, z]`` and `to_dense` builds the full mask.
+
+    Attributes:
+        shape (tuple[int, int, int]): Shape of the base image grid.
+        threshold (float): Voxels strictly above this value belong to the mask.
+    """
+
+    def __init__(self, overlay, threshold):
+        self.overlay = overlay
+        self.shape = overlay.shape
+        self.threshold = threshold
+
+    def plane(self, axis, index):
+        """Return one boolean slice, equal to ``mask.take(index, axis)`` on the dense mask."""
+        return self.overlay.plane(axis, index) > self.threshold
+
+    def __getitem__(self, voxel):
+        x, y, z = (int(i) for i in voxel)
+        return bool(self.overlay.plane(0, x)[y, z] > self.threshold)
+
+    def to_dense(self, dtype=bool):
+        """Build the dense 3D mask."""
+        mask = np.empty(self.shape, dtype=dtype)
+        for x in range(self.shape[0]):
+            mask[x] = self.overlay.sample_plane(0, x) > self.threshold
+        return mask
@@ -0,0 +1,91 @@
+import numpy as np
+
+PROJECTIONS = ("MIP", "MinIP", "AvgIP")
+"""Intensity projections available in the viewer (maximum, minimum and mean)."""
+
+ROTATING_MIP = "RotatingMIP"
+"""Projection mode showing a MIP rotating about the superior (z) axis."""
+
+
+def intensity_projection(volume, kind, axis, chunk_size=16):
+    """
+    Project a 3D volume along one axis with a chunked reduction.
+
+    The volume is reduced a few slabs at a time along `axis`, so strided views
+    (a time frame of a 4D series) are never copied as a whole and the
+    temporary memory stays proportional to `chunk_size`.
+
+    Args:
+        volume (np.ndarray): 3D volume.
+        kind (str): One of `PROJECTIONS`.
+        axis (int): Axis to project along (0, 1 or 2).
+        chunk_size (int, optional): Number of slices reduced per chunk.
+
+    Returns:
+        np.ndarray: 2D float32 projection, shaped like ``volume.take(0, axis)``.
+
+    Raises:
+        ValueError: If `kind` is not a known projection.
+    """
+    if kind not in PROJECTIONS:
+        raise ValueError(f"Unknown projection: {kind}")
+
+    n = volume.shape[axis]
+    result = None
+    for start in range(0, n, chunk_size):
+        chunk = np.take(volume, np.arange(start, min(start + chunk_size, n)), axis=axis)
+        if kind == "MIP":
+            partial = chunk.max(axis=axis)
+            result = partial if result is None else np.maximum(result, partial)
+        elif kind == "MinIP":
+            partial = chunk.min(axis=axis)
+            result = partial if result is None else np.minimum(result, partial)
+        else:
+            partial = chunk.sum(axis=axis, dtype=np.float64)
+            result = partial if result is None else result + partial
+
+    if kind == "AvgIP":
+        result = result / n
+    return result.astype(np.float32)
+
+
+def rotation_angles(step_deg):
+    """Return the angles (degrees) of a full turn sampled every `step_deg` degrees."""
+    return np.arange(0.0, 360.0, step_deg)
+
+
+def rotating_mip(volume, angle_deg, chunk_size=16):
+    """
+    Maximum-intensity projection of a 3D volume rotated about its z axis.
+
+    Rays run along the y axis rotated by `angle_deg` around the volume centre,
+    so the angle 0 gives the coronal MIP. Voxels are sampled with nearest
+    neighbour interpolation, a few depth planes at a time.
+
+    Args:
+        volume (np.ndarray): 3D volume (X, Y, Z).
+        angle_deg (float): Rotation angle in degrees.
+        chunk_size (int, optional): Number of depth planes sampled per chunk.
+
+    Returns:
+        np.ndarray: 2D float32 projection of shape (X, Z).
+    """
+    nx, ny, nz = volume.shape[:3]
+    cx, cy = (nx - 1) / 2.0, (ny - 1) / 2.0
+    theta = np.deg2rad(angle_deg)
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+
+    u = np.arange(nx) - cx
+    result = np.zeros((nx, nz), dtype=np.float32)
+    for start in range(0, ny, chunk_size):
+        v = np.arange(start, min(start + chunk_size, ny)) - cy
+        # Source (x, y) of every (u, v) ray sample
+        x = np.rint(cx + u[:, None] * cos_t - v[None, :] * sin_t).astype(np.int64)
+        y = np.rint(cy + u[:, None] * sin_t + v[None, :] * cos_t).astype(np.int64)
+        inside = (x >= 0) & (x < nx) & (y >= 0) & (y < ny)
+        if not inside.any():
+            continue
+        samples = np.zeros(x.shape + (nz,), dtype=np.float32)
+        samples[inside] = volume[x[inside], y[inside], :]
+        np.maximum(result, samples.max(axis=1), out=result)
+    return result
@@ -0,0 +1,223 @@
+import numpy as np
+
+
+class RunLengthROI:
+    """
+    Compact binary ROI stored as run-length encoded rows of a 3D volume.
+
+    Voxels are addressed by their C-order flat index in a volume of shape
+    (X, Y, Z). The ROI is the union of half-open runs ``[start, end)``; runs are
+    sorted, disjoint and never cross a row (a fixed (x, y) along the last axis),
+    so each one describes a segment of one slice.
+
+    Instances are immutable: `union` and `difference` return new ROIs, which
+    makes keeping an undo history cheap. All operations cost time proportional
+    to the number of runs, not to the volume size.
+
+    Args:
+        shape (tuple[int, int, int]): Shape of the volume the ROI belongs to.
+        starts (np.ndarray, optional): Flat start index of each run.
+        ends (np.ndarray, optional): Flat (exclusive) end index of each run.
+    """
+
+    def __init__(self, shape, starts=None, ends=None):
+        self.shape = tuple(int(n) for n in shape[:3])
+        self.starts = np.asarray(starts if starts is not None else [], dtype=np.int64)
+        self.ends = np.asarray(ends if ends is not None else [], dtype=np.int64)
+
+    @classmethod
+    def from_mask(cls, mask, offset=(0, 0, 0), shape=None):
+        """
+        Encode a dense binary mask, optionally cropped from a larger volume.
+
+        Args:
+            mask (np.ndarray): 3D mask; non-zero voxels belong to the ROI.
+            offset (tuple[int, int, int]): Position of `mask` inside the volume.
+            shape (tuple[int, int, int], optional): Volume shape (defaults to the mask shape).
+
+        Returns:
+            RunLengthROI: Encoded ROI.
+        """
+        shape = tuple(shape[:3]) if shape is not None else mask.shape[:3]
+        _, ny, nz = shape
+        ox, oy, oz = offset
+        if mask.size == 0:
+            return cls(shape)
+
+        # Pad along the last axis so each row starts and ends outside the ROI
+        padded = np.zeros(mask.shape[:2] + (mask.shape[2] + 2,), dtype=np.int8)
+        padded[:, :, 1:-1] = mask != 0
+        edges = np.diff(padded, axis=2)
+
+        sx, sy, sz = np.nonzero(edges == 1)
+        ex, ey, ez = np.nonzero(edges == -1)
+        starts = ((sx + ox) * ny + (sy + oy)) * nz + (sz + oz)
+        ends = ((ex + ox) * ny + (ey + oy)) * nz + (ez + oz)
+        return cls(shape, starts, ends)
+
+    @classmethod
+    def from_slices(cls, slices, shape):
+        """
+        Encode a mask given as its successive slices along the first axis.
+
+        Only one slice is encoded at a time, so no temporary of the size of the
+        volume is made (e.g. for a mask kept by the viewer, or a lazy one).
+
+        Args:
+            slices (Iterable[np.ndarray]): 2D masks of the slices x = 0, 1, ...
+            shape (tuple[int, int, int]): Volume shape.
+
+        Returns:
+            RunLengthROI: Encoded ROI.
+        """
+        starts, ends = [], []
+        for x, plane in enumerate(slices):
+            roi = cls.from_mask(np.asarray(plane)[np.newaxis], (x, 0, 0), shape)
+            starts.append(roi.starts)
+            ends.append(roi.ends)
+        if not starts:
+            return cls(shape)
+        return cls(shape, np.concatenate(starts), np.concatenate(ends))
+
+    def __len__(self):
+        """Return the number of runs."""
+        return len(self.starts)
+
+    @property
+    def voxel_count(self):
+        """int: Number of voxels in the ROI."""
+        return int(np.sum(self.ends - self.starts))
+
+    def is_empty(self):
+        """Return whether the ROI contains no voxel."""
+        return len(self.starts) == 0
+
+    def union(self, other):
+        """Return the ROI containing the voxels of either ROI."""
+        return self._combine(other, np.logical_or)
+
+    def difference(self, other):
+        """Return the ROI containing the voxels of this ROI that are not in `other`."""
+        return self._combine(other, lambda a, b: a & ~b)
+
+    def _combine(self, other, keep):
+        """
+        Combine two ROIs with a boolean rule by sweeping over their run boundaries.
+
+        Args:
+            other (RunLengthROI): ROI on a volume of the same shape.
+            keep (Callable[[np.ndarray, np.ndarray], np.ndarray]): Decides, from the
+                coverage of each ROI, which elementary segments belong to the result.
+        """
+        if other.shape != self.shape:
+            raise ValueError(f"ROI shapes differ: {self.shape} vs {other.shape}")
+
+        bounds = np.concatenate([self.starts, self.ends, other.starts, other.ends])
+        if len(bounds) == 0:
+            return RunLengthROI(self.shape)
+        positions, inverse = np.unique(bounds, return_inverse=True)
+
+        # Coverage of each ROI over the segments [positions[k], positions[k + 1])
+        n_self, n_other = len(self.starts), len(other.starts)
+        delta_self = np.zeros(len(positions), dtype=np.int64)
+        delta_other = np.zeros(len(positions), dtype=np.int64)
+        np.add.at(delta_self, inverse[:n_self], 1)
+        np.add.at(delta_self, inverse[n_self:2 * n_self], -1)
+        np.add.at(delta_other, inverse[2 * n_self:2 * n_self + n_other], 1)
+        np.add.at(delta_other, inverse[2 * n_self + n_other:], -1)
+        inside = keep(np.cumsum(delta_self)[:-1] > 0, np.cumsum(delta_other)[:-1] > 0)
+
+        # Merge consecutive kept segments into runs
+        padded = np.concatenate([[False], inside, [False]]).astype(np.int8)
+        edges = np.diff(padded)
+        starts = positions[np.flatnonzero(edges == 1)]
+        ends = positions[np.flatnonzero(edges == -1)]
+        return RunLengthROI(self.shape, *self._split_rows(starts, ends))
+
+    def _split_rows(self, starts, ends):
+        """Split runs that span several rows so every run lies within a single row."""
+        nz = self.shape[2]
+        first_row = starts // nz
+        n_rows = (ends - 1) // nz - first_row + 1
+        if len(starts) == 0 or np.all(n_rows == 1):
+            return starts, ends
+
+        run = np.repeat(np.arange(len(starts)), n_rows)
+        row = first_row[run] + np.arange(len(run)) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows)
+        return np.maximum(starts[run], row * nz), np.minimum(ends[run], (row + 1) * nz)
+
+    def flat_indices(self, starts=None, ends=None):
+        """
+        Expand runs into the flat indices of their voxels.
+
+        Args:
+            starts, ends (np.ndarray, optional): Subset of runs (defaults to all runs).
+
+        Returns:
+            np.ndarray: Sorted flat voxel indices (int64).
+        """
+        starts = self.starts if starts is None else starts
+        ends = self.ends if ends is None else ends
+        lengths = ends - starts
+        if len(lengths) == 0:
+            return np.empty(0, dtype=np.int64)
+        run_offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return np.arange(int(lengths.sum()), dtype=np.int64) + run_offsets
+
+    def plane(self, axis, index):
+        """
+        Decode one slice of the ROI.
+
+        Args:
+            axis (int): Axis orthogonal to the slice (0, 1 or 2).
+            index (int): Position of the slice along `axis`.
+
+        Returns:
+            np.ndarray: Binary slice (uint8), equal to ``mask.take(index, axis)``
+            on the dense mask.
+        """
+        nx, ny, nz = self.shape
+        if axis == 0:
+            # Runs of the slab x == index are contiguous in the sorted run list
+            lo, hi = np.searchsorted(self.starts, [index * ny * nz, (index + 1) * ny * nz])
+            out = np.zeros((ny, nz), dtype=np.uint8)
+            out.ravel()[self.flat_indices(self.starts[lo:hi], self.ends[lo:hi]) - index * ny * nz] = 1
+            return out
+
+        rows = self.starts // nz
+        if axis == 1:
+            selected = rows % ny == index
+            voxels = self.flat_indices(self.starts[selected], self.ends[selected])
+            out = np.zeros((nx, nz), dtype=np.uint8)
+            out[voxels // (ny * nz), voxels % nz] = 1
+            return out
+
+        first = self.starts - rows * nz
+        selected = (first <= index) & (index < self.ends - rows * nz)
+        out = np.zeros((nx, ny), dtype=np.uint8)
+        out[rows[selected] // ny, rows[selected] % ny] = 1
+        return out
+
+    def embed(self, offset, shape):
+        """
+        Place the ROI inside a larger volume.
+
+        Args:
+            offset (tuple[int, int, int]): Position of this ROI's volume inside the larger one.
+            shape (tuple[int, int, int]): Shape of the larger volume.
+
+        Returns:
+            RunLengthROI: The same voxels, addressed in the larger volume.
+        """
+        shape = tuple(int(n) for n in shape[:3])
+        _, ny, nz = self.shape
+        rows = self.starts // nz
+        x, y, z = rows // ny + offset[0], rows % ny + offset[1], self.starts % nz + offset[2]
+        starts = (x * shape[1] + y) * shape[2] + z
+        return RunLengthROI(shape, starts, starts + (self.ends - self.starts))
+
+    def to_dense(self, dtype=np.uint8):
+        """Decode the ROI into a dense 3D mask."""
+        mask = np.zeros(self.shape, dtype=dtype)
+        mask.ravel()[self.flat_indices()] = 1
+        return mask
@@ -0,0 +1,260 @@
+"""
+Provenance of skull-stripping outputs, used to skip work that was already done.
+
+The JSON sidecar of every output records a provenance entry: a hash of the
+input voxels (and affine), the tool, the parameters that change its result and
+the device. Running the same tool with the same parameters on an input whose
+voxels did not change finds the previous output instead of running the tool
+again, and an output whose input changed since it was written is known to be
+stale, whatever the modification times of the files.
+
+The record also keeps a stamp of the input file (size and modification time):
+checking whether an output is current (e.g. for every file listed in a dialog),
+or describing a new run of an input that was already stripped, only reads the
+voxels again when the stamp changed.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import nibabel as nib
+import numpy as np
+
+from logger import get_logger
+
+log = get_logger()
+
+PROVENANCE_KEY = "Provenance"
+"""Sidecar entry holding the provenance of an output."""
+
+TOOL_PARAMETERS = {
+    "fsl-bet": ("f_val", "opt_brain_extracted", "opt_m", "opt_t", "opt_s", "opt_o", "c_x", "c_y", "c_z"),
+    "synthstrip": (),
+    "hd-bet": (),
+}
+"""Parameters that change the output of each tool."""
+
+STAMP_KEY = "InputStamp"
+"""Provenance entry holding the stamp of the input; not part of the comparison between runs."""
+
+_hash_lock = threading.Lock()
+_hashes = {}
+"""Voxel hashes by (path, modification time, size), so unchanged files are read once."""
+
+
+def voxel_hash(path):
+    """
+    Hash the voxels, shape, data type and affine of a NIfTI image.
+
+    Two files holding the same image (e.g. copied, or compressed differently)
+    have the same hash. Hashes are memoized while the file is unchanged.
+
+    Args:
+        path (str): NIfTI file.
+
+    Returns:
+        str: Hexadecimal digest.
+
+    Raises:
+        Exception: If the file cannot be read as an image.
+    """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _hash_lock:
+        if key in _hashes:
+            return _hashes[key]
+
+    img = nib.load(path)
+    data = np.ascontiguousarray(np.asanyarray(img.dataobj))
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((data.shape, data.dtype.str)).encode())
+    digest.update(np.asarray(img.affine, dtype=np.float64).round(6).tobytes())
+    digest.update(data.tobytes())
+    value = digest.hexdigest()
+
+    with _hash_lock:
+        _hashes[key] = value
+    return value
+
+
+def file_stamp(path):
+    """
+    Return a cheap stamp of a file, which changes whenever the file is written.
+
+    Args:
+        path (str): File.
+
+    Returns:
+        dict: Size and modification time (ns) of the file.
+    """
+    stat = os.stat(os.path.realpath(path))
+    return {"Size": stat.st_size, "MtimeNs": stat.st_mtime_ns}
+
+
+def same_run(provenance, record):
+    """Return whether two provenance records describe the same run (the input stamps are ignored)."""
+    if not provenance or not record:
+        return False
+    strip = lambda r: {key: value for key, value in r.items() if key != STAMP_KEY}
+    return strip(provenance) == strip(record)
+
+
+def provenance_record(nifti_file, bet_tool, parameters, has_cuda, output_dir=None):
+    """
+    Describe a skull-stripping run of one input.
+
+    When `output_dir` holds an output of this input recorded with its current
+    stamp, the recorded voxel hash is reused instead of reading the voxels.
+
+    Args:
+        nifti_file (str): Input file.
+        bet_tool (str): Tool used ("fsl-bet", "synthstrip" or "hd-bet").
+        parameters (dict): Tool options (only those in `TOOL_PARAMETERS` are kept).
+        has_cuda (bool): Whether CUDA is available (HD-BET results differ on the CPU, without TTA).
+        output_dir (str, optional): Output folder of the subject.
+
+    Returns:
+        dict: JSON-serializable record stored in the output sidecar.
+    """
+    parameters = parameters or {}
+    stamp = file_stamp(nifti_file)
+    input_hash = _recorded_hash(output_dir, os.path.basename(nifti_file), stamp) if output_dir else None
+    return {
+        "InputHash": input_hash or voxel_hash(nifti_file),
+        "Tool": bet_tool,
+        "Parameters": {name: parameters[name] for name in TOOL_PARAMETERS.get(bet_tool, ()) if name in parameters},
+        "Device": ("cuda" if has_cuda else "cpu") if bet_tool == "hd-bet" else None,
+        STAMP_KEY: stamp,
+    }
+
+
+def _recorded_hash(output_dir, filename, stamp):
+    """Return the input hash recorded by an output of `filename` made when the input had `stamp`, or None."""
+    for _, metadata in _read_sidecars(output_dir):
+        provenance = metadata and metadata.get(PROVENANCE_KEY)
+        if provenance and filename in metadata.get("Sources", []) and provenance.get(STAMP_KEY) == stamp:
+            return provenance.get("InputHash")
+    return None
+
+
+def _read_sidecars(output_dir):
+    """Yield (output file, sidecar metadata or None) for every output of a folder."""
+    if not os.path.isdir(output_dir):
+        return
+    for name in sorted(os.listdir(output_dir)):
+        if not name.endswith(".nii.gz"):
+            continue
+        output = os.path.join(output_dir, name)
+        sidecar = output.replace(".nii.gz", ".json")
+        metadata = None
+        if os.path.exists(sidecar):
+            try:
+                with open(sidecar) as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning(f"Unreadable sidecar {sidecar}: {e}")
+        yield output, metadata
+
+
+def find_cached_output(output_dir, record, filename=None):
+    """
+    Find an output written by a run matching a provenance record.
+
+    The match may come from another input with the same voxels: outputs made
+    from `filename` (listed in their sidecar sources) are preferred.
+
+    Args:
+        output_dir (str): Output folder of the subject.
+        record (dict): Record returned by `provenance_record`.
+        filename (str, optional): Name of the input.
+
+    Returns:
+        tuple[str, bool] | None: Path of the matching output and whether it was
+        made from `filename`, or None.
+    """
+    match = None
+    for output, metadata in _read_sidecars(output_dir):
+        if metadata and same_run(metadata.get(PROVENANCE_KEY), record):
+            if filename is not None and filename in metadata.get("Sources", []):
+                return output, True
+            match = match or (output, False)
+    return match
+
+
+def has_current_output(output_dir, nifti_file):
+    """
+    Check whether a folder holds an up-to-date skull strip of an input.
+
+    Outputs recording their provenance count only if they were made from this
+    input and its voxels did not change since. The voxels are only hashed when
+    the input stamp differs from the recorded one (skull stripping the input
+    again records its new stamp, see `refresh_stamp`). Older outputs, without
+    provenance, count if their sidecar lists the input among its sources or if
+    they have no sidecar at all, since nothing tells whether they are stale.
+
+    Args:
+        output_dir (str): Output folder of the subject.
+        nifti_file (str): Input file.
+
+    Returns:
+        bool: True if an up-to-date (or untracked) output exists.
+    """
+    filename = os.path.basename(nifti_file)
+    stamp = input_hash = None
+    for output, metadata in _read_sidecars(output_dir):
+        if metadata is None:
+            return True
+        if filename not in metadata.get("Sources", []):
+            continue
+        provenance = metadata.get(PROVENANCE_KEY)
+        if not provenance:
+            return True
+        if stamp is None:
+            try:
+                stamp = file_stamp(nifti_file)
+            except OSError as e:
+                log.warning(f"Cannot read {nifti_file}: {e}")
+                return True
+        if provenance.get(STAMP_KEY) == stamp:
+            return True
+        if input_hash is None:
+            try:
+                input_hash = voxel_hash(nifti_file)
+            except Exception as e:
+                log.warning(f"Cannot hash {nifti_file}: {e}")
+                return True
+        if provenance.get("InputHash") == input_hash:
+            return True
+    return False
+
+
+def refresh_stamp(output, record):
+    """
+    Record the current input stamp in the sidecar of an output reused by a run.
+
+    The input was touched but its voxels did not change (e.g. it was copied back
+    or saved again): later checks compare the stamp and skip the hash.
+
+    Args:
+        output (str): Output reused by the run.
+        record (dict): Record returned by `provenance_record` for the run.
+    """
+    sidecar = output.replace(".nii.gz", ".json")
+    try:
+        with open(sidecar) as f:
+            metadata = json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning(f"Unreadable sidecar {sidecar}: {e}")
+        return
+    provenance = metadata.get(PROVENANCE_KEY)
+    if not provenance or provenance.get(STAMP_KEY) == record.get(STAMP_KEY):
+        return
+
+    provenance[STAMP_KEY] = record[STAMP_KEY]
+    try:
+        with open(sidecar, "w") as f:
+            json.dump(metadata, f, indent=2)
+    except OSError as e:
+        log.warning(f"Cannot update sidecar {sidecar}: {e}")
@@ -0,0 +1,195 @@
+import matplotlib
+import numpy as np
+
+from logger import get_logger
+from numba_kernels import numba_kernel_lock, apply_overlay_numba
+
+log = get_logger()
+
+OVERLAY_COLORS = {
+    "gray": np.array([1.0, 0.0, 0.0]),
+    "viridis": np.array([1.0, 0.0, 0.0]),
+    "plasma": np.array([0.0, 1.0, 0.0]),
+    "inferno": np.array([0.0, 1.0, 1.0]),
+    "magma": np.array([0.0, 1.0, 1.0]),
+    "hot": np.array([0.0, 1.0, 1.0]),
+    "cool": np.array([1.0, 1.0, 0.0]),
+    "bone": np.array([1.0, 0.0, 0.0])
+}
+"""Mask color (RGB) used on top of each colormap, chosen to contrast with it."""
+
+DEFAULT_OVERLAY_COLOR = np.array([0.0, 1.0, 0.0])
+
+
+def intensity_window(volume):
+    """
+    Return the intensities that `normalize_volume` maps to 0 and 1.
+
+    Args:
+        volume (np.ndarray): 3D voxel intensities.
+
+    Returns:
+        tuple[float, float] | None: 0.1th and 99.9th percentiles of the finite
+        voxels, or None if there are none.
+    """
+    valid_data = volume[np.isfinite(volume)]
+    if valid_data.size == 0:
+        return None
+
+    vmin, vmax = np.percentile(valid_data, [0.1, 99.9])
+    if vmax <= vmin:
+        vmax = vmin + 1.0
+    return vmin, vmax
+
+
+def normalize_volume(volume, out=None, window=None):
+    """
+    Normalize a 3D volume to [0, 1] using percentile-based contrast stretching.
+
+    Intensities are scaled between the 0.1th and 99.9th percentiles of the
+    finite voxels, similar to how matplotlib normalizes image intensities.
+
+    Args:
+        volume (np.ndarray): 3D voxel intensities.
+        out (np.ndarray, optional): float32 array receiving the result, which
+            may be `volume` itself to normalize it in place.
+        window (tuple[float, float], optional): Intensities mapped to 0 and 1
+            (see `intensity_window`), when they come from another volume, e.g.
+            the uncropped one.
+
+    Returns:
+        np.ndarray: Normalized float32 volume (`out` if given).
+    """
+    if window is None:
+        window = intensity_window(volume)
+    if window is None:
+        if out is None:
+            return np.zeros_like(volume, dtype=np.float32)
+        out[...] = 0
+        return out
+
+    vmin, vmax = window
+    if out is None:
+        return np.clip((volume - vmin) / (vmax - vmin), 0, 1).astype(np.float32)
+    np.subtract(volume, vmin, out=out, casting="unsafe")
+    np.divide(out, vmax - vmin, out=out, casting="unsafe")
+    return np.clip(out, 0, 1, out=out)
+
+
+def extract_slice(data, plane_idx, slice_idx):
+    """
+    Extract one slice of a 3D volume or mask, oriented for display.
+
+    Args:
+        data (np.ndarray | RunLengthROI | ResampledOverlayMask): Volume, or lazy mask
+            exposing ``plane(axis, index)``.
+        plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+        slice_idx (int): Slice index along the plane normal.
+
+    Returns:
+        np.ndarray | None: Transposed and vertically flipped slice (rows top to bottom).
+    """
+    if hasattr(data, "plane"):
+        # Lazy masks (RunLengthROI, resampled overlays) decode only the requested plane;
+        # planes 0, 1 and 2 are orthogonal to the z, y and x axes respectively
+        return np.flipud(data.plane(2 - plane_idx, slice_idx).T)
+
+    slice = None
+    if plane_idx == 0:
+        slice = data[:, :, slice_idx].T
+        slice = np.flipud(slice)
+    elif plane_idx == 1:
+        slice = data[:, slice_idx, :].T
+        slice = np.flipud(slice)
+    elif plane_idx == 2:
+        slice = data[slice_idx, :, :].T
+        slice = np.flipud(slice)
+    else:
+        log.warning(f"Invalid plane_idx {plane_idx}")
+    return slice
+
+
+def apply_colormap(data, colormap_name):
+    """
+    Map a normalized 2D slice to RGBA with a matplotlib colormap.
+
+    Returns:
+        np.ndarray | None: Float RGBA image (H, W, 4), or None if the colormap fails.
+    """
+    try:
+        # Retrieve selected colormap from matplotlib
+        cmap = matplotlib.colormaps.get_cmap(colormap_name)
+
+        # Apply colormap to normalized image data
+        return cmap(data)
+
+    except Exception as e:
+        # Log errors (e.g., invalid colormap name)
+        log.error(f"Error applying colormap: {e}")
+        return None
+
+
+def composite_overlay(rgba_image, overlay_slice, colormap, alpha):
+    """
+    Blend a binary mask slice into an RGBA image in the mask color of the colormap.
+
+    Args:
+        rgba_image (np.ndarray): Float RGBA image (H, W, 4).
+        overlay_slice (np.ndarray): Mask slice with the same height and width.
+        colormap (str): Name of the colormap of the base image.
+        alpha (float): Mask opacity.
+
+    Returns:
+        np.ndarray: Blended image clipped to [0, 1]; the unmodified image on error.
+    """
+    try:
+        # Convert RGBA base image to float for blending
+        rgba_image_float = rgba_image.astype(np.float64)  # shape (H, W, 4)
+
+        if overlay_slice.size > 0:
+
+            if np.any(overlay_slice):
+                # Apply transparency scaling (based on user alpha)
+                overlay_intensity = overlay_slice * alpha
+
+                # Retrieve overlay color from dictionary or default (green)
+                overlay_color = OVERLAY_COLORS.get(colormap, DEFAULT_OVERLAY_COLOR)
+
+                log.debug("Blending overlay color into base image")
+                # Blend overlay into base image using a numba-accelerated function
+                with numba_kernel_lock:
+                    rgba_image_float = apply_overlay_numba(rgba_image, overlay_slice,
+                                                           overlay_intensity, overlay_color)
+                log.debug("Blended overlay color into base image")
+        log.debug("Clipping values to a valid range")
+        # Clip values to valid range [0, 1]
+        return np.clip(rgba_image_float, 0, 1)
+
+    except Exception as e:
+        # Log errors and return unmodified base image as fallback
+        log.error(f"Error creating overlay composite: {e}")
+        return rgba_image
+
+
+def render_slice_rgba(volume, plane_idx, slice_idx, colormap, mask_layers, alpha):
+    """
+    Composite one slice of a 3D volume with its mask layers into an RGBA array.
+
+    This is the Qt-free part of the viewer's rendering, shared with the
+    headless snapshot renderer.
+
+    Args:
+        volume (np.ndarray): 3D base volume (normalized to [0, 1]).
+        plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+        slice_idx (int): Slice index along the plane normal.
+        colormap (str): Name of the matplotlib colormap.
+        mask_layers (list): 3D masks blended on top of the slice.
+        alpha (float): Mask opacity.
+
+    Returns:
+        np.ndarray: Float RGBA image (H, W, 4) in [0, 1].
+    """
+    rgba_image = apply_colormap(extract_slice(volume, plane_idx, slice_idx), colormap)
+    for mask in mask_layers:
+        rgba_image = composite_overlay(rgba_image, extract_slice(mask, plane_idx, slice_idx), colormap, alpha)
+    return rgba_image
@@ -0,0 +1,300 @@
+"""
+Headless QC snapshots of NIfTI images, optionally with a mask overlay.
+
+Each subject is rendered as the three orthogonal views of the viewer (same
+slice extraction, colormaps and mask compositing, without any Qt widget),
+and a cohort is collected into a scrollable HTML page and a montage PNG.
+Subjects are rendered in parallel in a process pool.
+
+Usage:
+    python snapshot_renderer.py --images "derivatives/skullstrips/sub-*/anat/*_brain.nii.gz" \
+        --output qc/skullstrips [--overlays "derivatives/.../sub-*/anat/*_mask.nii.gz"]
+"""
+import glob
+import html
+import multiprocessing
+import os
+import re
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.image
+import nibabel as nib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from logger import get_logger
+from overlay_resampling import ResampledOverlay, needs_resampling
+from slice_compositing import normalize_volume, render_slice_rgba
+
+log = get_logger()
+
+SUBJECT_PATTERN = re.compile(r"sub-[A-Za-z0-9]+")
+"""BIDS subject label used to pair images with their overlays."""
+
+PANEL_GAP = 4
+"""Gap (pixels) between the three views of a subject snapshot."""
+
+
+def subject_id(path):
+    """Return the BIDS subject label found in a path, or the file name without extension."""
+    match = SUBJECT_PATTERN.search(path)
+    if match:
+        return match.group(0)
+    return os.path.basename(path).split(".")[0]
+
+
+def find_subjects(image_pattern, overlay_pattern=None):
+    """
+    Pair the images matching a glob pattern with their overlays, by subject label.
+
+    Args:
+        image_pattern (str): Glob pattern of the base images.
+        overlay_pattern (str, optional): Glob pattern of the overlays.
+
+    Returns:
+        list[dict]: One dict per image with keys `subject`, `image` and `overlay`
+        (None when no overlay of the same subject was found), sorted by subject.
+    """
+    overlays = {}
+    if overlay_pattern:
+        for path in sorted(glob.glob(overlay_pattern, recursive=True)):
+            overlays.setdefault(subject_id(path), path)
+
+    subjects = []
+    for path in sorted(glob.glob(image_pattern, recursive=True)):
+        subject = subject_id(path)
+        subjects.append({"subject": subject, "image": path, "overlay": overlays.get(subject)})
+    return sorted(subjects, key=lambda s: s["subject"])
+
+
+def load_volume(path):
+    """
+    Load a NIfTI file in canonical (RAS+) orientation, as the viewer does.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: 3D float32 data (first frame of a 4D series) and affine.
+    """
+    img = nib.as_closest_canonical(nib.load(path))
+    data = np.asanyarray(img.dataobj, dtype=np.float32)
+    if data.ndim == 4:
+        data = data[..., 0]
+    return data, img.affine
+
+
+def snapshot_slices(shape, mask=None):
+    """
+    Choose the (axial, coronal, sagittal) slices of a snapshot.
+
+    Slices go through the centroid of the mask when it is not empty, and
+    through the volume centre otherwise.
+
+    Returns:
+        list[int]: Slice indices along z, y and x.
+    """
+    centre = [n // 2 for n in shape[:3]]
+    if mask is not None:
+        dense = mask.to_dense(bool) if hasattr(mask, "to_dense") else mask
+        coords = np.nonzero(dense)
+        if coords[0].size:
+            centre = [int(round(c.mean())) for c in coords]
+    return [centre[2], centre[1], centre[0]]
+
+
+def scale_to_mm(rgba, pixel_spacing):
+    """Stretch a rendered view vertically to the in-plane voxel aspect ratio (nearest neighbour)."""
+    height = rgba.shape[0]
+    scaled_height = int(height * (pixel_spacing[1] / pixel_spacing[0]))
+    if scaled_height == height or scaled_height <= 0:
+        return rgba
+    rows = np.minimum((np.arange(scaled_height) * height / scaled_height).astype(int), height - 1)
+    return rgba[rows]
+
+
+def render_subject(image_path, overlay_path=None, colormap="gray", alpha=0.5, threshold=0.0):
+    """
+    Render the three orthogonal views of one subject side by side.
+
+    Args:
+        image_path (str): Base image.
+        overlay_path (str, optional): Mask or segmentation shown on top; voxels above
+            `threshold` are blended in, after resampling into the image space if needed.
+        colormap (str, optional): Matplotlib colormap of the base image.
+        alpha (float, optional): Overlay opacity.
+        threshold (float, optional): Overlay threshold.
+
+    Returns:
+        np.ndarray: uint8 RGBA snapshot (H, W, 4).
+    """
+    data, affine = load_volume(image_path)
+    volume = normalize_volume(data)
+    voxel_sizes = np.sqrt((affine[:3, :3] ** 2).sum(axis=0))
+
+    mask = None
+    if overlay_path:
+        overlay, overlay_affine = load_volume(overlay_path)
+        if needs_resampling(overlay.shape, overlay_affine, volume.shape, affine):
+            resampled = ResampledOverlay(overlay, overlay_affine, affine, volume.shape)
+            resampled.set_threshold(threshold)
+            mask = resampled.mask
+        else:
+            mask = overlay > threshold
+
+    slices = snapshot_slices(volume.shape, mask)
+    spacings = [(voxel_sizes[0], voxel_sizes[1]), (voxel_sizes[0], voxel_sizes[2]),
+                (voxel_sizes[1], voxel_sizes[2])]
+    layers = [mask] if mask is not None else []
+    views = [scale_to_mm(render_slice_rgba(volume, plane_idx, slices[plane_idx], colormap, layers, alpha),
+                         spacings[plane_idx])
+             for plane_idx in range(3)]
+
+    # Place the views side by side on a black background
+    height = max(view.shape[0] for view in views)
+    width = sum(view.shape[1] for view in views) + PANEL_GAP * (len(views) - 1)
+    panel = np.zeros((height, width, 4), dtype=np.float64)
+    panel[..., 3] = 1.0
+    x = 0
+    for view in views:
+        top = (height - view.shape[0]) // 2
+        panel[top:top + view.shape[0], x:x + view.shape[1]] = view
+        x += view.shape[1] + PANEL_GAP
+    return (panel * 255).astype(np.uint8)
+
+
+def save_subject_snapshot(job):
+    """
+    Render one subject and save its snapshot PNG; runs in a worker process.
+
+    Args:
+        job (dict): Subject entry from `find_subjects`, plus `png` (output path) and
+            the `colormap`, `alpha` and `threshold` rendering options.
+
+    Returns:
+        dict: The subject entry with `png`, or with `error` if rendering failed.
+    """
+    result = {key: job[key] for key in ("subject", "image", "overlay")}
+    try:
+        snapshot = render_subject(job["image"], job.get("overlay"), job.get("colormap", "gray"),
+                                  job.get("alpha", 0.5), job.get("threshold", 0.0))
+        matplotlib.image.imsave(job["png"], snapshot)
+        result["png"] = job["png"]
+    except Exception as e:
+        log.error(f"Snapshot of {job['image']} failed: {e}")
+        result["error"] = str(e)
+    return result
+
+
+def write_montage_html(results, html_path, title="QC snapshots"):
+    """Write a scrollable page showing every subject snapshot with its label."""
+    base_dir = os.path.dirname(os.path.abspath(html_path))
+    cells = []
+    for result in results:
+        caption = html.escape(result["subject"])
+        if "png" in result:
+            source = html.escape(os.path.relpath(result["png"], base_dir))
+            tooltip = html.escape(result["image"] + (f" + {result['overlay']}" if result["overlay"] else ""))
+            cells.append(f'<figure><img src="{source}" loading="lazy" title="{tooltip}">'
+                         f'<figcaption>{caption}</figcaption></figure>')
+        else:
+            cells.append(f'<figure class="error"><figcaption>{caption}: '
+                         f'{html.escape(result.get("error", ""))}</figcaption></figure>')
+
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ background: #111; color: #ddd; font-family: sans-serif; }}
+main {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(480px, 1fr)); gap: 8px; }}
+figure {{ margin: 0; }}
+img {{ width: 100%; image-rendering: pixelated; }}
+.error figcaption {{ color: #f66; }}
+</style></head>
+<body><h1>{html.escape(title)} ({len(results)})</h1><main>
+{chr(10).join(cells)}
+</main></body></html>
+"""
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(page)
+
+
+def write_montage_png(results, png_path, columns=4):
+    """Write all subject snapshots in one labelled grid image."""
+    rendered = [result for result in results if "png" in result]
+    if not rendered:
+        return
+    rows = (len(rendered) + columns - 1) // columns
+    figure = Figure(figsize=(4 * columns, 1.6 * rows), facecolor="black")
+    FigureCanvasAgg(figure)
+    for i, result in enumerate(rendered):
+        ax = figure.add_subplot(rows, columns, i + 1)
+        ax.imshow(matplotlib.image.imread(result["png"]))
+        ax.set_title(result["subject"], color="white", fontsize=8)
+        ax.axis("off")
+    figure.tight_layout()
+    figure.savefig(png_path, facecolor="black", dpi=100)
+
+
+def render_cohort(subjects, output_dir, workers=None, colormap="gray", alpha=0.5, threshold=0.0, columns=4):
+    """
+    Render every subject in a process pool and build the cohort montage.
+
+    Args:
+        subjects (list[dict]): Entries as returned by `find_subjects`.
+        output_dir (str): Directory receiving `subjects/<subject>.png`, `montage.html`
+            and `montage.png`.
+        workers (int, optional): Number of worker processes (defaults to the CPU count).
+        colormap, alpha, threshold: Rendering options, see `render_subject`.
+        columns (int, optional): Number of subjects per row of the montage PNG.
+
+    Returns:
+        list[dict]: Per-subject results, in the order of `subjects`.
+    """
+    snapshot_dir = os.path.join(output_dir, "subjects")
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    counts = Counter(subject["subject"] for subject in subjects)
+    jobs = []
+    for i, subject in enumerate(subjects):
+        # Several images of the same subject get distinct file names
+        name = subject["subject"] if counts[subject["subject"]] == 1 else f"{subject['subject']}_{i}"
+        jobs.append(dict(subject, png=os.path.join(snapshot_dir, f"{name}.png"),
+                         colormap=colormap, alpha=alpha, threshold=threshold))
+
+    if workers == 1 or len(jobs) <= 1:
+        results = [save_subject_snapshot(job) for job in jobs]
+    else:
+        # Spawned workers: forking a process that runs Qt or numba threads can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(save_subject_snapshot, jobs, chunksize=max(1, len(jobs) // 64)))
+
+    write_montage_html(results, os.path.join(output_dir, "montage.html"))
+    write_montage_png(results, os.path.join(output_dir, "montage.png"), columns=columns)
+    failed = sum("error" in result for result in results)
+    log.info(f"Rendered {len(results) - failed} snapshots ({failed} failed) in {output_dir}")
+    return results
+
+
+def main(argv=None):
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter,
+                            description="Render QC snapshots and montages of NIfTI images.")
+    parser.add_argument("--images", required=True, help="Glob pattern of the base images")
+    parser.add_argument("--overlays", default=None, help="Glob pattern of the overlays, paired by subject label")
+    parser.add_argument("--output", required=True, help="Output directory")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--colormap", default="gray", help="Colormap of the base images")
+    parser.add_argument("--alpha", type=float, default=0.5, help="Overlay opacity")
+    parser.add_argument("--threshold", type=float, default=0.0, help="Overlay threshold")
+    parser.add_argument("--columns", type=int, default=4, help="Subjects per row of the montage PNG")
+    args = parser.parse_args(argv)
+
+    subjects = find_subjects(args.images, args.overlays)
+    if not subjects:
+        parser.error(f"No image matches {args.images}")
+    results = render_cohort(subjects, args.output, workers=args.workers, colormap=args.colormap,
+                            alpha=args.alpha, threshold=args.threshold, columns=args.columns)
+    return 0 if all("png" in result for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,57 +1,89 @@
 import os
-import shutil
-import sys
 import tempfile
 from pathlib import Path
 
-from PyQt6.QtCore import QThread, pyqtSignal, QProcess, QObject, QCoreApplication
+from PyQt6.QtCore import pyqtSignal, QProcess, QProcessEnvironment, QObject, QCoreApplication
 
 from logger import get_logger
-from utils import get_bin_path, resource_path, get_dl_python_executable, get_script_path
+from threads.inference_service import shared_inference_service, stop_shared_inference_service
+from threads.skull_strip_service import SkullStripService
+from threads.skull_strip_thread import THREAD_ENV_VARS
+from utils import get_bin_path, get_dl_python_executable, get_script_path
 
 log = get_logger()
 
+PHASES = ("synthstrip", "coregistration", "reorientation", "preprocess", "deep_learning", "postprocess")
+"""Phases of the pipeline, run in this order for every file."""
+
+PHASE_LIMITS = {"synthstrip": 1, "coregistration": 2, "reorientation": 2, "preprocess": 2,
+                "deep_learning": 1, "postprocess": 1}
+"""Default number of files that may run each phase at the same time."""
+
+GPU_PHASES = ("synthstrip", "deep_learning")
+"""Phases using the GPU (or every core without CUDA): two different ones never run at the same time."""
+
 
 class DlWorker(QObject):
+    """
+    Runs the deep learning segmentation pipeline on a cohort of files.
+
+    Every file goes through the six `PHASES`, each one a separate process.
+    Files are pipelined: while one file is in the deep learning phase, the next
+    ones can be coregistered or skull-stripped. Each phase runs for at most
+    `phase_limits[phase]` files at once, CPU phases split the cores between
+    their concurrent processes, and skull stripping never overlaps the deep
+    learning phase on the GPU. Without CUDA, both run on the CPU with every core.
+
+    With the shared nnU-Net worker, the phases after the coregistration run in
+    it as one job, handing arrays from one phase to the next in memory: only
+    the final segmentation is written (and the intermediate results, with
+    `debug_dumps`, in a "debug" folder of the file's temporary directory).
+
+    Progress is tracked per file and per phase: `progressbar_update` reports
+    the share of all (file, phase) steps that are completed, and `file_update`
+    the phase each file is in.
+    """
+
     progressbar_update = pyqtSignal(int)  # Overall progress (0-100)
     file_update = pyqtSignal(str, str)  # (filename, status)
     log_update = pyqtSignal(str, str)  # Log messages
     finished = pyqtSignal(bool, str)  # (success, message)
     cancel_requested = pyqtSignal()
 
-    def __init__(self, input_files, workspace_path, has_freesurfer):
+    def __init__(self, input_files, workspace_path, has_freesurfer, use_service=False, phase_limits=None,
+                 use_inference_service=False, has_cuda=True, debug_dumps=False):
         super().__init__()
         self.input_files = input_files
         self.workspace_path = workspace_path
         self.has_freesurfer = has_freesurfer
-
-        self.output_dir = None
+        self.has_cuda = has_cuda
+        # Run nipreps SynthStrip in a long-lived worker that loads the model once (see SkullStripService)
+        self.use_service = use_service
+        self.phase_limits = dict(PHASE_LIMITS, **(phase_limits or {}))
+        # Segment through the shared nnU-Net worker, which stays loaded between runs (see InferenceService)
+        self.use_inference_service = use_inference_service
+        self.debug_dumps = debug_dumps
 
         self.total_files = None
         self.processed_files = None
         self.failed_files = None
+        self.total_phases = len(PHASES)
+        self.jobs = []  # One dict per file, see `start`
 
         self.is_cancelled = False
+        self.is_finished = False
 
-        # Progress tracking
-        self.total_phases = 6  # Total number of phases per file
-        self.current_file_index = 0
-        self.current_phase = 0
-
-        self.current_input_file = None
-        self.current_input_file_basename = None
-        self.current_synthstrip_file = None
         self.atlas_file = get_script_path("deep_learning/atlas/T1.nii.gz")
         self.brats_file = get_script_path("deep_learning/atlas/BraTS-GLI-01-001.nii")
         self.synthstrip_model = get_script_path("deep_learning/synthstrip.1.pt")
+        # Atlas registrations computed by the coregistration and reused by the postprocess (and later runs),
+        # kept with the patients' data in a hidden folder of the workspace
+        self.registrations_dir = os.path.join(workspace_path, ".registrations")
 
-        # All processes for all phases
-        self.synthstrip_process = None
-        self.coregistration_process = None
-        self.reorientation_process = None
-        self.dl_preprocess = None
-        self.dl_process = None
-        self.dl_postprocess = None
+        self.synthstrip_service = None
+        self.synthstrip_jobs = {}  # Service job id -> file job
+        self.inference_service = None
+        self.inference_jobs = {}  # Service job id -> file job
 
         try:
             self.nipreps_synthstrip_bin_path = get_bin_path("nipreps-synthstrip")
@@ -64,176 +96,257 @@ class DlWorker(QObject):
 
         self.cancel_requested.connect(self.cancel)
 
-    def update_progress(self):
-        """Calculates and updates the progress bar based on files and phases"""
-        if self.total_files == 0:
-            return
-
-        # Calculate progress: (completed files * 6 + current file phases) / (total files * 6) * 100
-        total_phases_completed = (self.current_file_index * self.total_phases) + self.current_phase
-        total_phases_overall = self.total_files * self.total_phases
-
-        progress = int((total_phases_completed / total_phases_overall) * 100)
-        progress = min(progress, 100)  # Ensure it doesn't exceed 100
-
-        self.progressbar_update.emit(progress)
-
-        # Debug log (optional)
-        self.log_update.emit(
-            QCoreApplication.translate("DlWorker", "Progress: {0}% (File {1}/{2}, "
-            "Phase {3}/{4})").format(progress, self.current_file_index + 1, self.total_files, self.current_phase, self.total_phases),
-            'd'
-        )
-
     def start(self):
         """Processes all NIfTI files with the Deep Learning pipeline"""
-
         self.total_files = len(self.input_files)
         log.debug(self.input_files)
         self.processed_files = 0
         self.failed_files = []
+        self.is_finished = False
+
+        # state: "waiting" for a free slot of its next phase, "running", "done" or "failed"
+        self.jobs = [{
+            "index": index,
+            "input": input_file,
+            "basename": os.path.basename(input_file),
+            "name": os.path.basename(input_file).replace(".nii.gz", "").replace(".nii", ""),
+            "output_dir": None,
+            "synthstrip_file": None,
+            "phase": 0,  # Number of completed phases
+            "state": "waiting",
+            "process": None,
+        } for index, input_file in enumerate(self.input_files)]
 
-        # Initialize progress bar
-        self.current_file_index = 0
-        self.current_phase = 0
         self.update_progress()
-        self.progressbar_update.emit(5)
-
-        self.process_single_file()
+        self.schedule()
 
-    def process_single_file(self):
-        """Process single file with the Deep Learning pipeline"""
-        temp_dir = tempfile.mkdtemp(prefix=f"dl_processing_{self.current_file_index+1}_")
-        # out_dir = os.path.join(self.workspace_path, "outputs")
-        # os.makedirs(out_dir, exist_ok=True)
-        self.output_dir = temp_dir
+    def update_progress(self):
+        """Report the share of (file, phase) steps completed; failed files count as complete."""
+        if not self.total_files:
+            return
 
-        self.current_input_file = self.input_files[self.current_file_index]
-        self.current_input_file_basename = os.path.basename(self.current_input_file)
+        steps = sum(self.total_phases if job["state"] == "failed" else job["phase"] for job in self.jobs)
+        progress = min(100, int(100 * steps / (self.total_files * self.total_phases)))
+        self.progressbar_update.emit(progress)
 
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "=== PROCESSING: {0} ===").format(self.current_input_file_basename), 'i')
+        running = ", ".join(f"{job['basename']} {job['phase'] + 1}/{self.total_phases}"
+                            for job in self.jobs if job["state"] == "running")
+        self.log_update.emit(
+            QCoreApplication.translate("DlWorker", "Progress: {0}% (running: {1})").format(progress, running or "-"),
+            'd'
+        )
 
-        # PHASE 1: SynthStrip
-        self.current_phase = 1
-        self.run_synthstrip()
+    def can_start(self, phase):
+        """Return whether a file may start a phase now, given the phases already running."""
+        # A file in the nnU-Net worker holds the GPU from its reorientation to its postprocess
+        in_memory = {id(job) for job in self.inference_jobs.values()}
+        running = [PHASES[job["phase"]] for job in self.jobs if job["state"] == "running" and id(job) not in in_memory]
+        running += ["deep_learning"] * len(in_memory)
+        if running.count(phase) >= self.phase_limits[phase]:
+            return False
+        if phase == "reorientation" and self.inference_jobs:
+            # The nnU-Net worker segments one file at a time: the next one would only wait in its queue
+            return False
+        gpu_phase = "deep_learning" if phase == "reorientation" and self.use_inference_service else phase
+        if gpu_phase in GPU_PHASES and any(p in GPU_PHASES and p != gpu_phase for p in running):
+            return False
+        return True
 
-    def run_synthstrip(self):
-        """Synthstrip on a single file"""
-        phase = "Synthstrip"
-        self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Phase 1/6: Synthstrip skull strip..."))
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "PHASE 1: Skull strip with Synthstrip"), 'i')
+    def schedule(self):
+        """Start every phase that has a free slot, then report the end of the batch."""
+        if self.is_cancelled or self.is_finished:
+            return
 
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "SynthStrip started: {0}").format(os.path.basename(self.current_input_file)), 'i')
+        # Files further along the pipeline first, so their results come out early
+        waiting = sorted((job for job in self.jobs if job["state"] == "waiting"),
+                         key=lambda job: (-job["phase"], job["index"]))
+        for job in waiting:
+            # A phase failing at once schedules again, so the list may be stale
+            if job["state"] == "waiting" and self.can_start(PHASES[job["phase"]]):
+                self.start_phase(job)
+
+        if not self.is_finished and all(job["state"] in ("done", "failed") for job in self.jobs):
+            self.is_finished = True
+            self.stop_synthstrip_service()
+            self.release_inference_service()
+            if self.processed_files or not self.jobs:
+                self.finished.emit(True, QCoreApplication.translate("DlWorker", "Processing completed"))
+            else:
+                self.finished.emit(False, QCoreApplication.translate("DlWorker", "Segmentation failed for all files"))
+
+    def phase_messages(self, phase):
+        """Return the (file status, log message, completion message) of a phase."""
+        return {
+            "synthstrip": (QCoreApplication.translate("DlWorker", "Phase 1/6: Synthstrip skull strip..."),
+                           QCoreApplication.translate("DlWorker", "PHASE 1: Skull strip with Synthstrip"),
+                           QCoreApplication.translate("DlWorker", "✓ Skull stripping completed")),
+            "coregistration": (QCoreApplication.translate("DlWorker", "Phase 2/6: Coregistration..."),
+                               QCoreApplication.translate("DlWorker", "PHASE 2: Coregistration"),
+                               QCoreApplication.translate("DlWorker", "✓ Coregistration completed")),
+            "reorientation": (QCoreApplication.translate("DlWorker", "Phase 3/6: Reorientation..."),
+                              QCoreApplication.translate("DlWorker", "PHASE 3: Reorientation"),
+                              QCoreApplication.translate("DlWorker", "✓ Reorientation completed")),
+            "preprocess": (QCoreApplication.translate("DlWorker", "Phase 4/6: Preparing and preprocessing..."),
+                           QCoreApplication.translate("DlWorker", "PHASE 4: Prepare and preprocess"),
+                           QCoreApplication.translate("DlWorker", "✓ Preprocess completed")),
+            "deep_learning": (QCoreApplication.translate("DlWorker", "Phase 5/6: Deep Learning..."),
+                              QCoreApplication.translate("DlWorker", "PHASE 5: Deep learning execution"),
+                              QCoreApplication.translate("DlWorker", "✓ Deep learning execution completed")),
+            "postprocess": (QCoreApplication.translate("DlWorker", "Phase 6/6: Postprocessing..."),
+                            QCoreApplication.translate("DlWorker", "PHASE 6: Postprocess"),
+                            QCoreApplication.translate("DlWorker", "✓ Postprocess completed")),
+        }[phase]
+
+    def start_phase(self, job):
+        """Start the next phase of a file."""
+        phase = PHASES[job["phase"]]
+        job["state"] = "running"
+        if job["output_dir"] is None:
+            job["output_dir"] = tempfile.mkdtemp(prefix=f"dl_processing_{job['index'] + 1}_")
+            self.log_update.emit(QCoreApplication.translate("DlWorker", "=== PROCESSING: {0} ===").format(job["basename"]), 'i')
+
+        status, message, _ = self.phase_messages(phase)
+        self.file_update.emit(job["basename"], status)
+        self.log_update.emit(f"[{job['basename']}] {message}", 'i')
 
-        # Skull stripped file name
-        base_name = self.current_input_file_basename.replace(".nii.gz", "").replace(".nii", "")
-        self.current_synthstrip_file = os.path.join(self.output_dir, f"{base_name}_skull_stripped.nii.gz")
+        try:
+            getattr(self, f"run_{phase}")(job)
+        except Exception as e:
+            self.log_update.emit(f"[{job['basename']}] {e}", 'e')
+            self.on_phase_finished(job, -1, QProcess.ExitStatus.CrashExit)
+
+    def start_process(self, job, label, program, args):
+        """Run one phase of a file as a process; `on_phase_finished` is called when it ends."""
+        process = QProcess()
+        job["process"] = process
+        process.finished.connect(lambda exit_code, exit_status, job=job: self.on_phase_finished(job, exit_code, exit_status))
+        process.errorOccurred.connect(lambda error, job=job, label=label: self.on_process_error(job, label, error))
+        process.readyReadStandardOutput.connect(lambda label=label: self.on_stdout(label, process.readAllStandardOutput()))
+        process.readyReadStandardError.connect(lambda label=label: self.on_stderr(label, process.readAllStandardError()))
+
+        # CPU phases running side by side share the cores
+        phase = PHASES[job["phase"]]
+        if phase not in GPU_PHASES or not self.has_cuda:
+            threads = max(1, (os.cpu_count() or 1) // self.phase_limits[phase])
+            env = QProcessEnvironment.systemEnvironment()
+            for name in THREAD_ENV_VARS:
+                env.insert(name, str(threads))
+            process.setProcessEnvironment(env)
+
+        process.start(program, args)
+
+    def run_synthstrip(self, job):
+        """Synthstrip on a single file"""
+        self.log_update.emit(QCoreApplication.translate("DlWorker", "SynthStrip started: {0}").format(job["basename"]), 'i')
+        job["synthstrip_file"] = os.path.join(job["output_dir"], f"{job['name']}_skull_stripped.nii.gz")
 
-        self.synthstrip_process = QProcess()
-        self.synthstrip_process.finished.connect(self.on_synthstrip_finished)
-        self.synthstrip_process.errorOccurred.connect(lambda error, string=phase: self.on_error(string, error))
-        self.synthstrip_process.readyReadStandardOutput.connect(lambda string=phase: self.on_stdout(string, self.synthstrip_process.readAllStandardOutput()))
-        self.synthstrip_process.readyReadStandardError.connect(lambda string=phase: self.on_stderr(string, self.synthstrip_process.readAllStandardError()))
+        if self.use_service and not self.has_freesurfer and self.start_synthstrip_service():
+            service_job = self.synthstrip_service.submit(job["input"], job["synthstrip_file"])
+            self.synthstrip_jobs[service_job] = job
+            return
 
         if self.has_freesurfer:
             cmd = [
                 "mri_synthstrip",
-                "-i", self.current_input_file,
-                "-o", self.current_synthstrip_file
+                "-i", job["input"],
+                "-o", job["synthstrip_file"]
             ]
         else:
             cmd = [
                 self.nipreps_synthstrip_bin_path,
-                "-i", self.current_input_file,
-                "-o", self.current_synthstrip_file,
-                "-g",
+                "-i", job["input"],
+                "-o", job["synthstrip_file"],
                 "--model", self.synthstrip_model
             ]
-
-        self.synthstrip_process.start(cmd[0], cmd[1:])
-
-    def on_synthstrip_finished(self, exit_code, exit_status):
-        if self.is_cancelled:
-            return
-
-        # This slot is called by the QProcess when it finishes
-        if exit_code != 0 or exit_status != QProcess.ExitStatus.NormalExit:
-            self.log_update.emit("SynthStrip failed", f"Exit code: {exit_code}")
-            if self.current_file_index + 1 < self.total_files:
-                self.current_file_index += 1
-                self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Segmentation failed for this file"))
-                self.process_single_file()
+            if self.has_cuda:
+                cmd.append("-g")
+
+        self.start_process(job, "Synthstrip", cmd[0], cmd[1:])
+
+    def start_synthstrip_service(self):
+        """Start the SynthStrip worker on first use; return whether it can take the job."""
+        if self.synthstrip_service is not None:
+            if self.synthstrip_service.is_running():
+                return True
+            # The worker exited: start it again, unless it never loaded the model
+            ready = self.synthstrip_service.is_ready
+            self.stop_synthstrip_service()
+            if not ready:
+                self.use_service = False
+                return False
+        service = SkullStripService("synthstrip", device="cuda" if self.has_cuda else "cpu", model=self.synthstrip_model,
+                                    threads=None if self.has_cuda else os.cpu_count())
+        service.job_finished.connect(self.on_synthstrip_job_finished)
+        service.log_message.connect(lambda line: self.log_update.emit(f"[Synthstrip] {line}", 'd'))
+        try:
+            service.start()
+        except FileNotFoundError as e:
+            log.warning(f"SynthStrip worker unavailable: {e}")
+            self.use_service = False
+            return False
+        self.synthstrip_service = service
+        return True
+
+    def stop_synthstrip_service(self, kill=False):
+        """Stop the SynthStrip worker, if it was started."""
+        service, self.synthstrip_service = self.synthstrip_service, None
+        if service is not None:
+            service.job_finished.disconnect(self.on_synthstrip_job_finished)
+            if kill:
+                service.kill()
+            else:
+                service.stop()
+
+    def on_synthstrip_job_finished(self, service_job, success, message):
+        """Triggered when the SynthStrip worker finishes a job."""
+        job = self.synthstrip_jobs.pop(service_job, None)
+        if job is None or self.is_cancelled:
             return
-
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "✓ Skull stripping completed"), 'i')
-        self.update_progress()
-        # PHASE 2: Coregistration
-        self.current_phase = 2
-        self.run_coregistration()  # Start the next phase
-
-    def run_coregistration(self):
+        if not success:
+            self.log_update.emit(f"[Synthstrip] {message}", 'e')
+            if not self.synthstrip_service.is_ready:
+                # The worker could not load the model: run one process per file instead
+                self.log_update.emit(QCoreApplication.translate(
+                    "DlWorker", "SynthStrip worker unavailable, running one process per file"), 'w')
+                jobs = [job] + list(self.synthstrip_jobs.values())
+                self.synthstrip_jobs.clear()
+                self.stop_synthstrip_service(kill=True)
+                self.use_service = False
+                for pending in jobs:
+                    self.run_synthstrip(pending)
+                return
+            if not self.synthstrip_service.is_running():
+                self.stop_synthstrip_service(kill=True)  # Started again for the next file
+        self.on_phase_finished(job, 0 if success else 1, QProcess.ExitStatus.NormalExit)
+
+    def run_coregistration(self, job):
         """Performs coregistration with atlas"""
-        phase = "Coregistration"
-
-        self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Phase 2/6: Coregistration..."))
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "PHASE 2: Coregistration"), 'i')
-
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "Coregistration started: {0}").format(os.path.basename(self.current_input_file)), 'i')
+        self.log_update.emit(QCoreApplication.translate("DlWorker", "Coregistration started: {0}").format(job["basename"]), 'i')
 
         # Create directory for coregistration
-        coreg_dir = os.path.join(self.output_dir, "coregistration")
+        coreg_dir = os.path.join(job["output_dir"], "coregistration")
         os.makedirs(coreg_dir, exist_ok=True)
 
-        self.coregistration_process = QProcess()
-        self.coregistration_process.finished.connect(self.on_coregistration_finished)
-        self.coregistration_process.errorOccurred.connect(lambda error, string=phase: self.on_error(string, error))
-        self.coregistration_process.readyReadStandardOutput.connect(lambda string=phase: self.on_stdout(string, self.coregistration_process.readAllStandardOutput()))
-        self.coregistration_process.readyReadStandardError.connect(lambda string=phase: self.on_stderr(string, self.coregistration_process.readAllStandardError()))
-
         args = [
             get_script_path("deep_learning/coregistration.py"),
-            "--mri", self.current_input_file,
-            "--skull", self.current_synthstrip_file,
+            "--mri", job["input"],
+            "--skull", job["synthstrip_file"],
             "--atlas", self.atlas_file,
-            "-o", coreg_dir
+            "-o", coreg_dir,
+            "--registrations", self.registrations_dir
         ]
 
-        self.coregistration_process.start(self.python_executable, args)
-
-    def on_coregistration_finished(self, exit_code, exit_status):
-        if self.is_cancelled:
-            return
+        self.start_process(job, "Coregistration", self.python_executable, args)
 
-        # This slot is called by the QProcess when it finishes
-        if exit_code != 0 or exit_status != QProcess.ExitStatus.NormalExit:
-            self.log_update.emit("Coregistration failed", f"Exit code: {exit_code}")
-            if self.current_file_index + 1 < self.total_files:
-                self.current_file_index += 1
-                self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Segmentation failed for this file"))
-                self.process_single_file()
-            return
-
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "✓ Coregistration completed"), 'i')
-        self.update_progress()
-        # PHASE 3: Reorientation
-        self.current_phase = 3
-        self.run_reorientation()  # Start the next phase
-
-    def run_reorientation(self):
+    def run_reorientation(self, job):
         """Performs reorientation of the brain_in_atlas file using the BraTS affine matrix"""
-        phase = "Reorientation"
-
-        self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Phase 3/6: Reorientation..."))
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "PHASE 3: Reorientation"), 'i')
+        self.log_update.emit(QCoreApplication.translate("DlWorker", "Reorientation started: {0}").format(job["basename"]), 'i')
 
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "Reorientation started: {0}").format(os.path.basename(self.current_input_file)), 'i')
-
-        coreg_dir = Path(os.path.join(self.output_dir, "coregistration"))
+        coreg_dir = Path(os.path.join(job["output_dir"], "coregistration"))
         brain_in_atlas_files = list(coreg_dir.glob("*.nii.gz")) + list(coreg_dir.glob("*.nii"))
 
         if not brain_in_atlas_files:
-            self.log_update.emit(QCoreApplication.translate("DlWorker", "✗ No brain_in_atlas file found"), 'e')
-            return False
+            raise FileNotFoundError(QCoreApplication.translate("DlWorker", "✗ No brain_in_atlas file found"))
 
         rsl_files = [f for f in brain_in_atlas_files if f.name.endswith("_rsl.nii") or f.name.endswith("_rsl.nii.gz")]
 
@@ -243,198 +356,204 @@ class DlWorker(QObject):
             # fallback
             brain_in_atlas_file = str(brain_in_atlas_files[0])
 
-        self.reorientation_process = QProcess()
-        self.reorientation_process.finished.connect(self.on_reorientation_finished)
-        self.reorientation_process.errorOccurred.connect(lambda error, string=phase: self.on_error(string, error))
-        self.reorientation_process.readyReadStandardOutput.connect(lambda string=phase: self.on_stdout(string, self.reorientation_process.readAllStandardOutput()))
-        self.reorientation_process.readyReadStandardError.connect(lambda string=phase: self.on_stderr(string, self.reorientation_process.readAllStandardError()))
+        if self.use_inference_service and self.acquire_inference_service():
+            self.run_in_memory(job, brain_in_atlas_file)
+            return
 
         args = [
             get_script_path("deep_learning/reorientation.py"),
             "--input", brain_in_atlas_file,
-            "--output", self.output_dir + "/reoriented",
+            "--output", os.path.join(job["output_dir"], "reoriented"),
             "--brats", self.brats_file,
-            "--basename", self.current_input_file_basename.replace(".nii.gz", "").replace(".nii", "")
+            "--basename", job["name"]
         ]
 
-        self.reorientation_process.start(self.python_executable, args)
-
-    def on_reorientation_finished(self, exit_code, exit_status):
-        if self.is_cancelled:
-            return
-
-        # This slot is called by the QProcess when it finishes
-        if exit_code != 0 or exit_status != QProcess.ExitStatus.NormalExit:
-            self.log_update.emit("Reorientation failed", f"Exit code: {exit_code}")
-            if self.current_file_index + 1 < self.total_files:
-                self.current_file_index += 1
-                self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Segmentation failed for this file"))
-                self.process_single_file()
-            return
-
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "✓ Reorientation completed"), 'i')
-        self.update_progress()
-        # PHASE 4: Preprocess
-        self.current_phase = 4
-        self.run_preprocess()  # Start the next phase
+        self.start_process(job, "Reorientation", self.python_executable, args)
+
+    def run_in_memory(self, job, brain_in_atlas_file):
+        """Runs PHASES 3 to 6 in the nnU-Net worker, without intermediate files"""
+        debug_dir = os.path.join(job["output_dir"], "debug") if self.debug_dumps else None
+        service_job = self.inference_service.submit(
+            brain_in_atlas_file, self.workspace_path,
+            kind="segment",
+            mri=job["input"],
+            atlas=self.atlas_file,
+            brats=self.brats_file,
+            registrations=self.registrations_dir,
+            debug_dir=debug_dir
+        )
+        self.inference_jobs[service_job] = job
+        if debug_dir:
+            self.log_update.emit(f"[{job['basename']}] Intermediate results: {debug_dir}", 'd')
 
-    def run_preprocess(self):
+    def run_preprocess(self, job):
         """Runs PHASE 4: PREPARE and PREPROCESS"""
-        phase = "Preprocessing"
-
-        self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Phase 4/6: Preparing and preprocessing..."))
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "PHASE 4: Prepare and preprocess"), 'i')
-
-        data_path = os.path.join(self.output_dir, "reoriented")
-        results_path = os.path.join(self.output_dir, "preprocess")
-
-        self.dl_preprocess = QProcess()
-        self.dl_preprocess.finished.connect(self.on_preprocess_finished)
-        self.dl_preprocess.errorOccurred.connect(lambda error, string=phase: self.on_error(string, error))
-        self.dl_preprocess.readyReadStandardOutput.connect(lambda string=phase: self.on_stdout(string, self.dl_preprocess.readAllStandardOutput()))
-        self.dl_preprocess.readyReadStandardError.connect(lambda string=phase: self.on_stderr(string, self.dl_preprocess.readAllStandardError()))
-
         args = [
             get_script_path("deep_learning/preprocess.py"),
-            '--data', data_path,
-            '--results', results_path,
+            '--data', os.path.join(job["output_dir"], "reoriented"),
+            '--results', os.path.join(job["output_dir"], "preprocess"),
             '--ohe'
         ]
 
-        self.dl_preprocess.start(self.python_executable, args)
+        self.start_process(job, "Preprocessing", self.python_executable, args)
 
-    def on_preprocess_finished(self, exit_code, exit_status):
-        # This slot is called by the QProcess when it finishes
-        if self.is_cancelled:
-            return
-
-        if exit_code != 0 or exit_status != QProcess.ExitStatus.NormalExit:
-            self.log_update.emit("Preprocess failed", f"Exit code: {exit_code}")
-            if self.current_file_index + 1 < self.total_files:
-                self.current_file_index += 1
-                self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Segmentation failed for this file"))
-                self.process_single_file()
-            return
+    def model_args(self):
+        """Network and checkpoint arguments, shared by the runner and the inference worker."""
+        return [
+            '--depth', '6',
+            '--filters', '64', '96', '128', '192', '256', '384', '512',
+            '--min_fmap', '2',
+            '--gpus', '1' if self.has_cuda else '0',
+            '--amp',  # float16 on the GPU, bfloat16 on CPUs supporting it
+            '--ckpt_path', get_script_path('deep_learning/checkpoints/fold3/epoch=146-dice=88.05.ckpt'),
+            '--tta',
+            '--skip_empty_patches',
+        ]
 
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "✓ Preprocess completed"), 'i')
-        self.update_progress()
-        # PHASE 5: Deep learning execution
-        self.current_phase = 5
-        self.run_deep_learning()  # Start the next phase
+    def predictions_dir(self, job):
+        """Folder of the predictions of a file (named by the runner after the checkpoint)."""
+        return f'{job["output_dir"]}/dl_results/predictions_epoch=146-dice=88_05_task=train_fold=0_tta'
 
-    def run_deep_learning(self):
+    def run_deep_learning(self, job):
         """Runs PHASE 5: DEEP LEARNING"""
-        phase = "Deep Learning execution"
-
-        self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Phase 5/6: Deep Learning..."))
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "PHASE 5: Deep learning execution"), 'i')
-
-        self.dl_process = QProcess()
-        self.dl_process.finished.connect(self.on_dl_finished)
-        self.dl_process.errorOccurred.connect(lambda error, string=phase: self.on_error(string, error))
-        self.dl_process.readyReadStandardOutput.connect(lambda string=phase: self.on_stdout(string, self.dl_process.readAllStandardOutput()))
-        self.dl_process.readyReadStandardError.connect(lambda string=phase: self.on_stderr(string, self.dl_process.readAllStandardError()))
+        data_dir = f'{job["output_dir"]}/preprocess/val_3d/test'
 
         args = [
             get_script_path("deep_learning/deep_learning_runner.py"),
-            '--depth', '6',
-            '--filters', '64', '96', '128', '192', '256', '384', '512',
-            '--min_fmap', '2',
-            '--gpus', '1',
-            '--amp',
+            *self.model_args(),
             '--save_preds',
             '--exec_mode', 'predict',
-            '--data', f'{self.output_dir}/preprocess/val_3d/test',
-            '--ckpt_path', get_script_path('deep_learning/checkpoints/fold3/epoch=146-dice=88.05.ckpt'),
-            '--tta',
-            '--results', f'{self.output_dir}/dl_results'
+            '--data', data_dir,
+            '--results', f'{job["output_dir"]}/dl_results'
         ]
 
-        self.dl_process.start(self.python_executable, args)
+        self.start_process(job, "Deep Learning execution", self.python_executable, args)
 
-    def on_dl_finished(self, exit_code, exit_status):
-        if self.is_cancelled:
+    def acquire_inference_service(self):
+        """Connect to the shared nnU-Net worker, starting it if needed; return whether it can take the job."""
+        if self.inference_service is not None:
+            if self.inference_service.is_running():
+                return True
+            self.release_inference_service()
+        try:
+            service = shared_inference_service(self.model_args())
+        except FileNotFoundError as e:
+            log.warning(f"nnU-Net worker unavailable: {e}")
+            self.use_inference_service = False
+            return False
+        if not service.is_running() and not service.is_ready:
+            self.use_inference_service = False
+            return False
+        service.job_finished.connect(self.on_inference_job_finished)
+        service.job_progress.connect(self.on_inference_progress)
+        service.log_message.connect(self.on_inference_log)
+        self.inference_service = service
+        return True
+
+    def release_inference_service(self):
+        """Stop listening to the shared nnU-Net worker, which stays loaded for the next run."""
+        service, self.inference_service = self.inference_service, None
+        if service is not None:
+            service.job_finished.disconnect(self.on_inference_job_finished)
+            service.job_progress.disconnect(self.on_inference_progress)
+            service.log_message.disconnect(self.on_inference_log)
+
+    def on_inference_log(self, line):
+        self.log_update.emit(f"[Deep Learning execution] {line}", 'd')
+
+    def on_inference_progress(self, service_job, phase):
+        """Triggered when a file enters a phase in the nnU-Net worker."""
+        job = self.inference_jobs.get(service_job)
+        if job is None or self.is_cancelled or phase not in PHASES:
             return
+        self.advance_in_memory(job, PHASES.index(phase))
 
-        # This slot is called by the QProcess when it finishes
-        if exit_code != 0 or exit_status != QProcess.ExitStatus.NormalExit:
-            self.log_update.emit("Deep learning execution failed", f"Exit code: {exit_code}")
-            if self.current_file_index + 1 < self.total_files:
-                self.current_file_index += 1
-                self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Segmentation failed for this file"))
-                self.process_single_file()
+    def advance_in_memory(self, job, index):
+        """Record the phases completed in the nnU-Net worker, up to the phase at `index`."""
+        if index <= job["phase"]:
             return
-
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "✓ Deep learning execution completed"), 'i')
+        while job["phase"] < index:
+            self.log_update.emit(f"[{job['basename']}] {self.phase_messages(PHASES[job['phase']])[2]}", 'i')
+            job["phase"] += 1
+        status, message, _ = self.phase_messages(PHASES[index])
+        self.file_update.emit(job["basename"], status)
+        self.log_update.emit(f"[{job['basename']}] {message}", 'i')
         self.update_progress()
-        # PHASE 6: Postprocess
-        self.current_phase = 6
-        self.run_postprocess()  # Start the next phase
-
-    def run_postprocess(self):
-        phase = "Postprocessing"
-
-        self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Phase 6/6: Postprocessing..."))
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "PHASE 6: Postprocess"), 'i')
 
-        self.dl_postprocess = QProcess()
-        self.dl_postprocess.finished.connect(self.on_postprocess_finished)
-        self.dl_postprocess.errorOccurred.connect(lambda error, string=phase: self.on_error(string, error))
-        self.dl_postprocess.readyReadStandardOutput.connect(lambda string=phase: self.on_stdout(string, self.dl_postprocess.readAllStandardOutput()))
-        self.dl_postprocess.readyReadStandardError.connect(lambda string=phase: self.on_stderr(string, self.dl_postprocess.readAllStandardError()))
+    def on_inference_job_finished(self, service_job, success, message):
+        """Triggered when the nnU-Net worker finishes a job."""
+        job = self.inference_jobs.pop(service_job, None)
+        if job is None or self.is_cancelled:
+            return
+        if not success:
+            self.log_update.emit(f"[Deep Learning execution] {message}", 'e')
+            if not self.inference_service.is_ready:
+                # The worker could not load the model: run one process per phase instead
+                self.log_update.emit(QCoreApplication.translate(
+                    "DlWorker", "nnU-Net worker unavailable, running one process per phase"), 'w')
+                self.release_inference_service()
+                self.use_inference_service = False
+                self.start_phase(job)
+                return
+        else:
+            self.advance_in_memory(job, PHASES.index("postprocess"))
+        self.on_phase_finished(job, 0 if success else 1, QProcess.ExitStatus.NormalExit)
 
+    def run_postprocess(self, job):
+        """Runs PHASE 6: POSTPROCESS"""
         args = [
             get_script_path("deep_learning/postprocess.py"),
-            '-i', f'{self.output_dir}/dl_results/predictions_epoch=146-dice=88_05_task=train_fold=0_tta',
-            '-o', f'{self.output_dir}/dl_postprocess',
+            '-i', self.predictions_dir(job),
+            '-o', f'{job["output_dir"]}/dl_postprocess',
             '--w', f'{self.workspace_path}',
             '--atlas', self.atlas_file,
             "--brats", self.brats_file,
-            '--mri', f'{self.current_input_file}'
+            '--mri', f'{job["input"]}',
+            '--registrations', self.registrations_dir
         ]
 
-        self.dl_postprocess.start(self.python_executable, args)
+        self.start_process(job, "Postprocessing", self.python_executable, args)
 
-    def on_postprocess_finished(self, exit_code, exit_status):
-        if self.is_cancelled:
+    def on_phase_finished(self, job, exit_code, exit_status):
+        """Record the end of the running phase of a file and schedule the next phases."""
+        if self.is_cancelled or job["state"] != "running":
             return
+        job["process"] = None
+        phase = PHASES[job["phase"]]
 
-        # This slot is called by the QProcess when it finishes
         if exit_code != 0 or exit_status != QProcess.ExitStatus.NormalExit:
-            self.log_update.emit("Postprocess failed", f"Exit code: {exit_code}")
-            if self.current_file_index + 1 < self.total_files:
-                self.current_file_index += 1
-                self.file_update.emit(self.current_input_file_basename, QCoreApplication.translate("DlWorker", "Segmentation failed for this file"))
-                self.process_single_file()
-            return
+            self.log_update.emit(QCoreApplication.translate("DlWorker", "[{0}] {1} failed (exit code {2})").format(
+                job["basename"], phase, exit_code), 'e')
+            job["state"] = "failed"
+            self.failed_files.append(job["input"])
+            self.file_update.emit(job["basename"], QCoreApplication.translate("DlWorker", "Segmentation failed for this file"))
+        else:
+            self.log_update.emit(f"[{job['basename']}] {self.phase_messages(phase)[2]}", 'i')
+            job["phase"] += 1
+            if job["phase"] == self.total_phases:
+                job["state"] = "done"
+                self.processed_files += 1
+                self.file_update.emit(job["basename"], QCoreApplication.translate("DlWorker", "Segmentation completed"))
+            else:
+                job["state"] = "waiting"
 
-        self.log_update.emit(QCoreApplication.translate("DlWorker", "✓ Postprocess completed"), 'i')
-        self.file_update.emit(self.current_input_file_basename,
-                              QCoreApplication.translate("DlWorker", "Segmentation completed"))
         self.update_progress()
+        self.schedule()
 
-        if self.current_file_index + 1 < self.total_files:
-            self.current_file_index += 1
-            self.process_single_file()
-        else:
-            self.finished.emit(True, QCoreApplication.translate("DlWorker", "Processing completed"))
-        return
+    def on_process_error(self, job, phase, error):
+        """Log a process error; a process that could not start fails its phase (no `finished` follows)."""
+        self.on_error(phase, error)
+        if error == QProcess.ProcessError.FailedToStart:
+            self.on_phase_finished(job, -1, QProcess.ExitStatus.CrashExit)
 
     def cancel(self):
         self.is_cancelled = True
         self.log_update.emit(QCoreApplication.translate("DlWorker", "Cancellation requested - stopping all processes..."), 'w')
 
-        processes = {
-            'SynthStrip': self.synthstrip_process,
-            'Coregistration': self.coregistration_process,
-            'Reorientation': self.reorientation_process,
-            'Preprocess': self.dl_preprocess,
-            'Deep Learning': self.dl_process,
-            'Postprocess': self.dl_postprocess
-        }
-
-        for name, process in processes.items():
+        for job in self.jobs:
+            process = job["process"]
             if process is not None and process.state() != QProcess.ProcessState.NotRunning:
+                name = f"{PHASES[job['phase']]} ({job['basename']})"
                 self.log_update.emit(QCoreApplication.translate("DlWorker", "Stopping {name}...").format(name=name), 'w')
 
                 # No need to disconnect signals manually!
@@ -445,6 +564,14 @@ class DlWorker(QObject):
                     self.log_update.emit(QCoreApplication.translate("DlWorker", "Forcing {name} to quit...").format(name=name), 'e')
                     process.kill()
                     process.waitForFinished(1000)
+        self.synthstrip_jobs.clear()
+        self.stop_synthstrip_service(kill=True)
+        busy = bool(self.inference_jobs)
+        self.inference_jobs.clear()
+        self.release_inference_service()
+        if busy:
+            # The worker is busy with a file of this run: it is started afresh next time
+            stop_shared_inference_service()
 
         self.finished.emit(False, QCoreApplication.translate("DlWorker", "Processing cancelled by user"))
 
@@ -490,4 +617,4 @@ class DlWorker(QObject):
             self.log_update.emit(f"[{phase}] Process error: {error_msg}", 'e')
 
         except Exception as e:
-            self.log_update.emit(f"[{phase}] Error in error handler: {str(e)}", 'e')
\ No newline at end of file
+            self.log_update.emit(f"[{phase}] Error in error handler: {str(e)}", 'e')
@@ -0,0 +1,73 @@
+from logger import get_logger
+from threads.worker_service import WorkerService
+from utils import get_dl_python_executable, get_script_path
+
+log = get_logger()
+
+EVENT_PREFIX = "@nnunet "
+"""Marks the event lines of the worker (must match `deep_learning/inference_server.py`)."""
+
+_shared_service = None
+
+
+class InferenceService(WorkerService):
+    """
+    Client of the long-lived nnU-Net worker (`deep_learning/inference_server.py`).
+
+    The worker builds the network and loads the checkpoint once, then segments
+    the preprocessed folders submitted to it with `submit(input_dir, output_dir)`,
+    writing one prediction per case to the output folder. With
+    `submit(brain_in_atlas, workspace, kind="segment", ...)` it runs every
+    phase after the coregistration in memory and writes the final segmentation,
+    reporting each phase it enters with `job_progress`. Signals and methods are
+    those of `WorkerService`.
+    """
+
+    event_prefix = EVENT_PREFIX
+
+    def __init__(self, model_args, threads=None):
+        """
+        Args:
+            model_args (list[str]): Network and checkpoint arguments of `deep_learning_runner.py`.
+            threads (int, optional): CPU threads used by torch in the worker.
+        """
+        super().__init__("nnU-Net", threads=threads)
+        self.model_args = list(model_args)
+
+    def command(self):
+        """Return the program and arguments of the worker process."""
+        args = [get_script_path("deep_learning/inference_server.py"), *self.model_args]
+        if self.threads:
+            args += ["--threads", str(self.threads)]
+        return get_dl_python_executable(), args
+
+
+def shared_inference_service(model_args):
+    """
+    Return the nnU-Net worker shared by every segmentation run, starting it if needed.
+
+    The worker stays loaded between runs until `stop_shared_inference_service`;
+    it is replaced if it exited or was started with other model arguments.
+
+    Raises:
+        FileNotFoundError: If the deep learning environment is not installed.
+    """
+    global _shared_service
+    service = _shared_service
+    if service is not None and (not service.is_running() or service.model_args != list(model_args)):
+        stop_shared_inference_service()
+        service = None
+    if service is None:
+        service = InferenceService(model_args)
+        service.start()
+        _shared_service = service
+    return service
+
+
+def stop_shared_inference_service():
+    """Stop the shared nnU-Net worker, if it runs (e.g. when the application quits)."""
+    global _shared_service
+    service, _shared_service = _shared_service, None
+    if service is not None:
+        log.debug("Stopping the shared nnU-Net worker")
+        service.kill()
@@ -1,13 +1,52 @@
 import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
 import nibabel as nib
 import numpy as np
 
 from PyQt6.QtCore import QThread, pyqtSignal, QCoreApplication
 from logger import get_logger
+from numba_kernels import warm_up_kernels
+from roi_mask import RunLengthROI
+from slice_compositing import intensity_window, normalize_volume
 
 
 log = get_logger()
 
+
+def foreground_bounding_box(data, margin=2):
+    """
+    Find the bounding box of the non-zero voxels of a volume from its axis projections.
+
+    The volume is reduced once to a 3D foreground mask (over time for 4D data),
+    then to one 1D profile per axis, so the cost is a single pass over the data.
+
+    Args:
+        data (np.ndarray): 3D or 4D voxel data.
+        margin (int, optional): Voxels of background kept around the foreground.
+
+    Returns:
+        tuple[tuple[int, int, int], tuple[int, int, int]] | None: Start (inclusive) and
+        stop (exclusive) indices along x, y and z, or None if the volume is empty.
+    """
+    foreground = np.isfinite(data) & (data != 0)
+    if foreground.ndim == 4:
+        foreground = foreground.any(axis=3)
+
+    start, stop = [], []
+    for axis in range(3):
+        profile = foreground.any(axis=tuple(a for a in range(3) if a != axis))
+        indices = np.flatnonzero(profile)
+        if indices.size == 0:
+            return None
+        start.append(max(int(indices[0]) - margin, 0))
+        stop.append(min(int(indices[-1]) + 1 + margin, foreground.shape[axis]))
+    return tuple(start), tuple(stop)
+
+
 class SaveNiftiThread(QThread):
     """
     Background thread for saving a NIfTI image and its associated metadata
@@ -22,7 +61,9 @@ class SaveNiftiThread(QThread):
         error (str): Emitted when an error occurs during saving.
 
     Args:
-        data (np.ndarray): The voxel data to be saved as a NIfTI image.
+        data (np.ndarray | RunLengthROI): The voxel data to be saved as a NIfTI image.
+            Run-length encoded ROIs are written slice by slice without being decoded
+            into a full volume.
         affine (np.ndarray): The affine transformation matrix for spatial orientation.
         path (str): Output file path for the NIfTI image.
         json_path (str): Output file path for the JSON metadata file.
@@ -68,7 +109,10 @@ class SaveNiftiThread(QThread):
         try:
             log.debug(f"Save nifti in {self.path}")
             # Save the NIfTI file
-            nib.save(nib.Nifti1Image(self.data.astype(np.uint8), self.affine), self.path)
+            if isinstance(self.data, RunLengthROI):
+                self.write_run_length_roi(self.data)
+            else:
+                nib.save(nib.Nifti1Image(self.data.astype(np.uint8), self.affine), self.path)
 
             log.debug("Preparing json")
             json_dict = {
@@ -90,6 +134,25 @@ class SaveNiftiThread(QThread):
             # Emit error message if something goes wrong
             self.error.emit(str(e))
 
+    def write_run_length_roi(self, roi):
+        """
+        Stream a run-length encoded ROI to a uint8 NIfTI file.
+
+        NIfTI stores voxels in Fortran order, so the volume is written one axial
+        slice (last axis) at a time, each decoded from the runs it intersects.
+
+        Args:
+            roi (RunLengthROI): ROI to write.
+        """
+        header = nib.Nifti1Image(np.zeros((1, 1, 1), dtype=np.uint8), self.affine).header
+        header.set_data_shape(roi.shape)
+        header.set_data_offset(352)  # single-file NIfTI without extensions
+
+        with nib.openers.ImageOpener(self.path, "wb") as fileobj:
+            header.write_to(fileobj)
+            for z in range(roi.shape[2]):
+                fileobj.write(roi.plane(2, z).tobytes(order="F"))
+
 
 class ImageLoadThread(QThread):
     """
@@ -108,6 +171,9 @@ class ImageLoadThread(QThread):
     Args:
         file_path (str): Path to the NIfTI file to load.
         is_overlay (bool): Flag indicating whether the file is an overlay image.
+        crop_to_foreground (bool): Crop the volume to the bounding box of its
+            non-zero voxels. The emitted data, dims and affine then describe the
+            cropped grid, and `crop` holds (offset, original dims, original affine).
     """
 
     finished = pyqtSignal(object, object, object, bool, bool)
@@ -138,10 +204,15 @@ class ImageLoadThread(QThread):
     - `int`: Current progress percentage (0–100).  
     """
 
-    def __init__(self, file_path, is_overlay):
+    CROP_MARGIN = 2
+    """Background voxels kept around the foreground when cropping."""
+
+    def __init__(self, file_path, is_overlay, crop_to_foreground=False):
         super().__init__()
         self.file_path = file_path
         self.is_overlay = is_overlay
+        self.crop_to_foreground = crop_to_foreground
+        self.crop = None
 
     def run(self):
         """
@@ -178,9 +249,15 @@ class ImageLoadThread(QThread):
             img_data = np.asanyarray(canonical_img.dataobj, dtype=np.float32)
             self.progress.emit(80)
 
+            windows = None
+            if self.crop_to_foreground:
+                # Contrast comes from the whole volume, so it does not depend on the crop
+                windows = self.intensity_windows(img_data)
+                img_data, dims, affine = self.crop_volume(img_data, dims, affine)
+
             log.debug("Normalize image intensities")
             # Normalize image intensities
-            img_data = self.normalize_data_matplotlib_style(img_data)
+            img_data = self.normalize_data_matplotlib_style(img_data, windows)
 
             self.progress.emit(100)
             log.debug("Emit finished signal with image data and metadata.")
@@ -191,7 +268,38 @@ class ImageLoadThread(QThread):
             # Report any errors encountered
             self.error.emit(str(e))
 
-    def normalize_data_matplotlib_style(self, data):
+    def crop_volume(self, img_data, dims, affine):
+        """
+        Crop a volume to its foreground and shift the affine to the cropped grid.
+
+        Sets `crop` to (offset, original dims, original affine) when the volume shrinks.
+
+        Returns:
+            tuple[np.ndarray, tuple, np.ndarray]: Cropped data, dims and affine.
+        """
+        bbox = foreground_bounding_box(img_data, self.CROP_MARGIN)
+        if bbox is None:
+            return img_data, dims, affine
+        start, stop = bbox
+        if start == (0, 0, 0) and stop == tuple(img_data.shape[:3]):
+            return img_data, dims, affine
+
+        # Copy so the full-size array can be released
+        cropped = img_data[start[0]:stop[0], start[1]:stop[1], start[2]:stop[2]].copy()
+        cropped_affine = affine.copy()
+        cropped_affine[:3, 3] += affine[:3, :3] @ np.asarray(start, dtype=np.float64)
+        self.crop = (start, tuple(dims), affine)
+        log.info(f"Cropped {self.file_path} from {tuple(img_data.shape[:3])} to {cropped.shape[:3]}")
+        return cropped, cropped.shape[:3] + tuple(dims[3:]), cropped_affine
+
+    @staticmethod
+    def intensity_windows(data):
+        """Return the intensity window of each 3D volume of the data (one for 3D data), see `intensity_window`."""
+        if data.ndim == 4:
+            return [intensity_window(data[..., i]) for i in range(data.shape[3])]
+        return [intensity_window(data)]
+
+    def normalize_data_matplotlib_style(self, data, windows=None):
         """
         Normalize NIfTI data using robust percentile scaling (0.5th–99.5th percentiles).
 
@@ -200,6 +308,8 @@ class ImageLoadThread(QThread):
 
         Args:
             data (np.ndarray): The 3D or 4D voxel intensity data.
+            windows (list[tuple[float, float] | None], optional): Intensity window of
+                each 3D volume, from `intensity_windows` (computed from `data` by default).
 
         Returns:
             np.ndarray: Normalized float32 data with intensity values scaled to [0, 1].
@@ -208,24 +318,502 @@ class ImageLoadThread(QThread):
         if data.size == 0:
             return data
 
-        def normalize_volume(volume):
-            """Normalize a single 3D volume to [0, 1] using percentile-based contrast stretching."""
-            valid_data = volume[np.isfinite(volume)]
-            if valid_data.size == 0:
-                return np.zeros_like(volume, dtype=np.float32)
-
-            vmin, vmax = np.percentile(valid_data, [0.1, 99.9])
-            if vmax <= vmin:
-                vmax = vmin + 1.0
-
-            return np.clip((volume - vmin) / (vmax - vmin), 0, 1).astype(np.float32)
+        if windows is None:
+            windows = self.intensity_windows(data)
 
         # Handle both 3D and 4D volumes
         if data.ndim == 4:
-            normalized = np.empty_like(data, dtype=np.float32)
+            # C order keeps each voxel's time series contiguous for fast TAC reads
+            normalized = np.empty(data.shape, dtype=np.float32, order="C")
             for i in range(data.shape[3]):
-                normalized[..., i] = normalize_volume(data[..., i])
+                normalized[..., i] = normalize_volume(data[..., i], window=windows[i])
         else:
-            normalized = normalize_volume(data)
+            normalized = normalize_volume(data, window=windows[0])
 
         return normalized
+
+
+class DicomSeriesLoadThread(QThread):
+    """
+    Thread decoding a DICOM series slice by slice without blocking the UI.
+
+    Slices are decoded from the middle of the series outwards, and slices the
+    viewer is showing can be requested with `request` to be decoded next, so
+    the first slice appears long before the whole series is read. Each decoded
+    slice is announced with `slice_ready` along with its values, so the viewer
+    never decodes on the GUI thread. Slices are written into one canonical
+    buffer, which is normalized in place once all slices are read and emitted
+    like `ImageLoadThread` does.
+
+    Signals:
+        slice_ready (int, object): Emitted with the native index and the values of each decoded slice.
+        finished (object, object, object, bool, bool): Emitted when the whole series is
+            read, with (img_data, dims, affine, is_4d, is_overlay) of the canonical volume.
+        error (str): Emitted if a slice cannot be decoded.
+        progress (int): Emits loading progress updates (0–100).
+
+    Args:
+        series (DicomSeries): Series to read.
+    """
+
+    slice_ready = pyqtSignal(int, object)
+    """**Signal(int, object):** Emitted when a slice has been decoded.  
+    Parameters:  
+    - `int`: Native slice index.  
+    - `object`: Read-only float32 slice, as returned by `DicomSeries.read_slice`.  
+    """
+
+    finished = pyqtSignal(object, object, object, bool, bool)
+    """**Signal(object, object, object, bool, bool):** Emitted when the series is read,  
+    with the same parameters as `ImageLoadThread.finished`.  
+    """
+
+    error = pyqtSignal(str)
+    """**Signal(str):** Emitted when the series cannot be read.  
+    Parameters:  
+    - `str`: Description of the error.  
+    """
+
+    progress = pyqtSignal(int)
+    """**Signal(int):** Emitted to report the percentage of decoded slices.  
+    """
+
+    def __init__(self, series):
+        super().__init__()
+        self.series = series
+        self._requested = []
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def request(self, index):
+        """Decode the slice with this native index before the remaining ones."""
+        with self._lock:
+            if index not in self._requested:
+                self._requested.append(index)
+
+    def cancel(self):
+        """Stop after the slice currently decoded; nothing more is emitted."""
+        with self._lock:
+            self._cancelled = True
+
+    def _next_slice(self, order, decoded):
+        """Pop the next slice to decode: requested slices first, then in loading order."""
+        with self._lock:
+            if self._cancelled:
+                return None
+            while self._requested:
+                index = self._requested.pop(0)
+                if 0 <= index < len(decoded) and not decoded[index]:
+                    return index
+        while order and decoded[order[0]]:
+            order.pop(0)
+        return order.pop(0) if order else None
+
+    def run(self):
+        """
+        Decode every slice of the series, then emit the normalized canonical volume.
+
+        Emits:
+            - slice_ready(index, values): After each slice.
+            - finished(img_data, dims, affine, False, False): When all slices are read.
+            - error(message): If a slice cannot be decoded.
+        """
+        try:
+            series = self.series
+            # Decoded in native order into the canonical volume, which is then normalized in place
+            volume = np.empty(series.canonical_shape, dtype=np.float32)
+            raw = series.native_view(volume)
+            decoded = np.zeros(len(series), dtype=bool)
+            order = series.loading_order()
+
+            while True:
+                index = self._next_slice(order, decoded)
+                if index is None:
+                    break
+                values = series.read_slice(index)
+                raw[:, :, index] = values
+                decoded[index] = True
+                self.slice_ready.emit(index, values)
+                self.progress.emit(int(90 * decoded.sum() / len(series)))
+
+            if self._cancelled:
+                return
+
+            log.debug("Normalize DICOM series intensities")
+            del raw
+            normalize_volume(volume, out=volume)
+            self.progress.emit(100)
+            self.finished.emit(volume, series.canonical_shape, series.canonical_affine, False, False)
+
+        except Exception as e:
+            log.error(f"Error reading DICOM series {self.series.folder}: {e}")
+            self.error.emit(str(e))
+
+
+class CinePrefetchThread(QThread):
+    """
+    Background renderer that keeps the upcoming frames of a 4D cine loop ready.
+
+    The thread renders the frames following the current playhead into a bounded
+    buffer of `depth` frames, using a caller-provided `render_frame` function that
+    returns the three orthogonal planes of one time frame as `QImage` objects.
+    The GUI thread consumes frames with `take()`; frames that are not ready in
+    time are dropped by the caller instead of being rendered synchronously.
+
+    When rendering is slower than the playback rate, the thread skips ahead to
+    frames that can still be finished before they are due, so that rendered
+    frames are never discarded for arriving late.
+
+    Signals:
+        error (str): Emitted if rendering a frame fails.
+
+    Args:
+        render_frame (Callable[[int], list[QImage]]): Renders the planes of a time frame.
+        n_frames (int): Number of time frames in the volume.
+        start_frame (int): Frame currently displayed (the initial playhead).
+        depth (int): Number of frames to keep rendered ahead of the playhead.
+        frame_interval (float): Playback interval between frames, in seconds.
+    """
+
+    error = pyqtSignal(str)
+    """**Signal(str):** Emitted when a frame cannot be rendered.  
+    Parameters:  
+    - `str`: Description of the error.  
+    """
+
+    def __init__(self, render_frame, n_frames, start_frame=0, depth=8, frame_interval=0.2):
+        super().__init__()
+        self.render_frame = render_frame
+        self.n_frames = n_frames
+        self.depth = max(1, min(depth, n_frames - 1))
+        self.frame_interval = frame_interval
+        self.render_time = 0.0
+        self._playhead = start_frame
+        self._buffer = {}
+        self._running = True
+        self._condition = threading.Condition()
+
+    def _window(self):
+        """Return the frames that follow the playhead, in display order."""
+        return [(self._playhead + k) % self.n_frames for k in range(1, self.depth + 1)]
+
+    def _next_frame_to_render(self):
+        """
+        Pick the first missing frame that can still be rendered before it is due.
+
+        Frames that fell out of the window are evicted from the buffer.
+        Must be called with the condition lock held.
+        """
+        window = self._window()
+        for frame in list(self._buffer):
+            if frame not in window:
+                del self._buffer[frame]
+
+        lead = 1
+        if self.frame_interval > 0:
+            lead = max(1, math.ceil(self.render_time / self.frame_interval))
+        for frame in window[min(lead, self.depth) - 1:]:
+            if frame not in self._buffer:
+                return frame
+        return None
+
+    def take(self, frame):
+        """
+        Move the playhead to `frame` and return its rendered planes if available.
+
+        Args:
+            frame (int): Frame about to be displayed.
+
+        Returns:
+            list[QImage] | None: Rendered planes, or None if the frame is not ready.
+        """
+        with self._condition:
+            self._playhead = frame
+            images = self._buffer.pop(frame, None)
+            self._condition.notify_all()
+            return images
+
+    def stop(self):
+        """Ask the thread to stop after the frame currently being rendered."""
+        with self._condition:
+            self._running = False
+            self._buffer.clear()
+            self._condition.notify_all()
+
+    def run(self):
+        """
+        Render frames ahead of the playhead until stopped.
+
+        Emits:
+            - error(message): If rendering a frame raises an exception.
+        """
+        while True:
+            with self._condition:
+                frame = self._next_frame_to_render() if self._running else None
+                while self._running and frame is None:
+                    self._condition.wait()
+                    frame = self._next_frame_to_render()
+                if not self._running:
+                    return
+
+            start = time.perf_counter()
+            try:
+                images = self.render_frame(frame)
+            except Exception as e:
+                log.error(f"Error prefetching cine frame {frame}: {e}")
+                self.error.emit(str(e))
+                return
+            elapsed = time.perf_counter() - start
+            # Smoothed render time used to decide how far ahead to render
+            self.render_time = elapsed if self.render_time == 0 else 0.7 * self.render_time + 0.3 * elapsed
+
+            with self._condition:
+                if self._running and frame in self._window():
+                    self._buffer[frame] = images
+
+
+class AutomaticROIThread(QThread):
+    """
+    Long-lived worker that recomputes the automatic ROI off the GUI thread.
+
+    Requests are coalesced: `submit()` replaces any request that has not started
+    yet, so while a slider is dragged only the most recent parameters are ever
+    computed. Results of requests superseded while they were running are
+    discarded instead of being emitted.
+
+    Signals:
+        result_ready (object, int): Emitted with the computed mask and the
+                                    generation of the request that produced it.
+        error (str): Emitted if the computation fails.
+
+    Args:
+        compute (Callable[..., np.ndarray]): Computes the ROI mask from the keyword
+                                             arguments passed to `submit()`.
+    """
+
+    result_ready = pyqtSignal(object, int)
+    """**Signal(object, int):** Emitted when the latest request has been computed.  
+    Parameters:  
+    - `object`: Computed ROI mask.  
+    - `int`: Generation of the request.  
+    """
+
+    error = pyqtSignal(str)
+    """**Signal(str):** Emitted when the ROI cannot be computed.  
+    Parameters:  
+    - `str`: Description of the error.  
+    """
+
+    def __init__(self, compute):
+        super().__init__()
+        self.compute = compute
+        self.generation = 0
+        self._pending = None
+        self._running = True
+        self._condition = threading.Condition()
+
+    def submit(self, **params):
+        """
+        Queue a computation, replacing any request that has not started yet.
+
+        Returns:
+            int: Generation assigned to the request.
+        """
+        with self._condition:
+            self.generation += 1
+            self._pending = (self.generation, params)
+            self._condition.notify_all()
+            return self.generation
+
+    def cancel(self):
+        """Drop the pending request and mark the running one as stale."""
+        with self._condition:
+            self.generation += 1
+            self._pending = None
+
+    def is_current(self, generation):
+        """Return whether `generation` is the most recent request."""
+        with self._condition:
+            return generation == self.generation
+
+    def stop(self):
+        """Ask the thread to stop after the computation currently running."""
+        with self._condition:
+            self._running = False
+            self._pending = None
+            self._condition.notify_all()
+
+    def run(self):
+        """
+        Compute queued requests until stopped.
+
+        Emits:
+            - result_ready(mask, generation): For requests still current when done.
+            - error(message): If the computation raises an exception.
+        """
+        while True:
+            with self._condition:
+                while self._running and self._pending is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                generation, params = self._pending
+                self._pending = None
+
+            try:
+                mask = self.compute(**params)
+            except Exception as e:
+                log.error(f"Error computing automatic ROI: {e}")
+                self.error.emit(str(e))
+                continue
+
+            if self.is_current(generation):
+                self.result_ready.emit(mask, generation)
+
+
+class ProjectionThread(QThread):
+    """
+    Long-lived worker computing intensity projections off the GUI thread.
+
+    Jobs are identified by a hashable key; submitting a key that is already
+    queued is a no-op, and urgent jobs (projections needed on screen) jump
+    ahead of background ones such as the angles of a rotating MIP. `clear()`
+    drops the queue when the volume changes, and results of jobs started
+    before it are discarded instead of being emitted.
+
+    Signals:
+        result_ready (object, object): Emitted with the key and the computed projection.
+        error (str): Emitted if a projection cannot be computed.
+    """
+
+    result_ready = pyqtSignal(object, object)
+    """**Signal(object, object):** Emitted when a projection has been computed.  
+    Parameters:  
+    - `object`: Key the job was submitted with.  
+    - `object`: Projection (2D np.ndarray).  
+    """
+
+    error = pyqtSignal(str)
+    """**Signal(str):** Emitted when a projection cannot be computed.  
+    Parameters:  
+    - `str`: Description of the error.  
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.generation = 0
+        self._jobs = OrderedDict()
+        self._running = True
+        self._condition = threading.Condition()
+
+    def submit(self, key, compute, urgent=False):
+        """
+        Queue a projection job.
+
+        Args:
+            key (Hashable): Identifies the projection; emitted back with the result.
+            compute (Callable[[], np.ndarray]): Computes the projection.
+            urgent (bool, optional): Run the job before the queued ones.
+        """
+        with self._condition:
+            if key not in self._jobs:
+                self._jobs[key] = compute
+            if urgent:
+                self._jobs.move_to_end(key, last=False)
+            self._condition.notify_all()
+
+    def pending(self):
+        """Return the number of queued jobs."""
+        with self._condition:
+            return len(self._jobs)
+
+    def clear(self):
+        """Drop the queued jobs and mark the running one as stale."""
+        with self._condition:
+            self.generation += 1
+            self._jobs.clear()
+
+    def stop(self):
+        """Ask the thread to stop after the job currently running."""
+        with self._condition:
+            self._running = False
+            self._jobs.clear()
+            self._condition.notify_all()
+
+    def run(self):
+        """
+        Compute queued projections until stopped.
+
+        Emits:
+            - result_ready(key, projection): For jobs not cleared while running.
+            - error(message): If a projection raises an exception.
+        """
+        while True:
+            with self._condition:
+                while self._running and not self._jobs:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                key, compute = self._jobs.popitem(last=False)
+                generation = self.generation
+
+            try:
+                projection = compute()
+            except Exception as e:
+                log.error(f"Error computing projection {key}: {e}")
+                self.error.emit(str(e))
+                continue
+
+            with self._condition:
+                current = generation == self.generation
+            if current:
+                self.result_ready.emit(key, projection)
+
+
+class KernelWarmupThread(QThread):
+    """
+    Background thread compiling the viewer's numba kernels at startup.
+
+    Kernels compile on first use, which would otherwise stall the GUI the
+    first time a seed is clicked or an overlay is shown. With the on-disk
+    cache populated, warm-up only loads the compiled code. Requesting an
+    interruption stops it after the compilation in progress (see `stop`).
+
+    Signals:
+        error (str): Emitted if a kernel fails to compile.
+    """
+
+    error = pyqtSignal(str)
+    """**Signal(str):** Emitted when a kernel cannot be compiled.  
+    Parameters:  
+    - `str`: Description of the error.  
+    """
+
+    def run(self):
+        """
+        Compile all registered kernels.
+
+        Emits:
+            - error(message): If compilation raises an exception.
+        """
+        try:
+            start = time.perf_counter()
+            warm_up_kernels(stop=self.isInterruptionRequested)
+            if self.isInterruptionRequested():
+                log.info("Numba kernel warm-up interrupted")
+            else:
+                log.info(f"Numba kernels warmed up in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            log.error(f"Error warming up numba kernels: {e}")
+            self.error.emit(str(e))
+
+    def stop(self, timeout_ms=2000):
+        """
+        Interrupt the warm-up and wait for the compilation in progress, at most `timeout_ms`.
+
+        Returns:
+            bool: True if the thread finished; otherwise it is left running, e.g.
+            for the process to exit without waiting for it.
+        """
+        self.requestInterruption()
+        return self.wait(timeout_ms)
@@ -0,0 +1,43 @@
+from threads.worker_service import WorkerService
+from utils import get_dl_python_executable, get_script_path
+
+EVENT_PREFIX = "@skullstrip "
+"""Marks the event lines of the worker (must match `deep_learning/skull_strip_server.py`)."""
+
+
+class SkullStripService(WorkerService):
+    """
+    Client of a long-lived skull-stripping worker process (`deep_learning/skull_strip_server.py`).
+
+    The worker loads the SynthStrip or HD-BET network once and then strips the
+    files submitted to it with `submit(input_file, output_file)`. Signals and
+    methods are those of `WorkerService`.
+    """
+
+    event_prefix = EVENT_PREFIX
+
+    def __init__(self, tool, device="cpu", model=None, threads=None, tta=True):
+        """
+        Args:
+            tool (str): "synthstrip" (nipreps SynthStrip) or "hd-bet".
+            device (str, optional): Torch device ("cpu" or "cuda").
+            model (str, optional): SynthStrip model weights.
+            threads (int, optional): CPU threads used by torch in the worker.
+            tta (bool, optional): Test-time augmentation of HD-BET.
+        """
+        super().__init__(tool, threads=threads)
+        self.tool = tool
+        self.device = device
+        self.model = model
+        self.tta = tta
+
+    def command(self):
+        """Return the program and arguments of the worker process."""
+        args = [get_script_path("deep_learning/skull_strip_server.py"), "--tool", self.tool, "--device", self.device]
+        if self.model:
+            args += ["--model", self.model]
+        if self.threads:
+            args += ["--threads", str(self.threads)]
+        if self.tool == "hd-bet" and not self.tta:
+            args.append("--disable_tta")
+        return get_dl_python_executable(), args
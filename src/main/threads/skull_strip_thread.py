@@ -3,12 +3,46 @@ import json
 import shutil
 import tempfile
 
-from PyQt6.QtCore import pyqtSignal, QThread, QProcess, QCoreApplication
+from PyQt6.QtCore import pyqtSignal, QThread, QProcess, QProcessEnvironment, QCoreApplication
 from logger import get_logger
-from utils import setup_fsl_env, get_bin_path
+from threads.skull_strip_service import SkullStripService
+from skull_strip_cache import PROVENANCE_KEY, find_cached_output, provenance_record, refresh_stamp
+from tool_environment import resolve_tool_environment
+from utils import get_bin_path
 
 log = get_logger()
 
+THREADS_PER_JOB = {"fsl-bet": 1, "synthstrip": 4, "hd-bet": 4}
+"""CPU threads given to one process of each tool (BET is single-threaded)."""
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+                   "ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS")
+"""Environment variables capping the threads of OpenMP, BLAS, torch and ITK in a child process."""
+
+POLL_INTERVAL_MS = 100
+"""How long to wait on each running process before checking the others."""
+
+
+def plan_parallel_jobs(bet_tool, has_cuda, n_files, cpu_budget=None):
+    """
+    Split a CPU budget between concurrent skull-stripping processes.
+
+    Args:
+        bet_tool (str): Tool used ("fsl-bet", "synthstrip" or "hd-bet").
+        has_cuda (bool): Whether HD-BET runs on the GPU.
+        n_files (int): Number of files to process.
+        cpu_budget (int, optional): CPU cores available (defaults to all cores).
+
+    Returns:
+        tuple[int, int]: Number of processes run at once, and threads given to each.
+    """
+    budget = max(1, int(cpu_budget or os.cpu_count() or 1))
+    if bet_tool == "hd-bet" and has_cuda:
+        # One GPU: the jobs would only compete for its memory
+        return 1, budget
+    threads = min(THREADS_PER_JOB.get(bet_tool, 1), budget)
+    return max(1, min(n_files, budget // threads)), threads
+
 
 class SkullStripThread(QThread):
     """
@@ -18,7 +52,15 @@ class SkullStripThread(QThread):
     a `QProcess`, preventing the GUI from freezing during long-running neuroimaging operations.
 
     It supports batch processing of multiple files, progress reporting, cancellation, and
-    automatic generation of BIDS-like JSON sidecar metadata.
+    automatic generation of BIDS-like JSON sidecar metadata. The sidecar records the
+    provenance of the output (see `skull_strip_cache`), and a file whose voxels were
+    already processed with the same tool and parameters is not processed again.
+
+    Files are processed by up to `max_parallel` tool processes at once, as planned by
+    `plan_parallel_jobs` from the CPU budget; each process gets `threads_per_job` threads
+    through its environment. With `use_service`, HD-BET runs instead in one long-lived
+    worker process (`SkullStripService`) that loads the network once for the whole
+    batch, falling back to one process per file if the worker cannot start.
 
     ---
     **Signals**
@@ -35,7 +77,9 @@ class SkullStripThread(QThread):
     - `workspace_path (str)`: Root directory of the workspace, containing derivatives.
     - `parameters (dict)`: Dictionary of BET/HD-BET options (e.g., `f_val`, `opt_m`, `opt_t`).
     - `has_cuda (bool)`: Whether CUDA GPU acceleration is available (for HD-BET).
-    - `has_bet (bool)`: Whether to use FSL BET instead of HD-BET.
+    - `bet_tool (str)`: Tool to use ("fsl-bet", "synthstrip" or "hd-bet").
+    - `cpu_budget (int, optional)`: CPU cores the batch may use (defaults to all cores).
+    - `use_service (bool, optional)`: Run HD-BET in a long-lived worker process.
     """
 
     # Signal emitted when a progress message is updated.
@@ -62,7 +106,7 @@ class SkullStripThread(QThread):
     The parameters are: the total number of processed files and a list of results or statuses.
     """
 
-    def __init__(self, files, workspace_path, parameters, has_cuda, bet_tool):
+    def __init__(self, files, workspace_path, parameters, has_cuda, bet_tool, cpu_budget=None, use_service=False):
         super().__init__()
         self.files = files
         self.workspace_path = workspace_path
@@ -74,19 +118,32 @@ class SkullStripThread(QThread):
         self.success_count = 0
         self.failed_files = []
 
+        self.max_parallel, self.threads_per_job = plan_parallel_jobs(self.bet_tool, has_cuda, len(files), cpu_budget)
+        self.process = None
+        self.running = []  # (process, job) pairs of the tool processes currently running
+        self.tool_environment = {}
+        self.cpu_budget = cpu_budget
+        self.use_service = use_service
+        self.service = None
+
     def cancel(self):
         """
         Cancels the ongoing operation.
 
-        If a subprocess (`QProcess`) is currently running, it is terminated and killed.
+        Every running subprocess (`QProcess`) is terminated and killed.
         This allows for safe interruption of long-running skull-stripping commands.
         """
         self.is_cancelled = True
+        if self.service is not None:
+            self.service.interrupt()
 
-        if hasattr(self, "process") and self.process is not None:
+        processes = [process for process, _ in list(self.running)]
+        if self.process is not None and self.process not in processes:
+            processes.append(self.process)
+        for process in processes:
             try:
-                self.process.terminate()
-                self.process.kill()
+                process.terminate()
+                process.kill()
             except Exception as e:
                 log.error(f"Error while cancelling process: {e}")
 
@@ -98,7 +155,8 @@ class SkullStripThread(QThread):
         1. Emits a `file_started` signal.
         2. Determines subject ID from the file path.
         3. Chooses between **BET** or **HD-BET** and builds the command.
-        4. Runs the command asynchronously using `QProcess`.
+        4. Runs the command asynchronously using `QProcess`, next to up to
+           `max_parallel - 1` other files.
         5. Writes the stripped output and corresponding JSON metadata.
         6. Emits `file_completed` for each processed file.
 
@@ -114,168 +172,368 @@ class SkullStripThread(QThread):
             self.all_completed.emit(0, [])
             return
 
-        base_progress = 10
-        progress_per_file = int(90 / len(self.files))
+        if self.max_parallel > 1:
+            log.info(f"Running {self.max_parallel} {self.bet_tool} processes at once, "
+                     f"{self.threads_per_job} thread(s) each")
+
+        # FSL variables and shell PATH, resolved once for the whole batch (cached between runs)
+        if self.bet_tool == "fsl-bet":
+            self.tool_environment = resolve_tool_environment()
+
+        pending = list(self.files)
+        self.done_count = 0
+
+        # HD-BET in one worker process that loads the network once for the whole batch
+        if self.use_service and self.bet_tool == "hd-bet":
+            pending = self.run_with_service(pending)
+
+        while (pending or self.running) and not self.is_cancelled:
+            # Fill the free slots
+            while pending and len(self.running) < self.max_parallel and not self.is_cancelled:
+                nifti_file = pending.pop(0)
+                job = self.start_job(nifti_file, len(self.files) - len(pending))
+                if job is None:
+                    self.file_done()
+                elif job is False:
+                    return  # Unknown tool
+
+            # Collect the processes that finished
+            for process, job in list(self.running):
+                if self.is_cancelled:
+                    break
+                wait_ms = -1 if len(self.running) == 1 else POLL_INTERVAL_MS
+                if process.waitForFinished(wait_ms) or process.state() == QProcess.ProcessState.NotRunning:
+                    self.running.remove((process, job))
+                    if self.is_cancelled:
+                        shutil.rmtree(job["temp_dir"], ignore_errors=True)
+                    else:
+                        self.finish_job(process, job)
+                        self.file_done()
 
-        for i, nifti_file in enumerate(self.files):
-            if self.is_cancelled:
-                break
+        # Handle cancellation mid-run
+        if self.is_cancelled:
+            for process, job in self.running:
+                try:
+                    process.kill()
+                    process.waitForFinished()
+                except Exception as e:
+                    log.error(f"Error while stopping process: {e}")
+                shutil.rmtree(job["temp_dir"], ignore_errors=True)
+            self.running = []
 
-            filename = os.path.basename(nifti_file)
-            self.file_started.emit(filename)
+        # Emit final summary signal
+        self.all_completed.emit(self.success_count, self.failed_files)
 
-            base_progress = int(base_progress + i * progress_per_file)
-            self.progress_value_updated.emit(base_progress)
-            self.progress_updated.emit(
-                QCoreApplication.translate(
-                    "Threads",
-                    "Processing {0} ({1}/{2})"
-                ).format(filename, i + 1, len(self.files))
-            )
+    def file_done(self):
+        """Count a finished file and report the aggregated progress."""
+        self.done_count += 1
+        self.progress_value_updated.emit(10 + int(90 * self.done_count / len(self.files)))
 
-            try:
-                nifti_file = os.path.normpath(nifti_file)
-                self.workspace_path = os.path.normpath(self.workspace_path)
-
-                # Extract subject ID from BIDS-like file path
-                path_parts = nifti_file.replace(self.workspace_path, '').strip(os.sep).split(os.sep)
-                subject_id = next((p for p in path_parts if p.startswith("sub-")), None)
-                if not subject_id:
-                    self.file_completed.emit(
-                        filename,
-                        False,
-                        QCoreApplication.translate("Threads", "Cannot extract subject ID")
-                    )
-                    self.failed_files.append(nifti_file)
-                    continue
-
-                # Define output directory for this subject
-                output_dir = os.path.join(
-                    self.workspace_path,
-                    'derivatives',
-                    'skullstrips',
-                    subject_id,
-                    'anat'
+    def start_job(self, nifti_file, number):
+        """
+        Start the tool process of one file.
+
+        Args:
+            nifti_file (str): Input file.
+            number (int): Position of the file in the batch (1-based), for the progress message.
+
+        Returns:
+            dict | None | bool: The running job, or what `prepare_job` returned if no process is needed.
+        """
+        job = self.prepare_job(nifti_file, number)
+        if not job:
+            return job
+
+        # Run skull-stripping command with its share of the CPU budget
+        try:
+            self.process = QProcess()
+            self.process.setProcessEnvironment(self.process_environment())
+            self.process.start(job["cmd"][0], job["cmd"][1:])
+        except Exception as e:
+            self.complete_job(job, False, str(e))
+            return None
+        self.running.append((self.process, job))
+        return job
+
+    def prepare_job(self, nifti_file, number):
+        """
+        Prepare the output paths and the tool command of one file.
+
+        Args:
+            nifti_file (str): Input file.
+            number (int): Position of the file in the batch (1-based), for the progress message.
+
+        Returns:
+            dict | None | bool: The job, None if the file needs no process (it failed
+            before the tool could start, or an earlier output was reused; already reported with
+            `file_completed`), or False if the tool is unknown.
+        """
+        filename = os.path.basename(nifti_file)
+        self.file_started.emit(filename)
+        self.progress_updated.emit(
+            QCoreApplication.translate(
+                "Threads",
+                "Processing {0} ({1}/{2})"
+            ).format(filename, number, len(self.files))
+        )
+
+        temp_dir = None
+        try:
+            nifti_file = os.path.normpath(nifti_file)
+            self.workspace_path = os.path.normpath(self.workspace_path)
+
+            # Extract subject ID from BIDS-like file path
+            path_parts = nifti_file.replace(self.workspace_path, '').strip(os.sep).split(os.sep)
+            subject_id = next((p for p in path_parts if p.startswith("sub-")), None)
+            if not subject_id:
+                self.file_completed.emit(
+                    filename,
+                    False,
+                    QCoreApplication.translate("Threads", "Cannot extract subject ID")
                 )
-                os.makedirs(output_dir, exist_ok=True)
+                self.failed_files.append(nifti_file)
+                return None
+
+            # Define output directory for this subject
+            output_dir = os.path.join(
+                self.workspace_path,
+                'derivatives',
+                'skullstrips',
+                subject_id,
+                'anat'
+            )
+            os.makedirs(output_dir, exist_ok=True)
 
-                base_name = filename.replace('.nii.gz', '').replace('.nii', '')
+            base_name = filename.replace('.nii.gz', '').replace('.nii', '')
 
-                # Create an isolated temporary working directory
-                temp_dir = tempfile.mkdtemp(prefix="skullstrip_")
+            # Create an isolated temporary working directory
+            temp_dir = tempfile.mkdtemp(prefix="skullstrip_")
 
-                # Build the appropriate command (BET or HD-BET)
-                if self.bet_tool == "fsl-bet":
-                    # Configure FSL environment variables
-                    os.environ["FSLDIR"], os.environ["FSLOUTPUTTYPE"] = setup_fsl_env()
-                    f_val = self.parameters.get('f_val', 0.5)
-                    f_str = f"f{str(f_val).replace('.', '')}"
+            # Build the appropriate command (BET or HD-BET)
+            if self.bet_tool == "fsl-bet":
+                # FSL needs its environment variables (passed to the process below)
+                if not self.tool_environment.get("FSLDIR") or not self.tool_environment.get("FSLOUTPUTTYPE"):
+                    raise RuntimeError("Could not read FSLDIR and FSLOUTPUTTYPE")
+                f_val = self.parameters.get('f_val', 0.5)
+                f_str = f"f{str(f_val).replace('.', '')}"
 
-                    temp_output = os.path.join(temp_dir, f"{base_name}_{f_str}_brain.nii.gz")
-                    final_output = os.path.join(output_dir, f"{base_name}_{f_str}_brain.nii.gz")
+                temp_output = os.path.join(temp_dir, f"{base_name}_{f_str}_brain.nii.gz")
+                final_output = os.path.join(output_dir, f"{base_name}_{f_str}_brain.nii.gz")
 
-                    cmd = ["bet", nifti_file, temp_output, "-f", str(f_val)]
+                cmd = ["bet", nifti_file, temp_output, "-f", str(f_val)]
 
-                    # Optional BET parameters
-                    for opt in ['opt_m', 'opt_t', 'opt_s', 'opt_o']:
-                        if self.parameters.get(opt, False):
-                            cmd.append(f"-{opt[-1]}")
+                # Optional BET parameters
+                for opt in ['opt_m', 'opt_t', 'opt_s', 'opt_o']:
+                    if self.parameters.get(opt, False):
+                        cmd.append(f"-{opt[-1]}")
 
-                    # Optional center coordinates
-                    for coord in ['c_x', 'c_y', 'c_z']:
-                        val = self.parameters.get(coord, 0)
-                        if val != 0:
-                            cmd += ["-c", str(val)]
+                # Optional center coordinates
+                for coord in ['c_x', 'c_y', 'c_z']:
+                    val = self.parameters.get(coord, 0)
+                    if val != 0:
+                        cmd += ["-c", str(val)]
 
-                    # Exclude brain extraction mask if requested
-                    if not self.parameters.get('opt_brain_extracted', True):
-                        cmd.append("-n")
+                # Exclude brain extraction mask if requested
+                if not self.parameters.get('opt_brain_extracted', True):
+                    cmd.append("-n")
 
-                    method = "FSL BET"
+                method = "FSL BET"
 
-                else:
-                    temp_output = os.path.join(temp_dir, f"{base_name}_{self.bet_tool}_brain.nii.gz")
-                    final_output = os.path.join(output_dir, f"{base_name}_{self.bet_tool}_brain.nii.gz")
-                    if self.bet_tool == "synthstrip":
+            else:
+                temp_output = os.path.join(temp_dir, f"{base_name}_{self.bet_tool}_brain.nii.gz")
+                final_output = os.path.join(output_dir, f"{base_name}_{self.bet_tool}_brain.nii.gz")
+                if self.bet_tool == "synthstrip":
 
-                        cmd = [get_bin_path("mri_synthstrip"), "-i", nifti_file, "-o", temp_output]
+                    cmd = [get_bin_path("mri_synthstrip"), "-i", nifti_file, "-o", temp_output]
 
-                        method = "SynthStrip"
+                    method = "SynthStrip"
 
-                    elif self.bet_tool == "hd-bet":
+                elif self.bet_tool == "hd-bet":
 
+                    if self.service is not None:
+                        cmd = None  # Submitted to the running worker instead
+                    else:
                         cmd = [get_bin_path("hd-bet"), "-i", nifti_file, "-o", temp_output]
 
                         # Disable CUDA if unavailable
                         if not self.has_cuda:
                             cmd += ["-device", "cpu", "--disable_tta"]
 
-                        method = "HD-BET"
+                    method = "HD-BET"
 
-                    else:
-                        log.error("Bet tool not recognized.")
-                        return
+                else:
+                    log.error("Bet tool not recognized.")
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    return False
+
+            # Reuse the output of an earlier run on the same voxels with the same settings
+            provenance = self.input_provenance(nifti_file, output_dir)
+            cached = find_cached_output(output_dir, provenance, filename) if provenance else None
+            if cached:
+                cached_output, own_output = cached
+                log.info(f"{filename} already skull-stripped with these settings: {cached_output}")
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                if own_output:
+                    refresh_stamp(cached_output, provenance)
+                else:
+                    # Made from another input with the same voxels: give this file its own output
+                    if os.path.abspath(cached_output) != os.path.abspath(final_output):
+                        shutil.copyfile(cached_output, final_output)
+                    self.write_sidecar(final_output, filename, method, provenance)
+                self.success_count += 1
+                self.file_completed.emit(filename, True, "")
+                return None
 
-                # Run skull-stripping command
-                self.process = QProcess()
-                self.process.start(cmd[0], cmd[1:])
+            return {"nifti_file": nifti_file, "filename": filename, "temp_dir": temp_dir, "cmd": cmd,
+                    "temp_output": temp_output, "final_output": final_output, "method": method,
+                    "provenance": provenance}
 
-                # Wait for process completion, checking for cancellation
-                while not self.process.waitForFinished(-1):
-                    if self.is_cancelled:
-                        self.process.kill()
-                        self.process.waitForFinished()
-                        break
+        except Exception as e:
+            # Catch all exceptions per file
+            self.file_completed.emit(filename, False, str(e))
+            self.failed_files.append(nifti_file)
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            return None
+
+    def write_sidecar(self, final_output, filename, method, provenance):
+        """Write the BIDS-like JSON sidecar of an output, with its provenance if known."""
+        json_file = final_output.replace(".nii.gz", ".json")
+        metadata = {
+            "SkullStripped": True,
+            "Description": "Skull-stripped brain image",
+            "Sources": [filename],
+            "SkullStrippingMethod": method
+        }
+        if provenance:
+            metadata[PROVENANCE_KEY] = provenance
+
+        with open(json_file, 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+    def input_provenance(self, nifti_file, output_dir):
+        """
+        Return the provenance record of a file for this run, or None if its voxels cannot be read.
 
-                # Handle cancellation mid-run
-                if self.is_cancelled:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                    break
+        The voxels are only hashed when no output in `output_dir` recorded the current stamp of the file.
+        """
+        try:
+            return provenance_record(nifti_file, self.bet_tool, self.parameters, self.has_cuda, output_dir)
+        except Exception as e:
+            log.warning(f"Cannot hash {nifti_file}, its output will not be reused: {e}")
+            return None
 
-                # Retrieve exit information and logs
-                ret_code = self.process.exitCode()
-                stderr = bytes(self.process.readAllStandardError()).decode()
-                stdout = bytes(self.process.readAllStandardOutput()).decode()
-
-                # Handle process errors
-                if ret_code != 0:
-                    self.file_completed.emit(
-                        filename,
-                        False,
-                        stderr or QCoreApplication.translate("Threads", "Error executing command")
-                    )
-                    self.failed_files.append(nifti_file)
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                    continue
+    def run_with_service(self, pending):
+        """
+        Process files through one long-lived HD-BET worker, one after the other.
 
-                # Move temporary output to final destination
-                shutil.move(temp_output, final_output)
-                shutil.rmtree(temp_dir, ignore_errors=True)
+        Args:
+            pending (list[str]): Files to process.
 
-                # Create BIDS-like JSON metadata
-                json_file = final_output.replace(".nii.gz", ".json")
-                metadata = {
-                    "SkullStripped": True,
-                    "Description": "Skull-stripped brain image",
-                    "Sources": [filename],
-                    "SkullStrippingMethod": method
-                }
+        Returns:
+            list[str]: Files left to run as separate processes: all of them if the
+            worker could not start, or those after the point where it stopped.
+        """
+        budget = max(1, int(self.cpu_budget or os.cpu_count() or 1))
+        self.service = SkullStripService("hd-bet", device="cuda" if self.has_cuda else "cpu",
+                                         threads=None if self.has_cuda else budget, tta=self.has_cuda)
+        self.service.log_message.connect(lambda line: log.debug(f"[HD-BET worker] {line}"))
+        try:
+            self.service.start()
+            ready = self.service.wait_until_ready()
+        except Exception as e:
+            log.warning(f"Cannot start the HD-BET worker: {e}")
+            ready = False
+        if not ready:
+            if not self.is_cancelled:
+                log.warning(f"HD-BET worker unavailable ({self.service.failure}), running one process per file")
+            self.service.kill()
+            self.service = None
+            return pending
+
+        while pending and not self.is_cancelled and self.service.is_running():
+            nifti_file = pending.pop(0)
+            job = self.prepare_job(nifti_file, len(self.files) - len(pending))
+            if not job:
+                self.file_done()
+                continue
+            success, message = self.service.wait_for_job(self.service.submit(nifti_file, job["temp_output"]))
+            if self.is_cancelled:
+                shutil.rmtree(job["temp_dir"], ignore_errors=True)
+                break
+            self.complete_job(job, success, message)
+            self.file_done()
+
+        if self.is_cancelled:
+            self.service.kill()
+        else:
+            self.service.stop()
+        self.service = None
+        return pending
+
+    def process_environment(self):
+        """Return the environment of a tool process: the resolved tool variables, with its thread count capped."""
+        env = QProcessEnvironment.systemEnvironment()
+        for name, value in self.tool_environment.items():
+            env.insert(name, value)
+        for name in THREAD_ENV_VARS:
+            env.insert(name, str(self.threads_per_job))
+        return env
+
+    def finish_job(self, process, job):
+        """
+        Store the output of a finished tool process and report the file as completed.
 
-                with open(json_file, 'w') as f:
-                    json.dump(metadata, f, indent=2)
+        Args:
+            process (QProcess): Finished process.
+            job (dict): Job returned by `start_job`.
+        """
+        try:
+            # Retrieve exit information and logs
+            ret_code = process.exitCode()
+            stderr = bytes(process.readAllStandardError()).decode()
+            stdout = bytes(process.readAllStandardOutput()).decode()
+        except Exception as e:
+            self.complete_job(job, False, str(e))
+            return
+        self.complete_job(job, ret_code == 0, stderr)
 
-                # Success count and signal
-                self.success_count += 1
-                self.file_completed.emit(filename, True, "")
+    def complete_job(self, job, success, error_message=""):
+        """
+        Store the output of a finished job and report the file as completed.
 
-            except Exception as e:
-                # Catch all exceptions per file
-                self.file_completed.emit(filename, False, str(e))
+        Args:
+            job (dict): Job returned by `prepare_job`.
+            success (bool): Whether the tool succeeded.
+            error_message (str, optional): Error output of the tool.
+        """
+        filename, nifti_file, temp_dir = job["filename"], job["nifti_file"], job["temp_dir"]
+        try:
+            # Handle tool errors
+            if not success:
+                self.file_completed.emit(
+                    filename,
+                    False,
+                    error_message or QCoreApplication.translate("Threads", "Error executing command")
+                )
                 self.failed_files.append(nifti_file)
-                try:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                except Exception:
-                    pass
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                return
 
-        # Emit final summary signal
-        self.all_completed.emit(self.success_count, self.failed_files)
+            # Move temporary output to final destination
+            final_output = job["final_output"]
+            shutil.move(job["temp_output"], final_output)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+            # Create BIDS-like JSON metadata
+            self.write_sidecar(final_output, filename, job["method"], job.get("provenance"))
+
+            # Success count and signal
+            self.success_count += 1
+            self.file_completed.emit(filename, True, "")
+
+        except Exception as e:
+            # Catch all exceptions per file
+            self.file_completed.emit(filename, False, str(e))
+            self.failed_files.append(nifti_file)
+            shutil.rmtree(temp_dir, ignore_errors=True)
@@ -0,0 +1,227 @@
+import itertools
+import json
+import time
+
+from PyQt6.QtCore import QObject, QProcess, QProcessEnvironment, pyqtSignal
+
+from logger import get_logger
+
+log = get_logger()
+
+READY_TIMEOUT_MS = 180000
+"""How long to wait for a worker to load its model."""
+
+POLL_INTERVAL_MS = 100
+
+
+class WorkerService(QObject):
+    """
+    Client of a long-lived worker process running in the deep learning environment.
+
+    The worker loads its model once and then processes the jobs submitted to
+    it, in order, so torch and the model weights are not loaded again for every
+    job. Jobs are written to its standard input as JSON lines and its events
+    are read from its standard output, as lines starting with `event_prefix`.
+    Subclasses give the prefix and the worker command (`command`).
+
+    The service can be driven by signals (from an object living in a thread with
+    an event loop), or synchronously with `wait_until_ready` and `wait_for_job`
+    (from the `run` method of a `QThread`).
+
+    ---
+    **Signals**
+    - `ready ()`: The worker loaded its model and accepts jobs.
+    - `job_started (str)`: The worker started a job (job id).
+    - `job_progress (str, str)`: A job entered a step (job id, step), for workers reporting them.
+    - `job_finished (str, bool, str)`: A job finished (job id, success flag, error message).
+    - `log_message (str)`: A line printed by the worker or by the tool.
+    - `stopped (str)`: The worker exited (reason); pending jobs were reported as failed.
+    """
+
+    event_prefix = None
+    """Marks the event lines of the worker."""
+
+    ready = pyqtSignal()
+    job_started = pyqtSignal(str)
+    job_progress = pyqtSignal(str, str)
+    job_finished = pyqtSignal(str, bool, str)
+    log_message = pyqtSignal(str)
+    stopped = pyqtSignal(str)
+
+    def __init__(self, name, threads=None):
+        """
+        Args:
+            name (str): Name of the worker in the log.
+            threads (int, optional): CPU threads used by torch in the worker.
+        """
+        super().__init__()
+        self.name = name
+        self.threads = threads
+
+        self.process = None
+        self.is_ready = False  # The model was loaded (stays True once the worker exits)
+        self.failure = None  # Why the worker stopped, once it did
+        self.pending = {}  # job id -> (input, output) of the submitted jobs not finished yet
+        self.results = {}  # job id -> (success, message) of the finished jobs
+        self._ids = itertools.count(1)
+        self._buffer = b""
+        self._exited = False
+        self.interrupted = False
+
+    def command(self):
+        """Return the program and arguments of the worker process."""
+        raise NotImplementedError
+
+    def start(self):
+        """
+        Start the worker process without waiting for its model to load.
+
+        Jobs can be submitted right away; the worker reads them once it is ready.
+
+        Raises:
+            FileNotFoundError: If the deep learning environment is not installed.
+        """
+        program, args = self.command()
+        self.process = QProcess()
+        if self.threads:
+            env = QProcessEnvironment.systemEnvironment()
+            env.insert("OMP_NUM_THREADS", str(self.threads))
+            self.process.setProcessEnvironment(env)
+        self.process.readyReadStandardOutput.connect(self._read_output)
+        self.process.readyReadStandardError.connect(self._read_errors)
+        self.process.finished.connect(lambda exit_code, exit_status: self._on_exit(
+            f"worker exited with code {exit_code}"))
+        self.process.errorOccurred.connect(self._on_error)
+        log.info(f"Starting {self.name} worker: {program} {' '.join(args)}")
+        self.process.start(program, args)
+
+    def is_running(self):
+        """Return whether the worker process is alive."""
+        return self.process is not None and not self._exited and \
+            self.process.state() != QProcess.ProcessState.NotRunning
+
+    def submit(self, input_file, output_file, **fields):
+        """
+        Queue one job.
+
+        Args:
+            input_file (str): Input image.
+            output_file (str): Output written by the worker.
+            **fields: Further entries of the job, for workers taking them.
+
+        Returns:
+            str: Job id, reported by `job_started` and `job_finished`.
+        """
+        job_id = str(next(self._ids))
+        self.pending[job_id] = (input_file, output_file)
+        if self._exited:
+            self._fail_pending(self.failure or "worker not running")
+        else:
+            line = json.dumps({"id": job_id, "input": input_file, "output": output_file, **fields}) + "\n"
+            self.process.write(line.encode())
+        return job_id
+
+    def wait_until_ready(self, timeout_ms=READY_TIMEOUT_MS):
+        """Block until the worker loaded its model; return False if it stopped or timed out."""
+        self._wait(lambda: self.is_ready, timeout_ms)
+        return self.is_ready
+
+    def wait_for_job(self, job_id, timeout_ms=-1):
+        """
+        Block until a job finishes.
+
+        Returns:
+            tuple[bool, str]: Success flag and error message (the worker's reason
+            if it stopped, or why the wait ended early).
+        """
+        self._wait(lambda: job_id in self.results, timeout_ms)
+        return self.results.pop(job_id, (False, self.failure or ("interrupted" if self.interrupted else "timed out")))
+
+    def _wait(self, condition, timeout_ms):
+        start = time.monotonic()
+        while not condition() and not self._exited and not self.interrupted:
+            if timeout_ms >= 0 and (time.monotonic() - start) * 1000 > timeout_ms:
+                return
+            if not self.process.waitForReadyRead(POLL_INTERVAL_MS) and \
+                    self.process.state() == QProcess.ProcessState.NotRunning:
+                self._on_exit(f"worker exited with code {self.process.exitCode()}")
+
+    def interrupt(self):
+        """Make a blocking wait return early; safe to call from another thread (the owner then calls `kill`)."""
+        self.interrupted = True
+
+    def stop(self, timeout_ms=5000):
+        """Let the worker finish its queue and exit, killing it after a timeout."""
+        if self.process is None or self._exited:
+            return
+        self.process.closeWriteChannel()
+        if not self.process.waitForFinished(timeout_ms):
+            self.kill()
+
+    def kill(self):
+        """Stop the worker immediately; pending jobs are reported as failed."""
+        if self.process is None or self._exited:
+            return
+        self.failure = self.failure or "worker stopped"
+        self.process.kill()
+        self.process.waitForFinished(1000)
+        self._on_exit(self.failure)
+
+    def _read_output(self):
+        self._buffer += bytes(self.process.readAllStandardOutput())
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for raw in lines:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line.startswith(self.event_prefix):
+                try:
+                    self._handle_event(json.loads(line[len(self.event_prefix):]))
+                    continue
+                except ValueError:
+                    pass
+            if line:
+                self.log_message.emit(line)
+
+    def _read_errors(self):
+        text = bytes(self.process.readAllStandardError()).decode("utf-8", errors="replace")
+        for line in text.splitlines():
+            if line.strip():
+                self.log_message.emit(line.strip())
+
+    def _handle_event(self, event):
+        kind = event.get("event")
+        if kind == "ready":
+            self.is_ready = True
+            self.ready.emit()
+        elif kind == "failed":
+            self.failure = event.get("message", "worker failed to start")
+        elif kind == "started":
+            self.job_started.emit(str(event["id"]))
+        elif kind == "progress":
+            self.job_progress.emit(str(event["id"]), event.get("phase", ""))
+        elif kind in ("done", "error"):
+            job_id = str(event["id"])
+            self.pending.pop(job_id, None)
+            success = kind == "done"
+            message = "" if success else event.get("message", "")
+            self.results[job_id] = (success, message)
+            self.job_finished.emit(job_id, success, message)
+
+    def _fail_pending(self, reason):
+        for job_id in list(self.pending):
+            del self.pending[job_id]
+            self.results[job_id] = (False, reason)
+            self.job_finished.emit(job_id, False, reason)
+
+    def _on_error(self, error):
+        if error == QProcess.ProcessError.FailedToStart:
+            self._on_exit("worker failed to start")
+
+    def _on_exit(self, reason):
+        if self._exited:
+            return
+        self._read_output()
+        self._exited = True
+        self.failure = self.failure or reason
+        log.info(f"{self.name} worker stopped: {self.failure}")
+        self._fail_pending(self.failure)
+        self.stopped.emit(self.failure)
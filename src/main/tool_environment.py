@@ -0,0 +1,181 @@
+"""
+Environment of the external neuroimaging tools (FSL, FreeSurfer) and of the user's shell.
+
+GUI applications do not inherit the variables set in the user's shell startup
+files, so they are read from a login shell. Starting one (and sourcing
+``fsl.sh``) takes up to a few seconds, so the result is resolved once, shared
+by all threads, and persisted in the settings. It is resolved again only when
+its fingerprint changes: the shell, the modification times of the shell
+startup files, or those of the FSL and FreeSurfer setup scripts.
+"""
+import json
+import os
+import platform
+import subprocess
+import threading
+
+from PyQt6.QtCore import QSettings
+
+from logger import get_logger
+
+log = get_logger()
+
+TOOL_VARIABLES = ("PATH", "FSLDIR", "FSLOUTPUTTYPE", "FREESURFER_HOME", "FS_LICENSE", "SUBJECTS_DIR")
+"""Variables read from the login shell."""
+
+SHELL_RC_FILES = (".zshenv", ".zprofile", ".zshrc", ".zlogin", ".bash_profile", ".bash_login", ".bashrc", ".profile")
+"""Startup files (in the home folder) whose changes invalidate the resolved environment."""
+
+FSL_SETUP_SCRIPT = os.path.join("etc", "fslconf", "fsl.sh")
+FREESURFER_SETUP_SCRIPT = "SetUpFreeSurfer.sh"
+
+SETTINGS_KEY = "tool_environment"
+
+OUTPUT_MARKER = "__GLIAANS_ENVIRONMENT__"
+"""Separates the variables from anything printed by the startup files."""
+
+_lock = threading.Lock()
+_resolved = None
+"""(environment, fingerprint) resolved by this process, shared by all threads."""
+
+
+def login_shell():
+    """Return the login shell used to read the environment, or None where there is none (Windows)."""
+    system = platform.system()
+    if system == "Darwin":
+        return "/bin/zsh"
+    if system == "Linux":
+        return os.environ.get("SHELL", "/bin/bash")
+    return None
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def environment_fingerprint(environment):
+    """
+    Describe the files an environment was resolved from.
+
+    Args:
+        environment (dict): Resolved variables (its FSLDIR and FREESURFER_HOME locate the setup scripts).
+
+    Returns:
+        dict: JSON-serializable fingerprint; the environment is stale when it changes.
+    """
+    home = os.path.expanduser("~")
+    fingerprint = {
+        "shell": login_shell(),
+        "rc_mtimes": {name: _mtime(os.path.join(home, name)) for name in SHELL_RC_FILES},
+    }
+    if environment.get("FSLDIR"):
+        fingerprint["fsl"] = _mtime(os.path.join(environment["FSLDIR"], FSL_SETUP_SCRIPT))
+    if environment.get("FREESURFER_HOME"):
+        fingerprint["freesurfer"] = _mtime(os.path.join(environment["FREESURFER_HOME"], FREESURFER_SETUP_SCRIPT))
+    return fingerprint
+
+
+def probe_login_shell(shell):
+    """
+    Read the tool variables from one login shell, after sourcing the FSL and FreeSurfer setup scripts.
+
+    Args:
+        shell (str): Shell executable.
+
+    Returns:
+        dict: Non-empty variables among `TOOL_VARIABLES`.
+
+    Raises:
+        subprocess.CalledProcessError: If the shell fails.
+    """
+    script = (
+        f'if [ -n "$FSLDIR" ] && [ -f "$FSLDIR/{FSL_SETUP_SCRIPT}" ]; then . "$FSLDIR/{FSL_SETUP_SCRIPT}"; fi; '
+        f'if [ -n "$FREESURFER_HOME" ] && [ -f "$FREESURFER_HOME/{FREESURFER_SETUP_SCRIPT}" ]; then '
+        f'. "$FREESURFER_HOME/{FREESURFER_SETUP_SCRIPT}" >/dev/null 2>&1; fi; '
+        f'echo {OUTPUT_MARKER}; '
+        + "; ".join(f'echo "{name}=${name}"' for name in TOOL_VARIABLES)
+    )
+    result = subprocess.run([shell, "-l", "-c", script], capture_output=True, text=True, check=True,
+                            stdin=subprocess.DEVNULL)
+
+    lines = result.stdout.splitlines()
+    if OUTPUT_MARKER in lines:
+        lines = lines[lines.index(OUTPUT_MARKER) + 1:]
+    environment = {}
+    for line in lines:
+        name, _, value = line.partition("=")
+        if name in TOOL_VARIABLES and value:
+            environment[name] = value
+    return environment
+
+
+def _current_environment():
+    """Tool variables of this process, used when no login shell can be read."""
+    return {name: os.environ[name] for name in TOOL_VARIABLES if os.environ.get(name)}
+
+
+def resolve_tool_environment(settings=None, refresh=False):
+    """
+    Return the environment of the external tools, resolving it only when needed.
+
+    The environment is looked up in memory, then in the settings, and read from
+    a login shell only when neither holds an entry with a matching fingerprint.
+    If the login shell fails, the environment of this process is used and not
+    persisted. Safe to call from any thread.
+
+    Args:
+        settings (QSettings, optional): Where the environment is persisted
+            (defaults to the application settings).
+        refresh (bool, optional): Read the login shell even if a valid entry exists.
+
+    Returns:
+        dict: Variables among `TOOL_VARIABLES`, e.g. {"PATH": ..., "FSLDIR": ..., "FSLOUTPUTTYPE": ...}.
+    """
+    global _resolved
+    with _lock:
+        if not refresh and _resolved is not None and environment_fingerprint(_resolved[0]) == _resolved[1]:
+            return dict(_resolved[0])
+
+        settings = settings if settings is not None else QSettings("GliAAns")
+        if not refresh:
+            try:
+                stored = json.loads(settings.value(SETTINGS_KEY, "", type=str) or "null")
+            except ValueError:
+                stored = None
+            if stored and stored.get("fingerprint") == environment_fingerprint(stored.get("environment", {})):
+                _resolved = (stored["environment"], stored["fingerprint"])
+                return dict(_resolved[0])
+
+        shell = login_shell()
+        environment = _current_environment()
+        probed = True
+        if shell:
+            try:
+                environment.update(probe_login_shell(shell))
+            except Exception as e:
+                log.error(f"Error while reading the environment from {shell}: {e}")
+                probed = False
+        log.info(f"Resolved tool environment: {sorted(environment)}")
+
+        fingerprint = environment_fingerprint(environment)
+        # A failed probe is kept for this session only, so the next launch reads the shell again
+        if probed:
+            settings.setValue(SETTINGS_KEY, json.dumps({"environment": environment, "fingerprint": fingerprint}))
+        _resolved = (environment, fingerprint)
+        return dict(environment)
+
+
+def clear_resolved_environment():
+    """Forget the in-memory environment (the persisted one is still checked against its fingerprint)."""
+    global _resolved
+    with _lock:
+        _resolved = None
+
+
+def apply_tool_environment(environment):
+    """Export a resolved environment to this process, so child processes and PATH lookups see it."""
+    for name, value in environment.items():
+        os.environ[name] = value
@@ -450,9 +450,8 @@ L'elaborazione verrà interrotta.</translation>
   <context>
     <name>DlWorker</name>
     <message>
-      <location filename="../threads/dl_worker.py" line="83" />
       <source>Progress: {0}% (File {1}/{2}, Phase {3}/{4})</source>
-      <translation>Avanzamento: {0}% (File {1}/{2}, Fase {3}/{4})</translation>
+      <translation type="vanished">Avanzamento: {0}% (File {1}/{2}, Fase {3}/{4})</translation>
     </message>
     <message>
       <location filename="../threads/dl_worker.py" line="114" />
@@ -644,6 +643,11 @@ L'elaborazione verrà interrotta.</translation>
       <source>Unknown error code: {error}</source>
       <translation>Codice di errore sconosciuto: {error}</translation>
     </message>
+    <message>
+      <location filename="../threads/dl_worker.py" line="488" />
+      <source>nnU-Net worker unavailable, running one process per phase</source>
+      <translation>Worker nnU-Net non disponibile, esecuzione di un processo per fase</translation>
+    </message>
     <message>
       <source>PHASE 5: Deep learning execution</source>
       <comment>i</comment>
@@ -659,6 +663,26 @@ L'elaborazione verrà interrotta.</translation>
       <comment>i</comment>
       <translation type="vanished">SynthStrip avviato: {0}</translation>
     </message>
+    <message>
+      <location filename="../threads/dl_worker.py" line="135" />
+      <source>Progress: {0}% (running: {1})</source>
+      <translation>Avanzamento: {0}% (in esecuzione: {1})</translation>
+    </message>
+    <message>
+      <location filename="../threads/dl_worker.py" line="525" />
+      <source>[{0}] {1} failed (exit code {2})</source>
+      <translation>[{0}] Fase {1} non riuscita (codice di uscita {2})</translation>
+    </message>
+    <message>
+      <location filename="../threads/dl_worker.py" line="175" />
+      <source>Segmentation failed for all files</source>
+      <translation>Segmentazione non riuscita per tutti i file</translation>
+    </message>
+    <message>
+      <location filename="../threads/dl_worker.py" line="309" />
+      <source>SynthStrip worker unavailable, running one process per file</source>
+      <translation>Worker SynthStrip non disponibile, un processo per ogni file</translation>
+    </message>
   </context>
   <context>
     <name>ImportFrame</name>
@@ -852,6 +876,11 @@ L'elaborazione verrà interrotta.</translation>
       <source>Coordinates: (-, -, -)</source>
       <translation>Coordinate: (-, -, -)</translation>
     </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3270" />
+      <source>Automatic ROI failed</source>
+      <translation>ROI automatica non riuscita</translation>
+    </message>
     <message>
       <location filename="../ui/nifti_viewer.py" line="2491" />
       <location filename="../ui/nifti_viewer.py" line="314" />
@@ -1232,6 +1261,131 @@ L'elaborazione verrà interrotta.</translation>
       <source>bone</source>
       <translation type="vanished">osso</translation>
     </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3750" />
+      <location filename="../ui/nifti_viewer.py" line="729" />
+      <source>📂 Open DICOM Folder</source>
+      <translation>📂 Apri cartella DICOM</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="733" />
+      <source>Open a DICOM series folder</source>
+      <translation>Apri la cartella di una serie DICOM</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="1633" />
+      <source>DICOM folders can only be opened as the main image</source>
+      <translation>Le cartelle DICOM possono essere aperte solo come immagine principale</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="1689" />
+      <source>Open DICOM Folder</source>
+      <translation>Apri cartella DICOM</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="1805" />
+      <location filename="../ui/nifti_viewer.py" line="1721" />
+      <source>Failed to load DICOM series</source>
+      <translation>Impossibile caricare la serie DICOM</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="1774" />
+      <source>Reading DICOM series</source>
+      <translation>Lettura della serie DICOM</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="1794" />
+      <source>DICOM series loaded</source>
+      <translation>Serie DICOM caricata</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3769" />
+      <location filename="../ui/nifti_viewer.py" line="2399" />
+      <location filename="../ui/nifti_viewer.py" line="870" />
+      <source>▶ Play</source>
+      <translation>▶ Riproduci</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3768" />
+      <location filename="../ui/nifti_viewer.py" line="2398" />
+      <source>⏸ Pause</source>
+      <translation>⏸ Pausa</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="875" />
+      <source>Play the time frames as a cine loop</source>
+      <translation>Riproduci i frame temporali in sequenza continua</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3771" />
+      <location filename="../ui/nifti_viewer.py" line="878" />
+      <source>FPS:</source>
+      <translation>FPS:</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="2248" />
+      <source>Voxels above threshold</source>
+      <translation>Voxel sopra la soglia</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3795" />
+      <location filename="../ui/nifti_viewer.py" line="1085" />
+      <source>Connectivity:</source>
+      <translation>Connettività:</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="986" />
+      <source>Remove ROI from incremental ROI</source>
+      <translation>Rimuovi ROI dalla ROI incrementale</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="990" />
+      <source>Remove the current ROI drawing from the incremental ROI</source>
+      <translation>Rimuovi il disegno ROI corrente dalla ROI incrementale</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="993" />
+      <source>Undo incremental ROI change</source>
+      <translation>Annulla modifica della ROI incrementale</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="997" />
+      <source>Revert the last change to the incremental ROI</source>
+      <translation>Annulla l'ultima modifica alla ROI incrementale</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="2035" />
+      <source>Cache</source>
+      <translation>Cache</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="1919" />
+      <source>resampled to the main image space</source>
+      <translation>ricampionato nello spazio dell'immagine principale</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3783" />
+      <location filename="../ui/nifti_viewer.py" line="934" />
+      <source>Projection:</source>
+      <translation>Proiezione:</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3787" />
+      <location filename="../ui/nifti_viewer.py" line="943" />
+      <source>Rotating MIP</source>
+      <translation>MIP rotante</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="3784" />
+      <location filename="../ui/nifti_viewer.py" line="949" />
+      <source>Crop background on load</source>
+      <translation>Ritaglia lo sfondo al caricamento</translation>
+    </message>
+    <message>
+      <location filename="../ui/nifti_viewer.py" line="2005" />
+      <source>Cropped to</source>
+      <translation>Ritagliata a</translation>
+    </message>
   </context>
   <context>
     <name>NiftiMaskSelectionPage</name>
@@ -1963,10 +2117,10 @@ L'elaborazione verrà interrotta.</translation>
   <context>
     <name>ToolSelectionPage</name>
     <message>
-      <location filename="../ui/tool_selection_page.py" line="274" />
-      <location filename="../ui/tool_selection_page.py" line="145" />
-      <source>To use this function you need Linux and a CUDA capable GPU</source>
-      <translation>Per utilizzare questa funzione è necessario un sistema operativo Linux e una GPU con CUDA</translation>
+      <location filename="../ui/tool_selection_page.py" line="250" />
+      <location filename="../ui/tool_selection_page.py" line="146" />
+      <source>To use this function you need Linux (a CUDA capable GPU makes it much faster)</source>
+      <translation>Per utilizzare questa funzione è necessario un sistema operativo Linux (una GPU con CUDA la rende molto più veloce)</translation>
     </message>
     <message>
       <location filename="../ui/tool_selection_page.py" line="231" />
@@ -239,10 +239,20 @@ class DlExecutionPage(Page):
             return
 
         # --- Setup Worker Thread ---
+        use_service = use_inference_service = True
+        debug_dumps = False
+        if "settings" in self.context:
+            use_service = self.context["settings"].value("skull_strip_persistent_worker", True, type=bool)
+            use_inference_service = self.context["settings"].value("dl_persistent_worker", True, type=bool)
+            debug_dumps = self.context["settings"].value("dl_debug_dumps", False, type=bool)
         self.worker = DlWorker(
             input_files=selected_files,
             workspace_path=self.context["workspace_path"],
-            has_freesurfer=self.has_freesurfer
+            has_freesurfer=self.has_freesurfer,
+            use_service=use_service,
+            use_inference_service=use_inference_service,
+            has_cuda=torch.cuda.is_available(),
+            debug_dumps=debug_dumps
         )
 
         # --- Connect Worker Signals ---
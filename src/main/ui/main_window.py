@@ -166,6 +166,15 @@ class MainWindow(QMainWindow):
         self.debug_log_action.toggled.connect(self.toggle_debug_log)
         self.settings_menu.addAction(self.debug_log_action)
 
+        self.kernel_warmup_action = QAction("Warm Up Viewer at Startup", self)
+        self.kernel_warmup_action.setCheckable(True)
+
+        # Restore saved warm-up setting (default: True)
+        warmup_enabled = self.settings.value("kernel_warmup", True, type=bool)
+        self.kernel_warmup_action.setChecked(warmup_enabled)
+        self.kernel_warmup_action.toggled.connect(self.toggle_kernel_warmup)
+        self.settings_menu.addAction(self.kernel_warmup_action)
+
         # --- Help menu ---
         self.help_menu = self.menu_bar.addMenu("Help")
 
@@ -367,6 +376,15 @@ class MainWindow(QMainWindow):
         else:
             set_log_level(logging.ERROR)
 
+    def toggle_kernel_warmup(self, checked):
+        """
+        Enable or disable compiling the viewer's numba kernels at startup.
+
+        Args:
+            checked (bool): True to warm up kernels at the next startup.
+        """
+        self.settings.setValue("kernel_warmup", checked)
+
     def _translate_ui(self):
         """Update all translatable UI text elements based on the current language."""
         self.setWindowTitle(QtCore.QCoreApplication.translate("MainWindow", "GliAAns UI"))
@@ -3,6 +3,8 @@ import sys
 import os
 import gc
 import json
+from collections import OrderedDict
+from functools import partial
 
 import numpy as np
 import nibabel as nib
@@ -10,7 +12,13 @@ import nibabel as nib
 from components.crosshair_graphic_view import CrosshairGraphicsView
 from components.nifti_file_dialog import NiftiFileDialog
 from logger import get_logger
-from threads.nifti_utils_threads import ImageLoadThread, SaveNiftiThread
+from roi_mask import RunLengthROI
+from overlay_resampling import ResampledOverlay, needs_resampling
+from dicom_series import DicomSeries
+from slice_compositing import OVERLAY_COLORS, apply_colormap, composite_overlay, render_slice_rgba
+from projections import PROJECTIONS, ROTATING_MIP, intensity_projection, rotating_mip, rotation_angles
+from threads.nifti_utils_threads import ImageLoadThread, SaveNiftiThread, CinePrefetchThread, AutomaticROIThread, \
+    ProjectionThread, DicomSeriesLoadThread
 
 log = get_logger()
 
@@ -39,93 +47,357 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.cm as cm
 
-# JIT optimization for numerical computations
-from numba import njit, prange
+# JIT-compiled numerical kernels (shared with background threads)
+from numba_kernels import region_grow_numba_mm
 
+# Neighbourhoods supported by the automatic ROI region growing (faces, +edges, +corners)
+ROI_CONNECTIVITIES = (6, 18, 26)
 
-@njit(parallel=True)
-def compute_mask_numba_mm(img, x0, y0, z0, radius_mm, voxel_sizes,
-                          seed_intensity, diff,
-                          x_min, x_max, y_min, y_max, z_min, z_max):
-    """
-    Compute a binary spherical mask around a seed point in millimeter space.
 
-    This function is compiled with Numba for high-performance execution and
-    performs voxel-wise checks to include all voxels within a given radius
-    (in mm) and within a specified intensity difference from a seed value.
+def compute_automatic_roi(img_data, seed, radius_mm, difference, voxel_sizes, connectivity):
+    """
+    Compute the automatic ROI mask grown from a seed voxel.
 
     Args:
-        img (np.ndarray): Input 3D image array.
-        x0, y0, z0 (int): Coordinates of the seed voxel.
-        radius_mm (float): Radius of the spherical mask in millimeters.
-        voxel_sizes (tuple[float, float, float]): Physical voxel sizes along each axis.
-        seed_intensity (float): Intensity value at the seed voxel.
-        diff (float): Maximum allowed intensity difference from the seed.
-        x_min, x_max, y_min, y_max, z_min, z_max (int): Bounding box limits in voxel space.
+        img_data (np.ndarray): 3D volume the ROI is drawn on.
+        seed (tuple[int, int, int]): Seed voxel coordinates.
+        radius_mm (float): Maximum distance from the seed in millimeters.
+        difference (float): Maximum intensity difference from the seed intensity.
+        voxel_sizes (np.ndarray): Physical voxel sizes along each axis.
+        connectivity (int): Neighbourhood used for growing (6, 18 or 26).
 
     Returns:
-        np.ndarray: Binary mask (uint8) with 1 where the voxel meets the criteria.
+        RunLengthROI: ROI on a volume with the shape of `img_data`.
     """
-    mask = np.zeros(img.shape, dtype=np.uint8)
-    r2 = radius_mm * radius_mm
-    vx, vy, vz = voxel_sizes  # voxel dimensions in mm
-
-    for x in prange(x_min, x_max):
-        for y in range(y_min, y_max):
-            for z in range(z_min, z_max):
-                dx_mm = (x - x0) * vx
-                dy_mm = (y - y0) * vy
-                dz_mm = (z - z0) * vz
-                if dx_mm * dx_mm + dy_mm * dy_mm + dz_mm * dz_mm <= r2:
-                    if abs(img[x, y, z] - seed_intensity) <= diff:
-                        mask[x, y, z] = 1
+    x0, y0, z0 = seed
+
+    # Intensity value at the seed voxel
+    seed_intensity = img_data[x0, y0, z0]
+
+    # Convert radius in mm to radius in voxel units per axis
+    rx_vox = int(np.ceil(radius_mm / voxel_sizes[0]))
+    ry_vox = int(np.ceil(radius_mm / voxel_sizes[1]))
+    rz_vox = int(np.ceil(radius_mm / voxel_sizes[2]))
+
+    # Compute subvolume limits (ROI bounding box)
+    x_min, x_max = max(0, x0 - rx_vox), min(img_data.shape[0], x0 + rx_vox + 1)
+    y_min, y_max = max(0, y0 - ry_vox), min(img_data.shape[1], y0 + ry_vox + 1)
+    z_min, z_max = max(0, z0 - rz_vox), min(img_data.shape[2], z0 + rz_vox + 1)
+
+    # Grow the connected region inside the bounding box; the result is cropped to its extent
+    region, ox, oy, oz = region_grow_numba_mm(img_data, x0, y0, z0,
+                                              radius_mm, voxel_sizes,
+                                              seed_intensity, difference,
+                                              x_min, x_max, y_min, y_max, z_min, z_max,
+                                              connectivity)
+
+    return RunLengthROI.from_mask(region, (ox, oy, oz), img_data.shape)
+
+
+def dense_mask(mask):
+    """Return a lazy mask (RunLengthROI, resampled overlay) as a dense boolean array."""
+    if hasattr(mask, "to_dense"):
+        return mask.to_dense(bool)
     return mask
 
 
-@njit(parallel=True)
-def apply_overlay_numba(rgba_image, overlay_mask, overlay_intensity, overlay_color):
+class FrameCoalescer:
     """
-    Apply a semi-transparent overlay to an RGBA image.
+    Collapse bursts of calls into at most one call per display frame.
 
-    This function adds colorized overlay regions based on the provided mask and
-    intensity map, applying blending only on RGB channels.
+    Each `submit` replaces the pending arguments; the first submit of a burst
+    arms a single-shot timer, and when it fires the callback runs once with the
+    latest arguments. High-rate pointer events therefore cost one update per
+    frame instead of one per event, without lagging more than a frame behind.
+    """
 
-    Args:
-        rgba_image (np.ndarray): Base image (H, W, 3) in float format (0–1 range).
-        overlay_mask (np.ndarray): Binary mask (H, W) specifying overlay pixels.
-        overlay_intensity (np.ndarray): Intensity weight map (H, W) for overlay blending.
-        overlay_color (tuple[float, float, float]): RGB overlay color (0–1 range).
+    def __init__(self, callback, interval_ms, parent=None):
+        """
+        Args:
+            callback (Callable): Function receiving the latest submitted arguments.
+            interval_ms (int): Minimum delay between two callback runs, in milliseconds.
+            parent (QObject, optional): Owner of the internal timer.
+        """
+        self.callback = callback
+        self.pending = None
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def submit(self, *args):
+        """Queue a call, merging it with any call still waiting for the next frame."""
+        self.pending = args
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        """Run the pending call now, if any."""
+        self.timer.stop()
+        if self.pending is None:
+            return
+        args, self.pending = self.pending, None
+        self.callback(*args)
 
-    Returns:
-        np.ndarray: Modified RGBA image with overlay applied.
+    def cancel(self):
+        """Drop the pending call."""
+        self.timer.stop()
+        self.pending = None
+
+
+class SliceRenderCache:
     """
-    h, w, c = rgba_image.shape
-    for y in prange(h):
-        for x in range(w):
-            if overlay_mask[y, x]:
-                for ch in range(3):
-                    # Apply color to RGB channels only
-                    if overlay_color[ch] != 0:
-                        rgba_image[y, x, ch] = min(1.0, rgba_image[y, x, ch] + overlay_intensity[y, x] * overlay_color[ch])
-                    else:
-                        rgba_image[y, x, ch] *= (1.0 - overlay_intensity[y, x])
-    return rgba_image
-
-
-def _slice(data, plane_idx, slice_idx):
-    slice = None
-    if plane_idx == 0:
-        slice = data[:, :, slice_idx].T
-        slice = np.flipud(slice)
-    elif plane_idx == 1:
-        slice = data[:, slice_idx, :].T
-        slice = np.flipud(slice)
-    elif plane_idx == 2:
-        slice = data[slice_idx, :, :].T
-        slice = np.flipud(slice)
-    else:
-        log.warning(f"Invalid plane_idx {plane_idx}")
-    return slice
+    Byte-budgeted LRU cache of rendered slice pixmaps.
+
+    Entries are keyed by the full view state that produced them (plane, slice
+    index, time frame, colormap, overlay alpha and the overlay/ROI versions),
+    so a cached pixmap can be shown again without re-running the colormap and
+    overlay compositing.
+
+    Attributes:
+        max_bytes (int): Maximum total size of the cached pixmaps in bytes.
+        nbytes (int): Current total size of the cached pixmaps in bytes.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes (int): Memory budget of the cache in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def pixmap_nbytes(pixmap):
+        """Return the approximate memory footprint of a pixmap in bytes."""
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def entry_nbytes(self, value):
+        """Return the memory footprint of a cached value in bytes."""
+        return self.pixmap_nbytes(value)
+
+    def get(self, key):
+        """
+        Return the cached pixmap for `key` and mark it as most recently used.
+
+        Returns:
+            QPixmap | None: The cached pixmap, or None on a cache miss.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, pixmap):
+        """
+        Store a rendered pixmap, evicting least recently used entries if the budget is exceeded.
+
+        Pixmaps larger than the whole budget are not cached.
+        """
+        size = self.entry_nbytes(pixmap)
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (pixmap, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_size
+
+    def clear(self):
+        """Drop all cached pixmaps."""
+        self._entries.clear()
+        self.nbytes = 0
+
+
+class ProjectionCache(SliceRenderCache):
+    """
+    Byte-budgeted LRU cache of computed intensity projections.
+
+    Entries are keyed by (time frame, projection, axis or rotation angle) and
+    hold 2D arrays; the cache is cleared when another base volume is shown.
+    """
+
+    def entry_nbytes(self, value):
+        return value.nbytes
+
+
+class OverlayThresholdIndex:
+    """
+    Sorted-intensity index of an overlay volume for incremental thresholding.
+
+    The overlay voxels are sorted by intensity once; changing the threshold then
+    only flips the mask voxels whose intensity lies between the old and the new
+    threshold, found with a binary search, instead of re-thresholding the volume.
+
+    Attributes:
+        mask (np.ndarray): Boolean mask of the voxels strictly above the threshold.
+        threshold (float): Current threshold value.
+    """
+
+    def __init__(self, data):
+        """
+        Args:
+            data (np.ndarray): Overlay volume to index.
+        """
+        data = np.asarray(data)
+        self.shape = data.shape
+        self.order = 'F' if data.flags.f_contiguous and not data.flags.c_contiguous else 'C'
+        flat = data.ravel(order=self.order)
+        index_dtype = np.int32 if flat.size < 2 ** 31 else np.int64
+        self.sorted_indices = np.argsort(flat).astype(index_dtype)
+        self.sorted_values = flat[self.sorted_indices]
+
+        self.mask = np.zeros(self.shape, dtype=bool, order=self.order)
+        self._mask_flat = self.mask.ravel(order=self.order)  # view sharing memory with mask
+        self.threshold = np.inf
+
+    @property
+    def count(self):
+        """Number of voxels above the current threshold."""
+        return int(self.sorted_values.size - np.searchsorted(self.sorted_values, self.threshold, side='right'))
+
+    def set_threshold(self, threshold):
+        """
+        Move the threshold and update the mask in place.
+
+        Args:
+            threshold (float): New threshold; voxels strictly above it are kept.
+
+        Returns:
+            np.ndarray: Flat indices (in `order`) of the voxels that changed state.
+        """
+        low, high = sorted((threshold, self.threshold))
+        start = np.searchsorted(self.sorted_values, low, side='right')
+        stop = np.searchsorted(self.sorted_values, high, side='right')
+        changed = self.sorted_indices[start:stop]
+        # Lowering the threshold adds voxels, raising it removes them
+        self._mask_flat[changed] = threshold < self.threshold
+        self.threshold = threshold
+        return changed
+
+    def changed_coordinates(self, changed):
+        """Convert flat indices returned by `set_threshold` into (x, y, z) voxel index arrays."""
+        return np.unravel_index(changed, self.shape, order=self.order)[:3]
+
+    @property
+    def nbytes(self):
+        """Memory footprint of the index and its mask in bytes."""
+        return self.sorted_indices.nbytes + self.sorted_values.nbytes + self.mask.nbytes
+
+
+class VolumeSessionCache:
+    """
+    Byte-budgeted LRU cache of the volumes opened during a viewer session.
+
+    Each entry keeps the loaded (normalized) voxel data, its dimensions and
+    affine, plus derived statistics such as an overlay threshold index, so that
+    reopening a recent file skips the reload through `ImageLoadThread`.
+    Entries are keyed by the resolved file path, modification time and size,
+    so a file changed on disk is loaded again.
+
+    Attributes:
+        max_bytes (int): Maximum total size of the cached volumes in bytes.
+        nbytes (int): Current total size of the cached volumes in bytes.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes (int): Memory budget of the cache in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def file_key(file_path):
+        """Return the cache key of a file, or None if it cannot be accessed."""
+        if not file_path:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return os.path.realpath(file_path), stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def entry_nbytes(entry):
+        """Return the memory footprint of a cache entry in bytes."""
+        return entry["data"].nbytes + sum(getattr(stat, "nbytes", 0) for stat in entry["stats"].values())
+
+    def get(self, file_path):
+        """
+        Return the cached volume of a file and mark it as most recently used.
+
+        Returns:
+            dict | None: Entry with keys `data`, `dims`, `affine`, `is_4d` and
+            `stats`, or None on a cache miss.
+        """
+        key = self.file_key(file_path)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, file_path, data, dims, affine, is_4d):
+        """
+        Store a loaded volume, evicting least recently used entries if the budget is exceeded.
+
+        Volumes larger than the whole budget are not cached.
+
+        Returns:
+            dict | None: The new entry, or None if the volume was not cached.
+        """
+        key = self.file_key(file_path)
+        if key is None or data.nbytes > self.max_bytes:
+            return None
+        self.discard(key)
+        entry = {"data": data, "dims": dims, "affine": affine, "is_4d": is_4d, "stats": {}}
+        self._entries[key] = entry
+        self.nbytes += data.nbytes
+        self._evict()
+        return entry
+
+    def add_stat(self, entry, name, value):
+        """Attach a derived statistic to a cached entry and account for its memory."""
+        if not any(cached is entry for cached in self._entries.values()):
+            return
+        previous = entry["stats"].get(name)
+        self.nbytes += getattr(value, "nbytes", 0) - getattr(previous, "nbytes", 0)
+        entry["stats"][name] = value
+        self._evict()
+
+    def discard(self, key):
+        """Remove an entry by key, if present."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= self.entry_nbytes(entry)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget."""
+        while self.nbytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= self.entry_nbytes(entry)
+
+    def clear(self):
+        """Drop all cached volumes."""
+        self._entries.clear()
+        self.nbytes = 0
+
 
 class NiftiViewer(QMainWindow):
     """
@@ -149,8 +421,34 @@ class NiftiViewer(QMainWindow):
         overlay_alpha (float): Overlay transparency level.
         overlay_threshold (float): Intensity threshold for overlay visibility.
         colormap (str): Current colormap name used for visualization.
+        render_cache (SliceRenderCache): LRU cache of rendered slice pixmaps.
+        session_cache (VolumeSessionCache): LRU cache of the volumes opened in this session.
     """
 
+    RENDER_CACHE_BYTES = 128 * 1024 * 1024
+    """Memory budget (bytes) of the rendered slice pixmap cache."""
+
+    CINE_PREFETCH_FRAMES = 8
+    """Number of time frames rendered ahead of the playhead during cine playback."""
+
+    AUTOMATIC_ROI_DEBOUNCE_MS = 30
+    """Delay after the last ROI slider change before the ROI is recomputed."""
+
+    POINTER_FRAME_MS = 16
+    """Display frame interval at which mouse-driven updates are merged and applied."""
+
+    PROJECTION_CACHE_BYTES = 256 * 1024 * 1024
+    """Memory budget (bytes) of the intensity projection cache."""
+
+    ROTATING_MIP_STEP_DEG = 10
+    """Angular step (degrees) at which rotating MIPs are precomputed."""
+
+    ROTATING_MIP_INTERVAL_MS = 100
+    """Interval between two angles of the rotating MIP animation."""
+
+    SESSION_CACHE_MB = 2048
+    """Default memory budget (MB) of the session volume cache, overridable with the `viewer_cache_mb` setting."""
+
     def __init__(self, context=None):
         """
         Initialize the NIfTI Viewer window and prepare all internal components.
@@ -172,6 +470,10 @@ class NiftiViewer(QMainWindow):
         # === Image data variables ===
         self.img_data = None
         self.affine = None
+        # Cropped base images: position of the loaded array in the file's voxel grid
+        self.crop_offset = np.zeros(3, dtype=int)
+        self.original_dims = None
+        self.original_affine = None
         self.dims = None
         self.is_4d = False
         self.current_slices = [0, 0, 0]  # axial, coronal, sagittal slice indices
@@ -190,6 +492,7 @@ class NiftiViewer(QMainWindow):
         self.overlay_file_path = None
         self.overlay_max = 0
         self.overlay_thresholded_data = None
+        self.overlay_threshold_index = None
 
         # === UI element placeholders ===
         self.info_text = None
@@ -201,16 +504,7 @@ class NiftiViewer(QMainWindow):
 
         # === Visualization color configuration ===
         self.colormap = 'gray'
-        self.overlay_colors = {
-            "gray": np.array([1.0, 0.0, 0.0]),
-            "viridis": np.array([1.0, 0.0, 0.0]),
-            "plasma": np.array([0.0, 1.0, 0.0]),
-            "inferno": np.array([0.0, 1.0, 1.0]),
-            "magma": np.array([0.0, 1.0, 1.0]),
-            "hot": np.array([0.0, 1.0, 1.0]),
-            "cool": np.array([1.0, 1.0, 0.0]),
-            "bone": np.array([1.0, 0.0, 0.0])
-        }
+        self.overlay_colors = OVERLAY_COLORS
 
         # === Viewer components ===
         self.views = []
@@ -228,6 +522,16 @@ class NiftiViewer(QMainWindow):
         self.time_plot_figure = None
         self.time_plot_canvas = None
 
+        # === Cine playback (for 4D data) ===
+        self.cine_play_btn = None
+        self.cine_fps_spin = None
+        self.cine_fps_label = None
+        self.cine_prefetcher = None
+        self.cine_state = None
+        self.cine_frame = 0
+        self.cine_dropped_frames = 0
+        self.cine_timer = QTimer(self)
+
         # === Additional UI components ===
         self.file_info_label = None
         self.slice_navigation_label = None
@@ -247,8 +551,27 @@ class NiftiViewer(QMainWindow):
         self.automaticROI_radius_label = None
         self.automaticROI_diff_label = None
         self.AutomaticROI_diff_slider = None
+        self.automaticROI_connectivity_label = None
+        self.automaticROI_connectivity_combo = None
         self.automaticROI_sliders_group = None
         self.automaticROI_seed_coordinates = None
+        self.automaticROI_worker = None
+        self.automaticROI_timer = QTimer(self)
+        self.automaticROI_timer.setSingleShot(True)
+
+        # === Intensity projections (MIP / MinIP / AvgIP) ===
+        self.projection_label = None
+        self.projection_combo = None
+        self.projection_mode = None
+        self.projection_cache = ProjectionCache(self.PROJECTION_CACHE_BYTES)
+        self.projection_worker = None
+        self.rotating_mip_angles = rotation_angles(self.ROTATING_MIP_STEP_DEG)
+        self.rotating_mip_index = 0
+        self.rotating_mip_timer = QTimer(self)
+
+        # === Pointer event coalescing (one heavy update per display frame) ===
+        self.hover_update = FrameCoalescer(self.update_coordinates, self.POINTER_FRAME_MS, self)
+        self.navigation_update = FrameCoalescer(self.apply_navigation, self.POINTER_FRAME_MS, self)
         self.ROI_save_btn = None
         self.automaticROI_overlay = None
 
@@ -256,8 +579,39 @@ class NiftiViewer(QMainWindow):
         self.incrementalROI_checkbox = None
         self.incrementalROI_enabled = False
         self.addOrigin_btn = None
+        self.removeOrigin_btn = None
+        self.undoROI_btn = None
         self.cancelROI_btn = None
         self.incrementalROI_origins = []
+        # Previous (incremental ROI, origins) states, restored by undo
+        self.incrementalROI_history = []
+
+        # === Rendered slice cache ===
+        # Versions are bumped whenever the overlay or ROI masks change, so cached
+        # pixmaps rendered from the old masks are never reused.
+        self.render_cache = SliceRenderCache(self.RENDER_CACHE_BYTES)
+        self.overlay_version = 0
+        self.roi_version = 0
+        self.displayed_render_keys = [None, None, None]
+
+        # === Session volume cache ===
+        cache_mb = self.SESSION_CACHE_MB
+        if context and "settings" in context:
+            cache_mb = context["settings"].value("viewer_cache_mb", self.SESSION_CACHE_MB, type=int)
+        self.session_cache = VolumeSessionCache(cache_mb * 1024 * 1024)
+
+        # === Crop base images to their foreground on load ===
+        self.crop_background = False
+        if context and "settings" in context:
+            self.crop_background = context["settings"].value("viewer_crop_background", False, type=bool)
+        self.crop_checkbox = None
+
+        # === DICOM series read slice by slice while being displayed ===
+        self.dicom_series = None
+        self.dicom_loader = None
+        self.dicom_preview = None  # Native-order view of the displayed volume
+        self.dicom_window = None  # Intensity window of the preview, from the first decoded slice
+        self.dicom_refresh = FrameCoalescer(self.refresh_dicom_preview, self.POINTER_FRAME_MS, self)
 
         # === Initialize and connect the UI ===
         self.init_ui()
@@ -313,6 +667,9 @@ class NiftiViewer(QMainWindow):
         self.coord_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Coordinates: (-, -, -)"))
         self.value_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Value: -"))
         self.slice_info_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Slice: -/-"))
+        self.cache_memory_label = QLabel()
+        self.status_bar.addPermanentWidget(self.cache_memory_label)
+        self.update_cache_memory_label()
 
         # Display initial status message when the viewer is ready
         self.status_bar.showMessage(
@@ -367,6 +724,14 @@ class NiftiViewer(QMainWindow):
         self.open_btn.setToolTip(QtCore.QCoreApplication.translate("NIfTIViewer", "Open NIfTI File"))
         file_layout.addWidget(self.open_btn)
 
+        # Button to open a DICOM series folder without importing it
+        self.open_dicom_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "📂 Open DICOM Folder"))
+        self.open_dicom_btn.setMinimumHeight(35)
+        self.open_dicom_btn.setMaximumHeight(40)
+        self.open_dicom_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.open_dicom_btn.setToolTip(QtCore.QCoreApplication.translate("NIfTIViewer", "Open a DICOM series folder"))
+        file_layout.addWidget(self.open_dicom_btn)
+
         # Label displaying currently loaded file info
         self.file_info_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "No file loaded"))
         self.file_info_label.setWordWrap(True)
@@ -495,6 +860,36 @@ class NiftiViewer(QMainWindow):
         time_controls_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         time_layout.addWidget(time_controls_widget)
 
+        # Cine playback controls (play/pause + frame rate)
+        cine_controls_widget = QWidget()
+        cine_controls_layout = QHBoxLayout(cine_controls_widget)
+        cine_controls_layout.setContentsMargins(0, 0, 0, 0)
+        cine_controls_layout.setSpacing(5)
+
+        self.cine_play_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "▶ Play"))
+        self.cine_play_btn.setCheckable(True)
+        self.cine_play_btn.setEnabled(False)
+        self.cine_play_btn.setMaximumHeight(30)
+        self.cine_play_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.cine_play_btn.setToolTip(QtCore.QCoreApplication.translate("NIfTIViewer", "Play the time frames as a cine loop"))
+        cine_controls_layout.addWidget(self.cine_play_btn, stretch=3)
+
+        self.cine_fps_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "FPS:"))
+        self.cine_fps_label.setStyleSheet("font-size: 10px;")
+        cine_controls_layout.addWidget(self.cine_fps_label, stretch=0)
+
+        self.cine_fps_spin = QSpinBox()
+        self.cine_fps_spin.setMinimum(1)
+        self.cine_fps_spin.setMaximum(30)
+        self.cine_fps_spin.setValue(5)
+        self.cine_fps_spin.setMaximumWidth(60)
+        self.cine_fps_spin.setMinimumWidth(50)
+        self.cine_fps_spin.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        cine_controls_layout.addWidget(self.cine_fps_spin, stretch=0)
+
+        cine_controls_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        time_layout.addWidget(cine_controls_widget)
+
         self.time_group.setVisible(False)
         layout.addWidget(self.time_group)
 
@@ -533,6 +928,26 @@ class NiftiViewer(QMainWindow):
         colormap_layout.addWidget(self.colormap_combo)
         colormap_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         display_layout.addWidget(colormap_widget)
+
+        # Projection selection dropdown (slices or intensity projections)
+        self.projection_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Projection:"))
+        self.projection_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.projection_label.setStyleSheet("font-size: 10px; font-weight: bold;")
+        display_layout.addWidget(self.projection_label)
+
+        self.projection_combo = QComboBox()
+        self.projection_combo.addItem(QtCore.QCoreApplication.translate("NIfTIViewer", "Slices"), None)
+        for projection in PROJECTIONS:
+            self.projection_combo.addItem(projection, projection)
+        self.projection_combo.addItem(QtCore.QCoreApplication.translate("NIfTIViewer", "Rotating MIP"), ROTATING_MIP)
+        self.projection_combo.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.projection_combo.setMaximumHeight(25)
+        display_layout.addWidget(self.projection_combo)
+
+        # Crop empty background of base images when loading them
+        self.crop_checkbox = QCheckBox(QtCore.QCoreApplication.translate("NIfTIViewer", "Crop background on load"))
+        self.crop_checkbox.setChecked(self.crop_background)
+        display_layout.addWidget(self.crop_checkbox)
         layout.addWidget(display_group)
 
         # ==========================
@@ -567,6 +982,20 @@ class NiftiViewer(QMainWindow):
         self.addOrigin_btn.setToolTip(QtCore.QCoreApplication.translate("NIfTIViewer", "Increment the current incremental ROI with the current ROI drawing"))
         automaticROIbtns_layout.addWidget(self.addOrigin_btn)
 
+        self.removeOrigin_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Remove ROI from incremental ROI"))
+        self.removeOrigin_btn.setEnabled(False)
+        self.removeOrigin_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.removeOrigin_btn.setMaximumHeight(30)
+        self.removeOrigin_btn.setToolTip(QtCore.QCoreApplication.translate("NIfTIViewer", "Remove the current ROI drawing from the incremental ROI"))
+        automaticROIbtns_layout.addWidget(self.removeOrigin_btn)
+
+        self.undoROI_btn = QPushButton(QtCore.QCoreApplication.translate("NIfTIViewer", "Undo incremental ROI change"))
+        self.undoROI_btn.setEnabled(False)
+        self.undoROI_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.undoROI_btn.setMaximumHeight(30)
+        self.undoROI_btn.setToolTip(QtCore.QCoreApplication.translate("NIfTIViewer", "Revert the last change to the incremental ROI"))
+        automaticROIbtns_layout.addWidget(self.undoROI_btn)
+
         automaticROIbtns_group.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         automaticROI_layout.addWidget(automaticROIbtns_group)
 
@@ -651,6 +1080,20 @@ class NiftiViewer(QMainWindow):
         diff_controls_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         automaticROI_sliders_layout.addWidget(diff_controls_widget)
 
+        # Neighbourhood used to grow the connected region from the seed
+        self.automaticROI_connectivity_label = QLabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Connectivity:"))
+        self.automaticROI_connectivity_label.setStyleSheet("font-size: 10px;")
+        self.automaticROI_connectivity_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        automaticROI_sliders_layout.addWidget(self.automaticROI_connectivity_label)
+
+        self.automaticROI_connectivity_combo = QComboBox()
+        for connectivity in ROI_CONNECTIVITIES:
+            self.automaticROI_connectivity_combo.addItem(str(connectivity), connectivity)
+        self.automaticROI_connectivity_combo.setCurrentIndex(ROI_CONNECTIVITIES.index(26))
+        self.automaticROI_connectivity_combo.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.automaticROI_connectivity_combo.setMaximumHeight(25)
+        automaticROI_sliders_layout.addWidget(self.automaticROI_connectivity_combo)
+
         self.automaticROI_sliders_group.setVisible(False)
         self.automaticROI_sliders_group.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
         automaticROI_layout.addWidget(self.automaticROI_sliders_group)
@@ -983,6 +1426,12 @@ class NiftiViewer(QMainWindow):
         self.time_plot_widget = None
         self.time_plot_canvas = None
         self.time_indicator_line = None
+        self.time_series_line = None
+        self.time_series_band = None
+        self.time_plot_background = None
+        self.time_series_key = None
+        self.time_plot_ylim = None
+        self.roi_tac_cache = None
 
         # Add dynamic content area to layout
         fourth_layout.addWidget(self.fourth_content)
@@ -1037,6 +1486,7 @@ class NiftiViewer(QMainWindow):
         # File-related connections
         # ----------------------------
         self.open_btn.clicked.connect(lambda: self.open_file())
+        self.open_dicom_btn.clicked.connect(self.open_dicom_folder)
         self.overlay_btn.clicked.connect(lambda: self.open_file(is_overlay=True))
         self.overlay_checkbox.toggled.connect(self.toggle_overlay)
         self.overlay_alpha_slider.valueChanged.connect(self.update_overlay_alpha)
@@ -1056,9 +1506,12 @@ class NiftiViewer(QMainWindow):
         self.automaticROIbtn.clicked.connect(self.automaticROI_clicked)
         self.automaticROI_diff_slider.valueChanged.connect(self.update_automaticROI)
         self.automaticROI_radius_slider.valueChanged.connect(self.update_automaticROI)
+        self.automaticROI_connectivity_combo.currentIndexChanged.connect(self.update_automaticROI)
         self.ROI_save_btn.clicked.connect(self.ROI_save)
         self.automaticROI_checkbox.toggled.connect(self.toggle_automaticROI)
         self.addOrigin_btn.clicked.connect(self.addOrigin_clicked)
+        self.removeOrigin_btn.clicked.connect(self.removeOrigin_clicked)
+        self.undoROI_btn.clicked.connect(self.undoROI_clicked)
         self.incrementalROI_checkbox.toggled.connect(self.toggle_incrementalROI)
         self.cancelROI_btn.clicked.connect(self.resetROI)
         # ----------------------------
@@ -1067,17 +1520,25 @@ class NiftiViewer(QMainWindow):
         self.time_checkbox.toggled.connect(self.toggle_time_controls)
         self.time_slider.valueChanged.connect(self.time_changed)
         self.time_spin.valueChanged.connect(self.time_changed)
+        self.cine_play_btn.toggled.connect(self.toggle_cine)
+        self.cine_fps_spin.valueChanged.connect(self.cine_fps_changed)
+        self.cine_timer.timeout.connect(self.cine_tick)
+        self.automaticROI_timer.timeout.connect(self.request_automaticROI)
 
         # ----------------------------
         # Colormap control
         # ----------------------------
         self.colormap_combo.currentTextChanged.connect(self.colormap_changed)
+        self.projection_combo.currentIndexChanged.connect(
+            lambda index: self.projection_changed(self.projection_combo.itemData(index)))
+        self.rotating_mip_timer.timeout.connect(self.advance_rotating_mip)
+        self.crop_checkbox.toggled.connect(self.toggle_crop_background)
 
         # ----------------------------
         # Coordinate synchronization across views
         # ----------------------------
         for view in self.views:
-            view.coordinate_changed.connect(self.update_coordinates)
+            view.coordinate_changed.connect(self.hover_update.submit)
 
     def show_workspace_nii_dialog(self, is_overlay=False):
         """
@@ -1128,8 +1589,8 @@ class NiftiViewer(QMainWindow):
         via a modal progress dialog.
 
         Args:
-            file_path (str, optional): Path to the NIfTI file to load. If None,
-                a file dialog will be displayed.
+            file_path (str, optional): Path to the NIfTI file to load, or to a DICOM
+                series folder (see `open_dicom_series`). If None, a file dialog will be displayed.
             is_overlay (bool, optional): Whether the file being opened is an overlay
                 (requires a base image to be already loaded). Defaults to False.
 
@@ -1156,6 +1617,41 @@ class NiftiViewer(QMainWindow):
             if not file_path:  # User canceled the dialog
                 return
 
+        if not is_overlay:
+            # A new base image replaces any DICOM series still being read
+            self.stop_dicom_loader()
+
+        # ----------------------------
+        # Open DICOM series folders directly
+        # ----------------------------
+        if file_path and os.path.isdir(file_path):
+            if is_overlay:
+                QMessageBox.warning(
+                    self,
+                    QtCore.QCoreApplication.translate("NIfTIViewer", "Warning"),
+                    QtCore.QCoreApplication.translate("NIfTIViewer",
+                                                      "DICOM folders can only be opened as the main image")
+                )
+                return
+            self.open_dicom_series(file_path)
+            return
+
+        # ----------------------------
+        # Reuse a volume opened earlier in this session
+        # ----------------------------
+        cached = self.session_cache.get(file_path) if file_path else None
+        if cached is not None and not is_overlay and cached.get("crop_requested", False) != self.crop_background:
+            cached = None  # Cached with the other crop setting
+        if cached is not None:
+            log.debug(f"Session cache hit for {file_path}")
+            if is_overlay:
+                self.overlay_file_path = file_path
+            else:
+                self.file_path = file_path
+            self.show_loaded_volume(cached, is_overlay)
+            self.update_cache_memory_label()
+            return
+
         # ----------------------------
         # Start file loading process
         # ----------------------------
@@ -1169,7 +1665,8 @@ class NiftiViewer(QMainWindow):
             self.progress_dialog.setMinimumDuration(0)
 
             # Launch threaded image loading
-            self.threads.append(ImageLoadThread(file_path, is_overlay))
+            self.threads.append(ImageLoadThread(file_path, is_overlay,
+                                                crop_to_foreground=self.crop_background and not is_overlay))
             self.threads[-1].finished.connect(self.on_file_loaded)
             self.threads[-1].error.connect(self.on_load_error)
             self.threads[-1].progress.connect(self.progress_dialog.setValue)
@@ -1184,6 +1681,139 @@ class NiftiViewer(QMainWindow):
             else:
                 self.file_path = file_path
 
+    def open_dicom_folder(self):
+        """Ask for a DICOM series folder and open it as the main image."""
+        start_dir = self.context.get("workspace_path", "") if self.context else ""
+        folder = QFileDialog.getExistingDirectory(
+            self, QtCore.QCoreApplication.translate("NIfTIViewer", "Open DICOM Folder"), start_dir)
+        if folder:
+            self.open_file(folder)
+
+    def open_dicom_series(self, folder):
+        """
+        Display a DICOM series folder while its slices are being decoded.
+
+        Only the headers are read here; the volume is shown right away and filled
+        in by a `DicomSeriesLoadThread` as slices are decoded, the slice on screen
+        first. Intensities are windowed on the first decoded slice until the whole
+        series is read, then the volume is normalized like a NIfTI image and kept
+        in the session cache.
+
+        Args:
+            folder (str): Folder holding the instances of the series.
+        """
+        cached = self.session_cache.get(folder)
+        if cached is not None:
+            log.debug(f"Session cache hit for {folder}")
+            self.file_path = folder
+            self.show_loaded_volume(cached, False)
+            self.update_cache_memory_label()
+            return
+
+        try:
+            series = DicomSeries(folder)
+        except Exception as e:
+            log.error(f"Cannot open DICOM series {folder}: {e}")
+            QMessageBox.critical(
+                self,
+                QtCore.QCoreApplication.translate("NIfTIViewer", "Error Loading File"),
+                QtCore.QCoreApplication.translate("NIfTIViewer", "Failed to load DICOM series") + f":\n{e}"
+            )
+            return
+
+        # Show the (still empty) volume right away
+        self.file_path = folder
+        preview = np.zeros(series.canonical_shape, dtype=np.float32)
+        self.show_loaded_volume({"data": preview, "dims": series.canonical_shape,
+                                 "affine": series.canonical_affine, "is_4d": False, "stats": {}}, False)
+        self.dicom_series = series
+        self.dicom_preview = series.native_view(preview)
+        self.dicom_window = None
+
+        self.dicom_loader = DicomSeriesLoadThread(series)
+        self.dicom_loader.slice_ready.connect(self.on_dicom_slice_ready)
+        self.dicom_loader.finished.connect(self.on_dicom_series_loaded)
+        self.dicom_loader.error.connect(self.on_dicom_series_error)
+        self.dicom_loader.progress.connect(self.on_dicom_progress)
+        self.request_dicom_slice()
+        self.dicom_loader.start()
+
+    def request_dicom_slice(self):
+        """Ask the DICOM loader to decode the slice under the crosshair next."""
+        if self.dicom_loader is None:
+            return
+        axis = self.dicom_series.canonical_slice_axis
+        self.dicom_loader.request(self.dicom_series.native_slice_index(self.current_coordinates[axis]))
+
+    def on_dicom_slice_ready(self, index, values):
+        """Copy a slice decoded by the loader into the displayed volume and schedule a redraw."""
+        if self.sender() is not self.dicom_loader:
+            return  # Slice of a series that was closed meanwhile
+
+        if self.dicom_window is None:
+            finite = values[np.isfinite(values)]
+            vmin, vmax = np.percentile(finite, [0.1, 99.9]) if finite.size else (0.0, 1.0)
+            self.dicom_window = (vmin, vmax if vmax > vmin else vmin + 1.0)
+        vmin, vmax = self.dicom_window
+        self.dicom_preview[:, :, index] = np.clip((values - vmin) / (vmax - vmin), 0, 1)
+        self.dicom_refresh.submit()
+
+    def refresh_dicom_preview(self):
+        """Redraw the views after new DICOM slices were decoded."""
+        if self.img_data is None:
+            return
+        self.invalidate_render_cache()
+        self.update_all_displays()
+        self.update_coordinate_displays()
+
+    def on_dicom_progress(self, value):
+        """Show the share of decoded DICOM slices in the status bar."""
+        if self.sender() is self.dicom_loader:
+            self.status_bar.showMessage(
+                QtCore.QCoreApplication.translate("NIfTIViewer", "Reading DICOM series") + f": {value}%")
+
+    def on_dicom_series_loaded(self, img_data, dims, affine, is_4d, is_overlay):
+        """
+        Replace the preview with the normalized series once every slice is decoded.
+
+        The view state (slices, ROI, overlay) is kept, since the volume grid is unchanged.
+        """
+        if self.sender() is not self.dicom_loader:
+            return
+        self.dicom_refresh.cancel()
+        self.stop_dicom_loader()
+
+        self.session_cache.put(self.file_path, img_data, dims, affine, is_4d)
+        self.img_data = img_data
+        self.reset_projections()
+        self.reset_time_series_cache()
+        self.refresh_dicom_preview()
+        self.update_cache_memory_label()
+        self.status_bar.showMessage(
+            QtCore.QCoreApplication.translate("NIfTIViewer", "DICOM series loaded") +
+            f":{os.path.basename(self.file_path)}", 3000)
+
+    def on_dicom_series_error(self, error_message):
+        """Report a DICOM series that could not be read and stop reading it."""
+        if self.sender() is not self.dicom_loader:
+            return
+        self.stop_dicom_loader()
+        QMessageBox.critical(
+            self,
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Error Loading File"),
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Failed to load DICOM series") + f":\n{error_message}"
+        )
+
+    def stop_dicom_loader(self):
+        """Stop reading the current DICOM series, if any."""
+        self.dicom_refresh.cancel()
+        if self.dicom_loader is not None:
+            self.dicom_loader.cancel()
+            self.dicom_loader.wait()
+            self.dicom_loader.deleteLater()
+            self.dicom_loader = None
+        self.dicom_preview = None
+
     def on_file_loaded(self, img_data, dims, affine, is_4d, is_overlay):
         """
         Handle successful completion of a NIfTI file loading operation.
@@ -1210,6 +1840,32 @@ class NiftiViewer(QMainWindow):
         thread_to_cancel = self.sender()
         self.threads.remove(thread_to_cancel)
 
+        if is_4d and not img_data.flags.c_contiguous:
+            # Keep each voxel's time series contiguous for fast TAC reads
+            img_data = np.ascontiguousarray(img_data)
+
+        # Keep the volume for the rest of the session so reopening it is instant
+        file_path = self.overlay_file_path if is_overlay else self.file_path
+        entry = self.session_cache.put(file_path, img_data, dims, affine, is_4d)
+        if entry is None:
+            entry = {"data": img_data, "dims": dims, "affine": affine, "is_4d": is_4d, "stats": {}}
+        entry["crop"] = getattr(thread_to_cancel, "crop", None)
+        entry["crop_requested"] = getattr(thread_to_cancel, "crop_to_foreground", False)
+        self.show_loaded_volume(entry, is_overlay)
+        self.update_cache_memory_label()
+
+    def show_loaded_volume(self, entry, is_overlay):
+        """
+        Display a loaded volume as base image or overlay.
+
+        Args:
+            entry (dict): Volume with keys `data`, `dims`, `affine`, `is_4d` and `stats`,
+                as stored in the session cache, and optionally `crop` (offset, original
+                dims, original affine) for volumes cropped to their foreground.
+            is_overlay (bool): Whether the volume is shown as an overlay.
+        """
+        img_data, dims, affine, is_4d = entry["data"], entry["dims"], entry["affine"], entry["is_4d"]
+
         # ---------------------------------------------------
         # Handle overlay image loading
         # ---------------------------------------------------
@@ -1218,24 +1874,29 @@ class NiftiViewer(QMainWindow):
             self.overlay_data = img_data
             self.overlay_dims = dims
 
-            # Check for dimension mismatch and apply padding if necessary
-            if hasattr(self, "dims") and self.overlay_data.shape[:3] != self.dims[:3]:
-                QMessageBox.warning(
-                    self,
-                    "Dimensions mismatch!",
-                    f"The main image has dimensions {self.dims[:3]} and the overlay has dimensions {self.overlay_data.shape[:3]}."
-                )
-                self.overlay_data = self.pad_volume_to_shape(self.overlay_data, self.dims[:3])
-
-            self.overlay_max = np.max(self.overlay_data) if np.max(self.overlay_data) > 0 else 1
+            self.overlay_version += 1
+            stats = entry["stats"]
+            if "overlay_max" in stats:
+                self.overlay_max = stats["overlay_max"]
+            else:
+                self.overlay_max = np.max(img_data) if np.max(img_data) > 0 else 1
+                self.session_cache.add_stat(entry, "overlay_max", self.overlay_max)
+
+            resampled = self.affine is not None and needs_resampling(img_data.shape, affine, self.dims, self.affine)
+            if resampled:
+                # Overlay in another voxel space: sample it on the base grid slice by slice
+                log.info(f"Resampling overlay {dims} onto the main image grid {self.dims[:3]}")
+                self.overlay_threshold_index = ResampledOverlay(img_data, affine, self.affine, self.dims)
+            elif "threshold_index" in stats:
+                self.overlay_threshold_index = stats["threshold_index"]
+            else:
+                # Sort the overlay intensities once so threshold changes are incremental
+                self.overlay_threshold_index = OverlayThresholdIndex(img_data)
+                self.session_cache.add_stat(entry, "threshold_index", self.overlay_threshold_index)
 
             # Update overlay information label
             filename = os.path.basename(self.overlay_file_path)
-            self.overlay_info_label.setText(
-                f"Overlay: {filename}\n" +
-                QtCore.QCoreApplication.translate("NIfTIViewer", "Dimensions") +
-                f":{self.overlay_dims}"
-            )
+            self.update_overlay_info_label()
             log.debug("Activate the UI")
             # Enable and activate overlay in UI
             self.toggle_overlay(True,update_all=False)
@@ -1252,26 +1913,40 @@ class NiftiViewer(QMainWindow):
             self.overlay_checkbox.setEnabled(True)
             log.debug("Updating status bar")
             # Update status bar message
-            self.status_bar.showMessage(
-                QtCore.QCoreApplication.translate("NIfTIViewer", "Overlay loaded") + f":{filename}"
-            )
+            message = QtCore.QCoreApplication.translate("NIfTIViewer", "Overlay loaded") + f":{filename}"
+            if resampled:
+                message += " (" + QtCore.QCoreApplication.translate(
+                    "NIfTIViewer", "resampled to the main image space") + ")"
+            self.status_bar.showMessage(message)
 
         # ---------------------------------------------------
         # Handle base image loading
         # ---------------------------------------------------
         else:
-            # Reset any existing overlay and ROI tools
+            # Stop any cine loop of the previous volume, then reset overlay and ROI tools
+            self.cine_play_btn.setChecked(False)
             self.reset_overlay()
 
-            # Store loaded base image attributes
+            # Store loaded base image attributes and drop pixmaps and curves of the previous one
+            self.invalidate_render_cache()
+            self.reset_projections()
+            self.reset_time_series_cache()
             self.img_data = img_data
             self.dims = dims
             self.affine = affine
             self.is_4d = is_4d
             self.voxel_sizes = np.sqrt((self.affine[:3, :3] ** 2).sum(axis=0))  # Compute voxel size in mm
+            crop = entry.get("crop")
+            if crop is not None:
+                offset, self.original_dims, self.original_affine = crop
+                self.crop_offset = np.asarray(offset, dtype=int)
+            else:
+                self.crop_offset = np.zeros(3, dtype=int)
+                self.original_dims, self.original_affine = dims, affine
 
-            # Compose file information text
+            # Compose file information text (dimensions of the file, before cropping)
             filename = os.path.basename(self.file_path)
+            dims = self.original_dims
             if is_4d:
                 # 4D image information
                 info_text = QtCore.QCoreApplication.translate("NIfTIViewer", "File") + f":{filename}\n" + \
@@ -1302,6 +1977,7 @@ class NiftiViewer(QMainWindow):
             self.status_bar.addWidget(self.coord_label)
             self.status_bar.addPermanentWidget(self.slice_info_label)
             self.status_bar.addPermanentWidget(self.value_label)
+            self.status_bar.addPermanentWidget(self.cache_memory_label)
 
             # Enable ROI controls
             self.automaticROIbtn.setEnabled(True)
@@ -1309,6 +1985,7 @@ class NiftiViewer(QMainWindow):
             self.automaticROIbtn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Automatic ROI"))
 
             # Update information panel
+            info_text += self.crop_info_text()
             self.file_info_label.setText(info_text)
             self.info_text.setText(info_text)
 
@@ -1318,6 +1995,47 @@ class NiftiViewer(QMainWindow):
             self.resetROI()
             self.reset_overlay()
 
+    def crop_info_text(self):
+        """Return the info panel line describing the foreground crop, or '' if the image is not cropped."""
+        if self.img_data is None or self.original_dims is None or \
+                tuple(self.img_data.shape[:3]) == tuple(self.original_dims[:3]):
+            return ""
+        shape = self.img_data.shape[:3]
+        return "\n" + QtCore.QCoreApplication.translate("NIfTIViewer", "Cropped to") + \
+            f":{shape[0]}×{shape[1]}×{shape[2]} (+{self.crop_offset[0]}, +{self.crop_offset[1]}, +{self.crop_offset[2]})"
+
+    def toggle_crop_background(self, checked):
+        """
+        Enable or disable cropping base images to their foreground on load.
+
+        The choice is remembered in the settings and applies to the next base image opened.
+        """
+        self.crop_background = checked
+        if self.context and "settings" in self.context:
+            self.context["settings"].setValue("viewer_crop_background", checked)
+
+    def original_coordinates(self, coords):
+        """
+        Map voxel indices of the loaded (possibly cropped) array to the file's voxel grid.
+
+        Args:
+            coords (Sequence[int]): (x, y, z) indices into `img_data`, as returned by
+                `screen_to_image_coords`.
+
+        Returns:
+            list[int]: (x, y, z) indices in the original image.
+        """
+        return [int(c) + int(o) for c, o in zip(coords[:3], self.crop_offset)]
+
+    def update_cache_memory_label(self):
+        """Show the memory used by the session volume cache in the status bar."""
+        mb = 1024 * 1024
+        self.cache_memory_label.setText(
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Cache") +
+            f": {self.session_cache.nbytes / mb:.0f}/{self.session_cache.max_bytes / mb:.0f} MB "
+            f"({len(self.session_cache)})"
+        )
+
     def on_load_error(self, error_message):
         """
         Handle errors during NIfTI file loading.
@@ -1474,11 +2192,62 @@ class NiftiViewer(QMainWindow):
         if self.overlay_enabled and self.overlay_data is not None and self.overlay_max is not None:
             # Determine overlay threshold
             threshold_value = self.overlay_threshold * self.overlay_max
-            # Create boolean mask of overlay pixels above threshold
-            self.overlay_thresholded_data = self.overlay_data > threshold_value
+            if self.overlay_threshold_index is None:
+                self.overlay_threshold_index = OverlayThresholdIndex(self.overlay_data)
+            # Flip only the voxels crossing the threshold in the boolean overlay mask
+            changed = self.overlay_threshold_index.set_threshold(threshold_value)
+            self.overlay_thresholded_data = self.overlay_threshold_index.mask
+            previous_version = self.overlay_version
+            self.overlay_version += 1
+            self.keep_unchanged_planes(previous_version, changed)
+            self.update_overlay_info_label()
             if update_all:
                 self.update_all_displays()
 
+    def keep_unchanged_planes(self, previous_version, changed):
+        """
+        Carry displayed planes over to a new overlay version when none of their voxels changed.
+
+        After a threshold change only the planes whose current slice contains a voxel
+        that crossed the threshold need to be redrawn; the others keep their pixmap.
+
+        Args:
+            previous_version (int): Overlay version the planes were rendered with.
+            changed (np.ndarray | None): Flat indices of the voxels that crossed the threshold,
+                or None when they are unknown (resampled overlays), in which case every
+                plane is redrawn.
+        """
+        if changed is None:
+            return
+        if changed.size:
+            x, y, z = self.overlay_threshold_index.changed_coordinates(changed)
+            affected = [np.any(z == self.current_slices[0]),
+                        np.any(y == self.current_slices[1]),
+                        np.any(x == self.current_slices[2])]
+        else:
+            affected = [False, False, False]
+
+        for plane_idx in range(3):
+            old_key = self.displayed_render_keys[plane_idx]
+            if affected[plane_idx] or old_key is None or old_key[5] != previous_version:
+                continue
+            new_key = self.render_key(plane_idx)
+            if old_key[:5] + old_key[6:] != new_key[:5] + new_key[6:]:
+                continue
+            self.render_cache.put(new_key, self.pixmap_items[plane_idx].pixmap())
+            self.displayed_render_keys[plane_idx] = new_key
+
+    def update_overlay_info_label(self):
+        """Show overlay file, dimensions and number of voxels above the threshold."""
+        if self.overlay_file_path is None:
+            return
+        text = (f"Overlay: {os.path.basename(self.overlay_file_path)}\n" +
+                QtCore.QCoreApplication.translate("NIfTIViewer", "Dimensions") + f":{self.overlay_dims}")
+        if self.overlay_threshold_index is not None:
+            text += "\n" + QtCore.QCoreApplication.translate("NIfTIViewer", "Voxels above threshold") + \
+                    f": {self.overlay_threshold_index.count}"
+        self.overlay_info_label.setText(text)
+
     def update_overlay_settings(self,update_all=True):
         """
         Synchronize overlay alpha and threshold values from the UI controls.
@@ -1526,6 +2295,7 @@ class NiftiViewer(QMainWindow):
         self.update_display(plane_idx)
         self.update_coordinate_displays()
         self.update_cross_view_lines()
+        self.request_dicom_slice()
 
     def time_changed(self, value,update_all=True):
         """
@@ -1560,6 +2330,130 @@ class NiftiViewer(QMainWindow):
         self.time_spin.setVisible(value)
         self.time_spin.setEnabled(value)
         self.time_point_label.setVisible(value)
+        self.cine_play_btn.setEnabled(value)
+        self.cine_fps_spin.setEnabled(value)
+        if not value:
+            self.cine_play_btn.setChecked(False)
+
+    def cine_state_key(self):
+        """
+        Return the render state shared by all frames of the cine loop.
+
+        This is the render key of each plane without the time frame (also left
+        out of the projection key); when it changes during playback the
+        prefetched frames are stale.
+        """
+        return tuple(key[:2] + key[3:-1] + (key[-1][1:] if key[-1] is not None else None,)
+                     for key in (self.render_key(i) for i in range(3)))
+
+    def make_frame_renderer(self):
+        """
+        Build a thread-safe function that renders the three planes of a time frame.
+
+        The function works on a snapshot of the current slices, colormap, alpha,
+        visible masks and projection, so it can run on the cine prefetch thread.
+        In a projection mode it renders the projections of the frame, as
+        `render_slice_pixmap` does.
+
+        Returns:
+            Callable[[int], list[QImage]]: Renderer taking a time frame index.
+        """
+        volume = self.img_data
+        slices = list(self.current_slices)
+        spacings = [self.plane_pixel_spacing(i) for i in range(3)]
+        colormap = self.colormap
+        alpha = self.overlay_alpha
+        layers = self.visible_mask_layers()
+        projections = [self.projection_key(i) for i in range(3)]
+
+        def render_plane(frame, i):
+            if projections[i] is None:
+                return self.render_slice_image(frame, i, slices[i], spacings[i], colormap, layers, alpha)
+            _, kind, parameter = projections[i]
+            if kind == ROTATING_MIP:
+                projection = rotating_mip(frame, parameter)
+            else:
+                projection = intensity_projection(frame, kind, parameter)
+            return self.render_slice_image(np.expand_dims(projection, 2 - i), i, 0, spacings[i], colormap, [], alpha)
+
+        def render_frame(time_idx):
+            frame = volume[..., time_idx]
+            return [render_plane(frame, i) for i in range(3)]
+
+        return render_frame
+
+    def toggle_cine(self, playing):
+        """
+        Start or stop cine playback of a 4D volume.
+
+        Args:
+            playing (bool): Whether playback should run.
+        """
+        if playing and self.is_4d and self.img_data is not None:
+            self.start_cine()
+        else:
+            self.stop_cine()
+        self.cine_play_btn.setText(
+            QtCore.QCoreApplication.translate("NIfTIViewer", "⏸ Pause") if self.cine_timer.isActive()
+            else QtCore.QCoreApplication.translate("NIfTIViewer", "▶ Play")
+        )
+
+    def start_cine(self):
+        """Start the frame prefetcher and the playback timer from the current time frame."""
+        self.stop_cine()
+        interval_ms = int(1000 / self.cine_fps_spin.value())
+        self.cine_frame = self.current_time
+        self.cine_dropped_frames = 0
+        self.cine_state = self.cine_state_key()
+        self.cine_prefetcher = CinePrefetchThread(self.make_frame_renderer(), self.dims[3],
+                                                  start_frame=self.current_time,
+                                                  depth=self.CINE_PREFETCH_FRAMES,
+                                                  frame_interval=interval_ms / 1000)
+        self.cine_prefetcher.error.connect(lambda _: self.cine_play_btn.setChecked(False))
+        self.cine_prefetcher.start()
+        self.cine_timer.start(interval_ms)
+
+    def stop_cine(self):
+        """Stop the playback timer and the frame prefetcher."""
+        self.cine_timer.stop()
+        if self.cine_prefetcher is not None:
+            self.cine_prefetcher.stop()
+            self.cine_prefetcher.wait()
+            self.cine_prefetcher.deleteLater()
+            self.cine_prefetcher = None
+            log.debug(f"Cine playback stopped, {self.cine_dropped_frames} frames dropped")
+
+    def cine_fps_changed(self, value):
+        """Restart playback at the new frame rate if the cine loop is running."""
+        if self.cine_timer.isActive():
+            self.start_cine()
+
+    def cine_tick(self):
+        """
+        Advance the cine loop by one frame.
+
+        The next frame is shown only if the prefetcher already rendered it;
+        otherwise it is dropped so that the GUI never waits for rendering.
+        """
+        if self.cine_prefetcher is None:
+            return
+
+        # Slices, colormap or masks changed during playback: prefetched frames are stale
+        if self.cine_state_key() != self.cine_state:
+            self.start_cine()
+            return
+
+        self.cine_frame = (self.cine_frame + 1) % self.dims[3]
+        images = self.cine_prefetcher.take(self.cine_frame)
+        if images is None:
+            self.cine_dropped_frames += 1
+            return
+
+        # Hand the prefetched planes to the render cache, then move to the frame
+        self.current_time = self.cine_frame
+        for plane_idx, image in enumerate(images):
+            self.render_cache.put(self.render_key(plane_idx), QPixmap.fromImage(image))
+        self.time_changed(self.cine_frame)
 
     def colormap_changed(self, colormap_name,update_all=True):
         """
@@ -1585,8 +2479,9 @@ class NiftiViewer(QMainWindow):
             y (float): Y coordinate in screen space.
 
         Notes:
-            Converts screen coordinates to image voxel coordinates,
-            updates slice positions accordingly, and synchronizes all views.
+            Converts screen coordinates to image voxel coordinates and moves the
+            crosshairs of all views immediately; slice redraws, the time series plot
+            and the coordinate labels follow once per display frame (see `apply_navigation`).
         """
         if self.img_data is None:
             return
@@ -1604,15 +2499,31 @@ class NiftiViewer(QMainWindow):
         self.current_slices[1] = img_coords[1]  # Coronal (Y)
         self.current_slices[2] = img_coords[0]  # Sagittal (X)
 
-        # Synchronize controls for all planes
+        self.update_cross_view_lines()
+        self.navigation_update.submit()
+
+    def apply_navigation(self):
+        """
+        Apply the heavy part of the latest pointer navigation in one pass.
+
+        Synchronizes the slice controls without triggering their per-plane redraws,
+        then refreshes all displays, the time series plot and the coordinate labels.
+        """
+        if self.img_data is None:
+            return
+
+        # Synchronize controls for all planes; the displays are refreshed once below
         for i in range(3):
-            self.slice_sliders[i].setValue(self.current_slices[i])
-            self.slice_spins[i].setValue(self.current_slices[i])
+            for control in (self.slice_sliders[i], self.slice_spins[i]):
+                control.blockSignals(True)
+                control.setValue(self.current_slices[i])
+                control.blockSignals(False)
 
         # Refresh display and coordinate info
         self.update_all_displays()
         self.update_coordinate_displays()
         self.update_cross_view_lines()
+        self.request_dicom_slice()
 
     def screen_to_image_coords(self, view_idx, x, y):
         """
@@ -1624,7 +2535,9 @@ class NiftiViewer(QMainWindow):
             y (float): Y coordinate in view space.
 
         Returns:
-            list[int] | None: Image-space voxel indices [x, y, z] or None if invalid.
+            list[int] | None: Voxel indices [x, y, z] into `img_data` or None if invalid.
+            When the image was cropped on load, `original_coordinates` maps them to
+            the voxel grid of the file.
 
         Notes:
             Applies stretch factor correction, flips orientation for proper display,
@@ -1686,9 +2599,10 @@ class NiftiViewer(QMainWindow):
             else:
                 value = self.img_data[img_coords[0], img_coords[1], img_coords[2]]
 
-            # Update coordinate and voxel value display
+            # Update coordinate and voxel value display, in the voxel grid of the file
+            x, y, z = self.original_coordinates(img_coords)
             self.coord_label.setText(QtCore.QCoreApplication.translate(
-                "NIfTIViewer", "Coordinates") + f": ({img_coords[0]}, {img_coords[1]}, {img_coords[2]})")
+                "NIfTIViewer", "Coordinates") + f": ({x}, {y}, {z})")
             self.value_label.setText(QtCore.QCoreApplication.translate(
                 "NIfTIViewer", "Value") + f": {value:.2f}")
         except (IndexError, ValueError):
@@ -1706,15 +2620,17 @@ class NiftiViewer(QMainWindow):
             return
 
         coords = self.current_coordinates
+        # Coordinates are shown in the voxel grid of the file, before any cropping
+        shown = self.original_coordinates(coords)
 
         # Update per-view coordinate readouts
-        self.coord_displays[0].setText(f"({coords[0]}, {coords[1]})")  # Axial
-        self.coord_displays[1].setText(f"({coords[0]}, {coords[2]})")  # Coronal
-        self.coord_displays[2].setText(f"({coords[1]}, {coords[2]})")  # Sagittal
+        self.coord_displays[0].setText(f"({shown[0]}, {shown[1]})")  # Axial
+        self.coord_displays[1].setText(f"({shown[0]}, {shown[2]})")  # Coronal
+        self.coord_displays[2].setText(f"({shown[1]}, {shown[2]})")  # Sagittal
 
         # Update global coordinate display in status bar
         self.coord_label.setText(QtCore.QCoreApplication.translate(
-            "NIfTIViewer", "Coordinates") + f": ({coords[0]}, {coords[1]}, {coords[2]})")
+            "NIfTIViewer", "Coordinates") + f": ({shown[0]}, {shown[1]}, {shown[2]})")
 
         # Update value label safely
         try:
@@ -1759,88 +2675,308 @@ class NiftiViewer(QMainWindow):
                 y = (self.img_data.shape[2] - 1 - coords[2]) * stretch_y
                 view.set_crosshair_position(x, y)
 
+    def render_key(self, plane_idx):
+        """
+        Build the cache key describing everything that determines how a plane is rendered.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+
+        Returns:
+            tuple: (plane, slice index, time frame, colormap, overlay alpha,
+            overlay version, ROI version, visible layers, projection). The slice
+            index is None while a projection is shown, since it does not depend on it.
+        """
+        overlay_visible = self.overlay_enabled and self.overlay_thresholded_data is not None
+        return (
+            plane_idx,
+            self.current_slices[plane_idx] if self.projection_mode is None else None,
+            self.current_time if self.is_4d else 0,
+            self.colormap,
+            self.overlay_alpha,
+            self.overlay_version if overlay_visible else None,
+            self.roi_version,
+            (bool(self.automaticROI_overlay), bool(self.incrementalROI_enabled)),
+            self.projection_key(plane_idx),
+        )
+
+    def projection_key(self, plane_idx):
+        """
+        Return the key of the projection shown in a plane, or None when slices are shown.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+
+        Returns:
+            tuple | None: (time frame, projection, axis) or, for the coronal view of a
+            rotating MIP, (time frame, ROTATING_MIP, angle).
+        """
+        if self.projection_mode is None:
+            return None
+        frame = self.current_time if self.is_4d else 0
+        if self.projection_mode == ROTATING_MIP:
+            if plane_idx == 1:
+                return frame, ROTATING_MIP, float(self.rotating_mip_angles[self.rotating_mip_index])
+            return frame, "MIP", 2 - plane_idx
+        return frame, self.projection_mode, 2 - plane_idx
+
+    def invalidate_render_cache(self):
+        """Drop all cached pixmaps and force every plane to be redrawn."""
+        self.render_cache.clear()
+        self.displayed_render_keys = [None, None, None]
+
+    def plane_pixel_spacing(self, plane_idx):
+        """
+        Return the in-plane voxel spacing (mm) of an anatomical plane.
+
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+
+        Returns:
+            tuple[float, float] | None: (horizontal, vertical) spacing, or None for an invalid plane.
+        """
+        if plane_idx == 0:  # Axial (XY plane)
+            return tuple(self.voxel_sizes[0:2])  # spacing in X and Y directions
+        elif plane_idx == 1:  # Coronal (XZ plane)
+            return (self.voxel_sizes[0], self.voxel_sizes[2])  # X and Z spacing
+        elif plane_idx == 2:  # Sagittal (YZ plane)
+            return tuple(self.voxel_sizes[1:3])  # Y and Z spacing
+        return None
+
+    def visible_mask_layers(self):
+        """
+        Return the ROI and overlay masks currently shown on top of the base image.
+
+        Returns:
+            list[np.ndarray]: 3D masks in compositing order (automatic ROI, overlay, incremental ROI).
+        """
+        layers = []
+        if self.automaticROI_overlay and self.automaticROI_data is not None:
+            layers.append(self.automaticROI_data)
+        if self.overlay_enabled and self.overlay_data is not None and self.overlay_thresholded_data is not None:
+            layers.append(self.overlay_thresholded_data)
+        if self.incrementalROI_enabled and self.incrementalROI_data is not None:
+            layers.append(self.incrementalROI_data)
+        return layers
+
     def update_display(self, plane_idx):
-        """Update a specific plane display with matplotlib-style rendering in mm scale"""
+        """
+        Update a specific plane display with matplotlib-style rendering in mm scale.
+
+        Planes whose render key did not change since the last draw are skipped, and
+        previously rendered views are served from the pixmap cache.
+        """
         if self.img_data is None:
             return
 
         try:
-            log.debug(f"Update display: {plane_idx}")
-            # Select current 3D volume (for 4D data, use the selected time frame)
-            if self.is_4d:
-                current_data = self.img_data[..., self.current_time]
-            else:
-                current_data = self.img_data
+            pixel_spacing = self.plane_pixel_spacing(plane_idx)
+            if pixel_spacing is None:
+                log.error("Plane index out of range")
+                return  # Invalid plane index
 
-            # Get current slice index for the selected plane
-            slice_idx = self.current_slices[plane_idx]
+            # Skip planes whose inputs did not change since the last draw
+            key = self.render_key(plane_idx)
+            if key == self.displayed_render_keys[plane_idx]:
+                return
 
-            # Extract the corresponding slice depending on the plane
-            if plane_idx == 0:  # Axial (XY plane)
-                slice_data = current_data[:, :, slice_idx].T  # transpose to match orientation
-                slice_data = np.flipud(slice_data)  # flip vertically for correct visualization
-                pixel_spacing = self.voxel_sizes[0:2]  # spacing in X and Y directions
+            # Store stretch factors for coordinate conversion later
+            self.stretch_factors[plane_idx] = (1.0, pixel_spacing[1] / pixel_spacing[0])
 
-            elif plane_idx == 1:  # Coronal (XZ plane)
-                slice_data = current_data[:, slice_idx, :].T
-                slice_data = np.flipud(slice_data)
-                pixel_spacing = (self.voxel_sizes[0], self.voxel_sizes[2])  # X and Z spacing
+            pixmap = self.render_cache.get(key)
+            if pixmap is None:
+                log.debug(f"Update display: {plane_idx}")
+                pixmap = self.render_slice_pixmap(plane_idx, self.current_slices[plane_idx], pixel_spacing)
+                if pixmap is None:
+                    return
+                self.render_cache.put(key, pixmap)
 
-            elif plane_idx == 2:  # Sagittal (YZ plane)
-                slice_data = current_data[slice_idx, :, :].T
-                slice_data = np.flipud(slice_data)
-                pixel_spacing = self.voxel_sizes[1:3]  # Y and Z spacing
+            self.show_pixmap(plane_idx, pixmap)
+            self.displayed_render_keys[plane_idx] = key
+            log.debug("Updated display ended")
+        except Exception as e:
+            # Log any display update errors (e.g. shape mismatch or memory issue)
+            log.error(f"Error updating display {plane_idx}: {e}")
 
-            else:
-                log.error("Plane index out of range")
-                return  # Invalid plane index
+    def show_pixmap(self, plane_idx, pixmap):
+        """Place a rendered pixmap in the scene of a plane and fit it to the view."""
+        # Update QGraphicsScene and QGraphicsView with new image
+        self.pixmap_items[plane_idx].setPixmap(pixmap)
+        self.scenes[plane_idx].setSceneRect(0, 0, pixmap.width(), pixmap.height())
+        self.views[plane_idx].fitInView(self.scenes[plane_idx].sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
 
-            automaticROI_slice = _slice(self.automaticROI_data, plane_idx, slice_idx) if self.automaticROI_overlay and self.automaticROI_data is not None else None
+    def render_slice_pixmap(self, plane_idx, slice_idx, pixel_spacing):
+        """
+        Render one slice of the current volume, with overlays and ROIs, into a pixmap.
 
-            # Prepare overlay if available and enabled
-            overlay_slice = _slice(self.overlay_thresholded_data,plane_idx, slice_idx)  if self.overlay_enabled and self.overlay_data is not None and self.overlay_thresholded_data is not None else None
+        Args:
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+            slice_idx (int): Slice index along the plane normal.
+            pixel_spacing (tuple[float, float]): In-plane voxel spacing in mm.
 
-            incrementalROI_slice = _slice(self.incrementalROI_data,plane_idx, slice_idx) if self.incrementalROI_enabled and self.incrementalROI_data is not None else None
+        Returns:
+            QPixmap | None: The rendered slice scaled to mm aspect ratio.
+        """
+        if self.projection_mode is not None:
+            projection = self.projection_image(plane_idx)
+            if projection is None:
+                return None  # Shown once the worker has computed it
+            # A projection is a one-slice volume along the plane normal
+            qimage = self.render_slice_image(np.expand_dims(projection, 2 - plane_idx), plane_idx, 0,
+                                             pixel_spacing, self.colormap, [], self.overlay_alpha)
+            return QPixmap.fromImage(qimage) if qimage is not None else None
+
+        # Select current 3D volume (for 4D data, use the selected time frame)
+        if self.is_4d:
+            current_data = self.img_data[..., self.current_time]
+        else:
+            current_data = self.img_data
 
-            # Prepare RGBA composite for display
-            height, width = slice_data.shape
-            rgba_image = self.apply_colormap_matplotlib(slice_data, self.colormap)
+        qimage = self.render_slice_image(current_data, plane_idx, slice_idx, pixel_spacing,
+                                         self.colormap, self.visible_mask_layers(), self.overlay_alpha)
+        if qimage is None:
+            return None
+        return QPixmap.fromImage(qimage)
 
-            if automaticROI_slice is not None:
-                rgba_image = self.create_overlay_composite(rgba_image, automaticROI_slice, self.colormap)
+    def projection_changed(self, mode):
+        """
+        Switch the three views between slices and an intensity projection.
 
-            if overlay_slice is not None:
-                rgba_image = self.create_overlay_composite(rgba_image, overlay_slice, self.colormap)
+        Args:
+            mode (str | None): One of `PROJECTIONS`, `ROTATING_MIP`, or None for slices.
+        """
+        self.projection_mode = mode
+        self.rotating_mip_index = 0
+        if mode == ROTATING_MIP:
+            self.precompute_rotating_mip()
+            self.rotating_mip_timer.start(self.ROTATING_MIP_INTERVAL_MS)
+        else:
+            self.rotating_mip_timer.stop()
+        self.update_all_displays()
 
-            if incrementalROI_slice is not None:
-                rgba_image = self.create_overlay_composite(rgba_image, incrementalROI_slice, self.colormap)
+    def projection_image(self, plane_idx):
+        """
+        Return the cached projection shown in a plane, queueing it on the worker if missing.
 
-            # Convert RGBA data to 8-bit format for QImage
-            rgba_data_uint8 = (rgba_image * 255).astype(np.uint8)
-            qimage = QImage(rgba_data_uint8.data, width, height, width * 4, QImage.Format.Format_RGBA8888)
+        Returns:
+            np.ndarray | None: 2D projection, or None while it is being computed.
+        """
+        key = self.projection_key(plane_idx)
+        projection = self.projection_cache.get(key)
+        if projection is None:
+            self.request_projection(key, urgent=True)
+        return projection
 
-            if qimage is not None:
-                img_w, img_h = qimage.width(), qimage.height()
+    def request_projection(self, key, urgent=False):
+        """
+        Queue the computation of a projection on the background worker.
 
-                # Scale the image according to voxel size ratio (convert to mm scale)
-                qimage_scaled = qimage.scaled(
-                    int(img_w),
-                    int(img_h * (pixel_spacing[1] / pixel_spacing[0])),
-                    Qt.AspectRatioMode.IgnoreAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
+        Args:
+            key (tuple): Projection key as returned by `projection_key`.
+            urgent (bool, optional): Compute it before background (rotating MIP) jobs.
+        """
+        if self.img_data is None:
+            return
+        if self.projection_worker is None:
+            self.projection_worker = ProjectionThread()
+            self.projection_worker.result_ready.connect(self._on_projection_ready)
+            self.projection_worker.start()
+
+        frame, kind, parameter = key
+        volume = self.img_data[..., frame] if self.is_4d else self.img_data
+        if kind == ROTATING_MIP:
+            compute = partial(rotating_mip, volume, parameter)
+        else:
+            compute = partial(intensity_projection, volume, kind, parameter)
+        self.projection_worker.submit(key, compute, urgent=urgent)
+
+    def precompute_rotating_mip(self):
+        """Queue every angle of the rotating MIP of the current frame in the background."""
+        frame = self.current_time if self.is_4d else 0
+        for angle in self.rotating_mip_angles:
+            key = (frame, ROTATING_MIP, float(angle))
+            if key not in self.projection_cache:
+                self.request_projection(key)
+
+    def advance_rotating_mip(self):
+        """Show the next angle of the rotating MIP once it has been precomputed (paused during cine playback)."""
+        if self.img_data is None or self.projection_mode != ROTATING_MIP or self.cine_timer.isActive():
+            return
+        frame = self.current_time if self.is_4d else 0
+        next_index = (self.rotating_mip_index + 1) % len(self.rotating_mip_angles)
+        if (frame, ROTATING_MIP, float(self.rotating_mip_angles[next_index])) not in self.projection_cache:
+            # Wait for the worker (and re-queue the angles after a time frame change)
+            self.precompute_rotating_mip()
+            return
+        self.rotating_mip_index = next_index
+        self.update_display(1)
+
+    def _on_projection_ready(self, key, projection):
+        """Cache a computed projection and show it in the planes waiting for it."""
+        self.projection_cache.put(key, projection)
+        for plane_idx in range(3):
+            if self.projection_key(plane_idx) == key:
+                self.update_display(plane_idx)
+
+    def reset_projections(self):
+        """Drop cached and queued projections of the previous volume."""
+        self.projection_cache.clear()
+        self.rotating_mip_index = 0
+        if self.projection_worker is not None:
+            self.projection_worker.clear()
+
+    def stop_projection_worker(self):
+        """Stop the rotating MIP animation and the background projection worker."""
+        self.rotating_mip_timer.stop()
+        if self.projection_worker is not None:
+            self.projection_worker.stop()
+            self.projection_worker.wait()
+            self.projection_worker.deleteLater()
+            self.projection_worker = None
+
+    def render_slice_image(self, volume, plane_idx, slice_idx, pixel_spacing, colormap, mask_layers, alpha):
+        """
+        Composite one slice of a 3D volume with its mask layers into a QImage.
 
-                # Store stretch factors for coordinate conversion later
-                self.stretch_factors[plane_idx] = (1.0, pixel_spacing[1] / pixel_spacing[0])
+        Only the given arguments are read, so this can also run on background
+        renderer threads with a snapshot of the viewer state.
 
-                # Update QGraphicsScene and QGraphicsView with new image
-                self.pixmap_items[plane_idx].setPixmap(QPixmap.fromImage(qimage_scaled))
-                self.scenes[plane_idx].setSceneRect(0, 0, qimage_scaled.width(), qimage_scaled.height())
-                self.views[plane_idx].fitInView(self.scenes[plane_idx].sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
-            log.debug("Updated display ended")
-        except Exception as e:
-            # Log any display update errors (e.g. shape mismatch or memory issue)
-            log.error(f"Error updating display {plane_idx}: {e}")
+        Args:
+            volume (np.ndarray): 3D base volume (normalized to [0, 1]).
+            plane_idx (int): Index of the anatomical plane (0=axial, 1=coronal, 2=sagittal).
+            slice_idx (int): Slice index along the plane normal.
+            pixel_spacing (tuple[float, float]): In-plane voxel spacing in mm.
+            colormap (str): Name of the matplotlib colormap.
+            mask_layers (list[np.ndarray]): 3D masks blended on top of the slice.
+            alpha (float): Overlay opacity.
+
+        Returns:
+            QImage | None: The rendered slice scaled to mm aspect ratio.
+        """
+        # Colormap the slice (transposed and flipped for display) and blend the masks on top
+        rgba_image = render_slice_rgba(volume, plane_idx, slice_idx, colormap, mask_layers, alpha)
+        height, width = rgba_image.shape[:2]
+
+        # Convert RGBA data to 8-bit format for QImage
+        rgba_data_uint8 = np.ascontiguousarray((rgba_image * 255).astype(np.uint8))
+        qimage = QImage(rgba_data_uint8.data, width, height, width * 4, QImage.Format.Format_RGBA8888)
+
+        if qimage is None:
+            return None
+
+        img_w, img_h = qimage.width(), qimage.height()
+        scaled_h = int(img_h * (pixel_spacing[1] / pixel_spacing[0]))
+        if scaled_h == img_h:
+            # Detach from the NumPy buffer, which is released on return
+            return qimage.copy()
+
+        # Scale the image according to voxel size ratio (convert to mm scale)
+        return qimage.scaled(
+            int(img_w),
+            scaled_h,
+            Qt.AspectRatioMode.IgnoreAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
 
     def setup_time_series_plot(self):
         """Setup time series plot for 4D data"""
@@ -1859,6 +2995,33 @@ class NiftiViewer(QMainWindow):
         self.time_plot_axes = self.time_plot_figure.add_subplot(111)
         self.time_plot_axes.set_facecolor('black')
 
+        # Static axes decorations are drawn once and kept in the blitting background
+        self.time_plot_axes.set_xlabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Time Point"),
+                                       color='white')
+        self.time_plot_axes.set_ylabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Signal Intensity"),
+                                       color='white')
+        self.time_plot_axes.tick_params(colors='white')
+        self.time_plot_axes.grid(True, alpha=0.3, color='gray')
+
+        # Curve, error band, time indicator and title change on every update: they are
+        # animated artists redrawn on top of the cached background
+        self.time_series_line, = self.time_plot_axes.plot(
+            [], [], 'c-', linewidth=2, animated=True,
+            label=QtCore.QCoreApplication.translate("NIfTIViewer", 'Concentration'))
+        self.time_series_band = None
+        self.time_indicator_line = self.time_plot_axes.axvline(
+            x=self.current_time, color='yellow', linewidth=2, alpha=0.8, animated=True,
+            label=QtCore.QCoreApplication.translate("NIfTIViewer", 'Current Time')
+        )
+        self.time_plot_axes.title.set_color('white')
+        self.time_plot_axes.title.set_animated(True)
+        self.time_plot_axes.legend()
+
+        self.time_plot_background = None
+        self.time_series_key = None
+        self.time_plot_ylim = None
+        self.time_plot_canvas.mpl_connect('draw_event', self._on_time_plot_draw)
+
         # Update section title and add canvas widget to layout
         self.fourth_title.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Tracer Concentration Curve"))
         self.fourth_content_layout.addWidget(self.time_plot_canvas)
@@ -1873,102 +3036,141 @@ class NiftiViewer(QMainWindow):
             self.time_plot_canvas = None
             self.time_plot_axes = None
             self.time_plot_figure = None
+            self.time_plot_background = None
 
         # Restore title and info text for non-4D files
         self.fourth_title.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Image Information"))
         self.info_text.show()
 
+    def reset_time_series_cache(self):
+        """Forget cached ROI curves and force the next plot update to redraw the curve."""
+        self.roi_tac_cache = None
+        self.time_series_key = None
+        self.time_plot_ylim = None
+
+    def roi_time_series(self):
+        """
+        Return the mean and standard deviation curves of the thresholded overlay ROI.
+
+        The curves are computed once per overlay version (overlay data and
+        threshold) and reused for every click inside the ROI.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Mean and standard deviation per time frame.
+        """
+        if self.roi_tac_cache is not None and self.roi_tac_cache[0] == self.overlay_version:
+            return self.roi_tac_cache[1], self.roi_tac_cache[2]
+
+        # 4D data is stored time-contiguous, so each ROI voxel contributes one contiguous row
+        roi_voxels = self.img_data[dense_mask(self.overlay_thresholded_data)]
+        mean_series = roi_voxels.mean(axis=0)
+        std_series = roi_voxels.std(axis=0)
+        self.roi_tac_cache = (self.overlay_version, mean_series, std_series)
+        return mean_series, std_series
+
+    def time_series_data(self):
+        """
+        Select the curve shown in the time series plot for the current voxel.
+
+        Returns:
+            tuple: (key, time_series, std_series, title), where `key` identifies
+            the curve so unchanged curves are not re-uploaded to the plot.
+        """
+        coords = self.current_coordinates
+        mask = self.overlay_thresholded_data
+
+        # Check if overlay is active and apply ROI-based averaging
+        if (self.overlay_data is not None and self.overlay_enabled and mask is not None
+                and mask.shape == self.img_data.shape[:3] and mask[coords[0], coords[1], coords[2]]):
+            # Current voxel is inside the thresholded ROI mask: show the ROI mean
+            time_series, std_series = self.roi_time_series()
+            return ("roi", self.overlay_version), time_series, std_series, 'Mean in overlay mask'
+
+        # Outside mask or no overlay: show only single voxel time series
+        time_series = self.img_data[coords[0], coords[1], coords[2], :]
+        return (("voxel",) + tuple(coords), time_series, None,
+                f'Voxel ({coords[0]}, {coords[1]}, {coords[2]})')
+
+    def _on_time_plot_draw(self, event):
+        """Capture the static plot background after a full redraw and paint the animated artists."""
+        if self.time_plot_canvas is None:
+            return
+        self.time_plot_background = self.time_plot_canvas.copy_from_bbox(self.time_plot_figure.bbox)
+        self._draw_time_plot_artists()
+
+    def _draw_time_plot_artists(self):
+        """Draw the curve, error band, time indicator and title on the canvas renderer."""
+        axes = self.time_plot_axes
+        if self.time_series_band is not None:
+            axes.draw_artist(self.time_series_band)
+        axes.draw_artist(self.time_series_line)
+        axes.draw_artist(self.time_indicator_line)
+        axes.draw_artist(axes.title)
+
     def update_time_series_plot(self):
-        """Update the time series plot with current voxel or ROI data"""
+        """
+        Update the time series plot with current voxel or ROI data.
+
+        The plot artists are updated in place: when the axes limits do not change,
+        only the animated artists are redrawn and blitted over the cached background.
+        """
         if not self.is_4d or self.time_plot_canvas is None or self.img_data is None:
             return
 
         try:
-            coords = self.current_coordinates
-            bool_in_mask = False
-
-            # Check if overlay is active and apply ROI-based averaging
-            if self.overlay_data is not None and self.overlay_enabled:
-                overlay_max = np.max(self.overlay_data) if np.max(self.overlay_data) > 0 else 1
-                threshold_value = self.overlay_threshold * overlay_max
-                threshold_mask = self.overlay_data > threshold_value
-
-                # If current voxel is inside the thresholded ROI mask
-                if threshold_mask[coords[0], coords[1], coords[2]]:
-                    bool_in_mask = True
-                    roi_voxels = self.img_data[threshold_mask, :]  # extract time series from ROI voxels
-                    time_series = roi_voxels.mean(axis=0)  # mean intensity over ROI
-                    std_series = roi_voxels.std(axis=0)  # standard deviation for shaded region
+            axes = self.time_plot_axes
+            full_redraw = self.time_plot_background is None
+
+            key, time_series, std_series, title = self.time_series_data()
+            if key != self.time_series_key:
+                # X-axis values = time points
+                time_points = np.arange(self.dims[3])
+                self.time_series_line.set_data(time_points, time_series)
+
+                # Optional shaded error region (ROI variability)
+                if self.time_series_band is not None:
+                    self.time_series_band.remove()
+                    self.time_series_band = None
+                if std_series is not None:
+                    self.time_series_band = axes.fill_between(time_points, time_series - std_series,
+                                                              time_series + std_series, alpha=0.2, color='c',
+                                                              animated=True)
+                    low, high = np.min(time_series - std_series), np.max(time_series + std_series)
                 else:
-                    # Outside mask: show only single voxel time series
-                    time_series = self.img_data[coords[0], coords[1], coords[2], :]
-                    std_series = None
+                    low, high = np.min(time_series), np.max(time_series)
+
+                # Title reflects whether inside ROI or single voxel
+                axes.set_title(title, color='white')
+                self.time_series_key = key
+
+                # Limits are rounded to a coarse grid so nearby curves reuse the same background
+                ylim = (np.floor(low * 10) / 10, np.ceil(high * 10) / 10)
+                if ylim[1] <= ylim[0]:
+                    ylim = (ylim[0], ylim[0] + 0.1)
+                if ylim != self.time_plot_ylim:
+                    axes.set_xlim(0, max(self.dims[3] - 1, 1))
+                    axes.set_ylim(*ylim)
+                    self.time_plot_ylim = ylim
+                    full_redraw = True
+
+            # Move the vertical line showing the current time index
+            self.time_indicator_line.set_xdata([self.current_time, self.current_time])
+
+            if full_redraw:
+                # Full draw re-renders the static background; _on_time_plot_draw paints the artists
+                self.time_plot_canvas.draw()
             else:
-                # If overlay is not enabled, show voxel intensity over time
-                time_series = self.img_data[coords[0], coords[1], coords[2], :]
-                std_series = None
-
-            # X-axis values = time points
-            time_points = np.arange(self.dims[3])
-
-            # Clear previous plot content
-            self.time_plot_axes.clear()
-            self.time_plot_axes.set_facecolor('black')
-
-            # Plot time series curve
-            self.time_plot_axes.plot(time_points, time_series, 'c-', linewidth=2,
-                                     label=QtCore.QCoreApplication.translate("NIfTIViewer", 'Concentration'))
-
-            # Optional shaded error region (ROI variability)
-            if std_series is not None:
-                self.time_plot_axes.fill_between(time_points, time_series - std_series,
-                                                 time_series + std_series, alpha=0.2, color='c')
-
-            # Add vertical yellow line showing current time index
-            self.time_indicator_line = self.time_plot_axes.axvline(
-                x=self.current_time, color='yellow', linewidth=2, alpha=0.8,
-                label=QtCore.QCoreApplication.translate("NIfTIViewer", 'Current Time')
-            )
-
-            # Set axis labels and title
-            self.time_plot_axes.set_xlabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Time Point"),
-                                           color='white')
-            self.time_plot_axes.set_ylabel(QtCore.QCoreApplication.translate("NIfTIViewer", "Signal Intensity"),
-                                           color='white')
-
-            # Title reflects whether inside ROI or single voxel
-            if bool_in_mask:
-                self.time_plot_axes.set_title(f'Mean in overlay mask', color='white')
-            else:
-                self.time_plot_axes.set_title(f'Voxel ({coords[0]}, {coords[1]}, {coords[2]})', color='white')
-
-            # Style axes and legend
-            self.time_plot_axes.tick_params(colors='white')
-            self.time_plot_axes.legend()
-            self.time_plot_axes.grid(True, alpha=0.3, color='gray')
-
-            # Redraw updated plot on canvas
-            self.time_plot_canvas.draw()
+                self.time_plot_canvas.restore_region(self.time_plot_background)
+                self._draw_time_plot_artists()
+                self.time_plot_canvas.blit(self.time_plot_figure.bbox)
 
         except Exception as e:
             # Log error if plotting fails (e.g., index error)
             log.error(f"Error updating time series plot: {e}")
 
     def apply_colormap_matplotlib(self, data, colormap_name):
-        """Apply colormap using matplotlib and return QImage"""
-        try:
-            # Retrieve selected colormap from matplotlib
-            cmap = matplotlib.colormaps.get_cmap(colormap_name)
-
-            # Apply colormap to normalized image data
-            colored_data = cmap(data)
-
-            return colored_data
-
-        except Exception as e:
-            # Log errors (e.g., invalid colormap name)
-            log.error(f"Error applying colormap: {e}")
-            return None
+        """Apply colormap using matplotlib and return the RGBA array"""
+        return apply_colormap(data, colormap_name)
 
     def update_all_displays(self):
         """Update all plane displays"""
@@ -1982,48 +3184,24 @@ class NiftiViewer(QMainWindow):
 
         # Update slice information label in the status bar
         if self.img_data is not None:
-            spatial_dims = self.dims[:3] if self.is_4d else self.dims
-            # Construct slice position string for each plane (1-based indexing)
+            spatial_dims = (self.original_dims if self.original_dims is not None else self.dims)[:3]
+            x, y, z = self.original_coordinates(self.current_slices[::-1])
+            # Construct slice position string for each plane (1-based indexing, in the file's grid)
             slice_info = QtCore.QCoreApplication.translate("NIfTIViewer", "Slices") + \
-                         f": {self.current_slices[0] + 1}/{spatial_dims[2]} | " \
-                         f"{self.current_slices[1] + 1}/{spatial_dims[1]} | " \
-                         f"{self.current_slices[2] + 1}/{spatial_dims[0]}"
+                         f": {z + 1}/{spatial_dims[2]} | " \
+                         f"{y + 1}/{spatial_dims[1]} | " \
+                         f"{x + 1}/{spatial_dims[0]}"
             # Add current time info if applicable
             if self.is_4d:
                 slice_info += f" | " + QtCore.QCoreApplication.translate("NIfTIViewer", "Time") + \
                               f": {self.current_time + 1}/{self.dims[3]}"
             self.slice_info_label.setText(slice_info)
 
-    def create_overlay_composite(self, rgba_image, overlay_slice, colormap):
+    def create_overlay_composite(self, rgba_image, overlay_slice, colormap, alpha=None):
         """Create a composite image with colormap base and red overlay."""
-        try:
-            # Convert RGBA base image to float for blending
-            rgba_image_float = rgba_image.astype(np.float64)  # shape (H, W, 4)
-
-            if overlay_slice.size > 0:
-
-                if np.any(overlay_slice):
-                    # Apply transparency scaling (based on user alpha)
-                    overlay_intensity = overlay_slice * self.overlay_alpha
-
-                    # Retrieve overlay color from dictionary or default (green)
-                    overlay_color = self.overlay_colors.get(colormap, np.array([0.0, 1.0, 0.0]))
-
-                    log.debug("Blending overlay color into base image")
-                    # Blend overlay into base image using a numba-accelerated function
-                    rgba_image_float = apply_overlay_numba(rgba_image, overlay_slice,
-                                                           overlay_intensity, overlay_color)
-                    log.debug("Blended overlay color into base image")
-            log.debug("Clipping values to a valid range")
-            # Clip values to valid range [0, 1]
-            rgba_image_overlay = np.clip(rgba_image_float, 0, 1)
-
-            return rgba_image_overlay
-
-        except Exception as e:
-            # Log errors and return unmodified base image as fallback
-            log.error(f"Error creating overlay composite: {e}")
-            return rgba_image
+        if alpha is None:
+            alpha = self.overlay_alpha
+        return composite_overlay(rgba_image, overlay_slice, colormap, alpha)
 
     def resizeEvent(self, event: QResizeEvent):
         """Handle window resize to maintain aspect ratios"""
@@ -2040,10 +3218,70 @@ class NiftiViewer(QMainWindow):
                 view.fitInView(view.scene().sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
 
     def update_automaticROI(self):
-        """Update the automatic ROI overlay dynamically when parameters change"""
+        """
+        Schedule a recomputation of the automatic ROI when its parameters change.
+
+        Changes are debounced and computed in the background, so dragging the
+        sliders keeps showing the previous ROI until the latest one is ready.
+        """
         if self.automaticROI_overlay:
-            self.automaticROI_drawing()
+            self.automaticROI_timer.start(self.AUTOMATIC_ROI_DEBOUNCE_MS)
+
+    def automaticROI_params(self):
+        """Return the current automatic ROI parameters as arguments of `compute_automatic_roi`."""
+        img_data = self.img_data[..., self.current_time] if self.is_4d else self.img_data
+        return dict(img_data=img_data,
+                    seed=tuple(self.automaticROI_seed_coordinates),
+                    radius_mm=self.automaticROI_radius_slider.value(),  # ROI radius in mm
+                    difference=self.automaticROI_diff_slider.value() / 1000,  # intensity tolerance
+                    voxel_sizes=self.voxel_sizes,
+                    connectivity=self.automaticROI_connectivity_combo.currentData())
+
+    def request_automaticROI(self):
+        """Submit the current ROI parameters to the background worker."""
+        if not self.automaticROI_overlay or self.img_data is None or self.automaticROI_seed_coordinates is None:
+            return
+        if self.automaticROI_worker is None:
+            self.automaticROI_worker = AutomaticROIThread(compute_automatic_roi)
+            self.automaticROI_worker.result_ready.connect(self._on_automaticROI_ready)
+            self.automaticROI_worker.error.connect(self._on_automaticROI_error)
+            self.automaticROI_worker.start()
+        self.automaticROI_worker.submit(**self.automaticROI_params())
+
+    def _on_automaticROI_ready(self, mask, generation):
+        """Show a background-computed ROI unless it was superseded meanwhile."""
+        if not self.automaticROI_overlay or not self.automaticROI_worker.is_current(generation):
+            return
+        self.automaticROI_data = mask
+        self.roi_version += 1
+        self.update_all_displays()
+
+    def _on_automaticROI_error(self, error):
+        """Clear the ROI when its computation fails, so a stale one is not shown or saved, and report it."""
+        log.error(f"Automatic ROI failed: {error}")
+        if not self.automaticROI_overlay:
+            return
+        if self.automaticROI_data is not None:
+            self.roi_version += 1
+            self.automaticROI_data = None
             self.update_all_displays()
+        self.status_bar.showMessage(
+            QtCore.QCoreApplication.translate("NIfTIViewer", "Automatic ROI failed") + f": {error}")
+
+    def cancel_automaticROI(self):
+        """Discard scheduled and in-flight background ROI computations."""
+        self.automaticROI_timer.stop()
+        if self.automaticROI_worker is not None:
+            self.automaticROI_worker.cancel()
+
+    def stop_automaticROI_worker(self):
+        """Stop the background ROI worker thread."""
+        self.automaticROI_timer.stop()
+        if self.automaticROI_worker is not None:
+            self.automaticROI_worker.stop()
+            self.automaticROI_worker.wait()
+            self.automaticROI_worker.deleteLater()
+            self.automaticROI_worker = None
 
     def automaticROI_clicked(self):
         """Handle click on 'Automatic ROI' button to start or reset the ROI tool"""
@@ -2074,6 +3312,7 @@ class NiftiViewer(QMainWindow):
         self.automaticROI_overlay = True
         self.ROI_save_btn.setEnabled(True)
         self.addOrigin_btn.setEnabled(True)
+        self.removeOrigin_btn.setEnabled(True)
         self.cancelROI_btn.setEnabled(True)
 
         # Generate initial automatic ROI mask
@@ -2127,34 +3366,12 @@ class NiftiViewer(QMainWindow):
 
     def automaticROI_drawing(self):
         """Generate automatic ROI mask around selected seed voxel"""
-        radius_mm = self.automaticROI_radius_slider.value()  # ROI radius in mm
-        difference = self.automaticROI_diff_slider.value() / 1000  # intensity tolerance
-        x0, y0, z0 = self.automaticROI_seed_coordinates  # seed voxel coordinates
-
-        # Select proper 3D volume if data is 4D
-        img_data = self.img_data[..., self.current_time] if self.is_4d else self.img_data
-
-        # Intensity value at the seed voxel
-        seed_intensity = img_data[x0, y0, z0]
-
-        # Convert radius in mm to radius in voxel units per axis
-        rx_vox = int(np.ceil(radius_mm / self.voxel_sizes[0]))
-        ry_vox = int(np.ceil(radius_mm / self.voxel_sizes[1]))
-        rz_vox = int(np.ceil(radius_mm / self.voxel_sizes[2]))
-
-        # Compute subvolume limits (ROI bounding box)
-        x_min, x_max = max(0, x0 - rx_vox), min(img_data.shape[0], x0 + rx_vox + 1)
-        y_min, y_max = max(0, y0 - ry_vox), min(img_data.shape[1], y0 + ry_vox + 1)
-        z_min, z_max = max(0, z0 - rz_vox), min(img_data.shape[2], z0 + rz_vox + 1)
-
-        # Compute ROI mask using parallelized Numba function
-        mask = compute_mask_numba_mm(img_data, x0, y0, z0,
-                                     radius_mm, self.voxel_sizes,
-                                     seed_intensity, difference,
-                                     x_min, x_max, y_min, y_max, z_min, z_max)
+        # A synchronous result supersedes any pending background computation
+        self.cancel_automaticROI()
 
         # Store result as overlay for visualization
-        self.automaticROI_data = mask
+        self.automaticROI_data = compute_automatic_roi(**self.automaticROI_params())
+        self.roi_version += 1
 
     def ROI_save(self):
         """Save the automatically generated ROI mask to disk"""
@@ -2218,31 +3435,41 @@ class NiftiViewer(QMainWindow):
 
         origin_dict = {}
 
-        total_ROI = np.zeros(self.dims)
+        total_ROI = RunLengthROI(self.dims)
         if self.overlay_data is not None and self.overlay_enabled and self.overlay_thresholded_data is not None:
-            total_ROI = np.logical_or(self.overlay_thresholded_data, total_ROI).astype(np.uint8)
+            # Encode the thresholded mask slice by slice, without copying it
+            mask = self.overlay_thresholded_data
+            slices = (mask.plane(0, x) for x in range(mask.shape[0])) if hasattr(mask, "plane") else mask
+            total_ROI = total_ROI.union(RunLengthROI.from_slices(slices, self.dims))
             origin_dict["Original overlay"] = self.overlay_file_path
             origin_dict["Original overlay threshold"] = self.overlay_threshold
             
         if self.incrementalROI_data is not None and self.incrementalROI_enabled:
-            total_ROI = np.logical_or(self.incrementalROI_data,total_ROI).astype(np.uint8)
+            total_ROI = total_ROI.union(self.incrementalROI_data)
             origin_dict["Automatic drawing parameters"] = self.incrementalROI_origins
 
         if self.automaticROI_data is not None and self.automaticROI_overlay:
-            total_ROI = np.logical_or(self.automaticROI_data, total_ROI).astype(np.uint8)
+            total_ROI = total_ROI.union(self.automaticROI_data)
             new_params = {
-                "Seed": list(self.automaticROI_seed_coordinates),  # assicurati che sia JSON-safe
+                "Seed": self.original_coordinates(self.automaticROI_seed_coordinates),  # JSON-safe ints
                 "Radius": self.automaticROI_radius_slider.value(),
                 "Difference": self.automaticROI_diff_slider.value(),
+                "Connectivity": self.automaticROI_connectivity_combo.currentData(),
             }
             if "Automatic drawing parameters" in origin_dict:
                 origin_dict["Automatic drawing parameters"].append(new_params)
             else:
                 origin_dict["Automatic drawing parameters"] = [new_params]
 
+        # Save the mask on the grid of the file, also when it was cropped on load
+        affine = self.affine
+        if self.original_affine is not None and tuple(self.dims[:3]) != tuple(self.original_dims[:3]):
+            total_ROI = total_ROI.embed(self.crop_offset, self.original_dims)
+            affine = self.original_affine
+
         log.debug("Start thread")
         # Start threaded save operation
-        self.threads.append(SaveNiftiThread(total_ROI, self.affine,
+        self.threads.append(SaveNiftiThread(total_ROI, affine,
                                             full_save_path, json_save_path,
                                             relative_path, origin_dict))
         self.threads[-1].success.connect(self._on_ROI_saved)
@@ -2294,26 +3521,63 @@ class NiftiViewer(QMainWindow):
         else:
             return 1
     def addOrigin_clicked(self):
-        self.incrementalROI_data = self.incrementalROI_data if self.incrementalROI_data is not None else np.zeros(self.dims)
+        """Add the current automatic ROI to the incremental ROI."""
+        self.edit_incrementalROI(RunLengthROI.union)
 
-        if self.automaticROI_overlay and self.automaticROI_data is not None:
-            self.incrementalROI_data = np.logical_or(self.incrementalROI_data, self.automaticROI_data).astype(np.uint8)
+    def removeOrigin_clicked(self):
+        """Remove the current automatic ROI from the incremental ROI."""
+        self.edit_incrementalROI(RunLengthROI.difference, operation="Remove")
+
+    def edit_incrementalROI(self, combine, operation=None):
+        """
+        Combine the current automatic ROI into the incremental ROI.
+
+        The previous state is pushed on the undo history, unless there is no
+        automatic ROI or the edit changes nothing. ROIs are run-length encoded,
+        so an edit costs time and memory proportional to the ROI size.
+
+        Args:
+            combine (Callable[[RunLengthROI, RunLengthROI], RunLengthROI]): Set operation to apply.
+            operation (str, optional): Recorded with the origin parameters for non-additive edits.
+        """
+        if not self.automaticROI_overlay or self.automaticROI_data is None:
+            return
+        current = self.incrementalROI_data if self.incrementalROI_data is not None else RunLengthROI(self.dims)
+        combined = combine(current, self.automaticROI_data)
+        # A union only adds voxels and a difference only removes some: same count, same ROI
+        if combined.voxel_count == current.voxel_count:
+            return
+
+        self.incrementalROI_history.append((self.incrementalROI_data, list(self.incrementalROI_origins)))
+        self.undoROI_btn.setEnabled(True)
+        self.incrementalROI_data = combined
+        self.roi_version += 1
 
-        #if self.overlay_enabled and self.overlay_data is not None:
-        #    self.incrementalROI_data = np.logical_or(self.incrementalROI_data, self.overlay_data).astype(np.uint8)
         self.incrementalROI_checkbox.setVisible(True)
         self.incrementalROI_checkbox.setEnabled(True)
         self.toggle_incrementalROI(True)
 
         new_params = {
-            "Seed": list(self.automaticROI_seed_coordinates),
+            "Seed": self.original_coordinates(self.automaticROI_seed_coordinates),
             "Radius": self.automaticROI_radius_slider.value(),
             "Difference": self.automaticROI_diff_slider.value(),
+            "Connectivity": self.automaticROI_connectivity_combo.currentData(),
         }
+        if operation is not None:
+            new_params["Operation"] = operation
 
         # Mantieni lista incrementale
         self.incrementalROI_origins.append(new_params)
 
+    def undoROI_clicked(self):
+        """Restore the incremental ROI as it was before the last edit."""
+        if not self.incrementalROI_history:
+            return
+        self.incrementalROI_data, self.incrementalROI_origins = self.incrementalROI_history.pop()
+        self.roi_version += 1
+        self.undoROI_btn.setEnabled(bool(self.incrementalROI_history))
+        self.update_all_displays()
+
     def toggle_incrementalROI(self,enabled,update_all=True):
 
         self.incrementalROI_enabled = enabled
@@ -2335,6 +3599,14 @@ class NiftiViewer(QMainWindow):
 
     def closeEvent(self, event):
         """Clean up on application exit"""
+        # Stop cine playback and its prefetch thread
+        self.stop_cine()
+        self.stop_automaticROI_worker()
+        self.stop_projection_worker()
+        self.stop_dicom_loader()
+        self.hover_update.cancel()
+        self.navigation_update.cancel()
+
         # Stop and delete all active threads
         if hasattr(self, 'threads'):
             for t in self.threads:
@@ -2344,9 +3616,12 @@ class NiftiViewer(QMainWindow):
                 t.deleteLater()
             self.threads.clear()
 
-        # Clear large data arrays to release memory
+        # Clear large data arrays and cached pixmaps to release memory
         self.img_data = None
         self.overlay_data = None
+        self.invalidate_render_cache()
+        self.session_cache.clear()
+        self.update_cache_memory_label()
 
         # Trigger garbage collection
         gc.collect()
@@ -2358,13 +3633,19 @@ class NiftiViewer(QMainWindow):
         """Reset all overlay-related UI elements and internal variables."""
         # Disable the automatic ROI overlay mode
         self.automaticROI_overlay = False
+        self.cancel_automaticROI()
         # Disable the "Save ROI" button since there’s no active overlay
         self.ROI_save_btn.setEnabled(False)
         # Clear all overlay-related data
+        if self.overlay_data is not None:
+            self.overlay_version += 1
+        if self.automaticROI_data is not None:
+            self.roi_version += 1
         self.automaticROI_data = None
         self.overlay_data = None
         self.overlay_dims = None
         self.overlay_file_path = None
+        self.overlay_threshold_index = None
         # Hide and disable the overlay parameter sliders group (radius/difference)
         self.automaticROI_sliders_group.setVisible(False)
         self.automaticROI_sliders_group.setEnabled(False)
@@ -2384,6 +3665,8 @@ class NiftiViewer(QMainWindow):
         self.ROI_save_btn.setEnabled(False)
         self.cancelROI_btn.setEnabled(False)
         self.addOrigin_btn.setEnabled(False)
+        self.removeOrigin_btn.setEnabled(False)
+        self.undoROI_btn.setEnabled(False)
 
         self.toggle_incrementalROI(False,update_all=False)
         self.incrementalROI_checkbox.setEnabled(False)
@@ -2393,6 +3676,9 @@ class NiftiViewer(QMainWindow):
         self.automaticROI_checkbox.setEnabled(False)
         self.automaticROI_checkbox.setVisible(False)
 
+        self.cancel_automaticROI()
+        if self.incrementalROI_data is not None or self.automaticROI_data is not None:
+            self.roi_version += 1
         self.incrementalROI_data = None
         self.automaticROI_data = None
 
@@ -2404,34 +3690,10 @@ class NiftiViewer(QMainWindow):
         self.automaticROIbtn.setEnabled(True)
 
         self.incrementalROI_origins = []
+        self.incrementalROI_history = []
 
 
 
-    def pad_volume_to_shape(self, volume, target_shape, constant_value=0):
-        """
-        Pad a 3D volume (NumPy array) symmetrically to match a desired target shape.
-
-        Args:
-            volume (np.ndarray): Input 3D volume to pad.
-            target_shape (tuple[int]): Desired (X, Y, Z) dimensions after padding.
-            constant_value (int or float, optional): Value used for padding. Defaults to 0.
-
-        Returns:
-            np.ndarray: The padded 3D array with dimensions matching target_shape.
-        """
-        current_shape = volume.shape
-        pads = []  # Store pad widths for each axis
-
-        # Compute symmetric padding for each axis
-        for cur, tgt in zip(current_shape, target_shape):
-            diff = max(tgt - cur, 0)  # Calculate missing voxels along this axis
-            pad_before = diff // 2  # Padding before the data
-            pad_after = diff - pad_before  # Padding after the data
-            pads.append((pad_before, pad_after))  # Add as (before, after) pair
-
-        # Apply constant padding and return result
-        return np.pad(volume, pads, mode="constant", constant_values=constant_value)
-
     def handle_scroll(self,plane_idx,delta):
         if plane_idx == 0:  # Axial (XY plane)
             if delta>0:
@@ -2493,6 +3755,7 @@ class NiftiViewer(QMainWindow):
 
         # File open button label
         self.open_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "📁 Open NIfTI File"))
+        self.open_dicom_btn.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "📂 Open DICOM Folder"))
 
         # Default file information message
         self.file_info_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "No file loaded"))
@@ -2509,6 +3772,11 @@ class NiftiViewer(QMainWindow):
         # Time navigation controls
         self.time_checkbox.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Enable 4D Time Navigation"))
         self.time_point_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Time Point:"))
+        self.cine_play_btn.setText(
+            QtCore.QCoreApplication.translate("NIfTIViewer", "⏸ Pause") if self.cine_timer.isActive()
+            else QtCore.QCoreApplication.translate("NIfTIViewer", "▶ Play")
+        )
+        self.cine_fps_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "FPS:"))
 
         # Display options section label
         self.display_options_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Display Options:"))
@@ -2520,6 +3788,11 @@ class NiftiViewer(QMainWindow):
 
         # Label for colormap and overlay control sections
         self.colormap_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Colormap:"))
+        self.projection_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Projection:"))
+        self.crop_checkbox.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Crop background on load"))
+        self.projection_combo.setItemText(0, QtCore.QCoreApplication.translate("NIfTIViewer", "Slices"))
+        self.projection_combo.setItemText(self.projection_combo.count() - 1,
+                                          QtCore.QCoreApplication.translate("NIfTIViewer", "Rotating MIP"))
         self.overlay_control_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Overlay Controls:"))
 
         # Overlay loading and visibility controls
@@ -2527,6 +3800,7 @@ class NiftiViewer(QMainWindow):
         self.overlay_checkbox.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Show Overlay"))
         self.alpha_overlay_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Overlay Transparency:"))
         self.overlay_threshold_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Overlay Threshold:"))
+        self.automaticROI_connectivity_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "Connectivity:"))
         self.overlay_info_label.setText(QtCore.QCoreApplication.translate("NIfTIViewer", "No overlay loaded"))
 
         # Titles for image view panels
@@ -2545,7 +3819,7 @@ class NiftiViewer(QMainWindow):
         # If an image file is already loaded, update the displayed metadata
         if self.file_path:
             filename = os.path.basename(self.file_path)
-            dims = self.dims
+            dims = self.original_dims if self.original_dims is not None else self.dims
             # Distinguish between 3D and 4D datasets
             if self.is_4d:
                 info_text = (
@@ -2563,6 +3837,7 @@ class NiftiViewer(QMainWindow):
                 )
 
             # Update file info labels and sidebar text
+            info_text += self.crop_info_text()
             self.file_info_label.setText(info_text)
             self.info_text.setText(info_text)
         else:
@@ -9,6 +9,7 @@ import os
 import subprocess
 
 from components.file_selector_widget import FileSelectorWidget
+from skull_strip_cache import has_current_output
 from threads.skull_strip_thread import SkullStripThread
 from page import Page
 from logger import get_logger
@@ -294,7 +295,10 @@ class SkullStrippingPage(Page):
 
     def has_existing_skull_strip(self, nifti_file_path, workspace_path):
         """
-        Check if a skull-stripped file already exists for the selected subject.
+        Check if an up-to-date skull-stripped file already exists for the selected file.
+
+        Outputs recording their provenance count only if they were made from this
+        file and its voxels did not change since (see `skull_strip_cache.has_current_output`).
 
         Args:
             nifti_file_path (str): Full path to input NIfTI file.
@@ -309,10 +313,7 @@ class SkullStrippingPage(Page):
             return False
 
         skull_strip_dir = os.path.join(workspace_path, 'derivatives', 'skullstrips', subject_id, 'anat')
-        if not os.path.exists(skull_strip_dir):
-            return False
-
-        return any(f.endswith('.nii.gz') for f in os.listdir(skull_strip_dir))
+        return has_current_output(skull_strip_dir, nifti_file_path)
 
     def toggle_advanced(self):
         """Toggle visibility of advanced BET parameters."""
@@ -349,8 +350,15 @@ class SkullStrippingPage(Page):
         else:
             self.bet_tool = "hd-bet"
 
-        # Create worker thread
-        self.worker = SkullStripThread(selected_files, self.context["workspace_path"], parameters, self.has_cuda, self.bet_tool)
+        # Create worker thread; a CPU budget of 0 lets the batch use every core
+        # HD-BET runs in a long-lived worker unless disabled in the settings
+        cpu_budget = None
+        use_service = True
+        if "settings" in self.context:
+            cpu_budget = self.context["settings"].value("skull_strip_cpu_budget", 0, type=int) or None
+            use_service = self.context["settings"].value("skull_strip_persistent_worker", True, type=bool)
+        self.worker = SkullStripThread(selected_files, self.context["workspace_path"], parameters, self.has_cuda,
+                                       self.bet_tool, cpu_budget=cpu_budget, use_service=use_service)
 
         # Connect worker signals
         self.worker.progress_updated.connect(self.on_progress_updated)
@@ -7,14 +7,13 @@ to select the next processing step in the GliAAns pipeline.
 The available options include:
 - Skull Stripping
 - Automatic Drawing
-- Deep Learning Segmentation (Linux + CUDA only)
+- Deep Learning Segmentation (Linux only, CUDA or CPU)
 - Full Pipeline Execution
 
 Depending on the selected option, the next page is dynamically loaded.
 """
 
 import platform
-import torch
 from PyQt6.QtWidgets import (
     QVBoxLayout, QLabel, QGroupBox, QRadioButton, QButtonGroup, QSizePolicy,
     QWidget, QHBoxLayout, QMessageBox, QApplication
@@ -144,7 +143,7 @@ class ToolSelectionPage(Page):
                     text="i",
                     tooltip_text=QCoreApplication.translate(
                         "ToolSelectionPage",
-                        "To use this function you need Linux and a CUDA capable GPU"
+                        "To use this function you need Linux (a CUDA capable GPU makes it much faster)"
                     )
                 )
                 dl_layout.addWidget(self.radio_dl)
@@ -187,7 +186,7 @@ class ToolSelectionPage(Page):
         """
         Return the next page based on the selected option.
 
-        Handles platform and CUDA availability checks for Deep Learning mode.
+        Handles the platform check for Deep Learning mode (it runs on the CPU without CUDA).
         """
         page_classes = {
             0: ("next_skull_stripping", SkullStrippingPage),
@@ -199,11 +198,10 @@ class ToolSelectionPage(Page):
         if self.selected_option not in page_classes:
             return None
 
-        # Check CUDA and OS support for Deep Learning mode
+        # Check OS support for Deep Learning mode
         is_linux = platform.system() == "Linux"
-        has_gpu = torch.cuda.is_available()
 
-        if self.selected_option == 2 and (not has_gpu or not is_linux):
+        if self.selected_option == 2 and not is_linux:
             QMessageBox.warning(
                 self,
                 QCoreApplication.translate("ToolSelectionPage", "Not available for this platform"),
@@ -249,4 +247,4 @@ class ToolSelectionPage(Page):
         self.radio_draw.setText(QApplication.translate("ToolSelectionPage", "Automatic Drawing"))
         self.radio_dl.setText(QApplication.translate("ToolSelectionPage", "Deep Learning Segmentation"))
         self.radio_analysis.setText(QApplication.translate("ToolSelectionPage", "Full Pipeline"))
-        self.dl_info_label.setToolTip(QApplication.translate("ToolSelectionPage", "To use this function you need Linux and a CUDA capable GPU"))
+        self.dl_info_label.setToolTip(QApplication.translate("ToolSelectionPage", "To use this function you need Linux (a CUDA capable GPU makes it much faster)"))
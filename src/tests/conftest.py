@@ -7,6 +7,10 @@ import sys
 import os
 from PyQt6.QtCore import QSettings, QObject, pyqtSignal
 from PyQt6.QtWidgets import QPushButton, QWidget
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
 
 
 # Add the project path to PYTHONPATH
@@ -147,6 +151,101 @@ def mock_file_selector_dl():
     ) as mock:
         yield mock
 
+
+def write_dicom_series(folder, volume, orientation=(1, 0, 0, 0, 1, 0), spacing=(0.8, 0.9), step=(0, 0, 2.5),
+                       origin=(-10, -20, -30), slope=1.0, intercept=0.0, shuffle=True):
+    """Write a (columns, rows, slices) volume as a single-frame DICOM series, in random file order"""
+    os.makedirs(folder, exist_ok=True)
+    series_uid = generate_uid()
+    order = np.random.default_rng(1).permutation(volume.shape[2]) if shuffle else range(volume.shape[2])
+    for n, k in enumerate(order):
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = pydicom.uid.MRImageStorage
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds = Dataset()
+        ds.file_meta = meta
+        ds.SOPClassUID = meta.MediaStorageSOPClassUID
+        ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+        ds.SeriesInstanceUID = series_uid
+        ds.Modality = "MR"
+        ds.InstanceNumber = n + 1
+        ds.ImageOrientationPatient = list(orientation)
+        ds.ImagePositionPatient = list(np.asarray(origin, dtype=float) + k * np.asarray(step, dtype=float))
+        ds.PixelSpacing = list(spacing)
+        ds.SliceThickness = float(np.linalg.norm(step))
+        ds.RescaleSlope, ds.RescaleIntercept = slope, intercept
+        ds.Rows, ds.Columns = volume.shape[1], volume.shape[0]
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = "MONOCHROME2"
+        ds.BitsAllocated, ds.BitsStored, ds.HighBit = 16, 16, 15
+        ds.PixelRepresentation = 0
+        ds.PixelData = np.ascontiguousarray(volume[:, :, k].T.astype(np.uint16)).tobytes()
+        ds.save_as(os.path.join(folder, f"IM{n:04d}"), enforce_file_format=True)
+    return folder
+
+
+FAKE_SKULL_STRIP_WORKER = """
+import json, os, sys, time
+PREFIX = os.environ.get("FAKE_WORKER_PREFIX", "@skullstrip ")
+def emit(event, **fields):
+    print(PREFIX + json.dumps(dict(event=event, **fields)), flush=True)
+print("loading model", flush=True)
+if os.environ.get("FAKE_WORKER_MODE") == "fail":
+    emit("failed", message="ModuleNotFoundError: No module named 'HD_BET'")
+    sys.exit(1)
+emit("ready")
+for line in sys.stdin:
+    job = json.loads(line)
+    emit("started", id=job["id"])
+    if "slow" in job["input"]:
+        time.sleep(30)
+    if "bad" in job["input"]:
+        emit("error", id=job["id"], message="RuntimeError: cannot strip")
+        continue
+    if job.get("kind") == "segment":
+        for phase in ("reorientation", "preprocess", "deep_learning", "postprocess"):
+            emit("progress", id=job["id"], phase=phase)
+        os.makedirs(job["output"], exist_ok=True)
+        with open(os.path.join(job["output"], os.path.basename(job["mri"]) + "_seg.json"), "w") as f:
+            json.dump(job, f)
+        emit("done", id=job["id"], seconds=0.0, cases=1)
+        continue
+    os.makedirs(os.path.dirname(job["output"]), exist_ok=True)
+    with open(job["output"], "w") as f:
+        f.write(f"stripped by {os.getpid()} {sys.argv[1:]}")
+    emit("done", id=job["id"], seconds=0.0)
+"""
+
+
+@pytest.fixture
+def fake_skull_strip_worker(tmp_path, monkeypatch):
+    """Run a fake skull-stripping worker (same protocol as deep_learning/skull_strip_server.py)"""
+    script = tmp_path / "fake_skull_strip_server.py"
+    script.write_text(FAKE_SKULL_STRIP_WORKER)
+    # The application imports the module without the "main." prefix
+    for module in ("main.threads.skull_strip_service", "threads.skull_strip_service"):
+        monkeypatch.setattr(f"{module}.get_dl_python_executable", lambda: sys.executable)
+        monkeypatch.setattr(f"{module}.get_script_path", lambda _: str(script))
+    monkeypatch.delenv("FAKE_WORKER_MODE", raising=False)
+    monkeypatch.delenv("FAKE_WORKER_PREFIX", raising=False)
+    return script
+
+
+@pytest.fixture
+def fake_inference_worker(fake_skull_strip_worker, monkeypatch):
+    """Run a fake nnU-Net worker (same protocol as deep_learning/inference_server.py)"""
+    from main.threads import inference_service
+    for module in ("main.threads.inference_service", "threads.inference_service"):
+        monkeypatch.setattr(f"{module}.get_dl_python_executable", lambda: sys.executable)
+        monkeypatch.setattr(f"{module}.get_script_path", lambda _: str(fake_skull_strip_worker))
+    monkeypatch.setenv("FAKE_WORKER_PREFIX", inference_service.EVENT_PREFIX)
+    yield fake_skull_strip_worker
+    for module in ("main.threads.inference_service", "threads.inference_service"):
+        if module in sys.modules:
+            sys.modules[module].stop_shared_inference_service()
+
+
 # Pytest configuration
 def pytest_configure(config):
     """Global pytest configuration"""
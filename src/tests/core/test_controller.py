@@ -9,6 +9,17 @@ from PyQt6.QtWidgets import QApplication, QPushButton
 from main.controller import Controller
 
 
+@pytest.fixture(autouse=True)
+def remove_installed_translators(qapp):
+    """Remove the translators installed by the controllers, so the following tests see the source strings."""
+    installed = []
+    install = qapp.installTranslator
+    with patch.object(qapp, "installTranslator", side_effect=lambda t: installed.append(t) or install(t)):
+        yield
+    for translator in installed:
+        qapp.removeTranslator(translator)
+
+
 class TestControllerInitialization:
     """Tests for Controller Initialization"""
 
@@ -0,0 +1,55 @@
+import importlib
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytorch_lightning")
+pytest.importorskip("sklearn")
+
+MAIN_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), "..", "..", "main"))
+
+
+@pytest.fixture
+def data_module(monkeypatch):
+    """Import data_loading.data_module as the scripts do, with DALI missing"""
+    # the application has its own utils module, found before the utils folder of the scripts
+    monkeypatch.setattr(sys, "path", [os.path.join(MAIN_DIR, "deep_learning")] +
+                        [p for p in sys.path if os.path.realpath(p or os.curdir) != MAIN_DIR])
+    for name in list(sys.modules):
+        if name.split(".")[0] in ("utils", "data_loading"):
+            monkeypatch.delitem(sys.modules, name)
+    monkeypatch.setitem(sys.modules, "nvidia.dali", None)
+    imported = set(sys.modules)
+    yield importlib.import_module("data_loading.data_module")
+    for name in set(sys.modules) - imported:
+        if name.split(".")[0] in ("utils", "data_loading"):
+            del sys.modules[name]
+
+
+class TestCpuPathWithoutDali:
+    """The CPU prediction path and the nnU-Net worker do not need DALI"""
+
+    def test_load_data(self, data_module, tmp_path):
+        for name in ("b_x.npy", "a_x.npy", "a_meta.npy"):
+            np.save(tmp_path / name, np.zeros(1))
+
+        assert data_module.load_data(str(tmp_path), "*_x.npy") == [str(tmp_path / "a_x.npy"),
+                                                                     str(tmp_path / "b_x.npy")]
+        assert "data_loading.dali_loader" not in sys.modules
+
+    def test_cpu_test_dataloader(self, data_module, tmp_path):
+        np.save(tmp_path / "a_x.npy", np.zeros((1, 4, 4, 4), dtype=np.float32))
+        np.save(tmp_path / "a_meta.npy", np.zeros((4, 3), dtype=np.int64))
+        module = data_module.DataModule.__new__(data_module.DataModule)
+        module.args = SimpleNamespace(gpus=0)
+        module.test_images = [str(tmp_path / "a_x.npy")]
+        module.kwargs = {"meta": [str(tmp_path / "a_meta.npy")], "num_workers": 0}
+
+        batch = next(iter(module.test_dataloader()))
+
+        assert batch["image"].shape == (1, 1, 4, 4, 4)
+        with pytest.raises(ImportError):
+            data_module.DataModule.train_dataloader(module)
@@ -0,0 +1,116 @@
+import os
+from unittest.mock import patch
+
+import nibabel as nib
+import numpy as np
+import pydicom
+import pytest
+
+from main import dicom_series
+from main.dicom_series import DicomSeries
+from tests.conftest import write_dicom_series
+
+
+@pytest.fixture
+def volume():
+    return np.random.default_rng(0).integers(0, 1000, size=(12, 10, 7)).astype(np.uint16)
+
+
+class TestDicomSeries:
+    """Tests for reading DICOM series folders slice by slice"""
+
+    def test_slices_sorted_by_position(self, tmp_path, volume):
+        """Files are ordered along the slice normal, whatever their names"""
+        folder = write_dicom_series(str(tmp_path / "series"), volume, slope=2.0, intercept=-5.0)
+        series = DicomSeries(folder)
+
+        assert series.shape == (12, 10, 7)
+        for k in range(7):
+            np.testing.assert_allclose(series.read_slice(k), volume[:, :, k] * 2.0 - 5.0)
+
+    def test_affine_from_headers(self, tmp_path, volume):
+        """The affine maps voxel indices to RAS+ millimetres"""
+        folder = write_dicom_series(str(tmp_path / "series"), volume)
+        series = DicomSeries(folder)
+
+        expected = np.diag([-0.9, -0.8, 2.5, 1.0])
+        expected[:3, 3] = [10, 20, -30]
+        np.testing.assert_allclose(series.affine, expected)
+
+    def test_canonical_view_matches_nibabel(self, tmp_path, volume):
+        """The canonical volume and affine match nibabel's closest canonical image"""
+        folder = write_dicom_series(str(tmp_path / "series"), volume, orientation=(0, 1, 0, 0, 0, -1), step=(1.5, 0, 0))
+        series = DicomSeries(folder)
+        native = np.stack([series.read_slice(k) for k in range(len(series))], axis=2)
+
+        canonical = nib.as_closest_canonical(nib.Nifti1Image(native, series.affine))
+        np.testing.assert_array_equal(series.canonical_view(native), canonical.get_fdata())
+        np.testing.assert_allclose(series.canonical_affine, canonical.affine)
+        assert series.canonical_shape == canonical.shape
+
+        # Writing slices through the native view fills the canonical volume
+        filled = np.zeros(series.canonical_shape, dtype=np.float32)
+        view = series.native_view(filled)
+        for k in range(len(series)):
+            view[:, :, k] = series.read_slice(k)
+        np.testing.assert_array_equal(filled, canonical.get_fdata())
+
+        # Slices along the canonical axis map back to native slices
+        axis = series.canonical_slice_axis
+        for c in range(series.canonical_shape[axis]):
+            np.testing.assert_array_equal(np.sort(np.take(filled, c, axis=axis), axis=None),
+                                          np.sort(series.read_slice(series.native_slice_index(c)), axis=None))
+
+    def test_headers_only_until_slices_are_read(self, tmp_path, volume):
+        """Opening the series does not decode pixel data; slices are decoded once"""
+        folder = write_dicom_series(str(tmp_path / "series"), volume)
+        with patch.object(dicom_series.pydicom, "dcmread", wraps=pydicom.dcmread) as dcmread:
+            series = DicomSeries(folder)
+            assert all(call.kwargs.get("stop_before_pixels") for call in dcmread.call_args_list)
+
+            dcmread.reset_mock()
+            series.read_slice(3)
+            series.read_slice(3)
+            assert dcmread.call_count == 1
+
+    def test_slice_cache_evicts_least_recently_used(self, tmp_path, volume):
+        """The slice cache stays within its byte budget"""
+        folder = write_dicom_series(str(tmp_path / "series"), volume)
+        slice_bytes = 12 * 10 * 4
+        series = DicomSeries(folder, max_cache_bytes=2 * slice_bytes)
+
+        first = series.read_slice(0)
+        series.read_slice(1)
+        assert series.read_slice(0) is first
+        series.read_slice(2)
+
+        assert series.cache_bytes == 2 * slice_bytes
+        assert series.read_slice(0) is first
+        assert series.read_slice(1) is not None
+
+    def test_loading_order_starts_in_the_middle(self, tmp_path, volume):
+        folder = write_dicom_series(str(tmp_path / "series"), volume)
+        assert DicomSeries(folder).loading_order() == [3, 2, 4, 1, 5, 0, 6]
+
+    def test_largest_series_is_opened(self, tmp_path, volume):
+        """Other series and non-DICOM files in the folder are ignored"""
+        folder = str(tmp_path / "series")
+        write_dicom_series(folder, volume)
+        write_dicom_series(str(tmp_path / "other"), volume[:, :, :2])
+        for name in os.listdir(tmp_path / "other"):
+            os.replace(tmp_path / "other" / name, os.path.join(folder, "other_" + name))
+        with open(os.path.join(folder, "notes.txt"), "w") as f:
+            f.write("not dicom")
+
+        assert len(DicomSeries(folder)) == 7
+
+    def test_invalid_folders(self, tmp_path, volume):
+        """Empty folders and repeated positions are rejected"""
+        empty = tmp_path / "empty"
+        empty.mkdir()
+        with pytest.raises(ValueError):
+            DicomSeries(str(empty))
+
+        folder = write_dicom_series(str(tmp_path / "series"), volume, step=(0, 0, 0))
+        with pytest.raises(ValueError):
+            DicomSeries(folder)
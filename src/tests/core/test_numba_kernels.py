@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from main import numba_kernels
+from main.numba_kernels import JIT_KERNELS, jit_kernel, warm_up_kernels
+
+
+@pytest.fixture
+def registry():
+    """Restore the kernel registry after a test registers its own kernels"""
+    saved = dict(JIT_KERNELS)
+    yield JIT_KERNELS
+    JIT_KERNELS.clear()
+    JIT_KERNELS.update(saved)
+
+
+class TestKernelRegistry:
+    """Tests for the numba kernel registry"""
+
+    def test_viewer_kernels_are_registered_with_warmup_args(self):
+        """Every viewer kernel can be warmed up"""
+        for name in ("region_grow_numba_mm", "apply_overlay_numba"):
+            _, warmup_args = JIT_KERNELS[name]
+            assert warmup_args is not None
+
+    def test_unused_kernels_are_not_warmed_up(self):
+        """The spherical mask kernel is not used by the viewer, so warm-up skips it"""
+        _, warmup_args = JIT_KERNELS["compute_mask_numba_mm"]
+        assert warmup_args is None
+
+    def test_warm_up_covers_fortran_ordered_volumes(self):
+        """Volumes loaded in Fortran order do not compile a new specialization after warm-up"""
+        names = ["region_grow_numba_mm"]
+        warm_up_kernels(names=names)
+        counts = {name: len(JIT_KERNELS[name][0].signatures) for name in names}
+
+        img = np.asfortranarray(np.random.rand(6, 6, 6).astype(np.float32))
+        voxel_sizes = np.ones(3)
+        JIT_KERNELS["region_grow_numba_mm"][0](img, 2, 2, 2, 2, voxel_sizes, img[2, 2, 2], 0.1, 0, 6, 0, 6, 0, 6, 26)
+
+        assert {name: len(JIT_KERNELS[name][0].signatures) for name in names} == counts
+
+    def test_kernels_are_cached_on_disk(self):
+        """Kernels are compiled with on-disk caching when the source is available"""
+        kernel, _ = JIT_KERNELS["region_grow_numba_mm"]
+        assert type(kernel._cache).__name__ == "FunctionCache"
+
+    def test_decorator_registers_kernel(self, registry):
+        """New kernels get registered by the decorator"""
+        @jit_kernel(warmup_args=lambda: [(np.arange(3.0),)])
+        def _sum_kernel(values):
+            return values.sum()
+
+        assert registry["_sum_kernel"][0] is _sum_kernel
+        assert _sum_kernel(np.arange(4.0)) == 6.0
+
+    def test_warm_up_compiles_selected_kernels(self, registry):
+        """Warm-up calls kernels with their sample arguments"""
+        @jit_kernel(warmup_args=lambda: [(np.arange(3.0),)])
+        def _double_kernel(values):
+            return values * 2
+
+        timings = warm_up_kernels(names=["_double_kernel"])
+
+        assert list(timings) == ["_double_kernel"]
+        assert len(_double_kernel.signatures) == 1
+
+    def test_warm_up_stops_when_asked(self, registry):
+        """Warm-up ends before the next compilation once stop returns True"""
+        @jit_kernel(warmup_args=lambda: [(np.arange(3.0),), (np.arange(3),)])
+        def _stopped_kernel(values):
+            return values * 3
+
+        calls = []
+        timings = warm_up_kernels(names=["_stopped_kernel"], stop=lambda: calls.append(1) or len(calls) > 1)
+
+        assert timings == {}
+        assert len(_stopped_kernel.signatures) == 1
+
+    def test_kernels_without_warmup_args_are_skipped(self, registry):
+        """Kernels registered without samples compile lazily"""
+        @jit_kernel()
+        def _lazy_kernel(values):
+            return values
+
+        assert "_lazy_kernel" not in warm_up_kernels(names=["_lazy_kernel"])
+        assert _lazy_kernel.signatures == []
+
+    def test_falls_back_to_uncached_compilation(self, registry):
+        """Kernels whose source cannot be located still compile"""
+        real_njit = numba_kernels.njit
+
+        def njit_without_cache(*args, cache=False, **options):
+            if cache:
+                raise RuntimeError("no locator available")
+            return real_njit(*args, **options)
+
+        with patch.object(numba_kernels, "njit", side_effect=njit_without_cache):
+            @jit_kernel()
+            def _uncached_kernel(values):
+                return values + 1
+
+        assert _uncached_kernel(1) == 2
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from main.overlay_resampling import ResampledOverlay, needs_resampling, voxel_mapping
+
+
+@pytest.fixture
+def overlay():
+    """Random overlay on a 2 mm grid shifted by 4 mm"""
+    rng = np.random.default_rng(0)
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    affine[:3, 3] = [4.0, -2.0, 0.0]
+    return rng.random((6, 7, 8)).astype(np.float32), affine
+
+
+class TestResampledOverlay:
+    """Tests for the lazy base-space overlay"""
+
+    def test_needs_resampling(self, overlay):
+        """Only an identical grid skips resampling"""
+        data, affine = overlay
+        assert not needs_resampling(data.shape, affine, data.shape, affine)
+        assert needs_resampling(data.shape, affine, (12, 14, 16), affine)
+        assert needs_resampling(data.shape, affine, data.shape, np.eye(4))
+
+    def test_identity_mapping_returns_slices(self, overlay):
+        """On the overlay's own grid every plane equals the original slice"""
+        data, affine = overlay
+        resampled = ResampledOverlay(data, affine, affine, data.shape)
+        for axis in range(3):
+            np.testing.assert_array_equal(resampled.plane(axis, 3), data.take(3, axis))
+
+    def test_planes_match_dense_nearest_neighbour(self, overlay):
+        """Lazy planes agree with a full nearest-neighbour resample"""
+        data, affine = overlay
+        shape = (16, 12, 18)
+        resampled = ResampledOverlay(data, affine, np.eye(4), shape)
+
+        grid = np.indices(shape).reshape(3, -1)
+        mapping = voxel_mapping(affine, np.eye(4))
+        source = np.rint(mapping[:3, :3] @ grid + mapping[:3, 3:]).astype(int)
+        inside = np.all((source >= 0) & (source < np.array(data.shape)[:, None]), axis=0)
+        expected = np.zeros(grid.shape[1], dtype=data.dtype)
+        expected[inside] = data[tuple(source[:, inside])]
+        expected = expected.reshape(shape)
+
+        np.testing.assert_array_equal(resampled.to_dense(), expected)
+        for axis in range(3):
+            np.testing.assert_array_equal(resampled.plane(axis, 5), expected.take(5, axis))
+
+    def test_threshold_mask(self, overlay):
+        """The mask thresholds resampled intensities and counts overlay voxels"""
+        data, affine = overlay
+        resampled = ResampledOverlay(data, affine, np.eye(4), (16, 12, 18))
+        assert resampled.set_threshold(0.5) is None
+        mask = resampled.mask
+
+        dense = resampled.to_dense() > 0.5
+        np.testing.assert_array_equal(mask.to_dense(), dense)
+        np.testing.assert_array_equal(mask.plane(1, 4), dense[:, 4, :])
+        assert mask[8, 2, 6] == dense[8, 2, 6]
+        assert resampled.count == np.count_nonzero(data > 0.5)
+
+    def test_slice_cache_budget(self, overlay):
+        """Cached slices are reused and evicted beyond the budget"""
+        data, affine = overlay
+        shape = (16, 12, 18)
+        slice_bytes = 12 * 18 * data.itemsize
+        resampled = ResampledOverlay(data, affine, np.eye(4), shape, max_cache_bytes=2 * slice_bytes)
+
+        first = resampled.plane(0, 0)
+        assert resampled.plane(0, 0) is first
+        resampled.plane(0, 1)
+        resampled.plane(0, 2)
+        assert resampled.cache_bytes == 2 * slice_bytes
+        assert resampled.plane(0, 0) is not first
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from main.projections import PROJECTIONS, intensity_projection, rotating_mip, rotation_angles
+
+
+@pytest.fixture
+def volume():
+    """Random volume"""
+    return np.random.default_rng(0).random((9, 11, 7)).astype(np.float32)
+
+
+class TestIntensityProjection:
+    """Tests for the chunked intensity projections"""
+
+    @pytest.mark.parametrize("kind, reduce", list(zip(PROJECTIONS, (np.max, np.min, np.mean))))
+    @pytest.mark.parametrize("axis", [0, 1, 2])
+    def test_matches_full_reduction(self, volume, kind, reduce, axis):
+        """Chunked reductions equal the reduction over the whole axis"""
+        projection = intensity_projection(volume, kind, axis, chunk_size=4)
+        np.testing.assert_allclose(projection, reduce(volume, axis=axis), rtol=1e-6)
+        assert projection.dtype == np.float32
+
+    def test_strided_frame(self):
+        """A time frame of a time-contiguous 4D series is projected without copying it first"""
+        series = np.random.default_rng(1).random((6, 5, 4, 3)).astype(np.float32)
+        frame = series[..., 1]
+        np.testing.assert_allclose(intensity_projection(frame, "MIP", 2), frame.max(axis=2))
+
+    def test_unknown_projection(self, volume):
+        """Unknown projection names are rejected"""
+        with pytest.raises(ValueError):
+            intensity_projection(volume, "Median", 0)
+
+
+class TestRotatingMIP:
+    """Tests for the rotating maximum-intensity projection"""
+
+    def test_zero_angle_is_coronal_mip(self, volume):
+        """At 0 degrees the rays run along y"""
+        np.testing.assert_allclose(rotating_mip(volume, 0.0, chunk_size=3), volume.max(axis=1))
+
+    def test_half_turn_mirrors_projection(self):
+        """A half turn mirrors the projection left to right"""
+        volume = np.random.default_rng(2).random((9, 9, 5)).astype(np.float32)
+        np.testing.assert_allclose(rotating_mip(volume, 180.0), volume.max(axis=1)[::-1])
+
+    def test_rotation_angles(self):
+        """A full turn is sampled at the requested step"""
+        np.testing.assert_array_equal(rotation_angles(90), [0, 90, 180, 270])
@@ -0,0 +1,100 @@
+import os
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+from main.deep_learning.utils.registration_store import RegistrationStore, OUTPUT_NAMES
+
+
+def write_image(path, seed):
+    data = np.random.default_rng(seed).random((8, 8, 8)).astype(np.float32)
+    nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+    return str(path)
+
+
+class FakeRegister:
+    """Stands for utils.coreg.align: writes its four outputs after the prefix."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, fx, mv, transform_method, outprefix):
+        self.calls.append((fx, mv, transform_method))
+        for name in OUTPUT_NAMES:
+            with open(outprefix + name, "w") as f:
+                f.write(f"{name} {os.path.basename(fx)} {os.path.basename(mv)}")
+
+
+@pytest.fixture
+def images(tmp_path):
+    return write_image(tmp_path / "flair.nii.gz", 0), write_image(tmp_path / "atlas.nii.gz", 1)
+
+
+class TestRegistrationStore:
+    def test_same_registration_computed_once(self, tmp_path, images):
+        """The postprocess gets the transforms computed by the coregistration"""
+        flair, atlas = images
+        register = FakeRegister()
+
+        first = RegistrationStore(str(tmp_path / "store")).align(flair, atlas, "SyNAggro", register)
+        second = RegistrationStore(str(tmp_path / "store")).align(flair, atlas, "SyNAggro", register)
+
+        assert len(register.calls) == 1
+        assert first == second
+        assert [open(fn).read().split()[0] for fn in first] == list(OUTPUT_NAMES)
+
+    def test_keyed_by_content(self, tmp_path, images):
+        """A copy of the same image hits the store; another method does not"""
+        flair, atlas = images
+        copy = write_image(tmp_path / "renamed_flair.nii", 0)
+        store, register = RegistrationStore(str(tmp_path / "store")), FakeRegister()
+
+        store.align(flair, atlas, "SyNAggro", register)
+        store.align(copy, atlas, "SyNAggro", register)
+        store.align(flair, atlas, "Rigid", register)
+
+        assert [call[2] for call in register.calls] == ["SyNAggro", "Rigid"]
+
+    def test_opposite_registration_is_inverted(self, tmp_path, images):
+        flair, atlas = images
+        store, register = RegistrationStore(str(tmp_path / "store")), FakeRegister()
+
+        warpedmov, warpedfix, fwd, inv = store.align(flair, atlas, "SyNAggro", register)
+        assert store.align(atlas, flair, "SyNAggro", register) == (warpedfix, warpedmov, inv, fwd)
+        assert len(register.calls) == 1
+
+    def test_failed_registration_leaves_nothing(self, tmp_path, images):
+        flair, atlas = images
+        store = RegistrationStore(str(tmp_path / "store"))
+
+        def failing(**kwargs):
+            raise RuntimeError("registration failed")
+
+        with pytest.raises(RuntimeError):
+            store.align(flair, atlas, "SyNAggro", failing)
+        assert os.listdir(store.root) == []
+
+    def test_least_recently_used_pruned(self, tmp_path):
+        fixed = write_image(tmp_path / "fixed.nii.gz", 0)
+        moving = [write_image(tmp_path / f"moving_{i}.nii.gz", i + 1) for i in range(3)]
+        first = os.path.dirname(RegistrationStore(str(tmp_path / "sized")).align(fixed, moving[0], "SyNAggro",
+                                                                                 FakeRegister())[0])
+        entry_size = sum(os.path.getsize(os.path.join(first, fn)) for fn in os.listdir(first))
+        store, register = RegistrationStore(str(tmp_path / "store"), max_bytes=entry_size * 5 // 2), FakeRegister()
+
+        entries = []
+        for i, mv in enumerate(moving):
+            entries.append(os.path.dirname(store.align(fixed, mv, "SyNAggro", register)[0]))
+            os.utime(os.path.join(entries[-1], "entry.json"), (i, i))
+
+        assert [os.path.exists(entry) for entry in entries] == [False, True, True]
+
+    def test_latest_registration_kept_beyond_size(self, tmp_path, images):
+        """The coregistration's registration stays for the postprocess, however large"""
+        flair, atlas = images
+        store = RegistrationStore(str(tmp_path / "store"), max_bytes=1)
+
+        outputs = store.align(flair, atlas, "SyNAggro", FakeRegister())
+
+        assert all(os.path.exists(fn) for fn in outputs)
@@ -0,0 +1,28 @@
+import nibabel as nib
+import numpy as np
+
+from main.deep_learning.reorientation import as_saved, reorient
+
+
+def brats_reference():
+    """Reference with the int16 header of the BraTS scans."""
+    header = nib.Nifti1Header()
+    header.set_data_dtype(np.int16)
+    return nib.Nifti1Image(np.zeros((6, 7, 8), dtype=np.int16), np.diag([-1.0, -1.0, 1.0, 1.0]), header)
+
+
+class TestAsSaved:
+    def test_same_voxels_as_the_saved_file(self, tmp_path):
+        """The in-memory chain reads the same voxels as preprocess.py reads from the reoriented file"""
+        data = np.random.default_rng(0).random((6, 7, 8)).astype(np.float32) * 6000000
+        reoriented = reorient(nib.Nifti1Image(data, np.eye(4)), brats_reference())
+        nib.save(reoriented, tmp_path / "reoriented.nii.gz")
+        saved = nib.load(tmp_path / "reoriented.nii.gz")
+
+        image = as_saved(reoriented)
+
+        # beyond the int16 range: the file stores scaled values
+        assert saved.dataobj.slope > 1
+        assert np.array_equal(image.get_fdata(), saved.get_fdata())
+        assert np.array_equal(image.affine, saved.affine)
+        assert not np.array_equal(reoriented.get_fdata().astype(np.int16), saved.get_fdata().astype(np.int16))
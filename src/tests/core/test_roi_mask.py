@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from main.roi_mask import RunLengthROI
+
+
+@pytest.fixture
+def masks():
+    """Two random masks on the same volume"""
+    rng = np.random.default_rng(0)
+    return rng.random((6, 7, 8)) < 0.3, rng.random((6, 7, 8)) < 0.5
+
+
+class TestRunLengthROI:
+    """Tests for the run-length encoded ROI"""
+
+    def test_round_trip(self, masks):
+        """Encoding and decoding preserve the mask"""
+        mask, _ = masks
+        roi = RunLengthROI.from_mask(mask)
+        np.testing.assert_array_equal(roi.to_dense(), mask)
+        assert roi.voxel_count == mask.sum()
+
+    def test_cropped_mask_is_placed_at_offset(self):
+        """A cropped mask is encoded at its offset in the full volume"""
+        full = np.zeros((10, 10, 10), dtype=bool)
+        full[2:4, 3:6, 1:5] = True
+        roi = RunLengthROI.from_mask(full[2:4, 3:6, 1:5], offset=(2, 3, 1), shape=(10, 10, 10))
+
+        assert roi.shape == (10, 10, 10)
+        assert len(roi) == 6  # one run per row
+        np.testing.assert_array_equal(roi.to_dense(), full)
+
+    def test_from_slices_matches_from_mask(self, masks):
+        """Encoding slice by slice gives the same runs as encoding the volume"""
+        mask, _ = masks
+        roi = RunLengthROI.from_slices(iter(mask), mask.shape)
+        expected = RunLengthROI.from_mask(mask)
+
+        np.testing.assert_array_equal(roi.starts, expected.starts)
+        np.testing.assert_array_equal(roi.ends, expected.ends)
+        assert RunLengthROI.from_slices([], (2, 3, 4)).is_empty()
+
+    def test_embed_in_larger_volume(self, masks):
+        """Embedding places every voxel at its offset in the larger volume"""
+        mask, _ = masks
+        roi = RunLengthROI.from_mask(mask).embed((3, 1, 2), (12, 10, 15))
+
+        full = np.zeros((12, 10, 15), dtype=np.uint8)
+        full[3:9, 1:8, 2:10] = mask
+        assert roi.shape == (12, 10, 15)
+        np.testing.assert_array_equal(roi.to_dense(), full)
+
+    def test_union_and_difference(self, masks):
+        """Set operations match their dense equivalents"""
+        a, b = masks
+        roi_a, roi_b = RunLengthROI.from_mask(a), RunLengthROI.from_mask(b)
+
+        np.testing.assert_array_equal(roi_a.union(roi_b).to_dense(), a | b)
+        np.testing.assert_array_equal(roi_a.difference(roi_b).to_dense(), a & ~b)
+
+    def test_runs_never_cross_rows(self):
+        """Runs touching at a row boundary are kept as separate rows"""
+        a = np.zeros((1, 2, 4), dtype=bool)
+        b = np.zeros((1, 2, 4), dtype=bool)
+        a[0, 0, 2:] = True
+        b[0, 1, :2] = True
+        union = RunLengthROI.from_mask(a).union(RunLengthROI.from_mask(b))
+
+        assert list(zip(union.starts, union.ends)) == [(2, 4), (4, 6)]
+
+    def test_operations_do_not_modify_operands(self, masks):
+        """ROIs are immutable, so previous states can be kept for undo"""
+        a, b = masks
+        roi_a = RunLengthROI.from_mask(a)
+        roi_a.union(RunLengthROI.from_mask(b))
+        np.testing.assert_array_equal(roi_a.to_dense(), a)
+
+    def test_planes_match_dense_slices(self, masks):
+        """Decoded planes equal the slices of the dense mask along every axis"""
+        mask, _ = masks
+        roi = RunLengthROI.from_mask(mask)
+        for axis in range(3):
+            for index in range(mask.shape[axis]):
+                np.testing.assert_array_equal(roi.plane(axis, index), mask.take(index, axis=axis))
+
+    def test_empty_roi(self):
+        """An empty ROI decodes to zeros and combines like an empty set"""
+        empty = RunLengthROI((3, 3, 3))
+        other = RunLengthROI.from_mask(np.ones((3, 3, 3)))
+
+        assert empty.is_empty()
+        assert empty.union(other).voxel_count == 27
+        assert other.difference(other).is_empty()
+        assert empty.to_dense().sum() == 0
+
+    def test_shape_mismatch_raises(self):
+        """Combining ROIs of different volumes is rejected"""
+        with pytest.raises(ValueError):
+            RunLengthROI((2, 2, 2)).union(RunLengthROI((3, 3, 3)))
+
+    def test_4d_shape_uses_spatial_dimensions(self):
+        """ROIs built from 4D dimensions cover the spatial volume only"""
+        assert RunLengthROI((4, 5, 6, 10)).shape == (4, 5, 6)
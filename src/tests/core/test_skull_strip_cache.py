@@ -0,0 +1,194 @@
+import json
+import os
+import shutil
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+from main import skull_strip_cache
+from main.skull_strip_cache import (find_cached_output, has_current_output, provenance_record, refresh_stamp,
+                                    voxel_hash)
+
+
+def write_image(path, values=1.0, affine=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = np.arange(64, dtype=np.float32).reshape(4, 4, 4) * values
+    nib.save(nib.Nifti1Image(data, np.eye(4) if affine is None else affine), path)
+    return path
+
+
+def write_output(output_dir, name, sources, provenance=None):
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, name + ".nii.gz"), "w") as f:
+        f.write("stripped")
+    metadata = {"SkullStripped": True, "Sources": sources}
+    if provenance is not None:
+        metadata["Provenance"] = provenance
+    with open(os.path.join(output_dir, name + ".json"), "w") as f:
+        json.dump(metadata, f)
+
+
+class TestVoxelHash:
+    """Tests for hashing the content of NIfTI images"""
+
+    def test_same_voxels_same_hash(self, tmp_path):
+        """Copies and differently compressed files of the same image share a hash"""
+        first = write_image(str(tmp_path / "a.nii.gz"))
+        second = write_image(str(tmp_path / "b.nii"))
+        assert voxel_hash(first) == voxel_hash(second)
+
+    def test_changes_are_detected(self, tmp_path):
+        path = write_image(str(tmp_path / "a.nii.gz"))
+        original = voxel_hash(path)
+
+        write_image(path, values=2.0)
+        assert voxel_hash(path) != original
+
+        write_image(path, affine=np.diag([2.0, 1.0, 1.0, 1.0]))
+        assert voxel_hash(path) != original
+
+    def test_unchanged_file_read_once(self, tmp_path, monkeypatch):
+        path = write_image(str(tmp_path / "a.nii.gz"))
+        voxel_hash(path)
+        monkeypatch.setattr(skull_strip_cache.nib, "load", lambda *_: pytest.fail("file read again"))
+        voxel_hash(path)
+
+
+class TestProvenanceRecord:
+    """Tests for matching runs by their provenance"""
+
+    def test_record_keeps_relevant_parameters(self, tmp_path):
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        parameters = {"f_val": 0.5, "opt_m": True, "g_val": 0.0}
+
+        bet = provenance_record(path, "fsl-bet", parameters, False)
+        assert bet["Parameters"] == {"f_val": 0.5, "opt_m": True}
+        assert bet["Device"] is None
+
+        assert provenance_record(path, "hd-bet", parameters, True)["Device"] == "cuda"
+        assert provenance_record(path, "hd-bet", parameters, False)["Device"] == "cpu"
+        assert provenance_record(path, "synthstrip", parameters, True)["Parameters"] == {}
+
+    def test_find_cached_output(self, tmp_path):
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        output_dir = str(tmp_path / "out")
+        record = provenance_record(path, "fsl-bet", {"f_val": 0.5}, False)
+        write_output(output_dir, "T1w_f05_brain", ["T1w.nii.gz"], record)
+
+        output = os.path.join(output_dir, "T1w_f05_brain.nii.gz")
+        assert find_cached_output(output_dir, record, "T1w.nii.gz") == (output, True)
+        assert find_cached_output(output_dir, record, "T1w_copy.nii.gz") == (output, False)
+        assert find_cached_output(output_dir, provenance_record(path, "fsl-bet", {"f_val": 0.3}, False)) is None
+        assert find_cached_output(str(tmp_path / "missing"), record) is None
+
+    def test_output_of_the_input_preferred(self, tmp_path):
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        output_dir = str(tmp_path / "out")
+        record = provenance_record(path, "synthstrip", {}, False)
+        write_output(output_dir, "A_synthstrip_brain", ["A.nii.gz"], record)
+        write_output(output_dir, "T1w_synthstrip_brain", ["T1w.nii.gz"], record)
+
+        assert find_cached_output(output_dir, record, "T1w.nii.gz") == \
+            (os.path.join(output_dir, "T1w_synthstrip_brain.nii.gz"), True)
+
+    def test_recorded_hash_reused_for_same_stamp(self, tmp_path, monkeypatch):
+        """An input already stripped with its current stamp is not hashed again"""
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        output_dir = str(tmp_path / "out")
+        record = provenance_record(path, "synthstrip", {}, False)
+        write_output(output_dir, "T1w_synthstrip_brain", ["T1w.nii.gz"], record)
+
+        hashed = []
+        monkeypatch.setattr(skull_strip_cache, "voxel_hash", lambda p: hashed.append(p) or voxel_hash(p))
+        assert provenance_record(path, "synthstrip", {}, False, output_dir) == record
+        assert hashed == []
+
+        os.utime(path, ns=(0, 0))
+        assert provenance_record(path, "synthstrip", {}, False, output_dir)["InputHash"] == record["InputHash"]
+        assert hashed == [path]
+
+    def test_input_stamp_ignored_when_matching(self, tmp_path):
+        """Touching the input changes its stamp but not the run it describes"""
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        output_dir = str(tmp_path / "out")
+        write_output(output_dir, "T1w_synthstrip_brain", ["T1w.nii.gz"], provenance_record(path, "synthstrip", {}, False))
+
+        os.utime(path, ns=(0, 0))
+        assert find_cached_output(output_dir, provenance_record(path, "synthstrip", {}, False), "T1w.nii.gz")
+
+
+class TestHasCurrentOutput:
+    """Tests for detecting up-to-date and stale outputs"""
+
+    def test_fresh_and_stale_outputs(self, tmp_path):
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        output_dir = str(tmp_path / "out")
+        write_output(output_dir, "T1w_synthstrip_brain", ["T1w.nii.gz"],
+                     provenance_record(path, "synthstrip", {}, False))
+        assert has_current_output(output_dir, path)
+
+        write_image(path, values=3.0)
+        assert not has_current_output(output_dir, path)
+
+    def test_unchanged_stamp_skips_hash(self, tmp_path, monkeypatch):
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        output_dir = str(tmp_path / "out")
+        write_output(output_dir, "T1w_synthstrip_brain", ["T1w.nii.gz"],
+                     provenance_record(path, "synthstrip", {}, False))
+
+        monkeypatch.setattr(skull_strip_cache, "voxel_hash", lambda *_: pytest.fail("voxels hashed"))
+        assert has_current_output(output_dir, path)
+
+    def test_touched_input_hashed_without_writing(self, tmp_path, monkeypatch):
+        """A new stamp with the same voxels is hashed; checking does not rewrite the sidecar"""
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        output_dir = str(tmp_path / "out")
+        write_output(output_dir, "T1w_synthstrip_brain", ["T1w.nii.gz"],
+                     provenance_record(path, "synthstrip", {}, False))
+        os.utime(path, ns=(0, 0))
+        sidecar = os.path.join(output_dir, "T1w_synthstrip_brain.json")
+        before = os.stat(sidecar).st_mtime_ns
+
+        hashed = []
+        monkeypatch.setattr(skull_strip_cache, "voxel_hash", lambda p: hashed.append(p) or voxel_hash(p))
+        assert has_current_output(output_dir, path)
+        assert hashed == [path]
+        assert os.stat(sidecar).st_mtime_ns == before
+
+    def test_refresh_stamp(self, tmp_path, monkeypatch):
+        """Once a run records the new stamp, checks skip the hash again"""
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        output_dir = str(tmp_path / "out")
+        write_output(output_dir, "T1w_synthstrip_brain", ["T1w.nii.gz"],
+                     provenance_record(path, "synthstrip", {}, False))
+        os.utime(path, ns=(0, 0))
+
+        refresh_stamp(os.path.join(output_dir, "T1w_synthstrip_brain.nii.gz"),
+                      provenance_record(path, "synthstrip", {}, False))
+
+        with open(os.path.join(output_dir, "T1w_synthstrip_brain.json")) as f:
+            assert json.load(f)["Provenance"]["InputStamp"]["MtimeNs"] == 0
+        monkeypatch.setattr(skull_strip_cache, "voxel_hash", lambda *_: pytest.fail("voxels hashed"))
+        assert has_current_output(output_dir, path)
+
+    def test_outputs_of_other_inputs_are_ignored(self, tmp_path):
+        path = write_image(str(tmp_path / "T1w.nii.gz"))
+        other = write_image(str(tmp_path / "T2w.nii.gz"), values=2.0)
+        output_dir = str(tmp_path / "out")
+        write_output(output_dir, "T2w_synthstrip_brain", ["T2w.nii.gz"],
+                     provenance_record(other, "synthstrip", {}, False))
+        assert not has_current_output(output_dir, path)
+
+    def test_untracked_outputs_count(self, tmp_path):
+        """Outputs written before provenance was recorded cannot be checked and still count"""
+        output_dir = str(tmp_path / "out")
+        write_output(output_dir, "T1w_brain", ["T1w.nii.gz"])
+        assert has_current_output(output_dir, str(tmp_path / "T1w.nii.gz"))
+
+        shutil.rmtree(output_dir)
+        os.makedirs(output_dir)
+        with open(os.path.join(output_dir, "brain.nii.gz"), "w") as f:
+            f.write("stripped")
+        assert has_current_output(output_dir, str(tmp_path / "T1w.nii.gz"))
+        assert not has_current_output(str(tmp_path / "missing"), str(tmp_path / "T1w.nii.gz"))
@@ -0,0 +1,158 @@
+import pytest
+import torch
+
+from main.deep_learning.nnunet.sliding_window import foreground_sliding_window_inference, gaussian_importance_map, \
+    patch_slices, scan_starts
+
+ROI = (8, 8, 8)
+
+
+class Predictor:
+    """Stands for the network: a fixed convolution, recording the size of every batch."""
+
+    def __init__(self, max_batch=None):
+        torch.manual_seed(0)
+        self.conv = torch.nn.Conv3d(2, 1, kernel_size=3, padding=1)
+        self.max_batch = max_batch
+        self.batches = []
+
+    def __call__(self, patches):
+        if self.max_batch is not None and len(patches) > self.max_batch:
+            raise torch.cuda.OutOfMemoryError("CUDA out of memory")
+        self.batches.append(len(patches))
+        with torch.no_grad():
+            return self.conv(patches)
+
+
+def brain(shape=(1, 2, 20, 20, 20), box=(slice(2, 7),) * 3):
+    """Image with foreground only in a small box (intensity and ohe mask channels)."""
+    image = torch.zeros(shape)
+    image[(slice(None), 0) + box] = torch.rand(shape[:1] + tuple(s.stop - s.start for s in box)) + 0.5
+    image[(slice(None), 1) + box] = 1.0
+    return image
+
+
+def reference(image, predictor, overlap=0.5):
+    """Sliding window inference running the network on every patch."""
+    importance = gaussian_importance_map(ROI)
+    output = torch.zeros((image.shape[0], 1) + image.shape[2:])
+    count = torch.zeros(image.shape[2:])
+    for s in patch_slices(image.shape[2:], ROI, overlap):
+        output[(slice(None), slice(None)) + s] += predictor(image[(slice(None), slice(None)) + s]) * importance
+        count[s] += importance
+    return output / count
+
+
+class TestPatchGrid:
+    def test_scan_starts(self):
+        assert scan_starts(200, 128, 0.5) == [0, 64, 72]
+        assert scan_starts(128, 128, 0.5) == [0]
+        assert scan_starts(20, 8, 0.5) == [0, 4, 8, 12]
+
+    def test_patches_cover_the_image(self):
+        slices = patch_slices((20, 12, 8), ROI, 0.5)
+        assert len(slices) == 4 * 2 * 1
+        covered = torch.zeros(20, 12, 8, dtype=torch.bool)
+        for s in slices:
+            covered[s] = True
+        assert covered.all()
+
+
+class TestForegroundSlidingWindow:
+    def test_same_result_as_every_patch(self):
+        image = brain()
+        expected = reference(image, Predictor())
+
+        predictor = Predictor()
+        output = foreground_sliding_window_inference(image, ROI, 4, predictor, overlap=0.5)
+
+        assert output.shape == expected.shape
+        assert torch.allclose(output, expected, atol=1e-5)
+        # 2 x 2 x 2 patches touch the box, plus one prediction of the empty patch
+        assert sum(predictor.batches) == 8 + 1
+
+    def test_background_shared_between_calls(self):
+        image, predictor, background = brain(), Predictor(), {}
+        foreground_sliding_window_inference(image, ROI, 4, predictor, background=background)
+        calls = sum(predictor.batches)
+
+        foreground_sliding_window_inference(torch.flip(image, dims=[2]), ROI, 4, predictor, background=background)
+
+        assert len(background) == 1
+        assert sum(predictor.batches) == calls + 8
+
+    def test_batches_of_similar_size(self):
+        predictor = Predictor()
+        foreground_sliding_window_inference(brain(box=(slice(5, 11),) * 3), ROI, 4, predictor)
+
+        # 3 x 3 x 3 foreground patches in batches of at most 4: 7 batches of 3 or 4 patches
+        assert predictor.batches[1:] == [4] * 6 + [3]
+
+    def test_batch_halved_when_out_of_memory(self):
+        image = brain(box=(slice(5, 11),) * 3)
+        expected = foreground_sliding_window_inference(image, ROI, 4, Predictor())
+
+        predictor = Predictor(max_batch=2)
+        output = foreground_sliding_window_inference(image, ROI, 4, predictor)
+
+        assert max(predictor.batches) == 2
+        assert torch.allclose(output, expected, atol=1e-5)
+
+    def test_other_errors_raised(self):
+        def predictor(patches):
+            raise RuntimeError("shape mismatch")
+
+        with pytest.raises(RuntimeError, match="shape mismatch"):
+            foreground_sliding_window_inference(brain(), ROI, 4, predictor)
+
+    def test_image_smaller_than_patch(self):
+        image = brain(shape=(1, 2, 6, 10, 5), box=(slice(1, 4),) * 3)
+        predictor = Predictor()
+
+        output = foreground_sliding_window_inference(image, ROI, 4, predictor)
+
+        assert output.shape == (1, 1, 6, 10, 5)
+        padded = torch.nn.functional.pad(image, (1, 2, 0, 0, 1, 1))
+        assert torch.allclose(output, reference(padded, Predictor())[:, :, 1:7, 0:10, 1:6], atol=1e-5)
+
+    def test_empty_image(self):
+        predictor = Predictor()
+        output = foreground_sliding_window_inference(torch.zeros(1, 2, 16, 16, 16), ROI, 4, predictor)
+
+        assert predictor.batches == [1]
+        assert torch.allclose(output, reference(torch.zeros(1, 2, 16, 16, 16), Predictor()), atol=1e-5)
+
+
+class TestSameAsMonai:
+    """Compare with monai.inferers.sliding_window_inference, where MONAI is installed"""
+
+    @pytest.fixture
+    def monai(self):
+        return pytest.importorskip("monai")
+
+    def test_patch_grid(self, monai):
+        from monai.data.utils import dense_patch_slices
+        from monai.inferers.utils import _get_scan_interval
+
+        for image_size, roi_size in (((20, 12, 8), ROI), ((200, 160, 128), (128, 128, 128))):
+            interval = _get_scan_interval(image_size, roi_size, 3, 0.5)
+            expected = sorted(tuple(s) for s in dense_patch_slices(image_size, roi_size, interval))
+            assert sorted(patch_slices(image_size, roi_size, 0.5)) == expected
+
+    def test_importance_map(self, monai):
+        from monai.data.utils import compute_importance_map
+
+        for roi_size in (ROI, (128, 128, 128), (5, 9, 64)):
+            expected = compute_importance_map(roi_size, mode="gaussian")
+            expected = expected.clamp(min=max(expected[expected != 0].min().item(), 1e-3))
+            assert torch.allclose(gaussian_importance_map(roi_size), expected)
+
+    @pytest.mark.parametrize("shape", [(1, 2, 20, 20, 20), (1, 2, 6, 10, 5)])
+    def test_same_result(self, monai, shape):
+        from monai.inferers import sliding_window_inference
+
+        image = brain(shape=shape, box=(slice(1, 4),) * 3)
+        expected = sliding_window_inference(image, ROI, 4, Predictor(), overlap=0.5, mode="gaussian")
+        output = foreground_sliding_window_inference(image, ROI, 4, Predictor(), overlap=0.5)
+
+        assert torch.allclose(output, expected, atol=1e-5)
@@ -0,0 +1,70 @@
+import os
+
+import matplotlib.image
+import nibabel as nib
+import numpy as np
+import pytest
+
+from main.snapshot_renderer import find_subjects, render_subject, render_cohort, snapshot_slices
+
+
+@pytest.fixture
+def cohort(tmp_path):
+    """Two subjects with a brain image and a lesion mask, the second mask on a 2 mm grid"""
+    rng = np.random.default_rng(0)
+    for subject, mask_affine in (("sub-01", np.eye(4)), ("sub-02", np.diag([2.0, 2.0, 2.0, 1.0]))):
+        anat = tmp_path / subject / "anat"
+        anat.mkdir(parents=True)
+        nib.save(nib.Nifti1Image(rng.random((20, 22, 18)).astype(np.float32), np.eye(4)),
+                 str(anat / f"{subject}_T1w.nii.gz"))
+        mask = np.zeros((20, 22, 18) if subject == "sub-01" else (10, 11, 9), dtype=np.uint8)
+        mask[4:7, 4:7, 4:7] = 1
+        nib.save(nib.Nifti1Image(mask, mask_affine), str(anat / f"{subject}_mask.nii.gz"))
+    return tmp_path
+
+
+class TestSnapshotRenderer:
+    """Tests for the headless QC snapshot renderer"""
+
+    def test_find_subjects_pairs_overlays(self, cohort):
+        """Images and overlays are paired by subject label"""
+        subjects = find_subjects(str(cohort / "sub-*" / "anat" / "*_T1w.nii.gz"),
+                                 str(cohort / "sub-*" / "anat" / "*_mask.nii.gz"))
+        assert [s["subject"] for s in subjects] == ["sub-01", "sub-02"]
+        assert all(s["overlay"].endswith(f"{s['subject']}_mask.nii.gz") for s in subjects)
+
+    def test_snapshot_slices_follow_mask(self):
+        """Snapshots go through the mask centroid, or the volume centre without a mask"""
+        mask = np.zeros((10, 12, 14), dtype=bool)
+        mask[2, 3, 4] = True
+        assert snapshot_slices(mask.shape, mask) == [4, 3, 2]
+        assert snapshot_slices(mask.shape) == [7, 6, 5]
+
+    def test_render_subject_blends_resampled_mask(self, cohort):
+        """The mask of another grid is resampled and blended in the overlay color"""
+        anat = cohort / "sub-02" / "anat"
+        snapshot = render_subject(str(anat / "sub-02_T1w.nii.gz"), str(anat / "sub-02_mask.nii.gz"))
+        plain = render_subject(str(anat / "sub-02_T1w.nii.gz"))
+
+        assert snapshot.dtype == np.uint8 and snapshot.shape[2] == 4
+        assert snapshot.shape == plain.shape
+        # Red mask on the gray colormap: some pixels are no longer gray
+        assert np.any(snapshot[..., 0].astype(int) - snapshot[..., 1] > 50)
+        assert not np.any(plain[..., 0].astype(int) - plain[..., 1] > 50)
+
+    def test_render_cohort_writes_montage(self, cohort, tmp_path):
+        """Snapshots and montages are written, and failures are reported per subject"""
+        subjects = find_subjects(str(cohort / "sub-*" / "anat" / "*_T1w.nii.gz"),
+                                 str(cohort / "sub-*" / "anat" / "*_mask.nii.gz"))
+        subjects.append({"subject": "sub-03", "image": str(cohort / "missing.nii.gz"), "overlay": None})
+        output = tmp_path / "qc"
+
+        results = render_cohort(subjects, str(output), workers=2)
+
+        assert [r["subject"] for r in results] == ["sub-01", "sub-02", "sub-03"]
+        assert "error" in results[2]
+        for result in results[:2]:
+            assert matplotlib.image.imread(result["png"]).ndim == 3
+        page = (output / "montage.html").read_text()
+        assert 'src="subjects/sub-01.png"' in page and "sub-03" in page
+        assert os.path.getsize(output / "montage.png") > 0
@@ -0,0 +1,143 @@
+import json
+import os
+import subprocess
+from unittest.mock import patch
+
+import pytest
+from PyQt6.QtCore import QSettings
+
+from main import tool_environment
+from main.tool_environment import resolve_tool_environment, OUTPUT_MARKER, SETTINGS_KEY
+
+
+@pytest.fixture
+def settings(tmp_path):
+    return QSettings(str(tmp_path / "settings.ini"), QSettings.Format.IniFormat)
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """Home folder with a shell startup file, and an FSL installation"""
+    home = tmp_path / "home"
+    home.mkdir()
+    (home / ".bashrc").write_text("export FSLDIR=/opt/fsl\n")
+    fsldir = tmp_path / "fsl"
+    (fsldir / "etc" / "fslconf").mkdir(parents=True)
+    (fsldir / "etc" / "fslconf" / "fsl.sh").write_text("FSLOUTPUTTYPE=NIFTI_GZ\n")
+    monkeypatch.setenv("HOME", str(home))
+    tool_environment.clear_resolved_environment()
+    yield home, fsldir
+    tool_environment.clear_resolved_environment()
+
+
+def shell_output(fsldir, banner="Welcome!"):
+    lines = [banner, OUTPUT_MARKER, "PATH=/usr/bin:/opt/fsl/bin", f"FSLDIR={fsldir}",
+             "FSLOUTPUTTYPE=NIFTI_GZ", "FREESURFER_HOME=", "FS_LICENSE=", "SUBJECTS_DIR="]
+    return subprocess.CompletedProcess([], 0, stdout="\n".join(lines) + "\n", stderr="")
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+class TestResolveToolEnvironment:
+    """Tests for resolving the environment of the external tools once"""
+
+    def test_probe_parses_variables_after_marker(self, home):
+        """Output of the startup files is ignored, empty variables are dropped"""
+        _, fsldir = home
+        with patch.object(tool_environment.subprocess, "run", return_value=shell_output(fsldir, "PATH=/wrong")) as run:
+            environment = tool_environment.probe_login_shell("/bin/bash")
+
+        assert run.call_args[0][0][:3] == ["/bin/bash", "-l", "-c"]
+        assert environment == {"PATH": "/usr/bin:/opt/fsl/bin", "FSLDIR": str(fsldir), "FSLOUTPUTTYPE": "NIFTI_GZ"}
+
+    def test_login_shell_read_once(self, home, settings):
+        """Later calls are served from memory"""
+        _, fsldir = home
+        with patch.object(tool_environment, "login_shell", return_value="/bin/bash"), \
+                patch.object(tool_environment.subprocess, "run", return_value=shell_output(fsldir)) as run:
+            first = resolve_tool_environment(settings)
+            second = resolve_tool_environment(settings)
+
+        assert run.call_count == 1
+        assert first == second
+        assert first["FSLDIR"] == str(fsldir)
+
+    def test_persisted_environment_reused(self, home, settings):
+        """A new process reuses the environment stored in the settings"""
+        _, fsldir = home
+        with patch.object(tool_environment, "login_shell", return_value="/bin/bash"), \
+                patch.object(tool_environment.subprocess, "run", return_value=shell_output(fsldir)) as run:
+            resolve_tool_environment(settings)
+            tool_environment.clear_resolved_environment()
+            environment = resolve_tool_environment(settings)
+
+        assert run.call_count == 1
+        assert environment["FSLOUTPUTTYPE"] == "NIFTI_GZ"
+        assert json.loads(settings.value(SETTINGS_KEY))["environment"] == environment
+
+    @pytest.mark.parametrize("changed", ["rc", "fsl"])
+    def test_changed_files_invalidate_environment(self, home, settings, changed):
+        """Editing a shell startup file or the FSL setup script resolves the environment again"""
+        home_dir, fsldir = home
+        with patch.object(tool_environment, "login_shell", return_value="/bin/bash"), \
+                patch.object(tool_environment.subprocess, "run", return_value=shell_output(fsldir)) as run:
+            resolve_tool_environment(settings)
+            bump_mtime(home_dir / ".bashrc" if changed == "rc" else fsldir / "etc" / "fslconf" / "fsl.sh")
+            resolve_tool_environment(settings)
+            tool_environment.clear_resolved_environment()
+            resolve_tool_environment(settings)
+
+        assert run.call_count == 2
+
+    def test_refresh_forces_probe(self, home, settings):
+        _, fsldir = home
+        with patch.object(tool_environment, "login_shell", return_value="/bin/bash"), \
+                patch.object(tool_environment.subprocess, "run", return_value=shell_output(fsldir)) as run:
+            resolve_tool_environment(settings)
+            resolve_tool_environment(settings, refresh=True)
+
+        assert run.call_count == 2
+
+    def test_shell_error_falls_back_to_process_environment(self, home, settings, monkeypatch):
+        monkeypatch.setenv("FSLDIR", "/env/fsl")
+        error = subprocess.CalledProcessError(1, "bash")
+        with patch.object(tool_environment, "login_shell", return_value="/bin/bash"), \
+                patch.object(tool_environment.subprocess, "run", side_effect=error):
+            environment = resolve_tool_environment(settings)
+
+        assert environment["FSLDIR"] == "/env/fsl"
+        assert environment["PATH"] == os.environ["PATH"]
+
+    def test_shell_error_not_persisted(self, home, settings):
+        """The next launch reads the login shell again instead of reusing the fallback"""
+        _, fsldir = home
+        error = subprocess.CalledProcessError(1, "bash")
+        with patch.object(tool_environment, "login_shell", return_value="/bin/bash"), \
+                patch.object(tool_environment.subprocess, "run", side_effect=[error, shell_output(fsldir)]) as run:
+            resolve_tool_environment(settings)
+            assert settings.value(SETTINGS_KEY) is None
+            tool_environment.clear_resolved_environment()
+            environment = resolve_tool_environment(settings)
+
+        assert run.call_count == 2
+        assert environment["FSLDIR"] == str(fsldir)
+        assert json.loads(settings.value(SETTINGS_KEY))["environment"] == environment
+
+    def test_no_login_shell(self, home, settings):
+        """Without a login shell (Windows) the process environment is used"""
+        with patch.object(tool_environment, "login_shell", return_value=None), \
+                patch.object(tool_environment.subprocess, "run") as run:
+            environment = resolve_tool_environment(settings)
+
+        run.assert_not_called()
+        assert environment["PATH"] == os.environ["PATH"]
+        assert json.loads(settings.value(SETTINGS_KEY))["environment"] == environment
+
+    def test_apply_tool_environment(self, monkeypatch):
+        monkeypatch.delenv("FSLOUTPUTTYPE", raising=False)
+        tool_environment.apply_tool_environment({"FSLOUTPUTTYPE": "NIFTI_GZ"})
+        assert os.environ["FSLOUTPUTTYPE"] == "NIFTI_GZ"
+        monkeypatch.delenv("FSLOUTPUTTYPE")
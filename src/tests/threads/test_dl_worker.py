@@ -1,10 +1,11 @@
+import json
 import os
 import sys
 import pytest
 from unittest.mock import Mock, patch, MagicMock, call
 from PyQt6.QtCore import QProcess
 
-from main.threads.dl_worker import DlWorker
+from main.threads.dl_worker import DlWorker, PHASES
 import main.threads.dl_worker
 
 
@@ -67,6 +68,29 @@ def mock_external_dependencies(mocker):
     mock_qprocess_class.ProcessError = QProcess.ProcessError
 
 
+def started_worker(files, workspace, **kwargs):
+    """Start a worker whose processes are recorded instead of run."""
+    worker = DlWorker(files, workspace, False, **kwargs)
+    worker.start_process = Mock(side_effect=lambda job, label, program, args: job.update(process=Mock()))
+    worker.start()
+    return worker
+
+
+def running(worker):
+    """Return the (file index, phase) of the running jobs."""
+    return sorted((job["index"], PHASES[job["phase"]]) for job in worker.jobs if job["state"] == "running")
+
+
+def complete(worker, index, exit_code=0):
+    """Simulate the end of the running phase of a file."""
+    job = worker.jobs[index]
+    if PHASES[job["phase"]] == "coregistration":
+        coreg_dir = os.path.join(job["output_dir"], "coregistration")
+        os.makedirs(coreg_dir, exist_ok=True)
+        open(os.path.join(coreg_dir, f"{job['name']}_rsl.nii.gz"), "w").close()
+    worker.on_phase_finished(job, exit_code, QProcess.ExitStatus.NormalExit)
+
+
 class TestDlWorkerInitialization:
     """Tests for DlWorker initialization."""
 
@@ -81,8 +105,7 @@ class TestDlWorkerInitialization:
         assert worker.failed_files is None
         assert worker.is_cancelled is False
         assert worker.total_phases == 6
-        assert worker.current_file_index == 0
-        assert worker.current_phase == 0
+        assert worker.jobs == []
 
     def test_initialization_signals_exist(self, qtbot, test_input_files, temp_workspace):
         """Test that all signals exist."""
@@ -94,36 +117,17 @@ class TestDlWorkerInitialization:
         assert hasattr(worker, 'finished')
         assert hasattr(worker, 'cancel_requested')
 
-    def test_initialization_process_instances_none(self, qtbot, test_input_files, temp_workspace):
-        """Test that process instances are None initially."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
+    def test_phase_limits_override_defaults(self, qtbot, test_input_files, temp_workspace):
+        """Custom limits replace the default ones of their phases only."""
+        worker = DlWorker(test_input_files, temp_workspace, False, phase_limits={"coregistration": 4})
 
-        assert worker.synthstrip_process is None
-        assert worker.coregistration_process is None
-        assert worker.reorientation_process is None
-        assert worker.dl_preprocess is None
-        assert worker.dl_process is None
-        assert worker.dl_postprocess is None
+        assert worker.phase_limits["coregistration"] == 4
+        assert worker.phase_limits["deep_learning"] == 1
 
 
 class TestUpdateProgress:
     """Tests for the update_progress method."""
 
-    def test_update_progress_basic(self, qtbot, test_input_files, temp_workspace):
-        """Test basic progress update."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        worker.total_files = 3
-        worker.current_file_index = 0
-        worker.current_phase = 1
-
-        with qtbot.waitSignal(worker.progressbar_update) as blocker:
-            worker.update_progress()
-
-        # Signal should be emitted with a value
-        assert blocker.signal_triggered
-        assert isinstance(blocker.args[0], int)
-
     def test_update_progress_zero_files(self, qtbot, test_input_files, temp_workspace):
         """Test with zero files."""
         worker = DlWorker(test_input_files, temp_workspace, False)
@@ -135,34 +139,25 @@ class TestUpdateProgress:
             worker.update_progress()
             mock_signal.emit.assert_not_called()
 
-    def test_update_progress_calculation(self, qtbot, test_input_files, temp_workspace):
-        """Test progress calculation."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        worker.total_files = 2
-        worker.total_phases = 6
-        worker.current_file_index = 0
-        worker.current_phase = 3  # Halfway through the first file
+    def test_update_progress_counts_completed_phases(self, qtbot, test_input_files, temp_workspace):
+        """Progress is the share of completed (file, phase) steps."""
+        worker = started_worker(test_input_files[:2], temp_workspace)
+        worker.jobs[0]["phase"] = 3
 
         with qtbot.waitSignal(worker.progressbar_update) as blocker:
             worker.update_progress()
 
-        # Should be approx 25% (3 phases out of 12 total)
-        progress = blocker.args[0]
-        assert 20 <= progress <= 30
-
-    def test_update_progress_max_100(self, qtbot, test_input_files, temp_workspace):
-        """Test that progress does not exceed 100."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
+        assert blocker.args[0] == 25  # 3 phases out of 12
 
-        worker.total_files = 1
-        worker.current_file_index = 10  # Out of range value
-        worker.current_phase = 10
+    def test_failed_file_counts_as_complete(self, qtbot, test_input_files, temp_workspace):
+        """A failed file does not hold the progress back."""
+        worker = started_worker(test_input_files[:2], temp_workspace)
+        worker.jobs[0]["state"] = "failed"
 
         with qtbot.waitSignal(worker.progressbar_update) as blocker:
             worker.update_progress()
 
-        assert blocker.args[0] <= 100
+        assert blocker.args[0] == 50
 
 
 class TestStart:
@@ -170,178 +165,168 @@ class TestStart:
 
     def test_start_initializes_counters(self, qtbot, test_input_files, temp_workspace):
         """Test that start initializes counters."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        with patch.object(worker, 'process_single_file'):
-            worker.start()
+        worker = started_worker(test_input_files, temp_workspace)
 
         assert worker.total_files == len(test_input_files)
         assert worker.processed_files == 0
         assert worker.failed_files == []
-        assert worker.current_file_index == 0
-        assert worker.current_phase == 0
+        assert [job["input"] for job in worker.jobs] == test_input_files
 
-    def test_start_calls_process_single_file(self, qtbot, test_input_files, temp_workspace):
-        """Test that start calls process_single_file."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        with patch.object(worker, 'process_single_file') as mock_process:
-            worker.start()
+    def test_start_runs_first_synthstrip(self, qtbot, test_input_files, temp_workspace):
+        """Only one file is skull-stripped at a time."""
+        worker = started_worker(test_input_files, temp_workspace)
 
-            mock_process.assert_called_once()
+        assert running(worker) == [(0, "synthstrip")]
+        assert os.path.isdir(worker.jobs[0]["output_dir"])
+        assert worker.jobs[1]["output_dir"] is None
 
     def test_start_emits_initial_progress(self, qtbot, test_input_files, temp_workspace):
         """Test that start emits initial progress."""
         worker = DlWorker(test_input_files, temp_workspace, False)
+        worker.start_process = Mock()
 
-        with patch.object(worker, 'process_single_file'):
-            with qtbot.waitSignal(worker.progressbar_update):
-                worker.start()
-
-
-class TestProcessSingleFile:
-    """Tests for the process_single_file method."""
-
-    def test_process_single_file_creates_temp_dir(self, qtbot, test_input_files, temp_workspace):
-        """Test that it creates a temporary directory."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        worker.total_files = len(test_input_files)
-
-        with patch.object(worker, 'run_synthstrip'):
-            worker.process_single_file()
-
-            assert worker.output_dir is not None
-            assert os.path.exists(worker.output_dir)
-
-    def test_process_single_file_sets_current_file(self, qtbot, test_input_files, temp_workspace):
-        """Test that it sets the current file."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        worker.total_files = len(test_input_files)
-        worker.current_file_index = 1
+        with qtbot.waitSignal(worker.progressbar_update):
+            worker.start()
 
-        with patch.object(worker, 'run_synthstrip'):
-            worker.process_single_file()
 
-            assert worker.current_input_file == test_input_files[1]
-            assert worker.current_input_file_basename == os.path.basename(test_input_files[1])
+class TestRunSynthstrip:
+    """Tests for the run_synthstrip method."""
 
-    def test_process_single_file_calls_run_synthstrip(self, qtbot, test_input_files, temp_workspace):
-        """Test that it calls run_synthstrip."""
+    def test_run_synthstrip_starts_process(self, qtbot, test_input_files, temp_workspace):
+        """Test that it creates, connects and starts the process."""
         worker = DlWorker(test_input_files, temp_workspace, False)
+        worker.start()
 
-        worker.total_files = len(test_input_files)
-
-        with patch.object(worker, 'run_synthstrip') as mock_synthstrip:
-            worker.process_single_file()
-
-            mock_synthstrip.assert_called_once()
+        process = worker.jobs[0]["process"]
+        assert process.finished.connect.called
+        assert process.errorOccurred.connect.called
+        process.start.assert_called_once()
+        assert process.start.call_args[0][0] == "/fake/path/to/binary"
 
-    def test_process_single_file_emits_log(self, qtbot, test_input_files, temp_workspace):
-        """Test that it emits a log."""
+    def test_run_synthstrip_emits_signals(self, qtbot, test_input_files, temp_workspace):
+        """Test that it emits signals."""
         worker = DlWorker(test_input_files, temp_workspace, False)
 
-        worker.total_files = len(test_input_files)
-
-        with patch.object(worker, 'run_synthstrip'):
-            with qtbot.waitSignal(worker.log_update):
-                worker.process_single_file()
-
-
-class TestRunSynthstrip:
-    """Tests for the run_synthstrip method."""
+        with qtbot.waitSignal(worker.file_update):
+            worker.start()
 
-    def test_run_synthstrip_creates_process(self, qtbot, test_input_files, temp_workspace):
-        """Test that it creates the process."""
+    def test_cpu_phase_gets_thread_budget(self, qtbot, test_input_files, temp_workspace):
+        """CPU phases running side by side split the cores between them."""
         worker = DlWorker(test_input_files, temp_workspace, False)
+        worker.start()
+        worker.jobs[0]["process"].setProcessEnvironment.assert_not_called()  # GPU phase
 
-        worker.current_input_file = test_input_files[0]
-        worker.current_input_file_basename = os.path.basename(test_input_files[0])
-        worker.output_dir = temp_workspace
-
-        worker.run_synthstrip()
+        with patch("main.threads.dl_worker.os.cpu_count", return_value=8):
+            complete(worker, 0)
 
-        assert worker.synthstrip_process is not None
+        env = worker.jobs[0]["process"].setProcessEnvironment.call_args[0][0]
+        assert env.value("OMP_NUM_THREADS") == "4"  # 8 cores, 2 coregistrations
 
-    def test_run_synthstrip_connects_signals(self, qtbot, test_input_files, temp_workspace):
-        """Test that it connects signals."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
 
-        worker.current_input_file = test_input_files[0]
-        worker.current_input_file_basename = os.path.basename(test_input_files[0])
-        worker.output_dir = temp_workspace
+class TestScheduling:
+    """Tests for the pipelining of the phases across files."""
 
-        worker.run_synthstrip()
+    def test_next_file_starts_while_first_goes_on(self, qtbot, test_input_files, temp_workspace):
+        """Once a file is skull-stripped, the next one starts while the first is coregistered."""
+        worker = started_worker(test_input_files, temp_workspace)
 
-        assert worker.synthstrip_process.finished.connect.called
-        assert worker.synthstrip_process.errorOccurred.connect.called
+        complete(worker, 0)
 
-    def test_run_synthstrip_starts_process(self, qtbot, test_input_files, temp_workspace):
-        """Test that it starts the process."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
+        assert running(worker) == [(0, "coregistration"), (1, "synthstrip")]
 
-        worker.current_input_file = test_input_files[0]
-        worker.current_input_file_basename = os.path.basename(test_input_files[0])
-        worker.output_dir = temp_workspace
+    def test_pipeline_overlaps_phases(self, qtbot, test_input_files, temp_workspace):
+        """Three files can be in three different phases at the same time."""
+        worker = started_worker(test_input_files, temp_workspace)
 
-        worker.run_synthstrip()
+        complete(worker, 0)  # 0: coregistration, 1: synthstrip
+        complete(worker, 0)  # 0: reorientation
+        complete(worker, 1)  # 1: coregistration, 2: synthstrip
 
-        worker.synthstrip_process.start.assert_called_once()
+        assert running(worker) == [(0, "reorientation"), (1, "coregistration"), (2, "synthstrip")]
 
-    def test_run_synthstrip_emits_signals(self, qtbot, test_input_files, temp_workspace):
-        """Test that it emits signals."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
+    def test_phase_limit_is_respected(self, qtbot, temp_workspace):
+        """Files wait for a free slot of their next phase."""
+        files = [os.path.join(temp_workspace, f"f{i}.nii.gz") for i in range(4)]
+        worker = started_worker(files, temp_workspace, phase_limits={"synthstrip": 4, "coregistration": 1})
+        assert running(worker) == [(0, "synthstrip"), (1, "synthstrip"), (2, "synthstrip"), (3, "synthstrip")]
 
-        worker.current_input_file = test_input_files[0]
-        worker.current_input_file_basename = os.path.basename(test_input_files[0])
-        worker.output_dir = temp_workspace
+        complete(worker, 0)
+        complete(worker, 1)
 
-        with qtbot.waitSignal(worker.file_update):
-            worker.run_synthstrip()
+        assert running(worker) == [(0, "coregistration"), (2, "synthstrip"), (3, "synthstrip")]
+        assert worker.jobs[1]["state"] == "waiting"
 
+    def test_gpu_phases_do_not_overlap(self, qtbot, test_input_files, temp_workspace):
+        """The deep learning phase waits for the skull strip running on the GPU, and the reverse."""
+        worker = started_worker(test_input_files, temp_workspace)
+        for _ in range(4):
+            complete(worker, 0)
+        # File 0 is ready for deep learning while file 1 is skull-stripped
+        assert running(worker) == [(1, "synthstrip")]
+        assert worker.jobs[0]["state"] == "waiting"
 
-class TestOnSynthstripFinished:
-    """Tests for the on_synthstrip_finished callback."""
+        complete(worker, 1)
 
-    def test_on_synthstrip_finished_success(self, qtbot, test_input_files, temp_workspace):
-        """Test successful completion."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
+        # The file furthest along goes first
+        assert running(worker) == [(0, "deep_learning"), (1, "coregistration")]
+        assert worker.jobs[2]["state"] == "waiting"
 
-        worker.total_files = len(test_input_files)
-        worker.current_file_index = 0
+    def test_failure_does_not_stop_other_files(self, qtbot, test_input_files, temp_workspace):
+        """A failed file is reported and the others go on."""
+        worker = started_worker(test_input_files, temp_workspace)
+        updates = []
+        worker.file_update.connect(lambda name, status: updates.append((name, status)))
 
-        worker.current_input_file_basename = "test.nii.gz"
+        complete(worker, 0, exit_code=1)
 
-        with patch.object(worker, 'run_coregistration') as mock_coreg:
-            worker.on_synthstrip_finished(0, QProcess.ExitStatus.NormalExit)
+        assert worker.jobs[0]["state"] == "failed"
+        assert worker.failed_files == [test_input_files[0]]
+        assert ("test_0.nii.gz", "Segmentation failed for this file") in updates
+        assert running(worker) == [(1, "synthstrip")]
 
-            mock_coreg.assert_called_once()
-            assert worker.current_phase == 2
+    def test_failed_to_start_fails_phase(self, qtbot, test_input_files, temp_workspace):
+        """A process that cannot start fails its file, since no finished signal follows."""
+        worker = started_worker(test_input_files, temp_workspace)
 
-    def test_on_synthstrip_finished_failure(self, qtbot, test_input_files, temp_workspace):
-        """Test completion with failure."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
+        worker.on_process_error(worker.jobs[0], "Synthstrip", QProcess.ProcessError.FailedToStart)
 
-        worker.total_files = 2
-        worker.current_file_index = 0
-        worker.current_input_file_basename = "test.nii.gz"
+        assert worker.jobs[0]["state"] == "failed"
+        assert running(worker) == [(1, "synthstrip")]
 
-        with patch.object(worker, 'process_single_file') as mock_process:
-            worker.on_synthstrip_finished(1, QProcess.ExitStatus.NormalExit)
+    def test_missing_coregistration_output_fails_file(self, qtbot, test_input_files, temp_workspace):
+        """Reorientation without a coregistered image fails that file only."""
+        worker = started_worker(test_input_files[:1], temp_workspace)
+        complete(worker, 0)
 
-            assert worker.current_file_index == 1
+        with qtbot.waitSignal(worker.finished) as blocker:
+            worker.on_phase_finished(worker.jobs[0], 0, QProcess.ExitStatus.NormalExit)
 
-    def test_on_synthstrip_finished_cancelled(self, qtbot, test_input_files, temp_workspace):
-        """Test when cancelled."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
+        assert worker.jobs[0]["state"] == "failed"
+        assert blocker.args[0] is False
 
+    def test_finish_when_all_files_processed(self, qtbot, test_input_files, temp_workspace):
+        """All files go through the six phases, then the batch finishes."""
+        worker = started_worker(test_input_files, temp_workspace)
+        finished = []
+        worker.finished.connect(lambda success, message: finished.append(success))
+
+        while running(worker):
+            complete(worker, running(worker)[0][0])
+
+        assert [job["state"] for job in worker.jobs] == ["done"] * 3
+        assert worker.processed_files == 3
+        assert finished == [True]
+        assert worker.start_process.call_count == 3 * len(PHASES)
+
+    def test_cancelled_worker_ignores_results(self, qtbot, test_input_files, temp_workspace):
+        """Phases ending after a cancellation start nothing."""
+        worker = started_worker(test_input_files, temp_workspace)
         worker.is_cancelled = True
 
-        with patch.object(worker, 'run_coregistration') as mock_coreg:
-            worker.on_synthstrip_finished(0, QProcess.ExitStatus.NormalExit)
+        complete(worker, 0)
 
-            mock_coreg.assert_not_called()
+        assert worker.jobs[0]["phase"] == 0
+        assert worker.start_process.call_count == 1
 
 
 class TestCancel:
@@ -358,29 +343,28 @@ class TestCancel:
     def test_cancel_terminates_running_processes(self, qtbot, test_input_files, temp_workspace):
         """Test that it terminates running processes."""
         worker = DlWorker(test_input_files, temp_workspace, False)
+        worker.start()
 
-        # Simulate running process
-        mock_process = main.threads.dl_worker.QProcess()
-        worker.synthstrip_process = mock_process
-        mock_process.state = Mock(return_value=QProcess.ProcessState.Running)
+        process = worker.jobs[0]["process"]
+        process.state = Mock(return_value=QProcess.ProcessState.Running)
 
         worker.cancel()
 
-        worker.synthstrip_process.terminate.assert_called_once()
+        process.terminate.assert_called()
+        process.kill.assert_not_called()
 
     def test_cancel_kills_if_not_terminated(self, qtbot, test_input_files, temp_workspace):
         """Test that it kills the process if it doesn't terminate."""
         worker = DlWorker(test_input_files, temp_workspace, False)
+        worker.start()
 
-        mock_process = main.threads.dl_worker.QProcess()
-
-        worker.synthstrip_process = mock_process
-        mock_process.state = Mock(return_value=QProcess.ProcessState.Running)
-        mock_process.waitForFinished = Mock(return_value=False)
+        process = worker.jobs[0]["process"]
+        process.state = Mock(return_value=QProcess.ProcessState.Running)
+        process.waitForFinished = Mock(return_value=False)
 
         worker.cancel()
 
-        mock_process.kill.assert_called_once()
+        process.kill.assert_called()
 
     def test_cancel_emits_finished_signal(self, qtbot, test_input_files, temp_workspace):
         """Test that it emits the finished signal."""
@@ -453,82 +437,18 @@ class TestOnError:
             worker.on_error("TestPhase", QProcess.ProcessError.Crashed)
 
 
-class TestPhaseTransitions:
-    """Tests for phase transitions."""
-
-    def test_synthstrip_to_coregistration(self, qtbot, test_input_files, temp_workspace):
-        """Test synthstrip -> coregistration transition."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        worker.total_files = len(test_input_files)
-        worker.current_file_index = 0
-
-        worker.current_input_file_basename = "test.nii.gz"
-
-        with patch.object(worker, 'run_coregistration') as mock_coreg:
-            worker.on_synthstrip_finished(0, QProcess.ExitStatus.NormalExit)
-
-            assert worker.current_phase == 2
-            mock_coreg.assert_called_once()
-
-    def test_coregistration_to_reorientation(self, qtbot, test_input_files, temp_workspace):
-        """Test coregistration -> reorientation transition."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        worker.total_files = len(test_input_files)
-        worker.current_file_index = 0
-
-        worker.current_input_file_basename = "test.nii.gz"
-
-        with patch.object(worker, 'run_reorientation') as mock_reorient:
-            worker.on_coregistration_finished(0, QProcess.ExitStatus.NormalExit)
-
-            assert worker.current_phase == 3
-            mock_reorient.assert_called_once()
-
-
-class TestMultipleFiles:
-    """Tests for multiple file processing."""
-
-    def test_process_multiple_files_sequentially(self, qtbot, test_input_files, temp_workspace):
-        """Test sequential file processing."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        worker.total_files = 3
-        worker.current_file_index = 0
-
-        with patch.object(worker, 'run_synthstrip'):
-            # Simulate completion of the first file
-            worker.current_phase = 6
-            worker.on_postprocess_finished(0, QProcess.ExitStatus.NormalExit)
-
-            assert worker.current_file_index == 1
-
-    def test_finish_when_all_files_processed(self, qtbot, test_input_files, temp_workspace):
-        """Test finish when all files are processed."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        worker.total_files = 3
-        worker.current_file_index = 2  # Last file
-        worker.current_phase = 6
-
-        with qtbot.waitSignal(worker.finished) as blocker:
-            worker.on_postprocess_finished(0, QProcess.ExitStatus.NormalExit)
-
-        assert blocker.args[0] is True  # success=True
-
-
 class TestEdgeCases:
     """Tests for edge cases."""
 
     def test_empty_file_list(self, qtbot, temp_workspace):
-        """Test with empty file list."""
+        """An empty batch finishes at once."""
         worker = DlWorker([], temp_workspace, False)
 
-        with patch.object(worker, 'process_single_file') as mock_process:
+        with qtbot.waitSignal(worker.finished) as blocker:
             worker.start()
 
-            assert worker.total_files == 0
+        assert worker.total_files == 0
+        assert blocker.args[0] is True
 
     def test_unicode_in_filename(self, qtbot, temp_workspace):
         """Test with unicode in filename."""
@@ -536,27 +456,10 @@ class TestEdgeCases:
         with open(unicode_file, "w") as f:
             f.write("data")
 
-        worker = DlWorker([unicode_file], temp_workspace, False)
-
-        with patch.object(worker, 'run_synthstrip'):
-            worker.process_single_file()
+        worker = started_worker([unicode_file], temp_workspace)
 
-            assert worker.current_input_file == unicode_file
-
-
-class TestIntegration:
-    """Integration tests."""
-
-    def test_full_workflow_single_file(self, qtbot, test_input_files, temp_workspace):
-        """Test full workflow single file."""
-        worker = DlWorker([test_input_files[0]], temp_workspace, False)
-
-        # Start
-        with patch.object(worker, 'run_synthstrip'):
-            worker.start()
-
-        assert worker.total_files == 1
-        assert worker.current_file_index == 0
+        assert worker.jobs[0]["name"] == "файл_文件"
+        assert worker.jobs[0]["synthstrip_file"].endswith("файл_文件_skull_stripped.nii.gz")
 
 
 class TestMemoryAndPerformance:
@@ -571,16 +474,158 @@ class TestMemoryAndPerformance:
         assert worker.input_files == many_files
 
 
-class TestAccessibility:
-    """Tests for accessibility."""
-
-    def test_signals_have_docstrings(self, qtbot, test_input_files, temp_workspace):
-        """Test that signals have docstrings."""
-        worker = DlWorker(test_input_files, temp_workspace, False)
-
-        # Verify that the signal objects exist
-        assert hasattr(worker, 'progressbar_update')
-        assert hasattr(worker, 'file_update')
-        assert hasattr(worker, 'log_update')
-        assert hasattr(worker, 'finished')
-        assert hasattr(worker, 'cancel_requested')
\ No newline at end of file
+class TestSynthstripService:
+    """Tests for running SynthStrip through the long-lived worker."""
+
+    def test_synthstrip_job_runs_in_worker(self, qtbot, test_input_files, temp_workspace, fake_skull_strip_worker):
+        """The skull strip is computed by the worker, then the pipeline goes on."""
+        worker = started_worker(test_input_files[:1], temp_workspace, use_service=True)
+
+        qtbot.waitUntil(lambda: running(worker) == [(0, "coregistration")], timeout=10000)
+
+        main.threads.dl_worker.QProcess.assert_not_called()
+        assert os.path.exists(worker.jobs[0]["synthstrip_file"])
+        assert worker.synthstrip_service.is_running()
+
+        worker.stop_synthstrip_service()
+        assert worker.synthstrip_service is None
+
+    def test_falls_back_to_process(self, qtbot, test_input_files, temp_workspace, fake_skull_strip_worker,
+                                   monkeypatch):
+        """A worker that cannot load the model is replaced by one process per file."""
+        monkeypatch.setenv("FAKE_WORKER_MODE", "fail")
+        worker = started_worker(test_input_files, temp_workspace, use_service=True)
+
+        qtbot.waitUntil(lambda: worker.start_process.called, timeout=10000)
+
+        assert worker.start_process.call_args[0][1] == "Synthstrip"
+        assert running(worker) == [(0, "synthstrip")]
+        assert not worker.use_service and worker.synthstrip_service is None
+
+
+class TestInferenceService:
+    """Tests for running the phases after the coregistration in the shared nnU-Net worker."""
+
+    def test_phases_run_in_worker(self, qtbot, test_input_files, temp_workspace, fake_inference_worker):
+        """The file is segmented in memory by the worker, which stays loaded once the run is over."""
+        worker = started_worker(test_input_files[:1], temp_workspace, use_inference_service=True)
+        complete(worker, 0)
+        statuses = []
+        worker.file_update.connect(lambda name, status: statuses.append(status))
+        complete(worker, 0)
+        service = worker.inference_service
+
+        qtbot.waitUntil(lambda: worker.jobs[0]["state"] == "done", timeout=10000)
+
+        assert worker.start_process.call_count == 2  # Synthstrip and coregistration only
+        assert [s for s in statuses if s.startswith("Phase")] == \
+            [f"Phase {n}/6: {name}" for n, name in ((3, "Reorientation..."), (4, "Preparing and preprocessing..."),
+                                                    (5, "Deep Learning..."), (6, "Postprocessing..."))]
+        with open(os.path.join(temp_workspace, "test_0.nii.gz_seg.json")) as f:
+            job = json.load(f)
+        assert job["kind"] == "segment" and job["mri"] == test_input_files[0]
+        assert job["input"].endswith("test_0_rsl.nii.gz")
+        assert job["registrations"] == worker.registrations_dir
+        assert job["debug_dir"] is None
+        assert worker.inference_service is None
+        assert service.is_running()
+
+    def test_debug_dumps(self, qtbot, test_input_files, temp_workspace, fake_inference_worker):
+        worker = started_worker(test_input_files[:1], temp_workspace, use_inference_service=True, debug_dumps=True)
+        complete(worker, 0)
+        complete(worker, 0)
+
+        qtbot.waitUntil(lambda: worker.jobs[0]["state"] == "done", timeout=10000)
+
+        with open(os.path.join(temp_workspace, "test_0.nii.gz_seg.json")) as f:
+            assert json.load(f)["debug_dir"] == os.path.join(worker.jobs[0]["output_dir"], "debug")
+
+    def test_one_file_at_a_time(self, qtbot, test_input_files, temp_workspace, fake_inference_worker):
+        """A file waits for the previous one to leave the worker."""
+        worker = started_worker(test_input_files[:2], temp_workspace, use_inference_service=True)
+        complete(worker, 0)
+        complete(worker, 0)
+        complete(worker, 1)
+        complete(worker, 1)
+
+        assert running(worker) == [(0, "reorientation")]
+        assert worker.jobs[1]["state"] == "waiting"
+        qtbot.waitUntil(lambda: [job["state"] for job in worker.jobs] == ["done", "done"], timeout=10000)
+
+    def test_synthstrip_waits_for_worker(self, qtbot, test_input_files, temp_workspace, fake_inference_worker):
+        """The GPU is not shared between a skull strip and a file segmented in the worker."""
+        worker = started_worker(test_input_files, temp_workspace, use_inference_service=True)
+        overlaps = []
+        start_process = worker.start_process.side_effect
+
+        def record(job, label, program, args):
+            if label == "Synthstrip" and worker.inference_jobs:
+                overlaps.append(job["index"])
+            start_process(job, label, program, args)
+        worker.start_process.side_effect = record
+
+        complete(worker, 0)  # 0: coregistration, 1: synthstrip
+        complete(worker, 0)  # 0: waits for the skull strip of 1
+        assert not worker.inference_jobs and worker.jobs[0]["state"] == "waiting"
+
+        complete(worker, 1)  # 0: in the worker, 1: coregistration, 2: waits for the worker
+        assert worker.inference_jobs and worker.jobs[2]["state"] == "waiting"
+
+        qtbot.waitUntil(lambda: worker.jobs[0]["state"] == "done", timeout=10000)
+        assert running(worker) == [(1, "coregistration"), (2, "synthstrip")]
+        assert overlaps == []
+
+    def test_falls_back_to_processes(self, qtbot, test_input_files, temp_workspace, fake_inference_worker,
+                                     monkeypatch):
+        """A worker that cannot load the model is replaced by one process per phase."""
+        monkeypatch.setenv("FAKE_WORKER_MODE", "fail")
+        worker = started_worker(test_input_files[:1], temp_workspace, use_inference_service=True)
+        logs = []
+        worker.log_update.connect(lambda message, level: logs.append((message, level)))
+        complete(worker, 0)
+        complete(worker, 0)
+
+        qtbot.waitUntil(lambda: worker.start_process.call_count == 3, timeout=10000)
+
+        assert worker.start_process.call_args[0][1] == "Reorientation"
+        assert ("nnU-Net worker unavailable, running one process per phase", 'w') in logs
+        assert not worker.use_inference_service and worker.inference_service is None
+        for _ in range(3):
+            complete(worker, 0)
+        assert worker.start_process.call_args[0][1] == "Postprocessing"
+
+
+class TestCpuExecution:
+    """Tests for machines without CUDA."""
+
+    def test_deep_learning_runs_on_cpu(self, qtbot, test_input_files, temp_workspace):
+        """The runner is asked for the CPU and gets every core."""
+        worker = DlWorker(test_input_files[:1], temp_workspace, False, has_cuda=False)
+        worker.start()
+        assert "-g" not in worker.jobs[0]["process"].start.call_args[0][1]
+        for _ in range(4):
+            complete(worker, 0)
+
+        args = worker.jobs[0]["process"].start.call_args[0][1]
+        assert args[args.index("--gpus") + 1] == "0"
+        env = worker.jobs[0]["process"].setProcessEnvironment.call_args[0][0]
+        assert env.value("OMP_NUM_THREADS") == str(os.cpu_count())
+
+    def test_gpu_build_keeps_gpu_flags(self, qtbot, test_input_files, temp_workspace):
+        worker = DlWorker(test_input_files[:1], temp_workspace, False)
+
+        assert worker.model_args()[worker.model_args().index("--gpus") + 1] == "1"
+
+
+class TestRegistrationStore:
+    """Tests for the atlas registration shared by the coregistration and the postprocess."""
+
+    def test_phases_share_registration_store(self, qtbot, test_input_files, temp_workspace):
+        worker = started_worker(test_input_files[:1], temp_workspace)
+        for _ in range(5):
+            complete(worker, 0)
+
+        coregistration, postprocess = (worker.start_process.call_args_list[i][0][3] for i in (1, 5))
+        store = os.path.join(temp_workspace, ".registrations")
+        assert coregistration[coregistration.index("--registrations") + 1] == store
+        assert postprocess[postprocess.index("--registrations") + 1] == store
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from main.threads import inference_service
+from main.threads.inference_service import InferenceService, shared_inference_service, \
+    stop_shared_inference_service
+
+MODEL_ARGS = ["--depth", "6", "--ckpt_path", "model.ckpt", "--tta"]
+
+
+class TestInferenceService:
+    """Tests for the client of the long-lived nnU-Net worker"""
+
+    def test_command(self):
+        service = InferenceService(MODEL_ARGS, threads=4)
+        with patch.object(inference_service, "get_dl_python_executable", return_value="/venv/python"), \
+                patch.object(inference_service, "get_script_path", side_effect=lambda p: f"/app/{p}"):
+            program, args = service.command()
+
+        assert program == "/venv/python"
+        assert args == ["/app/deep_learning/inference_server.py", *MODEL_ARGS, "--threads", "4"]
+
+    def test_cases_share_one_worker(self, fake_inference_worker, tmp_path):
+        """The model is loaded once for every submitted folder"""
+        service = InferenceService(MODEL_ARGS)
+        service.start()
+        assert service.wait_until_ready(10000)
+
+        outputs = [str(tmp_path / f"predictions_{i}") for i in range(2)]
+        ids = [service.submit(str(tmp_path / f"case_{i}"), out) for i, out in enumerate(outputs)]
+        assert [service.wait_for_job(job_id, 10000) for job_id in ids] == [(True, "")] * 2
+
+        contents = {open(out).read() for out in outputs}
+        assert len(contents) == 1  # Same process for all jobs
+        assert "model.ckpt" in contents.pop()
+        service.stop()
+
+
+class TestSharedService:
+    """Tests for the worker kept loaded between segmentation runs"""
+
+    def test_reused_between_runs(self, fake_inference_worker):
+        first = shared_inference_service(MODEL_ARGS)
+        assert shared_inference_service(list(MODEL_ARGS)) is first
+        assert first.is_running()
+
+        stop_shared_inference_service()
+        assert not first.is_running()
+
+    def test_replaced_when_arguments_change(self, fake_inference_worker):
+        first = shared_inference_service(MODEL_ARGS)
+        second = shared_inference_service(MODEL_ARGS[:-1])
+
+        assert second is not first
+        assert not first.is_running() and second.is_running()
+
+    def test_replaced_when_exited(self, fake_inference_worker):
+        first = shared_inference_service(MODEL_ARGS)
+        first.kill()
+
+        second = shared_inference_service(MODEL_ARGS)
+        assert second is not first and second.is_running()
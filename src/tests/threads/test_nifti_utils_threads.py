@@ -17,7 +17,14 @@ import pytest
 import numpy as np
 import nibabel as nib
 
-from main.threads.nifti_utils_threads import SaveNiftiThread, ImageLoadThread
+import time
+
+from main.threads.nifti_utils_threads import (SaveNiftiThread, ImageLoadThread, CinePrefetchThread, AutomaticROIThread,
+                                              KernelWarmupThread, ProjectionThread, RunLengthROI,
+                                              DicomSeriesLoadThread, foreground_bounding_box)
+from main.dicom_series import DicomSeries
+from main.slice_compositing import normalize_volume
+from tests.conftest import write_dicom_series
 
 
 class TestSaveNiftiThreadInitialization:
@@ -67,6 +74,24 @@ class TestSaveNiftiThreadInitialization:
 class TestSaveNiftiThreadExecution:
     """Tests for SaveNiftiThread execution"""
 
+    @pytest.mark.parametrize("extension", [".nii", ".nii.gz"])
+    def test_run_length_roi_is_streamed(self, temp_workspace, extension):
+        """Run-length encoded ROIs are written without a dense volume and load back identically"""
+        mask = np.random.default_rng(0).random((7, 8, 9)) < 0.3
+        affine = np.diag([2.0, 2.0, 3.0, 1.0])
+        affine[:3, 3] = [-10, 5, 3]
+        nifti_path = os.path.join(temp_workspace, f"roi{extension}")
+
+        thread = SaveNiftiThread(RunLengthROI.from_mask(mask), affine, nifti_path,
+                                 os.path.join(temp_workspace, "roi.json"), "sub-01/anat/T1w.nii", {})
+        with patch.object(RunLengthROI, "to_dense", side_effect=AssertionError("dense decode")):
+            thread.run()
+
+        loaded_img = nib.load(nifti_path)
+        assert loaded_img.get_data_dtype() == np.uint8
+        np.testing.assert_array_equal(np.asarray(loaded_img.dataobj), mask)
+        np.testing.assert_array_almost_equal(loaded_img.affine, affine)
+
     def test_successful_save(self, temp_workspace):
         """Test successful saving of NIfTI and JSON"""
         # Test data
@@ -1454,5 +1479,371 @@ class TestEdgeCasesAndIntegration:
         assert isinstance(errors[0], str)
 
 
+class TestDicomSeriesLoadThread:
+    """Tests for reading DICOM series slice by slice"""
+
+    @pytest.fixture
+    def series(self, tmp_path):
+        volume = np.random.default_rng(0).integers(1, 1000, size=(8, 6, 9)).astype(np.uint16)
+        return DicomSeries(write_dicom_series(str(tmp_path / "series"), volume)), volume
+
+    def test_slices_from_the_middle_then_volume(self, series):
+        """Slices are announced middle-out, then the normalized canonical volume is emitted"""
+        series, volume = series
+        thread = DicomSeriesLoadThread(series)
+        slices, results = [], []
+        thread.slice_ready.connect(lambda index, values: slices.append((index, values)))
+        thread.finished.connect(lambda img_data, dims, aff, is_4d, is_overlay: results.append((img_data, dims, aff)))
+        thread.run()
+
+        assert [index for index, _ in slices] == series.loading_order()
+        for index, values in slices:
+            np.testing.assert_array_equal(values, volume[:, :, index])
+        img_data, dims, affine = results[0]
+        assert dims == series.canonical_shape
+        np.testing.assert_allclose(affine, series.canonical_affine)
+        assert img_data.flags.c_contiguous
+        assert 0 <= img_data.min() and img_data.max() <= 1
+        # Intensity order is preserved by the normalization
+        native = series.native_view(img_data)
+        assert np.argmax(native) == np.argmax(volume)
+        np.testing.assert_allclose(native, normalize_volume(volume.astype(np.float32)), atol=1e-6)
+
+    def test_requested_slice_is_read_first(self, series):
+        series, _ = series
+        thread = DicomSeriesLoadThread(series)
+        slices = []
+        thread.slice_ready.connect(lambda index, values: slices.append(index))
+        thread.request(0)
+        thread.run()
+
+        assert slices[0] == 0
+        assert sorted(slices) == list(range(len(series)))
+
+    def test_cancel_emits_nothing_more(self, series):
+        series, _ = series
+        thread = DicomSeriesLoadThread(series)
+        slices, results = [], []
+        thread.slice_ready.connect(lambda index, values: (slices.append(index), thread.cancel()))
+        thread.finished.connect(lambda *args: results.append(args))
+        thread.run()
+
+        assert len(slices) == 1
+        assert results == []
+
+    def test_unreadable_slice_reports_error(self, series):
+        series, _ = series
+        os.remove(series.files[len(series) // 2])
+        thread = DicomSeriesLoadThread(series)
+        errors = []
+        thread.error.connect(errors.append)
+        thread.run()
+
+        assert len(errors) == 1
+
+
+class TestCinePrefetchThread:
+    """Tests for the 4D cine frame prefetcher"""
+
+    @staticmethod
+    def _wait_for(thread, frame, timeout=2.0):
+        """Poll the buffer until the frame is rendered or the timeout expires."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with thread._condition:
+                if frame in thread._buffer:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def test_renders_frames_ahead_of_playhead(self):
+        """Frames following the playhead are rendered and consumed once"""
+        rendered = []
+
+        def render_frame(frame):
+            rendered.append(frame)
+            return [f"plane-{i}-frame-{frame}" for i in range(3)]
+
+        thread = CinePrefetchThread(render_frame, n_frames=10, start_frame=0, depth=3, frame_interval=0.1)
+        thread.start()
+        try:
+            assert self._wait_for(thread, 3)
+            assert sorted(rendered) == [1, 2, 3]
+
+            assert thread.take(1) == ["plane-0-frame-1", "plane-1-frame-1", "plane-2-frame-1"]
+            assert thread.take(1) is None
+            assert self._wait_for(thread, 4)
+        finally:
+            thread.stop()
+            thread.wait()
+
+    def test_window_wraps_around_last_frame(self):
+        """The prefetch window loops back to the first frame"""
+        thread = CinePrefetchThread(lambda frame: [frame], n_frames=4, start_frame=3, depth=2)
+        assert thread._window() == [0, 1]
+
+    def test_skips_frames_that_would_arrive_late(self):
+        """When rendering is slower than playback, frames that cannot be ready in time are skipped"""
+        thread = CinePrefetchThread(lambda frame: [frame], n_frames=20, start_frame=0, depth=8, frame_interval=0.1)
+        thread.render_time = 0.25
+        with thread._condition:
+            assert thread._next_frame_to_render() == 3
+
+    def test_stale_frames_are_evicted(self):
+        """Frames behind the playhead are dropped from the buffer"""
+        thread = CinePrefetchThread(lambda frame: [frame], n_frames=10, start_frame=0, depth=3)
+        thread._buffer = {1: ["a"], 2: ["b"]}
+        thread.take(3)
+        with thread._condition:
+            thread._next_frame_to_render()
+            assert thread._buffer == {}
+
+    def test_render_error_is_emitted(self):
+        """Rendering errors stop the thread and are reported"""
+        def render_frame(frame):
+            raise RuntimeError("boom")
+
+        thread = CinePrefetchThread(render_frame, n_frames=5)
+        errors = []
+        thread.error.connect(errors.append)
+        thread.run()
+
+        assert errors == ["boom"]
+
+
+class TestAutomaticROIThread:
+    """Tests for the coalescing background ROI worker"""
+
+    def test_only_latest_request_is_computed(self):
+        """Requests submitted before the worker picks them up are coalesced"""
+        computed = []
+        results = []
+
+        def compute(radius):
+            computed.append(radius)
+            thread.stop()
+            return radius * 10
+
+        thread = AutomaticROIThread(compute)
+        thread.result_ready.connect(lambda mask, generation: results.append((mask, generation)))
+        for radius in (1, 2, 3):
+            thread.submit(radius=radius)
+        thread.run()
+
+        assert computed == [3]
+        assert results == [(30, 3)]
+
+    def test_superseded_result_is_discarded(self):
+        """A request replaced while it was running does not emit its result"""
+        computed = []
+        results = []
+
+        def compute(radius):
+            computed.append(radius)
+            if radius == 1:
+                thread.submit(radius=2)
+            else:
+                thread.stop()
+            return radius
+
+        thread = AutomaticROIThread(compute)
+        thread.result_ready.connect(lambda mask, generation: results.append(mask))
+        thread.submit(radius=1)
+        thread.run()
+
+        assert computed == [1, 2]
+        assert results == [2]
+
+    def test_cancel_drops_pending_request(self):
+        """Cancelled requests are never computed"""
+        thread = AutomaticROIThread(lambda **params: None)
+        generation = thread.submit(radius=1)
+        thread.cancel()
+
+        assert thread._pending is None
+        assert not thread.is_current(generation)
+
+    def test_compute_error_is_emitted(self):
+        """Errors are reported and the worker keeps serving requests"""
+        def compute(radius):
+            thread.stop()
+            raise RuntimeError("boom")
+
+        thread = AutomaticROIThread(compute)
+        errors = []
+        thread.error.connect(errors.append)
+        thread.submit(radius=1)
+        thread.run()
+
+        assert errors == ["boom"]
+
+
+class TestForegroundCrop:
+    """Tests for cropping volumes to their foreground on load"""
+
+    def test_bounding_box_from_projections(self):
+        """The box spans the non-zero voxels plus the margin, clipped to the volume"""
+        data = np.zeros((20, 30, 40), dtype=np.float32)
+        data[5:10, 1:4, 30:39] = 1.0
+
+        start, stop = foreground_bounding_box(data, margin=2)
+
+        assert start == (3, 0, 28)
+        assert stop == (12, 6, 40)
+
+    def test_bounding_box_4d_and_empty(self):
+        """4D volumes use the foreground of any frame; empty volumes have no box"""
+        data = np.zeros((10, 10, 10, 3), dtype=np.float32)
+        assert foreground_bounding_box(data) is None
+
+        data[2, 3, 4, 0] = 1.0
+        data[6, 7, 8, 2] = np.nan
+        data[5, 5, 5, 2] = 1.0
+        assert foreground_bounding_box(data, margin=0) == ((2, 3, 4), (6, 6, 6))
+
+    def test_load_with_crop(self, temp_workspace):
+        """The cropped volume keeps its world position through the shifted affine"""
+        data = np.zeros((30, 30, 30), dtype=np.float32)
+        data[10:20, 12:18, 5:25] = np.random.rand(10, 6, 20) + 1
+        affine = np.diag([2.0, 2.0, 3.0, 1.0])
+        affine[:3, 3] = [-30, -30, -45]
+        nifti_path = os.path.join(temp_workspace, "padded.nii.gz")
+        nib.save(nib.Nifti1Image(data, affine), nifti_path)
+
+        thread = ImageLoadThread(nifti_path, False, crop_to_foreground=True)
+        results = []
+        thread.finished.connect(lambda img_data, dims, aff, is_4d, is_overlay: results.append((img_data, dims, aff)))
+        thread.run()
+
+        img_data, dims, cropped_affine = results[0]
+        margin = ImageLoadThread.CROP_MARGIN
+        assert img_data.shape == (10 + 2 * margin, 6 + 2 * margin, 20 + 2 * margin)
+        assert dims == img_data.shape
+
+        offset, original_dims, original_affine = thread.crop
+        assert offset == (10 - margin, 12 - margin, 5 - margin)
+        assert original_dims == (30, 30, 30)
+        np.testing.assert_allclose(original_affine, affine)
+        # Voxel (0, 0, 0) of the cropped grid is voxel `offset` of the file
+        np.testing.assert_allclose(cropped_affine[:3, 3], (affine @ np.array(list(offset) + [1]))[:3])
+
+    @pytest.mark.parametrize("shape", [(30, 30, 30), (30, 30, 30, 2)])
+    def test_crop_keeps_contrast(self, temp_workspace, shape):
+        """Cropped volumes are normalized with the window of the whole volume"""
+        data = np.zeros(shape, dtype=np.float32)
+        data[10:20, 12:18, 5:25] = np.random.default_rng(0).random((10, 6, 20) + shape[3:]) + 1
+        nifti_path = os.path.join(temp_workspace, "padded.nii.gz")
+        nib.save(nib.Nifti1Image(data, np.eye(4)), nifti_path)
+
+        loaded = {}
+        for crop in (False, True):
+            thread = ImageLoadThread(nifti_path, False, crop_to_foreground=crop)
+            thread.finished.connect(lambda img_data, *args, crop=crop: loaded.__setitem__(crop, img_data))
+            thread.run()
+
+        x, y, z = thread.crop[0]
+        sx, sy, sz = loaded[True].shape[:3]
+        np.testing.assert_array_equal(loaded[True], loaded[False][x:x + sx, y:y + sy, z:z + sz])
+
+    def test_no_crop_when_foreground_fills_volume(self, temp_workspace):
+        """Volumes without a background border are left untouched"""
+        nifti_path = os.path.join(temp_workspace, "full.nii")
+        nib.save(nib.Nifti1Image(np.ones((8, 8, 8), dtype=np.float32), np.eye(4)), nifti_path)
+
+        thread = ImageLoadThread(nifti_path, False, crop_to_foreground=True)
+        results = []
+        thread.finished.connect(lambda img_data, dims, aff, is_4d, is_overlay: results.append(dims))
+        thread.run()
+
+        assert results == [(8, 8, 8)]
+        assert thread.crop is None
+
+
+class TestProjectionThread:
+    """Tests for the background projection worker"""
+
+    def test_urgent_jobs_run_first_and_duplicates_are_merged(self):
+        """Urgent jobs jump the queue; resubmitted keys are computed once"""
+        computed = []
+        results = []
+
+        def job(key):
+            def compute():
+                computed.append(key)
+                if key == "background-2":
+                    thread.stop()
+                return key
+            return compute
+
+        thread = ProjectionThread()
+        thread.result_ready.connect(lambda key, projection: results.append(key))
+        thread.submit("background-1", job("background-1"))
+        thread.submit("background-2", job("background-2"))
+        thread.submit("background-1", job("background-1"))
+        thread.submit("visible", job("visible"), urgent=True)
+        thread.run()
+
+        assert computed == ["visible", "background-1", "background-2"]
+        assert results == computed
+
+    def test_clear_discards_running_job(self):
+        """Results of jobs running while the queue is cleared are not emitted"""
+        results = []
+
+        def compute():
+            thread.clear()
+            thread.stop()
+            return "stale"
+
+        thread = ProjectionThread()
+        thread.result_ready.connect(lambda key, projection: results.append(projection))
+        thread.submit("key", compute)
+        thread.submit("other", lambda: "dropped")
+        thread.run()
+
+        assert results == []
+        assert thread.pending() == 0
+
+
+class TestKernelWarmupThread:
+    """Tests for the startup kernel warm-up thread"""
+
+    def test_warms_up_all_kernels(self):
+        """All registered kernels are compiled"""
+        with patch("main.threads.nifti_utils_threads.warm_up_kernels") as mock_warm_up:
+            thread = KernelWarmupThread()
+            thread.run()
+        mock_warm_up.assert_called_once_with(stop=thread.isInterruptionRequested)
+
+    def test_stop_interrupts_warm_up(self, qtbot):
+        """Stopping ends the warm-up between two compilations"""
+        compiled = []
+
+        def slow_warm_up(stop):
+            for name in ("first", "second", "third"):
+                if stop():
+                    return
+                compiled.append(name)
+                time.sleep(0.2)
+
+        with patch("main.threads.nifti_utils_threads.warm_up_kernels", side_effect=slow_warm_up):
+            thread = KernelWarmupThread()
+            thread.start()
+            qtbot.waitUntil(lambda: bool(compiled), timeout=2000)
+            assert thread.stop(timeout_ms=2000)
+
+        assert compiled == ["first"]
+
+    def test_error_is_emitted(self):
+        """Compilation errors are reported instead of crashing the thread"""
+        thread = KernelWarmupThread()
+        errors = []
+        thread.error.connect(errors.append)
+        with patch("main.threads.nifti_utils_threads.warm_up_kernels", side_effect=RuntimeError("boom")):
+            thread.run()
+
+        assert errors == ["boom"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,104 @@
+import io
+import json
+import os
+
+from main.deep_learning import skull_strip_server
+from main.threads import skull_strip_service
+from main.threads.skull_strip_service import SkullStripService
+
+
+class TestSkullStripService:
+    """Tests for the client of the long-lived skull-stripping worker"""
+
+    def test_jobs_share_one_worker(self, fake_skull_strip_worker, tmp_path):
+        """The worker loads once and processes every submitted file"""
+        service = SkullStripService("hd-bet", threads=2, tta=False)
+        lines = []
+        service.log_message.connect(lines.append)
+        service.start()
+        assert service.wait_until_ready(10000)
+
+        outputs = [str(tmp_path / f"out_{i}.nii.gz") for i in range(3)]
+        ids = [service.submit(str(tmp_path / f"in_{i}.nii.gz"), out) for i, out in enumerate(outputs)]
+        assert [service.wait_for_job(job_id, 10000) for job_id in ids] == [(True, "")] * 3
+
+        contents = {open(out).read() for out in outputs}
+        assert len(contents) == 1  # Same process for all jobs
+        assert "--disable_tta" in contents.pop() and "loading model" in lines
+
+        service.stop()
+        assert not service.is_running()
+
+    def test_failed_job(self, fake_skull_strip_worker, tmp_path):
+        service = SkullStripService("synthstrip", model="model.pt")
+        finished = []
+        service.job_finished.connect(lambda *args: finished.append(args))
+        service.start()
+
+        job_id = service.submit(str(tmp_path / "bad.nii.gz"), str(tmp_path / "out.nii.gz"))
+        assert service.wait_for_job(job_id, 10000) == (False, "RuntimeError: cannot strip")
+        assert finished == [(job_id, False, "RuntimeError: cannot strip")]
+        service.stop()
+
+    def test_worker_that_cannot_load(self, fake_skull_strip_worker, tmp_path, monkeypatch):
+        """A worker failing to load its model fails its jobs with the reason"""
+        monkeypatch.setenv("FAKE_WORKER_MODE", "fail")
+        service = SkullStripService("hd-bet")
+        service.start()
+        job_id = service.submit(str(tmp_path / "in.nii.gz"), str(tmp_path / "out.nii.gz"))
+
+        assert not service.wait_until_ready(10000)
+        assert service.wait_for_job(job_id) == (False, "ModuleNotFoundError: No module named 'HD_BET'")
+        assert not service.is_ready
+
+        later = service.submit(str(tmp_path / "in.nii.gz"), str(tmp_path / "out.nii.gz"))
+        assert service.wait_for_job(later)[0] is False
+
+    def test_kill_fails_pending_jobs(self, fake_skull_strip_worker, tmp_path):
+        service = SkullStripService("hd-bet")
+        service.start()
+        assert service.wait_until_ready(10000)
+        job_id = service.submit(str(tmp_path / "slow.nii.gz"), str(tmp_path / "out.nii.gz"))
+
+        service.interrupt()
+        assert service.wait_for_job(job_id) == (False, "interrupted")
+        service.kill()
+        assert service.results.pop(job_id) == (False, "worker stopped")
+        assert not service.is_running()
+
+    def test_command(self, monkeypatch):
+        monkeypatch.setattr(skull_strip_service, "get_dl_python_executable", lambda: "/venv/bin/python")
+        monkeypatch.setattr(skull_strip_service, "get_script_path", lambda path: "/app/" + path)
+
+        program, args = SkullStripService("synthstrip", device="cuda", model="/app/synthstrip.1.pt").command()
+        assert program == "/venv/bin/python"
+        assert args == ["/app/deep_learning/skull_strip_server.py", "--tool", "synthstrip", "--device", "cuda",
+                        "--model", "/app/synthstrip.1.pt"]
+
+
+class TestSkullStripServer:
+    """Tests for the worker side of the protocol"""
+
+    class FakeModel:
+        def strip(self, input_file, output_file):
+            if "bad" in input_file:
+                raise ValueError("not an image")
+            with open(output_file, "w") as f:
+                f.write("stripped")
+
+    def test_protocol_matches_client(self):
+        assert skull_strip_server.EVENT_PREFIX == skull_strip_service.EVENT_PREFIX
+
+    def test_serve_reports_every_job(self, tmp_path, capsys):
+        jobs = [{"id": "1", "input": "in.nii.gz", "output": str(tmp_path / "sub" / "out.nii.gz")},
+                {"id": "2", "input": "bad.nii.gz", "output": str(tmp_path / "bad_out.nii.gz")}]
+        stream = io.StringIO("\n".join(json.dumps(job) for job in jobs) + "\nnot json\n")
+
+        skull_strip_server.serve(self.FakeModel(), stream)
+
+        lines = capsys.readouterr().out.splitlines()
+        events = [json.loads(line[len(skull_strip_server.EVENT_PREFIX):]) for line in lines]
+        assert [(e["event"], e["id"]) for e in events] == [("started", "1"), ("done", "1"),
+                                                           ("started", "2"), ("error", "2")]
+        assert events[3]["message"] == "ValueError: not an image"
+        assert os.path.exists(tmp_path / "sub" / "out.nii.gz")
@@ -17,7 +17,8 @@ from unittest.mock import Mock, patch, MagicMock, call
 import pytest
 from PyQt6.QtCore import QProcess
 
-from main.threads.skull_strip_thread import SkullStripThread
+from main.threads.skull_strip_thread import SkullStripThread, plan_parallel_jobs
+from main.skull_strip_cache import has_current_output
 
 
 class TestSkullStripThreadInitialization:
@@ -136,11 +137,11 @@ class TestSkullStripThreadCancellation:
 class TestBETCommandBuilding:
     """Tests for building FSL BET commands"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_bet_basic_command(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test basic BET command"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         # Mock process
         mock_process_instance = Mock()
@@ -171,11 +172,11 @@ class TestBETCommandBuilding:
         assert "-f" in call_args[1]
         assert "0.5" in call_args[1]
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_bet_with_options(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test BET command with advanced options"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -211,11 +212,11 @@ class TestBETCommandBuilding:
         assert "-o" in cmd  # opt_o
         assert "-s" not in cmd  # opt_s is False
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_bet_with_center_coordinates(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test BET command with center coordinates"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -248,11 +249,11 @@ class TestBETCommandBuilding:
         assert "-c" in cmd
         assert "128" in cmd or "64" in cmd
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_bet_brain_extracted_option(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test -n option for brain extraction"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -408,11 +409,11 @@ class TestHDBETCommandBuilding:
 class TestOutputGeneration:
     """Tests for output and metadata generation"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_output_directory_creation(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test output directory creation"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -443,11 +444,11 @@ class TestOutputGeneration:
         )
         assert os.path.exists(expected_dir)
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_json_metadata_creation_bet(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test JSON metadata creation for BET"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -527,11 +528,11 @@ class TestOutputGeneration:
 
         assert metadata["SkullStrippingMethod"] == "HD-BET"
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_output_filename_format_bet(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test output filename format for BET"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -608,11 +609,11 @@ class TestOutputGeneration:
 class TestBatchProcessing:
     """Tests for batch processing of multiple files"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_multiple_files_processing(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test processing of multiple files"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -651,11 +652,11 @@ class TestBatchProcessing:
         assert file_completed_count[0] == 3
         assert thread.success_count == 3
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_progress_tracking_multiple_files(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test progress tracking with multiple files"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -691,11 +692,11 @@ class TestBatchProcessing:
         for i in range(1, len(progress_values)):
             assert progress_values[i] >= progress_values[i - 1]
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_all_completed_signal(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test all_completed signal at the end"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -734,11 +735,11 @@ class TestBatchProcessing:
 class TestErrorHandling:
     """Tests for error handling"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_process_failure_nonzero_exit(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test process error handling with non-zero exit code"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -767,11 +768,11 @@ class TestErrorHandling:
         assert "error" in message.lower() or "invalid" in message.lower()
         assert len(thread.failed_files) == 1
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_missing_subject_id(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test handling of files without BIDS subject ID"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         # File without BIDS structure (no sub-XX)
         input_file = os.path.join(temp_workspace, "random_folder", "brain.nii")
@@ -793,11 +794,11 @@ class TestErrorHandling:
         assert "Impossibile estrarre" in message or "Cannot extract" in message
         assert len(thread.failed_files) == 1
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_exception_during_processing(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test generic exception handling during processing"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.start.side_effect = RuntimeError("Process start failed")
@@ -822,11 +823,11 @@ class TestErrorHandling:
         assert success is False
         assert "failed" in message.lower() or "error" in message.lower()
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_partial_failure_multiple_files(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test with some files failing and others succeeding"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         # Mock process alternating success/failure
         call_count = [0]
@@ -873,11 +874,11 @@ class TestErrorHandling:
 class TestCancellationDuringProcessing:
     """Tests for cancellation during processing"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_cancel_during_single_file(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test cancellation during single file processing"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
 
@@ -907,11 +908,11 @@ class TestCancellationDuringProcessing:
         mock_process.kill.assert_called()
         assert thread.is_cancelled is True
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_cancel_stops_batch_processing(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test that cancellation stops batch processing"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -955,11 +956,11 @@ class TestCancellationDuringProcessing:
 class TestSubjectIDExtraction:
     """Tests for subject ID extraction"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_extract_subject_id_standard_bids(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test extraction of subject ID from standard BIDS path"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -988,11 +989,11 @@ class TestSubjectIDExtraction:
 
         assert thread.success_count == 1
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_extract_subject_id_nested_path(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test extraction of subject ID from a nested path"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -1026,12 +1027,12 @@ class TestSubjectIDExtraction:
 class TestTempDirectoryHandling:
     """Tests for temporary directory management"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     @patch('tempfile.mkdtemp')
     def test_temp_directory_created(self, mock_mkdtemp, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test that the temporary directory is created"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
         temp_dir_path = os.path.join(temp_workspace, "temp_skullstrip")
         mock_mkdtemp.return_value = temp_dir_path
         os.makedirs(temp_dir_path, exist_ok=True)
@@ -1057,11 +1058,11 @@ class TestTempDirectoryHandling:
         mock_mkdtemp.assert_called()
         mock_rmtree.assert_called()
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_temp_directory_cleanup_on_error(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test cleanup of temp directory in case of error"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -1083,11 +1084,11 @@ class TestTempDirectoryHandling:
         # Should clean up the temp directory even after an error
         assert mock_rmtree.called
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_temp_directory_cleanup_on_cancel(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test cleanup of temp directory upon cancellation"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
 
@@ -1114,11 +1115,11 @@ class TestTempDirectoryHandling:
 class TestEdgeCases:
     """Tests for edge cases"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_empty_file_list(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test with empty file list"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         thread = SkullStripThread([], temp_workspace, {'f_val': 0.5}, False, "fsl-bet")
 
@@ -1129,11 +1130,11 @@ class TestEdgeCases:
         except ZeroDivisionError:
             pytest.fail("Division by zero with empty list")
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_file_with_spaces_in_name(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test file with spaces in name"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -1159,11 +1160,11 @@ class TestEdgeCases:
 
         assert thread.success_count == 1
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_nifti_without_gz_extension(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test uncompressed NIfTI file (.nii)"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -1191,11 +1192,11 @@ class TestEdgeCases:
 
         assert thread.success_count == 1
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_extreme_f_values(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test with extreme f_val values"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -1230,11 +1231,11 @@ class TestEdgeCases:
 class TestSignalEmissions:
     """Tests for signal emissions"""
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_progress_updated_signal(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test progress_updated signal emission"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -1265,11 +1266,11 @@ class TestSignalEmissions:
         # Message should contain info about processed file
         assert any("T1w.nii" in msg or "Processing" in msg for msg in progress_messages)
 
-    @patch('main.threads.skull_strip_thread.setup_fsl_env')
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
     @patch('main.threads.skull_strip_thread.QProcess')
     def test_file_started_signal_order(self, mock_qprocess, mock_fsl_env, temp_workspace):
         """Test file_started signal emission order"""
-        mock_fsl_env.return_value = ("/usr/local/fsl", "NIFTI_GZ")
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
 
         mock_process = Mock()
         mock_process.waitForFinished.return_value = True
@@ -1302,4 +1303,249 @@ class TestSignalEmissions:
 
         # Verify order
         assert len(started_files) == 3
-        assert started_files == filenames
\ No newline at end of file
+        assert started_files == filenames
+
+
+class TestConcurrentProcessing:
+    """Tests for running several tool processes at once"""
+
+    def test_plan_parallel_jobs(self):
+        """The CPU budget is split according to the threads of each tool"""
+        assert plan_parallel_jobs("fsl-bet", False, 100, cpu_budget=32) == (32, 1)
+        assert plan_parallel_jobs("synthstrip", False, 100, cpu_budget=32) == (8, 4)
+        assert plan_parallel_jobs("hd-bet", False, 3, cpu_budget=32) == (3, 4)
+        assert plan_parallel_jobs("hd-bet", True, 100, cpu_budget=32) == (1, 32)
+        assert plan_parallel_jobs("synthstrip", False, 100, cpu_budget=2) == (1, 2)
+
+    @staticmethod
+    def _make_files(temp_workspace, n):
+        files = []
+        for i in range(n):
+            file_path = os.path.join(temp_workspace, f"sub-{i:02d}", "anat", f"T1w_{i}.nii")
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'w') as f:
+                f.write("data")
+            files.append(file_path)
+        return files
+
+    @staticmethod
+    def _process(polls_before_exit):
+        process = Mock()
+        remaining = [polls_before_exit]
+
+        def wait(msecs):
+            remaining[0] -= 1
+            return remaining[0] < 0
+
+        process.waitForFinished.side_effect = wait
+        process.state.return_value = QProcess.ProcessState.Running
+        process.exitCode.return_value = 0
+        process.readAllStandardError.return_value = b''
+        process.readAllStandardOutput.return_value = b''
+        return process
+
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
+    @patch('main.threads.skull_strip_thread.QProcess')
+    def test_files_run_concurrently_within_budget(self, mock_qprocess, mock_fsl_env, temp_workspace):
+        """Up to max_parallel processes run at once, each with its thread cap"""
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
+        processes = [self._process(2) for _ in range(5)]
+        mock_qprocess.side_effect = processes
+
+        thread = SkullStripThread(self._make_files(temp_workspace, 5), temp_workspace, {'f_val': 0.5}, False,
+                                  "fsl-bet", cpu_budget=3)
+        assert thread.max_parallel == 3
+
+        events = []
+        thread.file_started.connect(lambda f: events.append(("started", f)))
+        thread.file_completed.connect(lambda f, ok, msg: events.append(("completed", f)))
+        progress = []
+        thread.progress_value_updated.connect(progress.append)
+
+        def mock_move(src, dst):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            with open(dst, 'w') as f:
+                f.write("stripped")
+
+        with patch('shutil.move', side_effect=mock_move), patch('shutil.rmtree'):
+            thread.run()
+
+        assert thread.success_count == 5
+        assert [kind for kind, _ in events[:3]] == ["started"] * 3
+        assert ("started", "T1w_3.nii") not in events[:events.index(("completed", "T1w_0.nii"))]
+        assert progress == sorted(progress) and progress[-1] == 100 and len(progress) == 5
+
+        env = processes[0].setProcessEnvironment.call_args[0][0]
+        assert env.value("OMP_NUM_THREADS") == "1"
+
+    @patch('main.threads.skull_strip_thread.resolve_tool_environment')
+    @patch('main.threads.skull_strip_thread.QProcess')
+    def test_cancel_kills_all_running_processes(self, mock_qprocess, mock_fsl_env, temp_workspace):
+        """Cancelling stops every running child and starts no new file"""
+        mock_fsl_env.return_value = {"FSLDIR": "/usr/local/fsl", "FSLOUTPUTTYPE": "NIFTI_GZ"}
+        processes = [self._process(1000) for _ in range(4)]
+        mock_qprocess.side_effect = processes
+
+        thread = SkullStripThread(self._make_files(temp_workspace, 4), temp_workspace, {'f_val': 0.5}, False,
+                                  "fsl-bet", cpu_budget=2)
+        processes[1].waitForFinished.side_effect = lambda msecs: (thread.cancel(), False)[1]
+        summary = []
+        thread.all_completed.connect(lambda count, failed: summary.append(count))
+
+        with patch('shutil.rmtree'):
+            thread.run()
+
+        processes[0].kill.assert_called()
+        processes[1].kill.assert_called()
+        assert mock_qprocess.call_count == 2
+        assert summary == [0]
+
+
+
+class TestProvenanceCache:
+    """Tests for reusing outputs of identical earlier runs"""
+
+    @pytest.fixture
+    def temp_workspace(self):
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _write_input(workspace, values, name="T1w.nii.gz"):
+        import nibabel as nib
+        import numpy as np
+        path = os.path.join(workspace, "sub-01", "anat", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        nib.save(nib.Nifti1Image(np.full((4, 4, 4), values, dtype=np.float32), np.eye(4)), path)
+        return path
+
+    @staticmethod
+    def _run(input_file, workspace, mock_qprocess, parameters=None):
+        process = Mock()
+        process.waitForFinished.return_value = True
+        process.exitCode.return_value = 0
+        process.readAllStandardError.return_value = b''
+        process.readAllStandardOutput.return_value = b''
+        mock_qprocess.return_value = process
+
+        thread = SkullStripThread([input_file], workspace, parameters or {}, False, "synthstrip")
+        completed = []
+        thread.file_completed.connect(lambda f, ok, msg: completed.append(ok))
+
+        def mock_move(src, dst):
+            with open(dst, 'w') as f:
+                f.write("stripped")
+
+        with patch('shutil.move', side_effect=mock_move):
+            thread.run()
+        assert completed == [True] and thread.success_count == 1
+        return thread
+
+    @patch('main.threads.skull_strip_thread.get_bin_path', return_value="mri_synthstrip")
+    @patch('main.threads.skull_strip_thread.QProcess')
+    def test_identical_input_is_not_processed_again(self, mock_qprocess, mock_get_bin, temp_workspace):
+        """A second run on the same voxels reuses the output, a changed input runs the tool"""
+        input_file = self._write_input(temp_workspace, 1.0)
+        self._run(input_file, temp_workspace, mock_qprocess)
+        assert mock_qprocess.call_count == 1
+
+        sidecar = os.path.join(temp_workspace, "derivatives", "skullstrips", "sub-01", "anat",
+                               "T1w_synthstrip_brain.json")
+        with open(sidecar) as f:
+            provenance = json.load(f)["Provenance"]
+        assert provenance["Tool"] == "synthstrip" and provenance["InputHash"]
+
+        self._run(input_file, temp_workspace, mock_qprocess)
+        assert mock_qprocess.call_count == 1
+
+        # Touched but unchanged: reused, and the new stamp is recorded
+        os.utime(input_file, ns=(0, 0))
+        self._run(input_file, temp_workspace, mock_qprocess)
+        assert mock_qprocess.call_count == 1
+        with open(sidecar) as f:
+            assert json.load(f)["Provenance"]["InputStamp"]["MtimeNs"] == 0
+
+        self._write_input(temp_workspace, 2.0)
+        self._run(input_file, temp_workspace, mock_qprocess)
+        assert mock_qprocess.call_count == 2
+
+    @patch('main.threads.skull_strip_thread.get_bin_path', return_value="mri_synthstrip")
+    @patch('main.threads.skull_strip_thread.QProcess')
+    def test_copy_of_input_gets_its_own_output(self, mock_qprocess, mock_get_bin, temp_workspace):
+        """An input with the voxels of an already stripped file reuses its output under its own name"""
+        self._run(self._write_input(temp_workspace, 1.0), temp_workspace, mock_qprocess)
+        self._run(self._write_input(temp_workspace, 1.0, "T1w_copy.nii.gz"), temp_workspace, mock_qprocess)
+        assert mock_qprocess.call_count == 1
+
+        output_dir = os.path.join(temp_workspace, "derivatives", "skullstrips", "sub-01", "anat")
+        with open(os.path.join(output_dir, "T1w_copy_synthstrip_brain.nii.gz")) as f:
+            assert f.read() == "stripped"
+        with open(os.path.join(output_dir, "T1w_copy_synthstrip_brain.json")) as f:
+            assert json.load(f)["Sources"] == ["T1w_copy.nii.gz"]
+        assert has_current_output(output_dir, os.path.join(temp_workspace, "sub-01", "anat", "T1w_copy.nii.gz"))
+
+
+class TestPersistentWorker:
+    """Tests for running HD-BET through the long-lived worker"""
+
+    @pytest.fixture
+    def temp_workspace(self):
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _make_files(workspace, names):
+        files = []
+        for name in names:
+            path = os.path.join(workspace, "sub-01", "anat", name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write("data")
+            files.append(path)
+        return files
+
+    @patch('main.threads.skull_strip_thread.QProcess')
+    def test_files_processed_by_one_worker(self, mock_qprocess, fake_skull_strip_worker, temp_workspace):
+        """No process is started per file; failures are reported per file"""
+        files = self._make_files(temp_workspace, ["T1w.nii.gz", "bad.nii.gz", "T2w.nii.gz"])
+        thread = SkullStripThread(files, temp_workspace, {}, False, "hd-bet", cpu_budget=2, use_service=True)
+        completed = []
+        thread.file_completed.connect(lambda f, ok, msg: completed.append((f, ok, msg)))
+        progress = []
+        thread.progress_value_updated.connect(progress.append)
+
+        thread.run()
+
+        mock_qprocess.assert_not_called()
+        assert completed == [("T1w.nii.gz", True, ""), ("bad.nii.gz", False, "RuntimeError: cannot strip"),
+                             ("T2w.nii.gz", True, "")]
+        assert progress[-1] == 100 and thread.service is None
+
+        output_dir = os.path.join(temp_workspace, "derivatives", "skullstrips", "sub-01", "anat")
+        with open(os.path.join(output_dir, "T1w_hd-bet_brain.nii.gz")) as f:
+            content = f.read()
+        assert "--device" in content and "cpu" in content and "--disable_tta" in content
+        with open(os.path.join(output_dir, "T2w_hd-bet_brain.json")) as f:
+            assert json.load(f)["SkullStrippingMethod"] == "HD-BET"
+
+    @patch('main.threads.skull_strip_thread.get_bin_path', return_value="/usr/bin/hd-bet")
+    @patch('main.threads.skull_strip_thread.QProcess')
+    def test_falls_back_to_processes(self, mock_qprocess, mock_get_bin, fake_skull_strip_worker, temp_workspace,
+                                     monkeypatch):
+        """When the worker cannot load the network, each file runs its own process"""
+        monkeypatch.setenv("FAKE_WORKER_MODE", "fail")
+        process = Mock()
+        process.waitForFinished.return_value = True
+        process.exitCode.return_value = 1
+        process.readAllStandardError.return_value = b'failed'
+        process.readAllStandardOutput.return_value = b''
+        mock_qprocess.return_value = process
+
+        files = self._make_files(temp_workspace, ["T1w.nii.gz", "T2w.nii.gz"])
+        thread = SkullStripThread(files, temp_workspace, {}, False, "hd-bet", cpu_budget=1, use_service=True)
+        thread.run()
+
+        assert mock_qprocess.call_count == 2
+        assert len(thread.failed_files) == 2
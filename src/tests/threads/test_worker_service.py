@@ -0,0 +1,48 @@
+import sys
+
+import pytest
+
+from main.threads.inference_service import InferenceService
+from main.threads.skull_strip_service import SkullStripService
+from main.threads.worker_service import WorkerService
+
+
+class EchoService(WorkerService):
+    """Minimal worker client, running the fake worker with its own event prefix"""
+
+    event_prefix = "@echo "
+
+    def __init__(self, script):
+        super().__init__("echo")
+        self.script = script
+
+    def command(self):
+        return sys.executable, [str(self.script)]
+
+
+class TestWorkerService:
+    """Tests for the client shared by the long-lived workers"""
+
+    def test_subclass_runs_jobs(self, fake_skull_strip_worker, tmp_path, monkeypatch):
+        """A subclass only gives its command and event prefix"""
+        monkeypatch.setenv("FAKE_WORKER_PREFIX", EchoService.event_prefix)
+        service = EchoService(fake_skull_strip_worker)
+        service.start()
+        assert service.wait_until_ready(10000)
+
+        job_id = service.submit(str(tmp_path / "in.nii.gz"), str(tmp_path / "out.nii.gz"))
+        assert service.wait_for_job(job_id, 10000) == (True, "")
+        service.stop()
+        assert not service.is_running()
+
+    def test_command_is_required(self):
+        with pytest.raises(NotImplementedError):
+            WorkerService("worker").command()
+
+    def test_services_are_independent(self):
+        """The nnU-Net client does not inherit the skull-stripping options"""
+        service = InferenceService(["--ckpt_path", "model.ckpt"])
+
+        assert not isinstance(service, SkullStripService)
+        assert not hasattr(service, "tool")
+        assert service.event_prefix != SkullStripService.event_prefix
@@ -305,6 +305,14 @@ class TestDebugLog:
         assert main_window.settings.value("debug_log", type=bool) == False
         mock_set_log_level.assert_called_with(logging.ERROR)
 
+    def test_toggle_kernel_warmup(self, main_window):
+        """Verify that the startup warm-up setting is persisted"""
+        main_window.toggle_kernel_warmup(False)
+        assert main_window.settings.value("kernel_warmup", type=bool) == False
+
+        main_window.toggle_kernel_warmup(True)
+        assert main_window.settings.value("kernel_warmup", type=bool) == True
+
 
 class TestWidgetManagement:
     """Tests for widget management"""
@@ -1,6 +1,7 @@
 import sys
 import os
 import unittest
+import time
 import numpy as np
 import nibabel as nib
 import tempfile
@@ -9,7 +10,14 @@ from PyQt6.QtTest import QTest
 from PyQt6.QtCore import Qt, QEventLoop, QTimer
 from unittest.mock import patch, MagicMock
 
-from main.ui.nifti_viewer import NiftiViewer, compute_mask_numba_mm, apply_overlay_numba
+from PyQt6.QtGui import QPixmap
+
+from main.ui import nifti_viewer
+from main.numba_kernels import compute_mask_numba_mm, region_grow_numba_mm, apply_overlay_numba
+from main.slice_compositing import extract_slice
+from main.ui.nifti_viewer import (NiftiViewer, SliceRenderCache, OverlayThresholdIndex, compute_automatic_roi,
+                                  RunLengthROI, VolumeSessionCache)
+from tests.conftest import write_dicom_series
 
 app = QApplication(sys.argv)
 
@@ -82,6 +90,35 @@ class TestNiftiViewer(unittest.TestCase):
                                      seed_intensity, diff, 0, 3, 0, 3, 0, 3)
         self.assertGreater(np.sum(mask), 0, "Boundary seed should produce non-empty mask")
 
+    def test_region_grow_numba_mm(self):
+        img = np.zeros((20, 20, 20))
+        img[5:10, 5:10, 5:10] = 100
+        img[12:15, 12:15, 12:15] = 100  # same intensity, not connected to the seed
+        voxel_sizes = (1.0, 1.0, 1.0)
+
+        mask, ox, oy, oz = region_grow_numba_mm(img, 7, 7, 7, 50.0, voxel_sizes, 100, 5,
+                                                0, 20, 0, 20, 0, 20, 26)
+
+        self.assertEqual(mask.dtype, np.uint8)
+        self.assertEqual(mask.shape, (5, 5, 5), "Mask should be cropped to the grown region")
+        self.assertEqual((ox, oy, oz), (5, 5, 5), "Offset should locate the crop in the volume")
+        self.assertEqual(np.sum(mask), 125, "Disconnected voxels should not be included")
+
+        mask, *_ = region_grow_numba_mm(img, 7, 7, 7, 0.0, voxel_sizes, 100, 5,
+                                        0, 20, 0, 20, 0, 20, 26)
+        self.assertEqual(np.sum(mask), 1, "Zero radius should produce single voxel mask")
+
+    def test_region_grow_numba_mm_connectivity(self):
+        img = np.zeros((5, 5, 5))
+        img[1, 1, 1] = img[2, 2, 1] = img[3, 3, 2] = 1  # chained by an edge and then a corner
+        counts = {}
+        for connectivity in (6, 18, 26):
+            mask, *_ = region_grow_numba_mm(img, 1, 1, 1, 10.0, (1.0, 1.0, 1.0), 1, 0.1,
+                                            0, 5, 0, 5, 0, 5, connectivity)
+            counts[connectivity] = int(np.sum(mask))
+
+        self.assertEqual(counts, {6: 1, 18: 2, 26: 3})
+
     def test_apply_overlay_numba(self):
         rgba_image = np.zeros((10, 10, 4), dtype=np.float64)
         overlay_mask = np.zeros((10, 10), dtype=bool)
@@ -117,28 +154,6 @@ class TestNiftiViewer(unittest.TestCase):
         self.assertEqual(result[5, 5, 1], 0.5, "Green channel should reflect overlay intensity")
         self.assertEqual(result[5, 5, 2], 0.0, "Blue channel should be zero for green overlay")
 
-    def test_pad_volume_to_shape(self):
-        volume = np.ones((5, 5, 5))
-        target_shape = (7, 7, 7)
-        padded = self.viewer.pad_volume_to_shape(volume, target_shape, constant_value=0)
-
-        self.assertEqual(padded.shape, target_shape, "Padded shape incorrect")
-        self.assertEqual(np.sum(padded[1:6, 1:6, 1:6]), 125, "Core volume values incorrect")
-        self.assertEqual(np.sum(padded == 0), 343 - 125, "Padding values incorrect")
-
-        padded = self.viewer.pad_volume_to_shape(volume, (5, 5, 5))
-        self.assertTrue(np.array_equal(volume, padded), "No padding should return original volume")
-
-        target_shape = (10, 8, 6)
-        padded = self.viewer.pad_volume_to_shape(volume, target_shape)
-        self.assertEqual(padded.shape, target_shape, "Asymmetric padded shape incorrect")
-        self.assertEqual(np.sum(padded[2:7, 1:6, 0:5]), 125, "Asymmetric core volume values incorrect")
-
-        target_shape = (3, 3, 3)
-        padded = self.viewer.pad_volume_to_shape(volume, target_shape)
-        self.assertEqual(padded.shape, (5, 5, 5), "Smaller target shape should return original volume")
-        self.assertEqual(np.sum(padded == 1), 125, "Smaller target volume should retain original values")
-
     def test_screen_to_image_coords(self):
         self.viewer.img_data = np.zeros((20, 20, 20))
         self.viewer.dims = (20, 20, 20)
@@ -205,8 +220,150 @@ class TestNiftiViewer(unittest.TestCase):
         self.viewer.automaticROI_drawing()
 
         self.assertIsNotNone(self.viewer.automaticROI_data, "Overlay data not generated")
-        self.assertEqual(self.viewer.automaticROI_data.dtype, np.uint8, "Overlay data type incorrect")
-        self.assertGreater(np.sum(self.viewer.automaticROI_data), 0, "Overlay mask should be non-empty")
+        self.assertIsInstance(self.viewer.automaticROI_data, RunLengthROI, "Overlay data type incorrect")
+        self.assertGreater(self.viewer.automaticROI_data.voxel_count, 0, "Overlay mask should be non-empty")
+
+    def test_automaticROI_drawing_is_connected(self):
+        img = np.zeros((20, 20, 20))
+        img[8:13, 8:13, 8:13] = 100
+        img[15:18, 15:18, 15:18] = 100
+        self.viewer.img_data = img
+        self.viewer.dims = (20, 20, 20)
+        self.viewer.voxel_sizes = np.array([1.0, 1.0, 1.0])
+        self.viewer.automaticROI_seed_coordinates = [10, 10, 10]
+        self.viewer.automaticROI_radius_slider.setMaximum(20)
+        self.viewer.automaticROI_radius_slider.setValue(15)
+        self.viewer.automaticROI_diff_slider.setValue(10)
+
+        self.viewer.automaticROI_drawing()
+
+        mask = self.viewer.automaticROI_data.to_dense()
+        self.assertEqual(mask.shape, (20, 20, 20))
+        self.assertEqual(np.sum(mask), 125)
+        self.assertFalse(mask[16, 16, 16])
+
+    def test_update_automaticROI_is_debounced_and_async(self):
+        self.viewer.img_data = np.ones((20, 20, 20)) * 100
+        self.viewer.dims = (20, 20, 20)
+        self.viewer.voxel_sizes = np.array([1.0, 1.0, 1.0])
+        self.viewer.automaticROI_seed_coordinates = [10, 10, 10]
+        self.viewer.automaticROI_overlay = True
+        self.viewer.automaticROI_data = None
+
+        # A drag produces many value changes but no synchronous computation
+        for radius in (1, 2, 3, 4):
+            self.viewer.automaticROI_radius_slider.setValue(radius)
+        self.assertIsNone(self.viewer.automaticROI_data)
+        self.assertTrue(self.viewer.automaticROI_timer.isActive())
+
+        deadline = time.time() + 5
+        while self.viewer.automaticROI_data is None and time.time() < deadline:
+            QTest.qWait(20)
+
+        expected = compute_automatic_roi(**self.viewer.automaticROI_params())
+        np.testing.assert_array_equal(self.viewer.automaticROI_data.to_dense(), expected.to_dense())
+        self.viewer.stop_automaticROI_worker()
+
+    def test_stale_automaticROI_result_is_ignored(self):
+        self.viewer.automaticROI_overlay = True
+        self.viewer.automaticROI_worker = MagicMock()
+        self.viewer.automaticROI_worker.is_current.return_value = False
+        self.viewer.automaticROI_data = None
+
+        self.viewer._on_automaticROI_ready(np.ones((2, 2, 2), dtype=np.uint8), 1)
+
+        self.assertIsNone(self.viewer.automaticROI_data)
+        self.viewer.automaticROI_worker = None
+
+    def test_automaticROI_error_clears_the_roi(self):
+        self.viewer.img_data = np.ones((20, 20, 20)) * 100
+        self.viewer.dims = (20, 20, 20)
+        self.viewer.voxel_sizes = np.array([1.0, 1.0, 1.0])
+        self.viewer.automaticROI_seed_coordinates = [10, 10, 10]
+        self.viewer.automaticROI_overlay = True
+        self.viewer.automaticROI_data = compute_automatic_roi(**self.viewer.automaticROI_params())
+        roi_version = self.viewer.roi_version
+
+        def fail(**params):
+            raise MemoryError("cannot allocate the mask")
+
+        with patch.object(nifti_viewer, "compute_automatic_roi", fail):
+            self.viewer.request_automaticROI()
+            deadline = time.time() + 5
+            while self.viewer.automaticROI_data is not None and time.time() < deadline:
+                QTest.qWait(20)
+
+        self.assertIsNone(self.viewer.automaticROI_data)
+        self.assertGreater(self.viewer.roi_version, roi_version)
+        self.assertIn("cannot allocate the mask", self.viewer.status_bar.currentMessage())
+        self.viewer.stop_automaticROI_worker()
+
+    def _draw_automaticROI(self, seed, radius):
+        self.viewer.automaticROI_overlay = True
+        self.viewer.automaticROI_seed_coordinates = seed
+        self.viewer.automaticROI_radius_slider.setValue(radius)
+        self.viewer.automaticROI_drawing()
+
+    def test_incrementalROI_union_difference_undo(self):
+        self.viewer.img_data = np.ones((20, 20, 20)) * 100
+        self.viewer.dims = (20, 20, 20)
+        self.viewer.voxel_sizes = np.array([1.0, 1.0, 1.0])
+        self.viewer.automaticROI_diff_slider.setValue(10)
+
+        self._draw_automaticROI([5, 5, 5], 2)
+        first = self.viewer.automaticROI_data.to_dense()
+        self.viewer.addOrigin_clicked()
+        self._draw_automaticROI([12, 12, 12], 2)
+        second = self.viewer.automaticROI_data.to_dense()
+        self.viewer.addOrigin_clicked()
+
+        self.assertIsInstance(self.viewer.incrementalROI_data, RunLengthROI)
+        np.testing.assert_array_equal(self.viewer.incrementalROI_data.to_dense(), first | second)
+
+        self._draw_automaticROI([5, 5, 5], 1)
+        inner = self.viewer.automaticROI_data.to_dense()
+        self.viewer.removeOrigin_clicked()
+        np.testing.assert_array_equal(self.viewer.incrementalROI_data.to_dense(), (first | second) & ~inner)
+        self.assertEqual(self.viewer.incrementalROI_origins[-1]["Operation"], "Remove")
+
+        self.viewer.undoROI_clicked()
+        np.testing.assert_array_equal(self.viewer.incrementalROI_data.to_dense(), first | second)
+        self.assertEqual(len(self.viewer.incrementalROI_origins), 2)
+        self.viewer.undoROI_clicked()
+        self.viewer.undoROI_clicked()
+        self.assertIsNone(self.viewer.incrementalROI_data)
+        self.assertFalse(self.viewer.undoROI_btn.isEnabled())
+
+    def test_incrementalROI_noop_edits_not_recorded(self):
+        """Edits without an automatic ROI, or changing nothing, leave no undo step"""
+        self.viewer.img_data = np.ones((20, 20, 20)) * 100
+        self.viewer.dims = (20, 20, 20)
+        self.viewer.voxel_sizes = np.array([1.0, 1.0, 1.0])
+        self.viewer.automaticROI_diff_slider.setValue(10)
+
+        self.viewer.automaticROI_overlay = False
+        self.viewer.addOrigin_clicked()
+        self.assertIsNone(self.viewer.incrementalROI_data)
+
+        self._draw_automaticROI([5, 5, 5], 2)
+        self.viewer.addOrigin_clicked()
+        self.viewer.addOrigin_clicked()
+        self._draw_automaticROI([15, 15, 15], 2)
+        self.viewer.removeOrigin_clicked()
+
+        self.assertEqual(len(self.viewer.incrementalROI_history), 1)
+        self.assertEqual(len(self.viewer.incrementalROI_origins), 1)
+
+    def test_run_length_roi_slices_match_dense(self):
+        mask = np.zeros((6, 7, 8), dtype=np.uint8)
+        mask[1:4, 2:6, 3:7] = 1
+        mask[5, 0, :] = 1
+        roi = RunLengthROI.from_mask(mask)
+        for plane_idx in range(3):
+            axis = 2 - plane_idx
+            for slice_idx in range(mask.shape[axis]):
+                np.testing.assert_array_equal(extract_slice(roi, plane_idx, slice_idx),
+                                              extract_slice(mask, plane_idx, slice_idx))
 
     # Additional tests to improve coverage
 
@@ -220,6 +377,240 @@ class TestNiftiViewer(unittest.TestCase):
         self.assertEqual(self.viewer.dims, (20, 20, 20), "Dimensions incorrect")
         self.assertFalse(self.viewer.is_4d, "Should be 3D data")
 
+    def _wait_for_load(self):
+        deadline = time.time() + 5
+        while self.viewer.threads and time.time() < deadline:
+            QTest.qWait(20)
+
+    def test_reopening_file_uses_session_cache(self):
+        self.viewer.open_file(self.test_nii_path)
+        self._wait_for_load()
+        first_data = self.viewer.img_data
+        self.viewer.open_file(self.test_4d_nii_path)
+        self._wait_for_load()
+        self.assertTrue(self.viewer.is_4d)
+
+        with patch.object(nifti_viewer, 'ImageLoadThread') as mock_thread:
+            self.viewer.open_file(self.test_nii_path)
+
+        mock_thread.assert_not_called()
+        self.assertIs(self.viewer.img_data, first_data)
+        self.assertFalse(self.viewer.is_4d)
+        self.assertEqual(self.viewer.file_path, self.test_nii_path)
+        self.assertEqual(len(self.viewer.session_cache), 2)
+        self.assertIn("(2)", self.viewer.cache_memory_label.text())
+
+    def test_reopening_overlay_reuses_threshold_index(self):
+        self.viewer.open_file(self.test_nii_path)
+        self._wait_for_load()
+        self.viewer.open_file(self.test_overlay_path, is_overlay=True)
+        self._wait_for_load()
+        index = self.viewer.overlay_threshold_index
+
+        self.viewer.reset_overlay()
+        with patch.object(nifti_viewer, 'ImageLoadThread') as mock_thread:
+            self.viewer.open_file(self.test_overlay_path, is_overlay=True)
+
+        mock_thread.assert_not_called()
+        self.assertIs(self.viewer.overlay_threshold_index, index)
+
+    def test_overlay_in_other_space_is_resampled_lazily(self):
+        self.viewer.open_file(self.test_nii_path)
+        self._wait_for_load()
+        # 10^3 overlay with 2 mm voxels, shifted by 2 mm, covering the 20^3 base image
+        affine = np.diag([2.0, 2.0, 2.0, 1.0])
+        affine[:3, 3] = 2.0
+        overlay = np.zeros((10, 10, 10), dtype=np.float32)
+        overlay[4, 4, 4] = 1.0
+        overlay_path = os.path.join(self.temp_dir.name, 'sub-01', 'overlay_2mm.nii')
+        nib.save(nib.Nifti1Image(overlay, affine), overlay_path)
+
+        self.viewer.open_file(overlay_path, is_overlay=True)
+        self._wait_for_load()
+
+        index = self.viewer.overlay_threshold_index
+        self.assertIsInstance(index, nifti_viewer.ResampledOverlay)
+        self.assertEqual(self.viewer.overlay_data.shape, (10, 10, 10), "Overlay must not be resampled on load")
+        mask = nifti_viewer.dense_mask(self.viewer.overlay_thresholded_data)
+        self.assertEqual(mask.shape, (20, 20, 20))
+        # World position of overlay voxel 4 is 2 + 4 * 2 = 10 mm -> base voxels 9..11 (nearest)
+        self.assertTrue(mask[10, 10, 10])
+        self.assertFalse(mask[0, 0, 0])
+        self.assertGreater(index.cache_bytes, 0, "Displayed slices should be cached")
+        self.assertLess(index.cache_bytes, mask.size * overlay.itemsize)
+
+    def test_crop_background_on_load(self):
+        data = np.zeros((30, 30, 30), dtype=np.float32)
+        data[10:20, 8:22, 5:15] = np.random.rand(10, 14, 10) + 1
+        padded_path = os.path.join(self.temp_dir.name, 'sub-01', 'padded.nii')
+        nib.save(nib.Nifti1Image(data, np.eye(4)), padded_path)
+
+        self.viewer.crop_checkbox.setChecked(True)
+        self.viewer.open_file(padded_path)
+        self._wait_for_load()
+
+        margin = nifti_viewer.ImageLoadThread.CROP_MARGIN
+        self.assertEqual(self.viewer.img_data.shape, (10 + 2 * margin, 14 + 2 * margin, 10 + 2 * margin))
+        np.testing.assert_array_equal(self.viewer.crop_offset, (10 - margin, 8 - margin, 5 - margin))
+        self.assertEqual(tuple(self.viewer.original_dims), (30, 30, 30))
+
+        # Coordinates are reported in the voxel grid of the file
+        self.viewer.current_coordinates = [0, 0, 0]
+        self.viewer.update_coordinate_displays()
+        self.assertEqual(self.viewer.coord_label.text(),
+                         f"Coordinates: ({10 - margin}, {8 - margin}, {5 - margin})")
+
+        # The cached cropped volume is not reused once cropping is turned off
+        self.viewer.crop_checkbox.setChecked(False)
+        self.viewer.open_file(padded_path)
+        self._wait_for_load()
+        self.assertEqual(self.viewer.img_data.shape, (30, 30, 30))
+        np.testing.assert_array_equal(self.viewer.crop_offset, (0, 0, 0))
+
+    def _wait_for_dicom(self):
+        deadline = time.time() + 5
+        while self.viewer.dicom_loader is not None and time.time() < deadline:
+            QTest.qWait(20)
+
+    def test_open_dicom_series_folder(self):
+        volume = np.random.default_rng(0).integers(1, 1000, size=(16, 12, 10)).astype(np.uint16)
+        folder = write_dicom_series(os.path.join(self.temp_dir.name, 'sub-01', 'dicom_t1'), volume)
+
+        self.viewer.open_file(folder)
+        self._wait_for_dicom()
+
+        self.assertEqual(self.viewer.file_path, folder)
+        self.assertEqual(self.viewer.img_data.shape, (16, 12, 10))
+        self.assertTrue(self.viewer.img_data.flags.c_contiguous)
+        self.assertGreater(self.viewer.img_data.min(), -1e-6)
+        self.assertLessEqual(self.viewer.img_data.max(), 1.0)
+        self.assertEqual(len(self.viewer.session_cache), 1)
+
+        with patch.object(nifti_viewer, 'DicomSeries') as mock_series:
+            self.viewer.open_file(folder)
+        mock_series.assert_not_called()
+
+    def test_dicom_slice_on_screen_is_shown_first(self):
+        volume = np.random.default_rng(0).integers(1, 1000, size=(16, 12, 10)).astype(np.uint16)
+        folder = write_dicom_series(os.path.join(self.temp_dir.name, 'sub-01', 'dicom_first'), volume)
+
+        class FirstSliceOnly(nifti_viewer.DicomSeriesLoadThread):
+            def run(self):
+                decoded = np.zeros(len(self.series), dtype=bool)
+                index = self._next_slice(self.series.loading_order(), decoded)
+                self.slice_ready.emit(index, self.series.read_slice(index))
+
+        with patch.object(nifti_viewer, 'DicomSeriesLoadThread', FirstSliceOnly):
+            self.viewer.open_file(folder)
+            self.viewer.dicom_loader.wait()
+            # The slice comes with the signal: nothing is decoded on the GUI thread
+            with patch.object(self.viewer.dicom_series, 'read_slice', side_effect=AssertionError("decoded again")):
+                QTest.qWait(100)
+
+        series = self.viewer.dicom_series
+        axis = series.canonical_slice_axis
+        filled = [c for c in range(self.viewer.img_data.shape[axis])
+                  if np.take(self.viewer.img_data, c, axis=axis).any()]
+        self.assertEqual(filled, [self.viewer.current_coordinates[axis]])
+        self.viewer.stop_dicom_loader()
+
+    def test_open_invalid_dicom_folder(self):
+        empty = os.path.join(self.temp_dir.name, 'sub-01', 'empty_dicom')
+        os.makedirs(empty, exist_ok=True)
+        with patch.object(nifti_viewer.QMessageBox, 'critical') as mock_critical:
+            self.viewer.open_file(empty)
+        mock_critical.assert_called_once()
+        self.assertIsNone(self.viewer.img_data)
+
+    def _wait_for_projections(self):
+        for _ in range(100):
+            QTest.qWait(20)
+            if self.viewer.projection_worker.pending() == 0 and None not in self.viewer.displayed_render_keys:
+                QTest.qWait(20)
+                return
+
+    def test_mip_views_are_cached_per_frame(self):
+        self.viewer.open_file(self.test_4d_nii_path)
+        self._wait_for_load()
+        self.viewer.projection_combo.setCurrentIndex(self.viewer.projection_combo.findData("MIP"))
+        self._wait_for_projections()
+
+        frame = self.viewer.current_time
+        volume = self.viewer.img_data[..., frame]
+        for plane_idx in range(3):
+            key = (frame, "MIP", 2 - plane_idx)
+            self.assertIn(key, self.viewer.projection_cache)
+            np.testing.assert_allclose(self.viewer.projection_cache.get(key), volume.max(axis=2 - plane_idx))
+            self.assertEqual(self.viewer.displayed_render_keys[plane_idx][-1], key)
+
+        # Redrawing the same frame reuses the cached projections
+        with patch.object(self.viewer, 'request_projection') as mock_request:
+            self.viewer.invalidate_render_cache()
+            self.viewer.update_all_displays()
+        mock_request.assert_not_called()
+
+        # Moving through the slices does not redraw the projections
+        with patch.object(self.viewer, 'render_slice_pixmap') as mock_render:
+            for plane_idx in range(3):
+                self.viewer.slice_sliders[plane_idx].setValue(self.viewer.current_slices[plane_idx] + 1)
+        mock_render.assert_not_called()
+
+        # A new frame needs new projections
+        with patch.object(self.viewer, 'request_projection') as mock_request:
+            self.viewer.time_changed(frame + 1)
+        requested = {call.args[0] for call in mock_request.call_args_list}
+        self.assertEqual(requested, {(frame + 1, "MIP", axis) for axis in range(3)})
+
+    def test_rotating_mip_is_precomputed(self):
+        self.viewer.open_file(self.test_nii_path)
+        self._wait_for_load()
+        self.viewer.projection_combo.setCurrentIndex(self.viewer.projection_combo.findData(nifti_viewer.ROTATING_MIP))
+        self.assertTrue(self.viewer.rotating_mip_timer.isActive())
+        self._wait_for_projections()
+
+        angles = self.viewer.rotating_mip_angles
+        self.assertEqual(len(angles), 360 // self.viewer.ROTATING_MIP_STEP_DEG)
+        for angle in angles:
+            self.assertIn((0, nifti_viewer.ROTATING_MIP, float(angle)), self.viewer.projection_cache)
+
+        self.viewer.projection_combo.setCurrentIndex(0)
+        self.assertFalse(self.viewer.rotating_mip_timer.isActive())
+        self.assertIsNone(self.viewer.displayed_render_keys[1][-1])
+
+    def test_volume_session_cache_lru_budget(self):
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir.name, f'cache_{i}.nii')
+            open(path, 'w').close()
+            paths.append(path)
+        volume = np.zeros((10, 10, 10), dtype=np.float32)  # 4000 bytes
+        cache = VolumeSessionCache(max_bytes=9000)
+
+        cache.put(paths[0], volume, volume.shape, np.eye(4), False)
+        cache.put(paths[1], volume.copy(), volume.shape, np.eye(4), False)
+        self.assertIsNotNone(cache.get(paths[0]))  # paths[1] becomes least recently used
+        cache.put(paths[2], volume.copy(), volume.shape, np.eye(4), False)
+
+        self.assertIsNone(cache.get(paths[1]))
+        self.assertIsNotNone(cache.get(paths[0]))
+        self.assertEqual(cache.nbytes, 8000)
+
+        # Derived statistics count against the budget too
+        cache.add_stat(cache.get(paths[0]), "extra", np.zeros(1500, dtype=np.uint8))
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.put(paths[1], np.zeros(10000, dtype=np.uint8), (10000,), np.eye(4), False))
+
+    def test_volume_session_cache_detects_modified_file(self):
+        path = os.path.join(self.temp_dir.name, 'modified.nii')
+        with open(path, 'w') as f:
+            f.write('a')
+        cache = VolumeSessionCache(max_bytes=1 << 20)
+        cache.put(path, np.zeros(4), (4,), np.eye(4), False)
+        with open(path, 'w') as f:
+            f.write('changed')
+
+        self.assertIsNone(cache.get(path))
+
     @patch('components.nifti_file_dialog.NiftiFileDialog.get_files')
     def test_load_4d_file(self, mock_get_files):
         mock_get_files.return_value = [self.test_4d_nii_path]
@@ -296,6 +687,33 @@ class TestNiftiViewer(unittest.TestCase):
 
         self.assertTrue(mock_thread_start.called, "Il thread di salvataggio dovrebbe essere avviato")
 
+    @patch('PyQt6.QtWidgets.QMessageBox.exec', return_value=QMessageBox.StandardButton.Yes)
+    def test_ROI_save_encodes_thresholded_overlay(self, mock_exec):
+        """The thresholded overlay is saved from its stored mask, dense or lazy"""
+        mask = np.zeros((20, 20, 20), dtype=bool)
+        mask[3:7, 4:9, 5:12] = True
+
+        class LazyMask:
+            shape = mask.shape
+
+            def plane(self, axis, index):
+                return mask.take(index, axis)
+
+        self.viewer.img_data = np.ones((20, 20, 20))
+        self.viewer.dims = (20, 20, 20)
+        self.viewer.affine = np.eye(4)
+        self.viewer.file_path = os.path.join(self.temp_dir.name, "sub-01", "anat", "T1w.nii.gz")
+        self.viewer.context = {"workspace_path": self.temp_dir.name}
+        self.viewer.overlay_data = mask.astype(np.float32)
+        self.viewer.overlay_enabled = True
+        self.viewer.automaticROI_overlay = False
+
+        for stored in (mask, LazyMask()):
+            self.viewer.overlay_thresholded_data = stored
+            with patch.object(nifti_viewer, "SaveNiftiThread") as save_thread:
+                self.viewer.ROI_save()
+            np.testing.assert_array_equal(save_thread.call_args[0][0].to_dense(bool), mask)
+
     def test_resize_event(self):
         with patch.object(self.viewer.views[0], 'fitInView') as mock_fitInView:
             QTest.qWait(500)
@@ -350,6 +768,37 @@ class TestNiftiViewer(unittest.TestCase):
 
         self.assertTrue(self.viewer.coord_label.text().startswith("Coordinates:"), "Coordinate label should be updated")
 
+    def test_mouse_moves_are_coalesced_per_frame(self):
+        self.viewer.open_file(self.test_nii_path)
+        self._wait_for_load()
+
+        with patch.object(self.viewer, 'update_coordinates') as mock_update:
+            self.viewer.hover_update.callback = mock_update
+            for x in range(10):
+                self.viewer.views[0].coordinate_changed.emit(0, x, 5)
+            mock_update.assert_not_called()
+            QTest.qWait(self.viewer.POINTER_FRAME_MS * 4)
+
+        mock_update.assert_called_once_with(0, 9, 5)
+
+    def test_click_moves_crosshair_immediately_and_defers_redraw(self):
+        self.viewer.open_file(self.test_nii_path)
+        self._wait_for_load()
+
+        with patch.object(self.viewer, 'update_all_displays') as mock_displays, \
+                patch.object(self.viewer, 'update_cross_view_lines') as mock_lines:
+            for x in (3, 4, 7):
+                self.viewer.handle_click_coordinates(0, x, 5)
+            self.assertEqual(mock_lines.call_count, 3, "Crosshairs should follow every click")
+            mock_displays.assert_not_called()
+            self.viewer.navigation_update.flush()
+
+        mock_displays.assert_called_once()
+        self.assertEqual(self.viewer.current_coordinates[0], 7)
+        self.assertEqual(self.viewer.current_slices[2], 7)
+        self.assertEqual(self.viewer.slice_sliders[2].value(), 7)
+        self.assertEqual(self.viewer.slice_spins[2].value(), 7)
+
     def test_update_cross_view_lines(self):
         self.viewer.open_file(self.test_nii_path)
         loop = QEventLoop()
@@ -379,6 +828,203 @@ class TestNiftiViewer(unittest.TestCase):
 
         self.assertEqual(self.viewer.windowTitle(), "NIfTI Image Viewer", "Window title should be translated")
 
+    def test_slice_render_cache_lru_eviction(self):
+        pixmap = QPixmap(10, 10)
+        size = SliceRenderCache.pixmap_nbytes(pixmap)
+        cache = SliceRenderCache(max_bytes=2 * size)
+
+        cache.put("a", pixmap)
+        cache.put("b", pixmap)
+        self.assertIsNotNone(cache.get("a"), "Cached pixmap should be returned")
+        cache.put("c", pixmap)
+
+        self.assertIn("a", cache, "Recently used entry should be kept")
+        self.assertNotIn("b", cache, "Least recently used entry should be evicted")
+        self.assertEqual(cache.nbytes, 2 * size, "Cache should stay within its byte budget")
+
+        cache.put("huge", QPixmap(100, 100))
+        self.assertNotIn("huge", cache, "Pixmaps larger than the budget should not be cached")
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.nbytes, 0)
+
+    def test_update_all_displays_redraws_only_dirty_planes(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        with patch.object(self.viewer, 'render_slice_pixmap', wraps=self.viewer.render_slice_pixmap) as mock_render:
+            self.viewer.update_all_displays()
+            self.assertEqual(mock_render.call_count, 0, "Unchanged planes should not be redrawn")
+
+            self.viewer.slice_sliders[0].setValue(3)
+            self.viewer.update_all_displays()
+            self.assertEqual(mock_render.call_count, 1, "Only the changed plane should be redrawn")
+
+            self.viewer.slice_sliders[0].setValue(10)
+            self.viewer.slice_sliders[0].setValue(3)
+            self.assertEqual(mock_render.call_count, 2, "Revisited slices should come from the cache")
+
+            self.viewer.colormap_combo.setCurrentText('hot')
+            self.assertEqual(mock_render.call_count, 5, "Colormap change should redraw every plane")
+
+    def test_roi_change_invalidates_rendered_slices(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        version = self.viewer.roi_version
+        self.viewer.automaticROI_clicked()
+        self.assertGreater(self.viewer.roi_version, version, "ROI drawing should bump the ROI version")
+        for i in range(3):
+            self.assertEqual(self.viewer.displayed_render_keys[i], self.viewer.render_key(i),
+                             "Every plane should be redrawn with the new ROI")
+
+    def test_cine_playback(self):
+        self.viewer.open_file(self.test_4d_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.assertTrue(self.viewer.cine_play_btn.isEnabled(), "Cine playback should be available for 4D data")
+        self.viewer.cine_fps_spin.setValue(20)
+        self.viewer.cine_play_btn.setChecked(True)
+        self.assertIsNotNone(self.viewer.cine_prefetcher, "Prefetcher should start with playback")
+
+        QTest.qWait(800)
+        self.assertNotEqual(self.viewer.current_time, 0, "Playback should advance the time frame")
+
+        self.viewer.cine_play_btn.setChecked(False)
+        self.assertIsNone(self.viewer.cine_prefetcher, "Prefetcher should stop with playback")
+        self.assertFalse(self.viewer.cine_timer.isActive())
+
+    def test_cine_playback_renders_projections(self):
+        self.viewer.open_file(self.test_4d_nii_path)
+        self._wait_for_load()
+        self.viewer.projection_combo.setCurrentIndex(self.viewer.projection_combo.findData("MIP"))
+        self._wait_for_projections()
+
+        self.viewer.cine_fps_spin.setValue(20)
+        self.viewer.cine_play_btn.setChecked(True)
+        QTest.qWait(800)
+        self.viewer.cine_play_btn.setChecked(False)
+        self.assertNotEqual(self.viewer.current_time, 0, "Playback should advance in projection mode")
+
+        volume = self.viewer.img_data[..., self.viewer.current_time]
+        for plane_idx in range(3):
+            cached = self.viewer.render_cache.get(self.viewer.render_key(plane_idx))
+            self.assertIsNotNone(cached)
+            projection = np.expand_dims(volume.max(axis=2 - plane_idx), 2 - plane_idx)
+            expected = self.viewer.render_slice_image(projection, plane_idx, 0,
+                                                      self.viewer.plane_pixel_spacing(plane_idx),
+                                                      self.viewer.colormap, [], self.viewer.overlay_alpha)
+            self.assertEqual(cached.toImage(), QPixmap.fromImage(expected).toImage(),
+                             "Cine frames should be cached as projections")
+
+    def test_time_series_plot_blits_time_changes(self):
+        self.viewer.open_file(self.test_4d_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        self.assertTrue(self.viewer.img_data.flags.c_contiguous, "4D data should be time-contiguous")
+        self.viewer.update_time_series_plot()
+        self.assertIsNotNone(self.viewer.time_plot_background, "Background should be cached after a full draw")
+
+        with patch.object(self.viewer.time_plot_canvas, 'draw') as mock_draw, \
+                patch.object(self.viewer.time_plot_canvas, 'blit') as mock_blit:
+            self.viewer.time_changed(3)
+            self.assertFalse(mock_draw.called, "Time changes should not redraw the whole figure")
+            self.assertTrue(mock_blit.called, "Time changes should be blitted")
+
+        x, _ = self.viewer.time_indicator_line.get_xdata()
+        self.assertEqual(x, 3, "Time indicator should follow the current frame")
+        coords = self.viewer.current_coordinates
+        np.testing.assert_array_equal(self.viewer.time_series_line.get_ydata(),
+                                      self.viewer.img_data[coords[0], coords[1], coords[2], :])
+
+    def test_roi_time_series_cached_per_overlay_version(self):
+        self.viewer.open_file(self.test_4d_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        mask = np.zeros((20, 20, 20), dtype=bool)
+        mask[5:10, 5:10, 5:10] = True
+        self.viewer.overlay_data = mask.astype(np.float32)
+        self.viewer.overlay_thresholded_data = mask
+        self.viewer.overlay_enabled = True
+        self.viewer.overlay_version += 1
+        self.viewer.current_coordinates = [6, 6, 6]
+
+        key, mean_series, std_series, _ = self.viewer.time_series_data()
+        self.assertEqual(key[0], "roi")
+        np.testing.assert_allclose(mean_series, self.viewer.img_data[mask].mean(axis=0), rtol=1e-6)
+        np.testing.assert_allclose(std_series, self.viewer.img_data[mask].std(axis=0), rtol=1e-6)
+
+        _, cached_mean, _, _ = self.viewer.time_series_data()
+        self.assertIs(cached_mean, mean_series, "ROI curve should be served from the cache")
+
+        self.viewer.overlay_version += 1
+        _, recomputed_mean, _, _ = self.viewer.time_series_data()
+        self.assertIsNot(recomputed_mean, mean_series, "A new overlay version should recompute the curve")
+
+        self.viewer.current_coordinates = [15, 15, 15]
+        key, _, std_series, _ = self.viewer.time_series_data()
+        self.assertEqual(key, ("voxel", 15, 15, 15))
+        self.assertIsNone(std_series)
+
+    def test_overlay_threshold_index_matches_full_threshold(self):
+        rng = np.random.default_rng(0)
+        for order in ('C', 'F'):
+            data = np.asarray(rng.random((12, 10, 8)), order=order)
+            index = OverlayThresholdIndex(data)
+            for threshold in (0.5, 0.2, 0.9, 0.9, 0.0, 1.0):
+                changed = index.set_threshold(threshold)
+                np.testing.assert_array_equal(index.mask, data > threshold)
+                self.assertEqual(index.count, int(np.sum(data > threshold)))
+                x, y, z = index.changed_coordinates(changed)
+                self.assertEqual(len(x), changed.size)
+
+        index = OverlayThresholdIndex(np.zeros((4, 4, 4)))
+        index.set_threshold(0.0)
+        self.assertEqual(index.count, 0, "Voxels equal to the threshold should be excluded")
+
+    def test_overlay_threshold_redraws_only_affected_planes(self):
+        self.viewer.open_file(self.test_nii_path)
+        loop = QEventLoop()
+        QTimer.singleShot(1000, loop.quit)
+        loop.exec()
+
+        overlay = np.zeros((20, 20, 20), dtype=np.float32)
+        overlay[2, 3, 4] = 0.5
+        overlay[9, 9, 9] = 1.0
+        self.viewer.current_slices = [9, 9, 9]
+        self.viewer.current_coordinates = [9, 9, 9]
+        self.viewer.overlay_data = overlay
+        self.viewer.overlay_file_path = self.test_overlay_path
+        self.viewer.overlay_dims = overlay.shape
+        self.viewer.overlay_max = 1.0
+        self.viewer.overlay_threshold_index = OverlayThresholdIndex(overlay)
+        self.viewer.overlay_enabled = True
+        self.viewer.update_overlay_threshold(60)
+        self.assertEqual(self.viewer.overlay_threshold_index.count, 1)
+        self.assertIn("Voxels above threshold: 1", self.viewer.overlay_info_label.text())
+
+        with patch.object(self.viewer, 'render_slice_pixmap', wraps=self.viewer.render_slice_pixmap) as mock_render:
+            # Only voxel (2, 3, 4) crosses the threshold; none of the displayed slices contain it
+            self.viewer.update_overlay_threshold(40)
+            self.assertEqual(mock_render.call_count, 0, "Unaffected planes should keep their pixmap")
+            np.testing.assert_array_equal(self.viewer.overlay_thresholded_data, overlay > 0.4)
+
+            self.viewer.slice_sliders[0].setValue(4)
+            mock_render.reset_mock()
+            self.viewer.update_overlay_threshold(60)
+            self.assertEqual(mock_render.call_count, 1, "Only the plane containing the changed voxel should be redrawn")
+
     def test_close_event(self):
         # Simulate close event
         mock_event = MagicMock()